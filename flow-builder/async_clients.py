@@ -0,0 +1,90 @@
+"""
+Shared asyncio clients for the GreenLine agent builders.
+
+AsyncClientPool owns a single pooled httpx.AsyncClient that every AsyncRetell
+client created through it reuses, so concurrent provisioning calls share one
+set of keep-alive connections instead of opening a new pool per builder.
+The async Supabase client is cached per project but keeps its own HTTP
+connections (see AsyncClientPool.supabase).
+
+Usage:
+    async with AsyncClientPool() as pool:
+        builder = AsyncGreenLineAgentBuilder(api_key, pool=pool)
+        results = await builder.create_agents(configs)
+"""
+
+import asyncio
+
+import httpx
+from retell import AsyncRetell, DefaultAsyncHttpxClient
+
+# Connection limits for the shared pool
+DEFAULT_MAX_CONNECTIONS = 50
+DEFAULT_MAX_KEEPALIVE = 20
+DEFAULT_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+
+class AsyncClientPool:
+    """
+    Pooled AsyncRetell and async Supabase clients.
+
+    Clients are created lazily and cached, so builders that share a pool
+    also share clients. Only the Retell clients run on the pooled `http`
+    connections. Create the pool inside the event loop that will use it and
+    close it with `await pool.aclose()` (or `async with`).
+    """
+
+    def __init__(
+        self,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE,
+        timeout: httpx.Timeout = DEFAULT_TIMEOUT,
+    ):
+        self.http = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+            ),
+            timeout=timeout,
+        )
+        self._retell: dict = {}
+        self._supabase: dict = {}
+        self._supabase_lock = asyncio.Lock()
+
+    def retell(self, api_key: str) -> AsyncRetell:
+        """AsyncRetell client for an API key, backed by the shared connection pool."""
+        if api_key not in self._retell:
+            self._retell[api_key] = AsyncRetell(api_key=api_key, http_client=self.http)
+        return self._retell[api_key]
+
+    async def supabase(self, url: str, key: str):
+        """
+        Async Supabase client for a project, or None if supabase is not installed.
+
+        The client is created once per (url, key) and reused; concurrent
+        first calls wait for the same client instead of each creating one.
+
+        supabase-py builds its own httpx clients for PostgREST, auth and
+        storage, so this client does not use the pooled `http` connections
+        and is not closed by aclose().
+        """
+        try:
+            from supabase import acreate_client
+        except ImportError:
+            return None
+
+        async with self._supabase_lock:
+            if (url, key) not in self._supabase:
+                self._supabase[(url, key)] = await acreate_client(url, key)
+        return self._supabase[(url, key)]
+
+    async def aclose(self):
+        """Close the shared HTTP pool (used by the Retell clients)."""
+        await self.http.aclose()
+
+    async def __aenter__(self) -> "AsyncClientPool":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
@@ -0,0 +1,171 @@
+"""
+Short-TTL cache with request coalescing for upstream availability lookups.
+
+Every /api/availability call used to hit the Calendly API, and callers
+arriving together each made their own request. TTLCache sits in front of
+an async loader:
+
+- fresh entries (younger than `ttl`) are returned without a call
+- stale entries (up to `ttl + stale_ttl` old) are returned immediately
+  while one background refresh runs
+- concurrent misses for the same key share one in-flight load (single
+  flight); if it fails and a stale value exists, the stale value is served
+- invalidate() drops entries, and loads that started before it are not
+  stored, so a booking is never hidden by a refresh already in flight
+- with a SharedState (see shared_state.py) invalidate() bumps a shared
+  generation counter, and every worker process drops its entries when it
+  sees the counter move, so a booking on one worker isn't hidden by
+  another worker's cache
+
+Usage:
+    cache = TTLCache(fetch_slots, ttl=30, stale_ttl=300)
+    slots = await cache.get((event_type, days_ahead))
+    await cache.invalidate()    # After a booking
+"""
+
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Hashable, Optional
+
+from shared_state import SharedState
+from structured_log import get_logger
+
+logger = get_logger("availability_cache")
+
+DEFAULT_TTL = float(os.environ.get("AVAILABILITY_CACHE_TTL", 30))
+DEFAULT_STALE_TTL = float(os.environ.get("AVAILABILITY_STALE_TTL", 300))
+
+# Shared generation before the first sync()
+_UNSYNCED = object()
+
+
+class TTLCache:
+    """
+    Async read-through cache with single-flight loads and stale-while-revalidate.
+
+    Args:
+        loader: async function key -> value; raise to signal failure
+        ttl: Seconds a value is served without refreshing
+        stale_ttl: Further seconds a value is served while a refresh runs
+        shared: Store shared with other workers, for invalidations
+        generation_key: Shared counter bumped by invalidate()
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[Hashable], Awaitable],
+        ttl: float = DEFAULT_TTL,
+        stale_ttl: float = DEFAULT_STALE_TTL,
+        shared: Optional[SharedState] = None,
+        generation_key: str = "availability:generation",
+    ):
+        self.loader = loader
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.shared = shared
+        self.generation_key = generation_key
+        self._shared_generation = _UNSYNCED  # Read on the first sync()
+        self._entries: dict = {}  # key -> (loaded_at, value)
+        self._inflight: dict = {}  # key -> asyncio.Task
+        self._generation = 0  # Bumped by invalidate()
+        self.counters = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0,
+                         "loads": 0, "load_errors": 0, "invalidations": 0, "shared_invalidations": 0}
+
+    async def get(self, key: Hashable):
+        """
+        Value for `key`, loading it if missing or expired.
+
+        Returns:
+            The cached value (shared between callers - don't mutate it)
+
+        Raises:
+            Whatever the loader raised, if there is no stale value to fall back on
+        """
+        if self.shared is not None:
+            await self.sync()
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age < self.ttl:
+                self.counters["hits"] += 1
+                return entry[1]
+            if age < self.ttl + self.stale_ttl:
+                self.counters["stale_hits"] += 1
+                self._load(key)  # Refresh in the background
+                return entry[1]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.counters["coalesced"] += 1
+        else:
+            self.counters["misses"] += 1
+            task = self._load(key)
+        try:
+            # shield: a cancelled caller must not cancel the shared load
+            return await asyncio.shield(task)
+        except Exception:
+            if entry is not None:
+                return entry[1]
+            raise
+
+    def _load(self, key: Hashable) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._run_loader(key, self._generation))
+            # Background refreshes may have no awaiter; mark their errors retrieved
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        return task
+
+    async def _run_loader(self, key: Hashable, generation: int):
+        self.counters["loads"] += 1
+        try:
+            value = await self.loader(key)
+        except Exception as e:
+            self.counters["load_errors"] += 1
+            logger.warning("Availability refresh failed",
+                           extra={"event": "availability_refresh_failed", "key": str(key), "error": str(e)})
+            raise
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+        if generation == self._generation:
+            self._entries[key] = (time.monotonic(), value)
+        return value
+
+    async def sync(self):
+        """Drop everything if another worker invalidated since the last check."""
+        generation = await self.shared.get(self.generation_key)
+        if self._shared_generation is _UNSYNCED:
+            self._shared_generation = generation
+        elif generation != self._shared_generation:
+            self._shared_generation = generation
+            self._drop(None)
+            self.counters["shared_invalidations"] += 1
+
+    async def invalidate(self, key: Hashable = None):
+        """Drop one key (or everything, on every worker); loads already running won't be stored."""
+        self.counters["invalidations"] += 1
+        if self.shared is not None:
+            # Other workers can't drop a single key, so they drop everything
+            previous = self._shared_generation
+            generation = await self.shared.incr(self.generation_key)
+            if previous is _UNSYNCED or generation != int(previous or 0) + 1:
+                key = None  # Another worker invalidated since our last check
+            self._shared_generation = str(generation)
+        self._drop(key)
+
+    def _drop(self, key: Hashable):
+        self._generation += 1
+        if key is None:
+            self._entries.clear()
+            self._inflight.clear()
+        else:
+            self._entries.pop(key, None)
+            self._inflight.pop(key, None)
+
+    def metrics(self) -> dict:
+        """Hit/miss counters and current size."""
+        return {"entries": len(self._entries), "inflight": len(self._inflight),
+                "ttl": self.ttl, "stale_ttl": self.stale_ttl, **self.counters}
@@ -0,0 +1,498 @@
+"""
+GreenLine AI Batch Agent Provisioning
+=====================================
+
+Provisions many GreenLine agents at once, e.g. after a campaign brings in a
+few hundred new contractors. Each job runs the same pipeline as
+GreenLineAgentBuilder.create_agent:
+
+    conversation flow -> voice agent -> Supabase business_onboarding link
+
+Jobs run concurrently on a bounded thread pool. Every Retell/Supabase call
+goes through a per-tenant token bucket (the tenant being the account that
+owns the onboarding row, or the company of a config-based job), transient failures are retried with
+exponential backoff, and each completed step is appended to a JSONL journal
+so an interrupted batch can be resumed without re-creating flows or agents.
+
+Creating a flow or agent is not idempotent: a request that reached Retell
+but whose response was lost would create a duplicate if sent again. Those
+steps are only retried when Retell provably did nothing (a refused
+connection or a 429), and the builder should be created with
+max_retries=0 so the SDK doesn't retry them behind our back.
+
+Usage:
+    cd flow-builder
+    python cli.py provision-batch --onboarding-file ids.txt --workers 8
+    python cli.py provision-batch -c acme.json -c bobs_hvac.json
+"""
+
+import copy
+import dataclasses
+import json
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+import httpx
+from retell import APIConnectionError, APIStatusError
+
+from greenline_agent import (
+    GreenLineAgentBuilder,
+    GreenLineConfig,
+    build_config_from_onboarding,
+)
+from flow_cache import FlowCache
+
+# Default location of the resumable progress journal
+DEFAULT_JOURNAL_PATH = "provision_journal.jsonl"
+
+# HTTP statuses worth retrying (timeouts, rate limits and server errors)
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# Statuses that mean the request was refused before anything was created
+REJECTED_STATUS_CODES = {429}
+
+
+class OnboardingLinkError(ValueError):
+    """link_agent_to_onboarding() did not update the onboarding row."""
+
+
+@dataclass
+class ProvisionJob:
+    """A single agent to provision, from either a config or an onboarding row."""
+    job_id: str
+    config: Optional[GreenLineConfig] = None
+    onboarding_id: Optional[str] = None
+    tenant: Optional[str] = None  # Rate limiting bucket (default: onboarding_tenant / config_tenant)
+
+
+@dataclass
+class ProvisionResult:
+    """Outcome of a single ProvisionJob."""
+    job_id: str
+    status: str  # 'created', 'failed' or 'skipped'
+    conversation_flow_id: Optional[str] = None
+    agent_id: Optional[str] = None
+    onboarding_updated: bool = False
+    attempts: int = 0
+    latency_s: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass
+class BatchStats:
+    """Aggregate throughput and latency for a provisioning batch."""
+    total: int = 0
+    created: int = 0
+    failed: int = 0
+    skipped: int = 0
+    attempts: int = 0
+    elapsed_s: float = 0.0
+    latencies: list = field(default_factory=list)
+    step_latencies: dict = field(default_factory=dict)
+
+    def record_step(self, step: str, seconds: float):
+        self.step_latencies.setdefault(step, []).append(seconds)
+
+    def summary(self) -> dict:
+        """Summarize the batch as plain numbers (safe to json.dump)."""
+        done = self.created + self.failed
+        return {
+            "total": self.total,
+            "created": self.created,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "attempts": self.attempts,
+            "elapsed_s": round(self.elapsed_s, 2),
+            "agents_per_minute": round(done / self.elapsed_s * 60, 2) if self.elapsed_s else 0.0,
+            "latency_s": _latency_summary(self.latencies),
+            "step_latency_s": {
+                step: _latency_summary(values)
+                for step, values in self.step_latencies.items()
+            },
+        }
+
+
+def _percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def _latency_summary(values: list) -> dict:
+    ordered = sorted(values)
+    if not ordered:
+        return {"count": 0}
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": round(_percentile(ordered, 50), 3),
+        "p95": round(_percentile(ordered, 95), 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+class TenantRateLimiter:
+    """
+    Thread-safe token bucket per tenant.
+
+    Each tenant gets `rate` requests per second with bursts of up to
+    `burst` requests. acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate: float = 2.0, burst: int = 4):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._buckets: dict = {}  # tenant -> [tokens, last_refill]
+        self._lock = threading.Lock()
+
+    def acquire(self, tenant: str):
+        if self.rate <= 0:
+            return
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                tokens, last = self._buckets.get(tenant, (float(self.burst), now))
+                tokens = min(float(self.burst), tokens + (now - last) * self.rate)
+                if tokens >= 1:
+                    self._buckets[tenant] = (tokens - 1, now)
+                    return
+                self._buckets[tenant] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+            time.sleep(wait)
+
+
+class ProvisioningJournal:
+    """
+    Append-only JSONL record of provisioning progress.
+
+    One line is written per completed step (flow_created, agent_created,
+    linked) and one per finished job. On load, the journal is replayed so
+    a resumed batch skips finished jobs and picks up partially provisioned
+    ones from their last completed step.
+    """
+
+    def __init__(self, path: str = DEFAULT_JOURNAL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.state: dict = {}  # job_id -> merged journal entries
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Torn write from an interrupted run
+                self.state.setdefault(entry["job_id"], {}).update(entry)
+
+    def get(self, job_id: str) -> dict:
+        with self._lock:
+            return dict(self.state.get(job_id, {}))
+
+    def is_done(self, job_id: str) -> bool:
+        return self.get(job_id).get("step") == "done"
+
+    def record(self, job_id: str, step: str, **data):
+        entry = {"job_id": job_id, "step": step, "ts": time.time(), **data}
+        line = json.dumps(entry, default=str)
+        with self._lock:
+            self.state.setdefault(job_id, {}).update(entry)
+            with open(self.path, 'a') as f:
+                f.write(line + "\n")
+                f.flush()
+
+
+def _slug(name: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+
+
+def config_job_id(config: GreenLineConfig) -> str:
+    """Stable job id for a config-based job (company slug + phone digits)."""
+    slug = _slug(config.company_name)
+    digits = re.sub(r'\D', '', config.phone_number)
+    return f"{slug}-{digits}" if digits else slug
+
+
+def config_tenant(config: GreenLineConfig) -> str:
+    """Rate limiting bucket for a config-based job: the company."""
+    return f"company:{_slug(config.company_name)}"
+
+
+def onboarding_tenant(onboarding: dict) -> str:
+    """Rate limiting bucket for an onboarding job: the account that owns the row."""
+    return f"user:{onboarding.get('user_id') or onboarding.get('id')}"
+
+
+def jobs_from_configs(configs: Iterable[GreenLineConfig], tenant: Optional[str] = None) -> list:
+    """Wrap GreenLineConfigs as ProvisionJobs (tenant: one bucket for all of them, instead of one per company)."""
+    return [
+        ProvisionJob(job_id=config_job_id(config), config=config, tenant=tenant)
+        for config in configs
+    ]
+
+
+def jobs_from_onboarding_ids(onboarding_ids: Iterable[str], tenant: Optional[str] = None) -> list:
+    """Wrap business_onboarding ids as ProvisionJobs (tenant: one bucket for all of them, instead of one per owner)."""
+    return [
+        ProvisionJob(job_id=onboarding_id, onboarding_id=onboarding_id, tenant=tenant)
+        for onboarding_id in onboarding_ids
+    ]
+
+
+def is_retryable(error: Exception, idempotent: bool = True) -> bool:
+    """
+    Whether a failed Retell/Supabase call is worth retrying.
+
+    Args:
+        error: What the call raised
+        idempotent: False for creates, which are only retried when the
+            request provably never took effect (no connection, or a 429);
+            after a timeout or a 5xx the object may exist already
+    """
+    if not idempotent:
+        if isinstance(error, APIConnectionError):
+            return isinstance(error.__cause__, (httpx.ConnectError, httpx.ConnectTimeout))
+        return isinstance(error, APIStatusError) and error.status_code in REJECTED_STATUS_CODES
+    if isinstance(error, OnboardingLinkError):
+        return True  # The link step reports Supabase errors as False
+    if isinstance(error, APIConnectionError):
+        return True  # Includes timeouts
+    if isinstance(error, APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    # Supabase (postgrest/httpx) transport errors
+    return isinstance(error, (ConnectionError, TimeoutError)) or type(error).__name__ in (
+        "ConnectError", "ReadTimeout", "RemoteProtocolError"
+    )
+
+
+class BatchProvisioner:
+    """
+    Provision many GreenLine agents concurrently with a bounded worker pool.
+
+    Example:
+        builder = GreenLineAgentBuilder(api_key)
+        provisioner = BatchProvisioner(builder, max_workers=8)
+        results, stats = provisioner.provision(jobs_from_onboarding_ids(ids))
+        print(stats.summary())
+    """
+
+    def __init__(
+        self,
+        builder: GreenLineAgentBuilder,
+        max_workers: int = 8,
+        rate_per_second: float = 2.0,
+        burst: int = 4,
+        max_retries: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+        journal_path: Optional[str] = DEFAULT_JOURNAL_PATH,
+    ):
+        self.builder = builder
+        self.max_workers = max(1, max_workers)
+        self.rate_limiter = TenantRateLimiter(rate_per_second, burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.journal = ProvisioningJournal(journal_path) if journal_path else None
+        self._stats_lock = threading.Lock()
+
+    def provision(self, jobs: list) -> tuple:
+        """
+        Run all jobs and wait for them to finish.
+
+        Args:
+            jobs: List of ProvisionJob
+
+        Returns:
+            Tuple of (list of ProvisionResult, BatchStats)
+        """
+        stats = BatchStats(total=len(jobs))
+        results = []
+        started = time.monotonic()
+
+        pending = []
+        for job in jobs:
+            if self.journal and self.journal.is_done(job.job_id):
+                previous = self.journal.get(job.job_id)
+                results.append(ProvisionResult(
+                    job_id=job.job_id,
+                    status="skipped",
+                    conversation_flow_id=previous.get("conversation_flow_id"),
+                    agent_id=previous.get("agent_id"),
+                    onboarding_updated=previous.get("onboarding_updated", False),
+                ))
+                stats.skipped += 1
+            else:
+                pending.append(job)
+
+        if stats.skipped:
+            print(f"Resuming batch: {stats.skipped} job(s) already provisioned")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self._run_job, job, stats): job for job in pending}
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+
+                if result.status == "created":
+                    print(f"[{len(results)}/{stats.total}] ✓ {result.job_id} -> {result.agent_id} ({result.latency_s:.1f}s)")
+                else:
+                    print(f"[{len(results)}/{stats.total}] ✗ {result.job_id}: {result.error}")
+
+        stats.elapsed_s = time.monotonic() - started
+        return results, stats
+
+    def _run_job(self, job: ProvisionJob, stats: BatchStats) -> ProvisionResult:
+        """Run the flow -> agent -> link pipeline for one job, resuming from the journal."""
+        started = time.monotonic()
+        state = self.journal.get(job.job_id) if self.journal else {}
+        result = ProvisionResult(job_id=job.job_id, status="failed")
+
+        try:
+            config = job.config
+            if config is None:
+                # Until the owner is known, the fetch is limited per onboarding row
+                fetch_job = job if job.tenant else dataclasses.replace(job, tenant=f"onboarding:{job.onboarding_id}")
+                onboarding = self._call(fetch_job, result, stats, "fetch_onboarding",
+                                        self.builder.fetch_onboarding, job.onboarding_id)
+                config = build_config_from_onboarding(onboarding)
+                tenant = job.tenant or onboarding_tenant(onboarding)
+            else:
+                # Jobs can be re-run, so never mutate the caller's config
+                config = copy.deepcopy(config)
+                tenant = job.tenant or config_tenant(config)
+            job = dataclasses.replace(job, tenant=tenant)
+
+            self.builder.prepare_config(config)
+
+            flow_id = state.get("conversation_flow_id")
+            if not flow_id:
+                flow = self._call(job, result, stats, "create_flow",
+                                  self.builder.create_conversation_flow, config, idempotent=False)
+                flow_id = flow.conversation_flow_id
+                self._record(job, "flow_created", conversation_flow_id=flow_id)
+            result.conversation_flow_id = flow_id
+
+            agent_id = state.get("agent_id")
+            if not agent_id:
+                agent = self._call(job, result, stats, "create_agent",
+                                   self.builder.create_voice_agent, config, flow_id, idempotent=False)
+                agent_id = agent.agent_id
+                self._record(job, "agent_created", conversation_flow_id=flow_id, agent_id=agent_id)
+            result.agent_id = agent_id
+
+            if job.onboarding_id and not state.get("onboarding_updated"):
+                # The job isn't done until the onboarding row points at the agent
+                result.onboarding_updated = self._call(job, result, stats, "link_onboarding",
+                                                       self._link_onboarding, job, agent_id, flow_id)
+                self._record(job, "linked", conversation_flow_id=flow_id, agent_id=agent_id,
+                             onboarding_updated=True)
+            else:
+                result.onboarding_updated = bool(state.get("onboarding_updated"))
+
+            result.status = "created"
+            self._record(job, "done", conversation_flow_id=flow_id, agent_id=agent_id,
+                         onboarding_updated=result.onboarding_updated)
+
+        except Exception as e:
+            result.error = str(e)
+            self._record(job, "failed", error=result.error)
+
+        result.latency_s = time.monotonic() - started
+        with self._stats_lock:
+            stats.attempts += result.attempts
+            if result.status == "created":
+                stats.created += 1
+                stats.latencies.append(result.latency_s)
+            else:
+                stats.failed += 1
+
+        return result
+
+    def _link_onboarding(self, job: ProvisionJob, agent_id: str, flow_id: str) -> bool:
+        """Link step; raises OnboardingLinkError (retryable) when the row was not updated."""
+        if not self.builder.link_agent_to_onboarding(onboarding_id=job.onboarding_id, agent_id=agent_id,
+                                                     flow_id=flow_id):
+            raise OnboardingLinkError(f"Could not link agent {agent_id} to onboarding {job.onboarding_id}")
+        return True
+
+    def _call(self, job: ProvisionJob, result: ProvisionResult, stats: BatchStats, step: str, func, *args,
+              idempotent: bool = True, **kwargs):
+        """Rate-limit and retry a single pipeline step (see is_retryable for `idempotent`)."""
+        attempt = 0
+        while True:
+            attempt += 1
+            result.attempts += 1
+            self.rate_limiter.acquire(job.tenant)
+            step_started = time.monotonic()
+            try:
+                value = func(*args, **kwargs)
+                with self._stats_lock:
+                    stats.record_step(step, time.monotonic() - step_started)
+                return value
+            except Exception as e:
+                if attempt > self.max_retries or not is_retryable(e, idempotent):
+                    raise
+                # Exponential backoff with full jitter
+                delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+                delay = random.uniform(0, delay)
+                print(f"   {job.job_id}: {step} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _record(self, job: ProvisionJob, step: str, **data):
+        if self.journal:
+            self.journal.record(job.job_id, step, **data)
+
+
+def provision_batch(
+    configs: Iterable[GreenLineConfig] = (),
+    onboarding_ids: Iterable[str] = (),
+    api_key: str = None,
+    flow_cache: FlowCache = None,
+    flow_definition: str = None,
+    **provisioner_kwargs
+) -> tuple:
+    """
+    Provision agents for many configs and/or business_onboarding records.
+
+    Args:
+        configs: GreenLineConfigs to create agents for
+        onboarding_ids: business_onboarding UUIDs to create and link agents for
+        api_key: Retell API key (defaults to RETELL_API_KEY)
+        flow_cache: Optional FlowCache so tenants with identical flows share one
+        flow_definition: Optional flow definition file (name or path) to build
+            the nodes and prompt from instead of the built-in flow
+        **provisioner_kwargs: Passed through to BatchProvisioner
+
+    Returns:
+        Tuple of (list of ProvisionResult, BatchStats)
+    """
+    api_key = api_key or os.environ.get("RETELL_API_KEY")
+    if not api_key:
+        raise ValueError("RETELL_API_KEY environment variable not set")
+
+    jobs = jobs_from_configs(configs) + jobs_from_onboarding_ids(onboarding_ids)
+
+    # BatchProvisioner does the retrying, and never blindly retries a create
+    builder = GreenLineAgentBuilder(api_key, flow_cache=flow_cache, flow_definition=flow_definition, max_retries=0)
+    if any(job.onboarding_id for job in jobs) and not builder.supabase:
+        raise ValueError("Supabase not configured. Set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY")
+
+    provisioner = BatchProvisioner(builder, **provisioner_kwargs)
+    return provisioner.provision(jobs)
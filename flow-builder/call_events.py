@@ -0,0 +1,448 @@
+"""
+Ingestion pipeline for Retell call events (/webhook/retell).
+
+The webhook used to print a few fields of each event and drop it. The
+pipeline stores every call instead, without making Retell wait:
+
+    endpoint -> bounded queue -> typed decoding -> handlers -> batched persistence
+
+- EventPipeline.submit() only enqueues; when the queue is full it returns
+  False and the endpoint answers 429 so Retell retries later (backpressure)
+- a worker task drains the queue in batches, decodes each payload into a
+  CallStarted / CallEnded / CallAnalyzed event and dispatches it to the
+  handlers registered for its type
+- handlers return field updates for the call record; updates from a whole
+  batch are merged per call and written with one update_calls() call, so
+  a campaign's worth of events costs a few commits instead of one each,
+  and workers merging events for the same call don't overwrite each other
+- compressing transcripts and writing the batch run in a worker thread
+  (see WebhookRepository.run()), so requests keep being answered while a
+  batch is persisted
+- Retell has already been answered 2xx, so a batch that can't be persisted
+  is retried with backoff and then appended to a dead-letter JSONL file
+  (one payload per line, ready to be POSTed to /webhook/retell again), as
+  are events still queued when stop() gives up waiting
+
+Call records hold the numbers, direction, agent, timestamps, duration,
+disconnection reason and post-call analysis, and move from "started" to
+"ended" to "analyzed" regardless of the order events arrive in. With a
+TranscriptStore, transcripts and analyses go to its compressed segments
+instead and the record keeps has_transcript / has_analysis flags.
+
+Usage:
+    pipeline = EventPipeline(repository, transcripts=TranscriptStore())
+    await pipeline.start()              # FastAPI lifespan startup
+    pipeline.submit(payload)            # False -> respond 429
+    await pipeline.stop()               # Drain and persist what's queued
+"""
+
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+from http_pool import LatencyTracker
+from structured_log import get_logger, log_context
+from transcript_store import TranscriptStore
+from webhook_storage import WebhookRepository
+
+DEFAULT_QUEUE_SIZE = int(os.environ.get("WEBHOOK_EVENT_QUEUE_SIZE", 10000))
+DEFAULT_BATCH_SIZE = 200
+BATCH_WAIT = 0.05  # Seconds to wait for a batch to fill
+DRAIN_TIMEOUT = 10.0
+DEFAULT_DEAD_LETTER_PATH = os.environ.get("WEBHOOK_EVENT_DEAD_LETTER_PATH", "call_events_dead_letter.jsonl")
+PERSIST_ATTEMPTS = 3  # Tries per batch before it is dead-lettered
+PERSIST_BACKOFF = 0.5  # Seconds before the first retry, doubled per retry
+
+logger = get_logger("call_events")
+
+# Call status never moves backwards when events arrive out of order
+STATUS_ORDER = {"started": 1, "ended": 2, "analyzed": 3}
+
+
+def _iso(timestamp_ms) -> Optional[str]:
+    if not isinstance(timestamp_ms, (int, float)):
+        return None
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc).replace(tzinfo=None).isoformat()
+
+
+@dataclass
+class CallEvent:
+    """A decoded webhook event; unknown event types decode to this base class."""
+    event: str
+    call_id: str
+    call: dict = field(repr=False)  # The payload's call object
+    received_at: str = ""
+
+    @classmethod
+    def from_call(cls, event: str, call: dict, received_at: str) -> "CallEvent":
+        return cls(event, str(call.get("call_id") or "unknown"), call, received_at)
+
+
+@dataclass
+class CallStarted(CallEvent):
+    from_number: Optional[str] = None
+    to_number: Optional[str] = None
+    direction: Optional[str] = None
+    agent_id: Optional[str] = None
+    started_at: Optional[str] = None
+
+    @classmethod
+    def from_call(cls, event, call, received_at):
+        base = CallEvent.from_call(event, call, received_at)
+        return cls(base.event, base.call_id, call, received_at,
+                   from_number=call.get("from_number"), to_number=call.get("to_number"),
+                   direction=call.get("direction"), agent_id=call.get("agent_id"),
+                   started_at=_iso(call.get("start_timestamp")))
+
+
+@dataclass
+class CallEnded(CallStarted):
+    ended_at: Optional[str] = None
+    duration_ms: Optional[int] = None
+    disconnection_reason: Optional[str] = None
+    transcript: str = field(default="", repr=False)
+
+    @classmethod
+    def from_call(cls, event, call, received_at):
+        started = CallStarted.from_call(event, call, received_at)
+        duration = call.get("duration_ms")
+        if duration is None and isinstance(call.get("start_timestamp"), (int, float)) \
+                and isinstance(call.get("end_timestamp"), (int, float)):
+            duration = call["end_timestamp"] - call["start_timestamp"]
+        return cls(**{name: getattr(started, name) for name in started.__dataclass_fields__},
+                   ended_at=_iso(call.get("end_timestamp")), duration_ms=duration,
+                   disconnection_reason=call.get("disconnection_reason"),
+                   transcript=call.get("transcript") or "")
+
+
+@dataclass
+class CallAnalyzed(CallEvent):
+    analysis: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_call(cls, event, call, received_at):
+        base = CallEvent.from_call(event, call, received_at)
+        analysis = call.get("call_analysis") or call.get("analysis") or {}
+        return cls(base.event, base.call_id, call, received_at, analysis=analysis)
+
+
+EVENT_TYPES = {
+    "call_started": CallStarted,
+    "call_ended": CallEnded,
+    "call_analyzed": CallAnalyzed,
+}
+
+
+def decode_event(payload: dict, received_at: Optional[str] = None) -> CallEvent:
+    """
+    Typed event for a webhook payload.
+
+    Retell nests the call under "call"; older/flat payloads put the call
+    fields next to "event", and both are accepted.
+
+    Raises:
+        ValueError: If the payload is not an object or its event is not a string
+    """
+    if not isinstance(payload, dict):
+        raise ValueError(f"Event payload must be an object, got {type(payload).__name__}")
+    call = payload.get("call") if isinstance(payload.get("call"), dict) else payload
+    event = payload.get("event") or "unknown"
+    if not isinstance(event, str):
+        raise ValueError(f"Event type must be a string, got {type(event).__name__}")
+    return EVENT_TYPES.get(event, CallEvent).from_call(event, call, received_at or datetime.utcnow().isoformat())
+
+
+# ---- default handlers: event -> call record field updates ----
+
+def _customer_number(event: CallStarted) -> Optional[str]:
+    return event.to_number if event.direction == "outbound" else event.from_number
+
+
+def _call_fields(event: CallStarted) -> dict:
+    return {"from_number": event.from_number, "to_number": event.to_number, "direction": event.direction,
+            "agent_id": event.agent_id, "phone": _customer_number(event), "started_at": event.started_at}
+
+
+def on_call_started(event: CallStarted) -> dict:
+    logger.info("Call started", extra={"event": "call_started", "direction": event.direction})
+    return {"status": "started", **_call_fields(event)}
+
+
+def on_call_ended(event: CallEnded) -> dict:
+    logger.info("Call ended", extra={"event": "call_ended", "duration_ms": event.duration_ms,
+                                     "disconnection_reason": event.disconnection_reason})
+    updates = _call_fields(event)
+    updates.update(status="ended", ended_at=event.ended_at, duration_ms=event.duration_ms,
+                   disconnection_reason=event.disconnection_reason, transcript=event.transcript,
+                   transcript_chars=len(event.transcript))
+    return updates
+
+
+def on_call_analyzed(event: CallAnalyzed) -> dict:
+    logger.info("Call analyzed", extra={"event": "call_analyzed", "analysis_fields": sorted(event.analysis)})
+    logger.debug("Call analysis", extra={"event": "call_analysis", "analysis": event.analysis})
+    return {"status": "analyzed", "analysis": event.analysis}
+
+
+def merge_call(record: Optional[dict], call_id: str, updates: dict, received_at: str) -> dict:
+    """Apply field updates to a call record (None values never overwrite data)."""
+    record = dict(record) if record else {"call_id": call_id, "created_at": received_at}
+    status = record.get("status")
+    for name, value in updates.items():
+        if value is None:
+            continue
+        if name == "status" and STATUS_ORDER.get(value, 0) < STATUS_ORDER.get(status, 0):
+            continue
+        record[name] = value
+    if updates.get("started_at"):
+        record["created_at"] = updates["started_at"]
+    record["updated_at"] = received_at
+    return record
+
+
+class EventPipeline:
+    """
+    Bounded queue plus batch worker for Retell call events.
+
+    Args:
+        repository: Where call records are saved
+        transcripts: Segment store for transcripts and analyses (default: kept in the call records)
+        queue_size: Events held before submit() refuses new ones
+        batch_size: Events decoded and persisted together
+        dead_letter_path: JSONL file for events that could not be persisted
+    """
+
+    def __init__(
+        self,
+        repository: WebhookRepository,
+        transcripts: Optional[TranscriptStore] = None,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        dead_letter_path: str = DEFAULT_DEAD_LETTER_PATH,
+    ):
+        self.repository = repository
+        self.transcripts = transcripts
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.dead_letter_path = dead_letter_path
+        self.queue: Optional[asyncio.Queue] = None
+        self.handlers: dict = {}  # event type -> [handler]
+        self._task: Optional[asyncio.Task] = None
+        self.lag = LatencyTracker()  # Enqueued -> persisted
+        self.persist_time = LatencyTracker()  # Per batch
+        self.counters = {"accepted": 0, "rejected": 0, "processed": 0, "batches": 0,
+                         "invalid": 0, "unhandled": 0, "handler_errors": 0, "persist_errors": 0,
+                         "persist_retries": 0, "dead_lettered": 0, "dead_letter_errors": 0,
+                         "worker_errors": 0}
+        self.event_counts: dict = {}
+
+        self.on("call_started", on_call_started)
+        self.on("call_ended", on_call_ended)
+        self.on("call_analyzed", on_call_analyzed)
+
+    def on(self, event_type: str, handler: Callable[[CallEvent], Optional[dict]]):
+        """Register a handler; it returns call record updates (or None)."""
+        self.handlers.setdefault(event_type, []).append(handler)
+        return handler
+
+    async def start(self):
+        """
+        Start the worker task (called from the app lifespan).
+
+        The queue belongs to the running event loop, so each start() after a
+        stop() gets a new one (e.g. a second TestClient in the same process).
+        """
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.queue_size)
+        if self._task is None:
+            self._task = asyncio.create_task(self._worker())
+
+    async def stop(self, timeout: float = DRAIN_TIMEOUT):
+        """Process what's queued (up to `timeout`), then stop the worker and drop the queue."""
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Event pipeline stopped with events unprocessed",
+                               extra={"event": "pipeline_stopped", "unprocessed": self.queue.qsize()})
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.queue is not None:
+            leftover = []
+            while not self.queue.empty():
+                leftover.append(self.queue.get_nowait())
+                self.queue.task_done()
+            await self._dead_letter(leftover, "shutdown before processing")
+        self.queue = None
+
+    def submit(self, payload: dict) -> bool:
+        """
+        Queue a webhook payload without waiting.
+
+        Returns:
+            False if the queue is full (the caller should answer 429)
+        """
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.queue_size)
+        try:
+            self.queue.put_nowait((time.monotonic(), datetime.utcnow().isoformat(), payload))
+        except asyncio.QueueFull:
+            self.counters["rejected"] += 1
+            return False
+        self.counters["accepted"] += 1
+        return True
+
+    async def _worker(self):
+        while True:
+            batch = [await self.queue.get()]
+            try:
+                deadline = time.monotonic() + BATCH_WAIT
+                while len(batch) < self.batch_size:
+                    if not self.queue.empty():
+                        batch.append(self.queue.get_nowait())
+                        continue
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                await self.process(batch)
+            except Exception:
+                # Never let one bad batch end the only worker
+                self.counters["worker_errors"] += 1
+                logger.exception("Event pipeline worker error", extra={"event": "worker_error", "batch": len(batch)})
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def process(self, batch: list):
+        """Decode, dispatch and persist one batch of (enqueued_at, received_at, payload)."""
+        updates: dict = {}  # call_id -> [(received_at, field updates)]
+        for _, received_at, payload in batch:
+            try:
+                event = decode_event(payload, received_at)
+            except Exception as e:
+                self.counters["invalid"] += 1
+                logger.warning("Invalid call event", extra={"event": "invalid_event", "error": str(e)})
+                continue
+            self.event_counts[event.event] = self.event_counts.get(event.event, 0) + 1
+            with log_context(call_id=event.call_id, agent_id=event.call.get("agent_id")):
+                logger.info("Retell webhook", extra={"event": "call_event", "webhook_event": event.event})
+                handlers = self.handlers.get(event.event)
+                if not handlers:
+                    self.counters["unhandled"] += 1
+                    continue
+                for handler in handlers:
+                    try:
+                        fields = handler(event)
+                    except Exception:
+                        self.counters["handler_errors"] += 1
+                        logger.exception("Event handler error",
+                                         extra={"event": "handler_error", "webhook_event": event.event})
+                        continue
+                    if fields:
+                        updates.setdefault(event.call_id, []).append((received_at, fields))
+
+        if updates:
+            started = time.perf_counter()
+            error = await self._persist(updates)
+            if error is not None:
+                await self._dead_letter(
+                    [item for item in batch if isinstance(item[2], dict)], f"persist failed ({error})"
+                )
+            self.persist_time.record(time.perf_counter() - started)
+
+        now = time.monotonic()
+        for enqueued_at, _, _ in batch:
+            self.lag.record(now - enqueued_at)
+        self.counters["processed"] += len(batch)
+        self.counters["batches"] += 1
+
+    async def _persist(self, updates: dict) -> Optional[str]:
+        """Write a batch's updates, retrying with backoff; returns the last error, or None once saved."""
+        delay = PERSIST_BACKOFF
+        for attempt in range(1, PERSIST_ATTEMPTS + 1):
+            try:
+                if self.transcripts is not None:
+                    await asyncio.to_thread(self._store_transcripts, updates)
+                await self.repository.run(self.repository.update_calls, list(updates), lambda existing: [
+                    self._merge(existing.get(call_id), call_id, changes) for call_id, changes in updates.items()
+                ])
+                return None
+            except Exception as e:
+                self.counters["persist_errors"] += 1
+                error = f"{type(e).__name__}: {e}"
+                logger.error("Call event persistence error",
+                             extra={"event": "persist_error", "error": error, "attempt": attempt})
+            if attempt < PERSIST_ATTEMPTS:
+                self.counters["persist_retries"] += 1
+                await asyncio.sleep(delay)
+                delay *= 2
+        return error
+
+    async def _dead_letter(self, items: list, reason: str):
+        """Append (enqueued_at, received_at, payload) items to the dead-letter file in a worker thread."""
+        if not items:
+            return
+        failed_at = datetime.utcnow().isoformat()
+        lines = "".join(json.dumps({
+            "failed_at": failed_at,
+            "reason": reason,
+            "received_at": received_at,
+            "payload": payload,
+        }, default=str) + "\n" for _, received_at, payload in items)
+        self.counters["dead_lettered"] += len(items)
+        logger.error("Call events dead-lettered",
+                     extra={"event": "call_events_dead_letter", "reason": reason, "events": len(items)})
+        try:
+            await asyncio.to_thread(self._append_dead_letters, lines)
+        except OSError as e:
+            self.counters["dead_letter_errors"] += len(items)
+            logger.error("Call event dead-letter write failed, events lost",
+                         extra={"event": "call_events_dead_letter_error", "error": str(e), "events": len(items)})
+
+    def _append_dead_letters(self, lines: str):
+        with open(self.dead_letter_path, "a") as f:
+            f.write(lines)
+
+    @staticmethod
+    def _merge(record: Optional[dict], call_id: str, changes: list) -> dict:
+        for received_at, fields in changes:
+            record = merge_call(record, call_id, fields, received_at)
+        return record
+
+    def _store_transcripts(self, updates: dict):
+        # Move transcripts and analyses out of the record updates into one segment append.
+        # The updates are only changed once the append succeeded, so a retry writes them again
+        records = []
+        for call_id, changes in updates.items():
+            for _, fields in changes:
+                for kind in ("transcript", "analysis"):
+                    if fields.get(kind):
+                        records.append((call_id, kind, fields[kind]))
+        if records:
+            self.transcripts.append_many(records)
+        for changes in updates.values():
+            for _, fields in changes:
+                for kind in ("transcript", "analysis"):
+                    if fields.pop(kind, None):
+                        fields[f"has_{kind}"] = True
+
+    def metrics(self) -> dict:
+        """Queue depth, throughput counters, lag and persistence time."""
+        return {
+            "depth": self.queue.qsize() if self.queue is not None else 0,
+            "capacity": self.queue_size,
+            "lag": self.lag.summary(),
+            "persist_time": self.persist_time.summary(),
+            "events": dict(self.event_counts),
+            "transcripts": self.transcripts.stats() if self.transcripts is not None else None,
+            **self.counters,
+        }
@@ -0,0 +1,116 @@
+"""
+Synthetic call data shared by test_call_scenarios.py and load_test.py.
+
+Each scenario holds the fields Retell puts on a call: numbers, the
+dynamic variables the agent collected, and the post-call analysis. The
+scenario runner sends them one at a time to check behaviour, and the
+load generator replays them at volume, so both exercise the same calls.
+
+Functions return fresh dicts (with current timestamps), so callers can
+add a call_id or nest them under "call" without copying.
+"""
+
+from datetime import datetime, timedelta
+
+BUSINESS_NUMBER = "+16195551234"
+
+# Calls expected to score HOT, WARM or COLD in the CRM
+LEAD_SCORING_SCENARIOS = [
+    {
+        "name": "Urgent customer (should be HOT)",
+        "dynamic_variables": {"urgency": "today", "caller_name": "Urgent User", "caller_phone": "+14085551111"},
+        "call_analysis": {"user_sentiment": "positive", "call_successful": True}
+    },
+    {
+        "name": "Positive sentiment (should be HOT)",
+        "dynamic_variables": {"caller_name": "Happy User", "caller_phone": "+14085552222"},
+        "call_analysis": {"user_sentiment": "positive", "call_successful": True}
+    },
+    {
+        "name": "Basic info only (should be WARM)",
+        "dynamic_variables": {"caller_name": "Basic User", "caller_phone": "+14085553333"},
+        "call_analysis": {"user_sentiment": "neutral", "call_successful": True}
+    },
+    {
+        "name": "Minimal info (should be COLD)",
+        "dynamic_variables": {},
+        "call_analysis": {"user_sentiment": "negative", "call_successful": False}
+    }
+]
+
+
+def call_started() -> dict:
+    """An inbound call that just connected."""
+    return {
+        "from_number": "+14085551234",
+        "to_number": BUSINESS_NUMBER,
+        "start_timestamp": int(datetime.now().timestamp() * 1000)
+    }
+
+
+def service_request_call() -> dict:
+    """A 5 minute call where the caller asked for a service appointment."""
+    return {
+        "from_number": "+14085551234",
+        "to_number": BUSINESS_NUMBER,
+        "start_timestamp": int((datetime.now() - timedelta(minutes=5)).timestamp() * 1000),
+        "end_timestamp": int(datetime.now().timestamp() * 1000),
+        "duration_ms": 300000,  # 5 minutes
+        "dynamic_variables": {
+            "caller_name": "John Test",
+            "caller_phone": "+14085551234",
+            "service_address": "123 Test Street, San Diego, CA 92101",
+            "service_type": "Lawn Mowing",
+            "urgency": "this week"
+        },
+        "call_analysis": {
+            "call_summary": "Customer requested lawn mowing service for next week.",
+            "user_sentiment": "positive",
+            "call_successful": True
+        },
+        "transcript": "Agent: Thank you for calling... User: I need lawn mowing service..."
+    }
+
+
+def message_call() -> dict:
+    """A 2 minute call where the caller left a message for a callback."""
+    return {
+        "from_number": "+14087779999",
+        "to_number": BUSINESS_NUMBER,
+        "duration_ms": 120000,  # 2 minutes
+        "dynamic_variables": {
+            "message_name": "Jane Callback",
+            "message_phone": "+14087779999",
+            "message_reason": "Wants to discuss a large landscaping project",
+            "callback_time": "afternoon"
+        },
+        "call_analysis": {
+            "call_summary": "Caller left a message requesting callback about landscaping project.",
+            "user_sentiment": "neutral",
+            "call_successful": True
+        }
+    }
+
+
+def lead_scoring_call(scenario: dict) -> dict:
+    """A 1 minute call for one of LEAD_SCORING_SCENARIOS."""
+    return {
+        "from_number": scenario["dynamic_variables"].get("caller_phone", "+14085550000"),
+        "duration_ms": 60000,
+        "dynamic_variables": scenario["dynamic_variables"],
+        "call_analysis": scenario["call_analysis"]
+    }
+
+
+def booking_request() -> dict:
+    """Booking details for a tree trimming visit two days out at 10:00."""
+    booking_time = datetime.now() + timedelta(days=2)
+    booking_time = booking_time.replace(hour=10, minute=0, second=0, microsecond=0)
+    return {
+        "attendee_name": "Test Customer",
+        "attendee_phone": "+14085559999",
+        "attendee_email": "test@example.com",
+        "start_time": booking_time.isoformat(),
+        "service_type": "Tree Trimming",
+        "notes": "Large oak tree in backyard needs trimming"
+    }
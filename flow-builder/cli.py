@@ -5,6 +5,7 @@ import argparse
 from typing import Optional
 from retell import Retell
 from greenline_agent import GreenLineAgentBuilder, GreenLineConfig
+from flow_cache import FlowCache, DEFAULT_FLOW_CACHE_PATH
 
 
 def load_config(config_path: str) -> GreenLineConfig:
@@ -14,6 +15,12 @@ def load_config(config_path: str) -> GreenLineConfig:
     return GreenLineConfig(**data)
 
 
+def _flow_cache(args) -> Optional[FlowCache]:
+    """FlowCache at the --flow-cache path, or None when the option wasn't given."""
+    path = getattr(args, "flow_cache", None)
+    return FlowCache(path) if path else None
+
+
 def create_agent(args):
     """Create a new agent from config file."""
     api_key = os.environ.get("RETELL_API_KEY")
@@ -30,7 +37,7 @@ def create_agent(args):
 
     # Create agent
     print(f"\nCreating agent for {config.company_name}...")
-    builder = GreenLineAgentBuilder(api_key)
+    builder = GreenLineAgentBuilder(api_key, flow_cache=_flow_cache(args), flow_definition=args.flow_definition)
 
     try:
         result = builder.create_agent(config)
@@ -61,6 +68,152 @@ def create_agent(args):
         sys.exit(1)
 
 
+def provision_batch(args):
+    """Provision agents for many configs and/or onboarding records concurrently."""
+    from batch_provisioner import (
+        BatchProvisioner,
+        jobs_from_configs,
+        jobs_from_onboarding_ids,
+    )
+
+    api_key = os.environ.get("RETELL_API_KEY")
+    if not api_key:
+        print("Error: RETELL_API_KEY environment variable not set")
+        sys.exit(1)
+
+    # Config files may hold a single config object or a list of them
+    configs = []
+    for config_path in args.config or []:
+        with open(config_path, 'r') as f:
+            data = json.load(f)
+        for item in data if isinstance(data, list) else [data]:
+            configs.append(GreenLineConfig(**item))
+
+    onboarding_ids = list(args.onboarding_ids or [])
+    if args.onboarding_file:
+        with open(args.onboarding_file, 'r') as f:
+            onboarding_ids.extend(line.strip() for line in f if line.strip())
+
+    jobs = jobs_from_configs(configs, args.tenant) + jobs_from_onboarding_ids(onboarding_ids, args.tenant)
+    if not jobs:
+        print("Error: Nothing to provision. Pass --config and/or --onboarding-ids/--onboarding-file")
+        sys.exit(1)
+
+    # BatchProvisioner does the retrying, and never blindly retries a create
+    builder = GreenLineAgentBuilder(api_key, flow_cache=_flow_cache(args), flow_definition=args.flow_definition,
+                                    max_retries=0)
+    if onboarding_ids and not builder.supabase:
+        print("Error: Supabase not configured. Set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY")
+        sys.exit(1)
+
+    provisioner = BatchProvisioner(
+        builder,
+        max_workers=args.workers,
+        rate_per_second=args.rate,
+        burst=args.burst,
+        max_retries=args.retries,
+        journal_path=args.journal,
+    )
+
+    print(f"\nProvisioning {len(jobs)} agent(s) with {args.workers} worker(s)...")
+    results, stats = provisioner.provision(jobs)
+    summary = stats.summary()
+
+    print("\n" + "=" * 60)
+    print("Batch Provisioning Complete")
+    print("=" * 60)
+    print(f"Created:      {summary['created']}")
+    print(f"Failed:       {summary['failed']}")
+    print(f"Skipped:      {summary['skipped']} (already in journal)")
+    print(f"Elapsed:      {summary['elapsed_s']}s")
+    print(f"Throughput:   {summary['agents_per_minute']} agents/min")
+    latency = summary["latency_s"]
+    if latency.get("count"):
+        print(f"Latency:      p50 {latency['p50']}s, p95 {latency['p95']}s, max {latency['max']}s")
+    print(f"Journal:      {args.journal}")
+    print("=" * 60)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                "summary": summary,
+                "results": [vars(r) for r in results],
+            }, f, indent=2)
+        print(f"\nResults saved to: {args.output}")
+
+    if stats.failed:
+        sys.exit(1)
+
+
+def sync_agents(args):
+    """Patch deployed agents so their flows match the current builder output."""
+    from greenline_agent import build_config_from_onboarding
+
+    api_key = os.environ.get("RETELL_API_KEY")
+    if not api_key:
+        print("Error: RETELL_API_KEY environment variable not set")
+        sys.exit(1)
+
+    builder = GreenLineAgentBuilder(api_key, flow_cache=_flow_cache(args), flow_definition=args.flow_definition)
+
+    # (agent_id, config) pairs to sync
+    targets = []
+    if args.agent_id:
+        if not args.config:
+            print("Error: --config is required when syncing a single agent")
+            sys.exit(1)
+        targets.append((args.agent_id, load_config(args.config)))
+
+    onboarding_ids = list(args.onboarding_ids or [])
+    if args.onboarding_file:
+        with open(args.onboarding_file, 'r') as f:
+            onboarding_ids.extend(line.strip() for line in f if line.strip())
+
+    for onboarding_id in onboarding_ids:
+        try:
+            onboarding = builder.fetch_onboarding(onboarding_id)
+        except ValueError as e:
+            print(f"Skipping {onboarding_id}: {e}")
+            continue
+        if not onboarding.get("retell_agent_id"):
+            print(f"Skipping {onboarding_id}: no retell_agent_id")
+            continue
+        targets.append((onboarding["retell_agent_id"], build_config_from_onboarding(onboarding)))
+
+    if not targets:
+        print("Error: Nothing to sync. Pass <agent_id> --config, or --onboarding-ids/--onboarding-file")
+        sys.exit(1)
+
+    updated = unchanged = failed = 0
+    for agent_id, config in targets:
+        try:
+            result = builder.update_agent(agent_id, config, dry_run=args.dry_run)
+        except Exception as e:
+            print(f"\n✗ {agent_id}: {e}")
+            failed += 1
+            continue
+
+        diff = result["diff"]
+        if not diff.has_changes and not result["agent_changes"]:
+            unchanged += 1
+            print(f"\n= {agent_id} ({config.company_name}): up to date")
+            continue
+
+        updated += 1
+        print(f"\n{'~' if args.dry_run else '✓'} {agent_id} ({config.company_name})")
+        for line in diff.summary().splitlines():
+            print(f"   {line}")
+        if result["agent_changes"]:
+            print(f"   Agent fields changed: {', '.join(result['agent_changes'])}")
+
+    print("\n" + "=" * 60)
+    print(f"{'Would update' if args.dry_run else 'Updated'}: {updated}   Up to date: {unchanged}   Failed: {failed}")
+    print("=" * 60)
+
+    if failed:
+        sys.exit(1)
+
+
 def interactive_config() -> GreenLineConfig:
     """Interactively gather configuration from user."""
     print("\nInteractive Agent Configuration")
@@ -216,6 +369,7 @@ def delete_flow(args):
 
     try:
         client.conversation_flow.delete(flow_id)
+        FlowCache(DEFAULT_FLOW_CACHE_PATH).discard_flow(flow_id)
         print(f"Conversation flow {flow_id} deleted successfully.")
     except Exception as e:
         print(f"Error deleting flow: {e}")
@@ -322,6 +476,155 @@ def export_flow(args):
         sys.exit(1)
 
 
+def write_flow_definitions(args):
+    """Regenerate the flow definition files from the built-in builders."""
+    from outbound_agent import GreenLineOutboundAgentBuilder
+    import greenline_inbound_agent
+
+    os.makedirs(args.dir, exist_ok=True)
+    extension = "yaml" if args.format == "yaml" else "json"
+
+    # Builders only render here, so skip __init__ (no API key or Supabase needed)
+    exports = [
+        ("inbound_receptionist", GreenLineAgentBuilder.__new__(GreenLineAgentBuilder).export_flow_definition),
+        ("outbound_sales", GreenLineOutboundAgentBuilder.__new__(GreenLineOutboundAgentBuilder).export_flow_definition),
+        ("greenline_inbound", greenline_inbound_agent.export_flow_definition),
+    ]
+
+    try:
+        for name, export in exports:
+            path = os.path.join(args.dir, f"{name}.{extension}")
+            flow = export(path, version=args.version)
+            print(f"Wrote {path} ({len(flow['nodes'])} nodes)")
+    except ValueError as e:
+        print(f"Error writing flow definitions: {e}")
+        sys.exit(1)
+
+
+def check_flow_definition(args):
+    """Validate flow definition files."""
+    from flow_definitions import FlowDefinitionError, load_definition
+
+    failed = False
+    for name in args.definitions:
+        try:
+            definition = load_definition(name)
+        except FlowDefinitionError as e:
+            print(f"INVALID {name}\n  {e}")
+            failed = True
+            continue
+
+        print(f"OK      {definition.path}")
+        print(f"        {definition.name} v{definition.version}: {len(definition.flow['nodes'])} nodes, "
+              f"slots: {', '.join(definition.slots) or '(none)'}")
+
+    if failed:
+        sys.exit(1)
+
+
+def _inbound_flow(config_path: Optional[str] = None) -> dict:
+    """Inbound receptionist flow payload for a config file (or a sample config), without Retell."""
+    config = load_config(config_path) if config_path else GreenLineConfig(
+        company_name="Sample Co", business_type="other", phone_number="+15550000000")
+    builder = GreenLineAgentBuilder.__new__(GreenLineAgentBuilder)  # Only renders, so skip __init__
+    builder.flow_definition = None
+    return builder._build_flow_params(builder.prepare_config(config))
+
+
+def validate_flow(args):
+    """Check flow graphs for dangling edges, unreachable nodes and dead ends."""
+    from flow_definitions import load_definition
+    from flow_graph import FlowValidationError, analyze_flow
+
+    flows = []  # (label, callable building the flow)
+    for name in args.definitions or []:
+        flows.append((name, lambda name=name: load_definition(name).flow))
+
+    if args.flow_id:
+        api_key = os.environ.get("RETELL_API_KEY")
+        if not api_key:
+            print("Error: RETELL_API_KEY environment variable not set")
+            sys.exit(1)
+        from flow_diff import to_plain
+        client = Retell(api_key=api_key)
+        flows.append((args.flow_id, lambda: to_plain(client.conversation_flow.retrieve(args.flow_id))))
+
+    if not flows or args.config:
+        # Built-in flows; builders only render here, so skip __init__
+        from outbound_agent import GreenLineOutboundAgentBuilder, GreenLineOutboundConfig
+        import greenline_inbound_agent
+
+        flows.append(("inbound receptionist", lambda: _inbound_flow(args.config)))
+        if not args.config:
+            outbound = GreenLineOutboundAgentBuilder.__new__(GreenLineOutboundAgentBuilder)
+            outbound.flow_definition = None
+            flows.append(("outbound sales", lambda: outbound._build_flow_params(GreenLineOutboundConfig())))
+            flows.append(("greenline inbound (Jordan)", greenline_inbound_agent.build_flow_params))
+
+    failed = False
+    for label, build in flows:
+        try:
+            analysis = analyze_flow(build())
+        except FlowValidationError as e:
+            analysis = e.analysis
+        except Exception as e:
+            print(f"\n{label}\nError loading flow: {e}")
+            failed = True
+            continue
+
+        status = "OK" if analysis.ok else "INVALID"
+        print(f"\n{status} {label}")
+        print("  " + analysis.summary().replace("\n", "\n  "))
+        failed = failed or not analysis.ok
+
+    if failed:
+        sys.exit(1)
+
+
+def simulate_flow(args):
+    """Run scripted and random callers through a flow offline."""
+    from flow_definitions import load_definition
+    from flow_simulator import FlowSimulator, load_scenarios
+
+    try:
+        flow = load_definition(args.definition).flow if args.definition else _inbound_flow(args.config)
+        scenarios = [scenario for path in args.scenarios or [] for scenario in load_scenarios(path)]
+    except (OSError, ValueError, TypeError) as e:
+        print(f"Error loading flow or scenarios: {e}")
+        sys.exit(1)
+
+    if not scenarios and not args.random:
+        print("Error: Nothing to simulate. Pass --scenarios and/or --random")
+        sys.exit(1)
+
+    simulator = FlowSimulator(flow, max_steps=args.max_steps)
+    report = simulator.run_many(scenarios, random_walks=args.random, seed=args.seed)
+
+    print("\n" + "=" * 60)
+    print(f"Flow Simulation: {args.definition or 'inbound receptionist'}")
+    print("=" * 60)
+    print(report.summary())
+    print("=" * 60)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                "runs": report.runs,
+                "elapsed_s": round(report.elapsed_s, 4),
+                "outcomes": dict(report.outcomes),
+                "end_nodes": dict(report.end_nodes),
+                "node_coverage": round(report.node_coverage, 4),
+                "edge_coverage": round(report.edge_coverage, 4),
+                "unvisited_nodes": report.unvisited_nodes,
+                "path_length": report.path_stats(),
+                "failures": [{"scenario": name, "message": message} for name, message in report.failures],
+            }, f, indent=2)
+        print(f"\nReport saved to: {args.output}")
+
+    if report.failures:
+        sys.exit(1)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="GreenLine AI - Retell Agent Management CLI",
@@ -330,12 +633,19 @@ def main():
 Examples:
   python cli.py create --config config.json
   python cli.py create                          # Interactive mode
+  python cli.py provision-batch --onboarding-file ids.txt --workers 8
+  python cli.py sync <agent_id> --config config.json --dry-run
   python cli.py list-agents
   python cli.py list-flows
   python cli.py get-agent <agent_id>
   python cli.py test <agent_id>
   python cli.py delete-agent <agent_id>
   python cli.py export-flow <flow_id> -o flow.json
+  python cli.py write-flow-definitions          # Regenerate flows/*.json
+  python cli.py check-flow-definition outbound_sales flows/my_flow.yaml
+  python cli.py validate-flow                   # Built-in flows
+  python cli.py validate-flow flows/my_flow.yaml --flow-id <flow_id>
+  python cli.py simulate --scenarios flows/scenarios/inbound_receptionist.json --random 5000
 
 Environment:
   RETELL_API_KEY    Your Retell AI API key (required)
@@ -347,8 +657,40 @@ Environment:
     # Create command
     create_parser = subparsers.add_parser("create", help="Create a new agent")
     create_parser.add_argument("--config", "-c", help="Path to config JSON file")
+    create_parser.add_argument("--flow-cache", nargs="?", const=DEFAULT_FLOW_CACHE_PATH, metavar="PATH",
+                               help=f"Reuse the flow of an identical tenant, indexed in PATH (default: {DEFAULT_FLOW_CACHE_PATH})")
+    create_parser.add_argument("--flow-definition", help="Flow definition file (name in flows/ or path) to use instead of the built-in flow")
     create_parser.set_defaults(func=create_agent)
 
+    # Provision batch command
+    batch_parser = subparsers.add_parser("provision-batch", help="Create many agents concurrently")
+    batch_parser.add_argument("--config", "-c", action="append", help="Config JSON file (object or list); repeatable")
+    batch_parser.add_argument("--onboarding-ids", nargs="+", help="business_onboarding IDs to provision")
+    batch_parser.add_argument("--onboarding-file", help="File with one business_onboarding ID per line")
+    batch_parser.add_argument("--workers", "-w", type=int, default=8, help="Concurrent workers (default: 8)")
+    batch_parser.add_argument("--rate", type=float, default=2.0, help="API calls per second per tenant (default: 2)")
+    batch_parser.add_argument("--burst", type=int, default=4, help="Rate limiter burst size (default: 4)")
+    batch_parser.add_argument("--retries", type=int, default=3, help="Retries per step on transient errors (default: 3)")
+    batch_parser.add_argument("--tenant", help="One rate limiting bucket for all jobs (default: per onboarding owner / company)")
+    batch_parser.add_argument("--journal", default="provision_journal.jsonl", help="Resumable progress journal")
+    batch_parser.add_argument("--output", "-o", help="Write results and stats to this JSON file")
+    batch_parser.add_argument("--flow-cache", nargs="?", const=DEFAULT_FLOW_CACHE_PATH, metavar="PATH",
+                              help=f"Reuse the flow of an identical tenant, indexed in PATH (default: {DEFAULT_FLOW_CACHE_PATH})")
+    batch_parser.add_argument("--flow-definition", help="Flow definition file (name in flows/ or path) to use instead of the built-in flow")
+    batch_parser.set_defaults(func=provision_batch)
+
+    # Sync command
+    sync_parser = subparsers.add_parser("sync", help="Patch existing agents to match the current flow")
+    sync_parser.add_argument("agent_id", nargs="?", help="Agent ID to sync (requires --config)")
+    sync_parser.add_argument("--config", "-c", help="Path to config JSON file")
+    sync_parser.add_argument("--onboarding-ids", nargs="+", help="Sync the agents linked to these business_onboarding IDs")
+    sync_parser.add_argument("--onboarding-file", help="File with one business_onboarding ID per line")
+    sync_parser.add_argument("--dry-run", action="store_true", help="Show the diff without updating anything")
+    sync_parser.add_argument("--flow-cache", nargs="?", const=DEFAULT_FLOW_CACHE_PATH, metavar="PATH",
+                             help=f"Flow cache index to update after patching a flow (default: {DEFAULT_FLOW_CACHE_PATH})")
+    sync_parser.add_argument("--flow-definition", help="Flow definition file (name in flows/ or path) to use instead of the built-in flow")
+    sync_parser.set_defaults(func=sync_agents)
+
     # List agents command
     list_agents_parser = subparsers.add_parser("list-agents", help="List all agents")
     list_agents_parser.set_defaults(func=list_agents)
@@ -383,6 +725,34 @@ Environment:
     export_parser.add_argument("--output", "-o", help="Output file path")
     export_parser.set_defaults(func=export_flow)
 
+    # Flow definition commands
+    write_defs_parser = subparsers.add_parser("write-flow-definitions", help="Write the built-in flows as definition files")
+    write_defs_parser.add_argument("--dir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "flows"),
+                                   help="Output directory (default: flows/)")
+    write_defs_parser.add_argument("--format", choices=["json", "yaml"], default="json", help="File format (yaml needs PyYAML)")
+    write_defs_parser.add_argument("--version", type=int, default=1, help="Definition version to record (default: 1)")
+    write_defs_parser.set_defaults(func=write_flow_definitions)
+
+    check_defs_parser = subparsers.add_parser("check-flow-definition", help="Validate flow definition files")
+    check_defs_parser.add_argument("definitions", nargs="+", help="Definition names (in flows/) or paths")
+    check_defs_parser.set_defaults(func=check_flow_definition)
+
+    validate_parser = subparsers.add_parser("validate-flow", help="Check flow graphs for broken edges and dead ends")
+    validate_parser.add_argument("definitions", nargs="*", help="Flow definition names (in flows/) or paths")
+    validate_parser.add_argument("--config", "-c", help="Validate the inbound flow built from this config")
+    validate_parser.add_argument("--flow-id", help="Validate a deployed conversation flow")
+    validate_parser.set_defaults(func=validate_flow)
+
+    simulate_parser = subparsers.add_parser("simulate", help="Run scripted callers through a flow offline")
+    simulate_parser.add_argument("definition", nargs="?", help="Flow definition name or path (default: built-in inbound flow)")
+    simulate_parser.add_argument("--config", "-c", help="Config JSON for the built-in inbound flow")
+    simulate_parser.add_argument("--scenarios", "-s", action="append", help="Scenario JSON file; repeatable")
+    simulate_parser.add_argument("--random", type=int, default=0, help="Additional seeded random walks")
+    simulate_parser.add_argument("--seed", type=int, default=0, help="Random walk seed (default: 0)")
+    simulate_parser.add_argument("--max-steps", type=int, default=60, help="Node visits before a call is cut off")
+    simulate_parser.add_argument("--output", "-o", help="Write the report to this JSON file")
+    simulate_parser.set_defaults(func=simulate_flow)
+
     args = parser.parse_args()
 
     if args.command is None:
@@ -0,0 +1,283 @@
+"""
+Background CRM forwarding for the webhook server.
+
+submit_lead used to await the CRM webhook before answering Retell, so a
+slow CRM held the voice agent's tool call for up to the read timeout.
+CRMForwarder queues the lead and returns immediately; worker tasks post
+it in the background:
+
+- a bounded number of concurrent workers and a bounded queue
+- micro-batching: with batch_size > 1, up to batch_size leads queued within
+  batch_wait seconds are posted together as a JSON array (for CRMs whose
+  webhook accepts arrays)
+- exponential backoff with jitter on connection errors, timeouts, 429 and
+  5xx responses; other 4xx responses are not retried
+- leads that exhaust their attempts, are rejected, or are still pending at
+  shutdown are appended to a dead-letter JSONL file, one lead per line
+  (written in a worker thread, off the event loop)
+- an unexpected error while delivering a batch is logged and counted, the
+  batch is dead-lettered, and the worker carries on with the next one
+
+Usage:
+    forwarder = CRMForwarder(pool, CRM_WEBHOOK_URL)
+    await forwarder.start()         # FastAPI lifespan startup
+    forwarder.submit(lead_data)     # Never blocks
+    await forwarder.stop()          # Drain, dead-letter whatever is left
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+from datetime import datetime
+from typing import Optional
+
+import httpx
+
+from http_pool import HTTPClientPool, LatencyTracker
+from structured_log import get_logger
+
+logger = get_logger("crm_queue")
+
+DEFAULT_WORKERS = int(os.environ.get("CRM_WORKERS", 4))
+DEFAULT_BATCH_SIZE = int(os.environ.get("CRM_BATCH_SIZE", 1))  # >1 posts JSON arrays
+DEFAULT_MAX_ATTEMPTS = int(os.environ.get("CRM_MAX_ATTEMPTS", 5))
+DEFAULT_DEAD_LETTER_PATH = os.environ.get("CRM_DEAD_LETTER_PATH", "crm_dead_letter.jsonl")
+DEFAULT_QUEUE_SIZE = 10000
+BATCH_WAIT = 0.05  # Seconds to wait for a batch to fill
+BASE_DELAY = 0.5  # First retry delay in seconds, doubled per attempt
+MAX_DELAY = 30.0
+DRAIN_TIMEOUT = 10.0  # Seconds stop() waits for the queue to empty
+
+
+class _Job:
+    """A queued lead and its delivery attempts."""
+    __slots__ = ("lead", "attempts", "queued_at", "error")
+
+    def __init__(self, lead: dict):
+        self.lead = lead
+        self.attempts = 0
+        self.queued_at = time.monotonic()
+        self.error = ""
+
+
+class CRMForwarder:
+    """
+    Non-blocking CRM webhook delivery with retries and a dead-letter file.
+
+    Args:
+        pool: Shared HTTPClientPool
+        url: CRM webhook URL (empty disables forwarding)
+        workers: Concurrent delivery tasks
+        batch_size: Leads per request; 1 posts single objects
+        max_attempts: Deliveries tried before a lead is dead-lettered
+        dead_letter_path: JSONL file for undeliverable leads
+        queue_size: Leads held before submit() starts dead-lettering
+    """
+
+    def __init__(
+        self,
+        pool: HTTPClientPool,
+        url: str,
+        workers: int = DEFAULT_WORKERS,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        dead_letter_path: str = DEFAULT_DEAD_LETTER_PATH,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+    ):
+        self.pool = pool
+        self.url = url
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.max_attempts = max(1, max_attempts)
+        self.dead_letter_path = dead_letter_path
+        self.queue_size = queue_size
+
+        self.queue: Optional[asyncio.Queue] = None
+        self._tasks: list = []
+        self._retries: set = set()  # Sleeping retry tasks
+        self._writes: set = set()  # Dead-letter writes started outside a task (submit)
+        self.lag = LatencyTracker()  # Queued -> picked up by a worker
+        self.counters = {"submitted": 0, "forwarded": 0, "batches": 0,
+                         "retried": 0, "failed": 0, "dead_lettered": 0,
+                         "worker_errors": 0, "dead_letter_errors": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.url)
+
+    async def start(self):
+        """
+        Start the worker tasks (called from the app lifespan).
+
+        The queue belongs to the running event loop; stop() drops it, so the
+        next start() (another lifespan, another loop) gets a new one.
+        """
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.queue_size)
+        if self.enabled and not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = DRAIN_TIMEOUT):
+        """Wait up to `timeout` for queued leads, then dead-letter the rest."""
+        if self.queue is None:
+            return
+        deadline = time.monotonic() + timeout
+        while self._tasks and time.monotonic() < deadline:
+            try:
+                await asyncio.wait_for(self.queue.join(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                break
+            if not self._retries:
+                break
+            # Retries land back on the queue when their backoff ends
+            await asyncio.wait(list(self._retries), timeout=max(0.0, deadline - time.monotonic()))
+
+        for task in self._tasks + list(self._retries):
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._retries, return_exceptions=True)
+        self._tasks = []
+
+        leftover = []
+        while not self.queue.empty():
+            leftover.append(self.queue.get_nowait())
+            self.queue.task_done()
+        await self._dead_letter(leftover, "shutdown before delivery")
+        if self._writes:
+            await asyncio.gather(*self._writes)
+        self.queue = None
+
+    def submit(self, lead: dict) -> bool:
+        """
+        Queue a lead for delivery.
+
+        Returns:
+            True if queued; False if forwarding is disabled or the queue is
+            full (the lead is dead-lettered instead of dropped)
+        """
+        if not self.enabled:
+            return False
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.counters["submitted"] += 1
+        job = _Job(lead)
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            task = asyncio.get_running_loop().create_task(self._dead_letter([job], "queue full"))
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+            return False
+        return True
+
+    async def _worker(self):
+        while True:
+            batch = [await self.queue.get()]
+            try:
+                deadline = time.monotonic() + BATCH_WAIT
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+
+                now = time.monotonic()
+                for job in batch:
+                    if job.attempts == 0:
+                        self.lag.record(now - job.queued_at)
+                await self._deliver(batch)
+            except Exception as e:
+                # Not a delivery failure _deliver knows how to handle; keep the worker alive
+                self.counters["worker_errors"] += 1
+                logger.exception("CRM worker error", extra={"event": "crm_worker_error", "leads": len(batch)})
+                await self._dead_letter(batch, f"worker error ({type(e).__name__}: {e})")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _deliver(self, batch: list):
+        payload = batch[0].lead if self.batch_size == 1 else [job.lead for job in batch]
+        for job in batch:
+            job.attempts += 1
+
+        retry = True
+        try:
+            response = await self.pool.post(self.url, json=payload)
+            if response.status_code < 400:
+                self.counters["forwarded"] += len(batch)
+                self.counters["batches"] += 1
+                return
+            error = f"HTTP {response.status_code}"
+            retry = response.status_code == 429 or response.status_code >= 500
+        except httpx.HTTPError as e:
+            error = f"{type(e).__name__}: {e}"
+
+        self.counters["failed"] += len(batch)
+        for job in batch:
+            job.error = error
+        if not retry or batch[0].attempts >= self.max_attempts:
+            logger.error("CRM forward failed, dead-lettering",
+                         extra={"event": "crm_dead_letter", "error": str(error), "leads": len(batch)})
+            await self._dead_letter(batch, error)
+            return
+
+        # Back off without holding a worker
+        delay = min(MAX_DELAY, BASE_DELAY * 2 ** (batch[0].attempts - 1))
+        delay *= random.uniform(0.5, 1.0)
+        self.counters["retried"] += len(batch)
+        task = asyncio.create_task(self._retry_later(batch, delay))
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+
+    async def _retry_later(self, batch: list, delay: float):
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            await self._dead_letter(batch, f"shutdown during retry ({batch[0].error})")
+            raise
+        for job in batch:
+            try:
+                self.queue.put_nowait(job)
+            except asyncio.QueueFull:
+                await self._dead_letter([job], "queue full on retry")
+
+    async def _dead_letter(self, jobs: list, reason: str):
+        """Append jobs to the dead-letter file in a worker thread; never raises for I/O errors."""
+        if not jobs:
+            return
+        failed_at = datetime.utcnow().isoformat()
+        lines = "".join(json.dumps({
+            "failed_at": failed_at,
+            "reason": reason,
+            "attempts": job.attempts,
+            "lead": job.lead,
+        }, default=str) + "\n" for job in jobs)
+        self.counters["dead_lettered"] += len(jobs)
+        try:
+            await asyncio.to_thread(self._append_dead_letters, lines)
+        except OSError as e:
+            self.counters["dead_letter_errors"] += len(jobs)
+            logger.error("CRM dead-letter write failed, leads lost",
+                         extra={"event": "crm_dead_letter_error", "error": str(e), "reason": reason,
+                                "lead_ids": [job.lead.get("lead_id") for job in jobs]})
+
+    def _append_dead_letters(self, lines: str):
+        with open(self.dead_letter_path, 'a') as f:
+            f.write(lines)
+
+    def metrics(self) -> dict:
+        """Queue depth, lag and delivery counters."""
+        depth = self.queue.qsize() if self.queue is not None else 0
+        return {
+            "enabled": self.enabled,
+            "workers": len(self._tasks),
+            "batch_size": self.batch_size,
+            "depth": depth,
+            "retrying": len(self._retries),
+            "lag": self.lag.summary(),
+            **self.counters,
+        }
@@ -0,0 +1,123 @@
+"""
+Pluggable fast JSON for the webhook server.
+
+Uses orjson when it is installed (pip install orjson) and the standard
+library otherwise; WEBHOOK_JSON=json forces the standard library.
+
+- loads() parses request bodies straight from bytes (the tool call
+  endpoints use Pydantic's model_validate_json() instead, which parses and
+  validates in one pass)
+- dumps() renders bytes (compact, UTF-8)
+- FastJSONResponse is the app's default response class. Endpoints that
+  return one directly skip FastAPI's jsonable_encoder pass, which walks
+  every value of large listings such as GET /api/leads
+
+Usage:
+    from fast_json import FastJSONResponse, loads
+    data = loads(await request.body())
+    return FastJSONResponse({"leads": records})
+
+    python fast_json.py     # Benchmark the webhook endpoints with each backend
+"""
+
+import json
+import os
+from typing import Any
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _std_dumps(content: Any) -> bytes:
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def _orjson_dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+
+def use(backend: str):
+    """Switch the JSON backend: "orjson" or "json"."""
+    global BACKEND, loads, dumps
+    if backend == "orjson" and ORJSON_AVAILABLE:
+        BACKEND, loads, dumps = "orjson", orjson.loads, _orjson_dumps
+    else:
+        BACKEND, loads, dumps = "json", json.loads, _std_dumps
+
+
+BACKEND = "json"
+loads = json.loads
+dumps = _std_dumps
+use(os.environ.get("WEBHOOK_JSON", "orjson"))
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the active fast_json backend."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _benchmark(seconds: float = 2.0):
+    """Requests/second for POST /api/leads and a 500-lead GET /api/leads, per backend."""
+    import asyncio
+    import contextlib
+    import io
+    import itertools
+    import time
+
+    os.environ.setdefault("WEBHOOK_STORAGE", "memory")
+    import httpx
+    import webhook_server
+
+    for i in range(500):
+        webhook_server.repository.save_lead({
+            "lead_id": f"LEAD-BENCH-{i:04d}", "customer_name": f"Customer {i}", "phone": f"555-01{i:02d}",
+            "address": f"{i} Main St", "service_type": "lawn care", "notes": "Front and back yard, weekly",
+            "priority": "normal", "callback_requested": False,
+            "created_at": f"2025-01-01T00:{i // 60:02d}:{i % 60:02d}", "status": "new",
+        })
+    webhook_server.repository.flush()
+    call_ids = itertools.count()
+
+    def lead() -> bytes:
+        # A new call_id per request, so every POST creates a lead instead of
+        # being replayed from the idempotency index
+        return dumps({"call": {"call_id": f"bench-{next(call_ids)}"}, "name": "capture_lead",
+                      "args": {"customer_name": "Jane Doe", "phone": "555-0100", "address": "1 Main St",
+                               "service_type": "lawn care", "notes": "Weekly mowing", "priority": "normal"}})
+
+    async def rate(client, method, url, body=None, **kwargs) -> float:
+        count, started = 0, time.perf_counter()
+        while time.perf_counter() - started < seconds:
+            if body is not None:
+                kwargs["content"] = body()
+            response = await client.request(method, url, **kwargs)
+            assert response.status_code == 200, response.text
+            count += 1
+        return count / (time.perf_counter() - started)
+
+    async def run():
+        transport = httpx.ASGITransport(app=webhook_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for backend in ("json", "orjson"):
+                if backend == "orjson" and not ORJSON_AVAILABLE:
+                    print("orjson: not installed (pip install orjson)")
+                    continue
+                use(backend)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    post = await rate(client, "POST", "/api/leads", body=lead)
+                listing = await rate(client, "GET", "/api/leads", params={"limit": 500})
+                print(f"{backend:>6}: POST /api/leads {post:7.0f} req/s   GET /api/leads?limit=500 {listing:6.0f} req/s")
+
+    asyncio.run(run())
+    webhook_server.repository.close()
+
+
+if __name__ == "__main__":
+    _benchmark()
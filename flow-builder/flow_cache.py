@@ -0,0 +1,200 @@
+"""
+Content-addressed cache of created conversation flows.
+
+Every create_agent call renders a conversation_flow.create payload from the
+config. Tenants with identical settings render byte-identical payloads, so
+FlowCache keeps a small on-disk index of
+
+    sha256(canonical payload JSON) -> conversation_flow_id
+
+and the builders reuse the existing flow instead of POSTing a duplicate.
+Retell agents only reference a flow by id, so several agents can safely
+share one flow. The index is namespaced by Retell API key because flow ids
+are only valid inside the workspace that created them.
+
+get_or_create() / aget_or_create() run the whole lookup -> retrieve ->
+create -> store sequence for a sync or async Retell client, so every
+builder shares it. The sequence holds a per-payload lock (a thread lock,
+or an asyncio lock for the async entry point), so concurrent identical
+payloads create one flow and the others reuse it.
+
+Usage:
+    cache = FlowCache("flow_cache.json")
+    builder = GreenLineAgentBuilder(api_key, flow_cache=cache)
+    flow = cache.get_or_create(client, api_key_namespace(api_key), params)
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+from retell import NotFoundError
+
+# Default location of the flow index
+DEFAULT_FLOW_CACHE_PATH = "flow_cache.json"
+
+
+def canonical_json(payload) -> str:
+    """Serialize a payload deterministically (sorted keys, no whitespace)."""
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def payload_hash(payload) -> str:
+    """SHA-256 of the canonical JSON form of a flow payload."""
+    return hashlib.sha256(canonical_json(payload).encode("utf-8")).hexdigest()
+
+
+def api_key_namespace(api_key: str) -> str:
+    """Short, non-reversible namespace for a Retell API key."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+class FlowCache:
+    """
+    Thread-safe JSON index mapping flow payload hashes to flow ids.
+
+    The file is rewritten atomically on every change, so it is safe to
+    share between the CLI and a batch run, and a crash never leaves a
+    half-written index behind.
+    """
+
+    def __init__(self, path: str = DEFAULT_FLOW_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: dict = {}  # "namespace:hash" -> {"conversation_flow_id", "created_at"}
+        self._flights: dict = {}  # "namespace:hash" -> [threading.Lock, users] while a lookup runs
+        self._async_flights: dict = {}  # "namespace:hash" -> [asyncio.Lock, users]
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                self._entries = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: Ignoring unreadable flow cache {self.path}: {e}")
+            self._entries = {}
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._entries, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def lookup(self, namespace: str, digest: str) -> Optional[str]:
+        """Return the cached flow id for a payload hash, if any."""
+        with self._lock:
+            entry = self._entries.get(f"{namespace}:{digest}")
+            return entry["conversation_flow_id"] if entry else None
+
+    def store(self, namespace: str, digest: str, flow_id: str):
+        """Record the flow id created for a payload hash."""
+        with self._lock:
+            self._entries[f"{namespace}:{digest}"] = {
+                "conversation_flow_id": flow_id,
+                "created_at": time.time(),
+            }
+            self._save()
+
+    def discard(self, namespace: str, digest: str):
+        """Forget a payload hash (e.g. its flow was deleted in Retell)."""
+        with self._lock:
+            if self._entries.pop(f"{namespace}:{digest}", None) is not None:
+                self._save()
+
+    def discard_flow(self, flow_id: str):
+        """Forget every payload hash that points at a flow id."""
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry["conversation_flow_id"] == flow_id]
+            for key in stale:
+                del self._entries[key]
+            if stale:
+                self._save()
+
+    def _enter_flight(self, flights: dict, key: str, new_lock):
+        with self._lock:
+            flight = flights.get(key)
+            if flight is None:
+                flight = flights[key] = [new_lock(), 0]
+            flight[1] += 1
+            return flight[0]
+
+    def _leave_flight(self, flights: dict, key: str):
+        # The last user removes the lock, so the dict only holds payloads being created
+        with self._lock:
+            flight = flights[key]
+            flight[1] -= 1
+            if not flight[1]:
+                del flights[key]
+
+    @contextlib.contextmanager
+    def _single_flight(self, key: str):
+        lock = self._enter_flight(self._flights, key, threading.Lock)
+        try:
+            with lock:
+                yield
+        finally:
+            self._leave_flight(self._flights, key)
+
+    @contextlib.asynccontextmanager
+    async def _async_single_flight(self, key: str):
+        lock = self._enter_flight(self._async_flights, key, asyncio.Lock)
+        try:
+            async with lock:
+                yield
+        finally:
+            self._leave_flight(self._async_flights, key)
+
+    def get_or_create(self, client, namespace: str, params: dict):
+        """
+        Reuse the flow created for an identical payload, or create and cache a new one.
+
+        Args:
+            client: Retell client (sync)
+            namespace: api_key_namespace() of the client's API key
+            params: conversation_flow.create payload
+
+        Returns:
+            The conversation flow
+        """
+        digest = payload_hash(params)
+        with self._single_flight(f"{namespace}:{digest}"):
+            flow_id = self.lookup(namespace, digest)
+            if flow_id:
+                try:
+                    flow = client.conversation_flow.retrieve(flow_id)
+                    print(f"Reusing identical conversation flow: {flow_id}")
+                    return flow
+                except NotFoundError:
+                    # Flow was deleted in Retell - forget it and create a new one
+                    self.discard(namespace, digest)
+
+            flow = client.conversation_flow.create(**params)
+            self.store(namespace, digest, flow.conversation_flow_id)
+            return flow
+
+    async def aget_or_create(self, client, namespace: str, params: dict):
+        """get_or_create() for an AsyncRetell client; index writes run in a worker thread."""
+        digest = payload_hash(params)
+        async with self._async_single_flight(f"{namespace}:{digest}"):
+            flow_id = self.lookup(namespace, digest)
+            if flow_id:
+                try:
+                    flow = await client.conversation_flow.retrieve(flow_id)
+                    print(f"Reusing identical conversation flow: {flow_id}")
+                    return flow
+                except NotFoundError:
+                    await asyncio.to_thread(self.discard, namespace, digest)
+
+            flow = await client.conversation_flow.create(**params)
+            await asyncio.to_thread(self.store, namespace, digest, flow.conversation_flow_id)
+            return flow
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,299 @@
+"""
+Declarative conversation flow definitions.
+
+A flow definition is a versioned JSON (or YAML, if PyYAML is installed) file
+holding the parts of a conversation_flow.create payload that make up the
+conversation itself - nodes, global prompt, start node - so a flow can be
+edited and reviewed without touching the builders' Python.
+
+    {
+      "name": "outbound_sales",
+      "version": 1,
+      "description": "Outbound sales agent (GreenLineOutboundAgentBuilder)",
+      "slots": ["agent_name", "company_name", ...],
+      "flow": {
+        "global_prompt": "You are [[agent_name]], ...",
+        "nodes": [...],
+        "start_node_id": "welcome",
+        "start_speaker": "agent",
+        "model_temperature": 0.4
+      }
+    }
+
+Per-tenant values are written as [[slot]] placeholders ({{...}} is left
+alone, it is Retell's dynamic variable syntax) and every placeholder must
+be declared in "slots". Fields the definition leaves out (model_choice,
+tools) are still built from the agent config by the builder.
+
+Definitions are parsed lazily on first use, validated, and compiled into a
+FlowTemplate. Parsed definitions are cached by (path, mtime, size), so a
+long-running worker picks up an edited file on its next render without a
+restart, and repeated renders never re-read the file.
+
+Usage:
+    builder = GreenLineOutboundAgentBuilder(api_key, flow_definition="outbound_sales")
+    python cli.py write-flow-definitions      # Regenerate flows/ from the builders
+    python cli.py check-flow-definition flows/outbound_sales.json
+"""
+
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
+from flow_templates import FlowTemplate, slot
+
+try:
+    import yaml
+    YAML_AVAILABLE = True
+except ImportError:
+    YAML_AVAILABLE = False
+
+# Bundled definitions, looked up by name
+FLOWS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "flows")
+
+# Flow payload keys a definition may set
+FLOW_KEYS = ("global_prompt", "nodes", "tools", "start_node_id", "start_speaker",
+             "model_choice", "model_temperature", "default_dynamic_variables")
+
+_PLACEHOLDER_PATTERN = re.compile(r"\[\[([A-Za-z_][A-Za-z0-9_]*)\]\]")
+_EXTENSIONS = (".json", ".yaml", ".yml")
+
+
+class FlowDefinitionError(ValueError):
+    """A flow definition file is missing, unreadable or invalid."""
+
+
+@dataclass
+class FlowDefinition:
+    """A parsed, validated flow definition."""
+    name: str
+    version: int
+    path: str
+    flow: dict
+    slots: list = field(default_factory=list)
+    description: str = ""
+    _template: FlowTemplate = field(default=None, repr=False, compare=False)
+
+    def render(self, values: Optional[dict] = None) -> dict:
+        """
+        Render the flow payload fields with slot values filled in.
+
+        Args:
+            values: Slot name -> value; extra keys are ignored
+
+        Returns:
+            dict of conversation_flow.create fields (read-only, static parts
+            are shared between renders)
+        """
+        values = values or {}
+        missing = [name for name in self.slots if name not in values]
+        if missing:
+            raise FlowDefinitionError(f"{self.name}: missing slot values: {', '.join(missing)}")
+        if self._template is None:
+            self._template = FlowTemplate(_to_markers(self.flow))
+        return self._template.render({name: str(values[name]) for name in self.slots})
+
+
+def _to_markers(node):
+    """Replace [[slot]] placeholders with flow_templates slot markers."""
+    if isinstance(node, str):
+        return _PLACEHOLDER_PATTERN.sub(lambda m: slot(m.group(1)), node)
+    if isinstance(node, dict):
+        return {key: _to_markers(value) for key, value in node.items()}
+    if isinstance(node, list):
+        return [_to_markers(value) for value in node]
+    return node
+
+
+def _placeholders(node, found: set) -> set:
+    if isinstance(node, str):
+        found.update(_PLACEHOLDER_PATTERN.findall(node))
+    elif isinstance(node, dict):
+        for value in node.values():
+            _placeholders(value, found)
+    elif isinstance(node, list):
+        for value in node:
+            _placeholders(value, found)
+    return found
+
+
+def validate_definition(data, path: str = "<definition>") -> list:
+    """
+    Check a parsed definition against the file format.
+
+    Returns:
+        List of problems (empty if the definition is valid)
+    """
+    if not isinstance(data, dict):
+        return [f"{path}: expected an object at the top level"]
+
+    errors = []
+    if not isinstance(data.get("name"), str) or not data.get("name"):
+        errors.append("'name' must be a non-empty string")
+    if not isinstance(data.get("version"), int) or isinstance(data.get("version"), bool):
+        errors.append("'version' must be an integer")
+
+    slots = data.get("slots", [])
+    if not isinstance(slots, list) or not all(isinstance(name, str) for name in slots):
+        errors.append("'slots' must be a list of strings")
+        slots = []
+
+    flow = data.get("flow")
+    if not isinstance(flow, dict):
+        errors.append("'flow' must be an object")
+        return [f"{path}: {error}" for error in errors]
+
+    unknown = sorted(set(flow) - set(FLOW_KEYS))
+    if unknown:
+        errors.append(f"unknown flow keys: {', '.join(unknown)}")
+    if not isinstance(flow.get("global_prompt"), str):
+        errors.append("'flow.global_prompt' must be a string")
+
+    nodes = flow.get("nodes")
+    if not isinstance(nodes, list) or not nodes:
+        errors.append("'flow.nodes' must be a non-empty list")
+        nodes = []
+    node_ids = set()
+    for index, node in enumerate(nodes):
+        if not isinstance(node, dict) or not isinstance(node.get("id"), str):
+            errors.append(f"node #{index} must be an object with a string 'id'")
+            continue
+        if node["id"] in node_ids:
+            errors.append(f"duplicate node id '{node['id']}'")
+        node_ids.add(node["id"])
+        if not isinstance(node.get("type"), str):
+            errors.append(f"node '{node['id']}' has no 'type'")
+
+    start = flow.get("start_node_id")
+    if not isinstance(start, str):
+        errors.append("'flow.start_node_id' must be a string")
+    elif node_ids and start not in node_ids:
+        errors.append(f"start node '{start}' is not defined")
+
+    if "tools" in flow and not isinstance(flow["tools"], list):
+        errors.append("'flow.tools' must be a list")
+    if "model_temperature" in flow and not isinstance(flow["model_temperature"], (int, float)):
+        errors.append("'flow.model_temperature' must be a number")
+
+    undeclared = sorted(_placeholders(flow, set()) - set(slots))
+    if undeclared:
+        errors.append(f"undeclared slots: {', '.join(undeclared)}")
+
+    return [f"{path}: {error}" for error in errors]
+
+
+def resolve_definition_path(name_or_path: str) -> str:
+    """Path of a definition file, given a path or the name of a bundled definition."""
+    if os.path.isfile(name_or_path):
+        return name_or_path
+    for extension in _EXTENSIONS:
+        candidate = os.path.join(FLOWS_DIR, name_or_path + extension)
+        if os.path.isfile(candidate):
+            return candidate
+    raise FlowDefinitionError(f"Flow definition not found: {name_or_path}")
+
+
+def _parse(path: str):
+    with open(path, 'r') as f:
+        text = f.read()
+    if path.endswith((".yaml", ".yml")):
+        if not YAML_AVAILABLE:
+            raise FlowDefinitionError(f"{path}: PyYAML is required for YAML flow definitions (pip install pyyaml)")
+        return yaml.safe_load(text)
+    return json.loads(text)
+
+
+# path -> ((mtime_ns, size), FlowDefinition)
+_cache: dict = {}
+_cache_lock = threading.Lock()
+
+
+def load_definition(name_or_path: str) -> FlowDefinition:
+    """
+    Load a flow definition, re-parsing only if the file changed since the last load.
+
+    Args:
+        name_or_path: Path to a .json/.yaml file, or the name of a file in flows/
+
+    Returns:
+        Validated FlowDefinition
+
+    Raises:
+        FlowDefinitionError: If the file is missing, unparsable or invalid
+    """
+    path = os.path.abspath(resolve_definition_path(name_or_path))
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+
+    with _cache_lock:
+        cached = _cache.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+
+    try:
+        data = _parse(path)
+    except (OSError, ValueError) as e:
+        raise FlowDefinitionError(f"{path}: {e}") from e
+
+    errors = validate_definition(data, path)
+    if errors:
+        raise FlowDefinitionError("Invalid flow definition:\n  " + "\n  ".join(errors))
+
+    definition = FlowDefinition(
+        name=data["name"],
+        version=data["version"],
+        path=path,
+        flow=data["flow"],
+        slots=list(data.get("slots", [])),
+        description=data.get("description", ""),
+    )
+    with _cache_lock:
+        _cache[path] = (key, definition)
+    return definition
+
+
+def write_definition(path: str, name: str, flow: dict, slots: list, version: int = 1, description: str = ""):
+    """
+    Write a flow definition file.
+
+    Args:
+        path: Output path (.json, or .yaml/.yml if PyYAML is installed)
+        name: Definition name
+        flow: Flow payload fields, with slot markers or [[slot]] placeholders
+        slots: Declared slot names
+        version: Definition version; bump it when the flow changes
+        description: Human-readable description
+    """
+    data = {
+        "name": name,
+        "version": version,
+        "description": description,
+        "slots": list(slots),
+        "flow": _from_markers(flow),
+    }
+    errors = validate_definition(data, path)
+    if errors:
+        raise FlowDefinitionError("Invalid flow definition:\n  " + "\n  ".join(errors))
+
+    with open(path, 'w') as f:
+        if path.endswith((".yaml", ".yml")):
+            if not YAML_AVAILABLE:
+                raise FlowDefinitionError("PyYAML is required to write YAML flow definitions (pip install pyyaml)")
+            yaml.safe_dump(data, f, sort_keys=False, allow_unicode=True, width=120)
+        else:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+
+
+def _from_markers(node):
+    """Replace flow_templates slot markers with [[slot]] placeholders."""
+    if isinstance(node, str):
+        return re.sub("\x00([A-Za-z_][A-Za-z0-9_]*)\x00", r"[[\1]]", node)
+    if isinstance(node, dict):
+        return {key: _from_markers(value) for key, value in node.items()}
+    if isinstance(node, list):
+        return [_from_markers(value) for value in node]
+    return node
@@ -0,0 +1,203 @@
+"""
+Diffing of deployed conversation flows against freshly rendered payloads.
+
+Used by the builders' update_agent() to turn a prompt or node change into a
+minimal conversation_flow.update call instead of creating a new flow and
+agent. Retell's update endpoint replaces top-level fields wholesale (the
+whole `nodes` list, the whole `tools` list), so the diff is reported per
+node/edge/tool for humans, and update_params() sends only the top-level
+fields that actually changed.
+
+Retell adds server-side defaults to stored flows (editor positions, unset
+fields as empty lists or false), so a deployed value is considered
+unchanged when it contains everything the rendered value specifies and its
+other keys are such defaults. Any other extra deployed key is a field the
+rendered payload no longer sets, and is reported as a change.
+"""
+
+from dataclasses import dataclass, field
+
+# Flow settings compared besides nodes, tools and global_prompt
+FLOW_SETTINGS = ("start_node_id", "start_speaker", "model_choice", "model_temperature")
+
+# Node keys that hold a single edge (the rest use an `edges` list)
+SINGLE_EDGE_KEYS = ("edge", "success_edge", "failed_edge", "else_edge", "skip_response_edge")
+
+# Keys Retell adds to stored nodes, edges and tools whatever their value
+SERVER_DEFAULT_KEYS = frozenset({"display_position"})
+
+
+def to_plain(obj):
+    """Convert a Retell response model (or nested models) to plain dicts/lists."""
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(exclude_none=True)
+    if isinstance(obj, dict):
+        return {key: to_plain(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [to_plain(value) for value in obj]
+    return obj
+
+
+def matches(current, desired) -> bool:
+    """
+    Whether a deployed value satisfies a rendered one.
+
+    Dicts match if every rendered key matches and every other deployed key
+    is a server default (see is_server_default()); lists must match element
+    by element.
+    """
+    if isinstance(desired, dict):
+        if not isinstance(current, dict):
+            return False
+        return all(key in current and matches(current[key], value) for key, value in desired.items()) \
+            and all(is_server_default(key, value) for key, value in current.items() if key not in desired)
+    if isinstance(desired, list):
+        if not isinstance(current, list) or len(current) != len(desired):
+            return False
+        return all(matches(c, d) for c, d in zip(current, desired))
+    if isinstance(desired, float) or isinstance(current, float):
+        try:
+            return abs(float(current) - float(desired)) < 1e-9
+        except (TypeError, ValueError):
+            return False
+    return current == desired
+
+
+def is_server_default(key: str, value) -> bool:
+    """Whether a deployed key the rendered payload doesn't set is just Retell filling in a default."""
+    return key in SERVER_DEFAULT_KEYS or value is None or value is False or value in ("", [], {})
+
+
+def node_edges(node: dict) -> dict:
+    """All edges of a node keyed by edge id (or by edge key for unnamed single edges)."""
+    edges = {}
+    for edge in node.get("edges") or []:
+        edges[edge.get("id") or edge.get("destination_node_id")] = edge
+    for key in SINGLE_EDGE_KEYS:
+        edge = node.get(key)
+        if edge:
+            edges[edge.get("id") or key] = edge
+    return edges
+
+
+def _without_edges(node: dict) -> dict:
+    return {key: value for key, value in node.items() if key != "edges" and key not in SINGLE_EDGE_KEYS}
+
+
+@dataclass
+class FlowDiff:
+    """Differences between a deployed flow and a rendered flow payload."""
+    added_nodes: list = field(default_factory=list)
+    removed_nodes: list = field(default_factory=list)
+    changed_nodes: list = field(default_factory=list)  # Node content (instruction, type, ...) changed
+    changed_edges: list = field(default_factory=list)  # (node_id, edge_id) added, removed or changed
+    node_order_changed: bool = False
+    tools_changed: list = field(default_factory=list)  # tool ids added, removed or changed
+    global_prompt_changed: bool = False
+    settings_changed: list = field(default_factory=list)
+
+    @property
+    def nodes_changed(self) -> bool:
+        return bool(self.added_nodes or self.removed_nodes or self.changed_nodes
+                    or self.changed_edges or self.node_order_changed)
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.nodes_changed or self.tools_changed
+                    or self.global_prompt_changed or self.settings_changed)
+
+    def update_params(self, desired: dict) -> dict:
+        """Keyword arguments for conversation_flow.update carrying only changed fields."""
+        params = {}
+        if self.nodes_changed:
+            params["nodes"] = desired["nodes"]
+        if self.tools_changed:
+            params["tools"] = desired.get("tools", [])
+        if self.global_prompt_changed:
+            params["global_prompt"] = desired["global_prompt"]
+        for key in self.settings_changed:
+            params[key] = desired[key]
+        return params
+
+    def summary(self) -> str:
+        """One line per kind of change, for CLI output."""
+        if not self.has_changes:
+            return "No changes"
+
+        lines = []
+        if self.added_nodes:
+            lines.append(f"Nodes added: {', '.join(self.added_nodes)}")
+        if self.removed_nodes:
+            lines.append(f"Nodes removed: {', '.join(self.removed_nodes)}")
+        if self.changed_nodes:
+            lines.append(f"Nodes changed: {', '.join(self.changed_nodes)}")
+        if self.changed_edges:
+            lines.append(f"Edges changed: {', '.join(f'{n}/{e}' for n, e in self.changed_edges)}")
+        if self.node_order_changed:
+            lines.append("Node order changed")
+        if self.tools_changed:
+            lines.append(f"Tools changed: {', '.join(self.tools_changed)}")
+        if self.global_prompt_changed:
+            lines.append("Global prompt changed")
+        if self.settings_changed:
+            lines.append(f"Settings changed: {', '.join(self.settings_changed)}")
+        return "\n".join(lines)
+
+
+def diff_flow(current: dict, desired: dict) -> FlowDiff:
+    """
+    Compare a deployed flow (as returned by conversation_flow.retrieve, in
+    plain form) with a rendered conversation_flow.create payload.
+
+    Args:
+        current: Deployed flow, see to_plain()
+        desired: Payload from a builder's _build_flow_params()
+
+    Returns:
+        FlowDiff describing what needs to be sent
+    """
+    diff = FlowDiff()
+
+    current_nodes = {node["id"]: node for node in current.get("nodes") or []}
+    desired_nodes = {node["id"]: node for node in desired.get("nodes") or []}
+
+    for node_id, node in desired_nodes.items():
+        deployed = current_nodes.get(node_id)
+        if deployed is None:
+            diff.added_nodes.append(node_id)
+            continue
+
+        if not matches(_without_edges(deployed), _without_edges(node)):
+            diff.changed_nodes.append(node_id)
+
+        deployed_edges = node_edges(deployed)
+        for edge_id, edge in node_edges(node).items():
+            if edge_id not in deployed_edges or not matches(deployed_edges[edge_id], edge):
+                diff.changed_edges.append((node_id, edge_id))
+        for edge_id in deployed_edges.keys() - node_edges(node).keys():
+            diff.changed_edges.append((node_id, edge_id))
+
+    diff.removed_nodes = [node_id for node_id in current_nodes if node_id not in desired_nodes]
+
+    shared = [node_id for node_id in desired_nodes if node_id in current_nodes]
+    if shared != [node_id for node_id in current_nodes if node_id in desired_nodes]:
+        diff.node_order_changed = True
+
+    current_tools = {tool.get("tool_id") or tool.get("name"): tool for tool in current.get("tools") or []}
+    desired_tools = {tool.get("tool_id") or tool.get("name"): tool for tool in desired.get("tools") or []}
+    for tool_id in desired_tools.keys() | current_tools.keys():
+        if tool_id not in current_tools or tool_id not in desired_tools \
+                or not matches(current_tools[tool_id], desired_tools[tool_id]):
+            diff.tools_changed.append(tool_id)
+    diff.tools_changed.sort()
+
+    if "global_prompt" in desired and current.get("global_prompt") != desired["global_prompt"]:
+        diff.global_prompt_changed = True
+
+    for key in FLOW_SETTINGS:
+        if key in desired and not matches(current.get(key), desired[key]):
+            diff.settings_changed.append(key)
+
+    return diff
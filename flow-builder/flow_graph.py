@@ -0,0 +1,290 @@
+"""
+Static analysis of conversation flow graphs.
+
+Nodes reference each other only through destination_node_id strings, so a
+typo or a deleted node produces a flow Retell accepts but callers get stuck
+in. FlowGraph indexes the nodes once and runs linear-time checks:
+
+- dangling edges (destination does not exist) and edges without a target
+- duplicate node ids and a missing start node
+- nodes unreachable from the start node (global nodes count as entry points)
+- non-end nodes without any exit
+- cycles (strongly connected components), and closed loops with no way out
+- the longest path from the start node to an end node, with each cycle
+  collapsed to a single step
+
+The builders run validate_flow() on every payload before creating or
+updating a flow, and `python cli.py validate-flow` reports on the built-in
+flows, definition files or a deployed flow.
+"""
+
+from dataclasses import dataclass, field
+from typing import Optional
+
+from flow_diff import SINGLE_EDGE_KEYS
+
+
+class FlowValidationError(ValueError):
+    """A conversation flow has structural errors."""
+
+    def __init__(self, analysis: "FlowAnalysis"):
+        self.analysis = analysis
+        details = "\n  ".join(str(issue) for issue in analysis.errors)
+        super().__init__(f"Conversation flow has {len(analysis.errors)} error(s):\n  {details}")
+
+
+@dataclass
+class FlowIssue:
+    """One problem found in a flow."""
+    severity: str  # "error" or "warning"
+    code: str  # dangling_edge, unreachable, no_exit, ...
+    node_id: Optional[str]
+    message: str
+
+    def __str__(self) -> str:
+        where = f"[{self.node_id}] " if self.node_id else ""
+        return f"{self.severity.upper()} {self.code}: {where}{self.message}"
+
+
+@dataclass
+class FlowAnalysis:
+    """Result of analyze_flow()."""
+    node_count: int = 0
+    edge_count: int = 0
+    start_node_id: Optional[str] = None
+    end_nodes: list = field(default_factory=list)
+    unreachable: list = field(default_factory=list)
+    cycles: list = field(default_factory=list)  # Node id lists, one per cyclic component
+    longest_path: list = field(default_factory=list)  # Node ids from start to an end node
+    issues: list = field(default_factory=list)
+
+    @property
+    def errors(self) -> list:
+        return [issue for issue in self.issues if issue.severity == "error"]
+
+    @property
+    def warnings(self) -> list:
+        return [issue for issue in self.issues if issue.severity == "warning"]
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def summary(self) -> str:
+        """Multi-line report for CLI output."""
+        lines = [
+            f"Nodes: {self.node_count}, edges: {self.edge_count}, end nodes: {len(self.end_nodes)}",
+            f"Start: {self.start_node_id}",
+            f"Cycles: {len(self.cycles)}" + (
+                f" ({'; '.join(f'{len(cycle)} nodes via {cycle[0]}' for cycle in self.cycles)})" if self.cycles else ""
+            ),
+        ]
+        if self.longest_path:
+            lines.append(f"Longest path to end ({len(self.longest_path) - 1} steps): {' > '.join(self.longest_path)}")
+        else:
+            lines.append("Longest path to end: no end node is reachable")
+        lines.extend(str(issue) for issue in self.issues)
+        return "\n".join(lines)
+
+
+class FlowGraph:
+    """
+    Adjacency index of a conversation flow.
+
+    Args:
+        nodes: The flow's `nodes` list
+        start_node_id: The flow's start node
+    """
+
+    def __init__(self, nodes: list, start_node_id: Optional[str]):
+        self.start_node_id = start_node_id
+        self.nodes: dict = {}
+        self.duplicates: list = []
+        for node in nodes:
+            node_id = node.get("id")
+            if node_id in self.nodes:
+                self.duplicates.append(node_id)
+            self.nodes[node_id] = node
+
+        # node id -> [(edge id, destination id)]
+        self.edges: dict = {node_id: list(self._node_edges(node)) for node_id, node in self.nodes.items()}
+
+    @staticmethod
+    def _node_edges(node: dict):
+        for edge in node.get("edges") or []:
+            yield edge.get("id"), edge.get("destination_node_id")
+        for key in SINGLE_EDGE_KEYS:
+            edge = node.get(key)
+            if edge:
+                yield edge.get("id") or key, edge.get("destination_node_id")
+
+    def successors(self, node_id: str) -> list:
+        """Existing destination nodes of a node's edges."""
+        return [dest for _, dest in self.edges.get(node_id, ()) if dest in self.nodes]
+
+    def entry_points(self) -> list:
+        """Start node plus global nodes (which Retell can jump to from anywhere)."""
+        entries = [self.start_node_id] if self.start_node_id in self.nodes else []
+        entries.extend(node_id for node_id, node in self.nodes.items()
+                       if node.get("global_node_setting") and node_id != self.start_node_id)
+        return entries
+
+    def reachable(self, sources: list) -> set:
+        """Nodes reachable from any of the sources (iterative DFS)."""
+        seen = set(sources)
+        stack = list(sources)
+        while stack:
+            for dest in self.successors(stack.pop()):
+                if dest not in seen:
+                    seen.add(dest)
+                    stack.append(dest)
+        return seen
+
+    def components(self) -> list:
+        """
+        Strongly connected components (iterative Tarjan), in reverse
+        topological order: every edge leaving a component points at a
+        component earlier in the list.
+        """
+        index: dict = {}
+        lowlink: dict = {}
+        on_stack: set = set()
+        stack: list = []
+        result: list = []
+        counter = 0
+
+        for root in self.nodes:
+            if root in index:
+                continue
+            work = [(root, iter(self.successors(root)))]
+            index[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+
+            while work:
+                node_id, children = work[-1]
+                for child in children:
+                    if child not in index:
+                        index[child] = lowlink[child] = counter
+                        counter += 1
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(self.successors(child))))
+                        break
+                    if child in on_stack:
+                        lowlink[node_id] = min(lowlink[node_id], index[child])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node_id])
+                    if lowlink[node_id] == index[node_id]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node_id:
+                                break
+                        result.append(component)
+        return result
+
+
+def analyze_flow(flow: dict) -> FlowAnalysis:
+    """
+    Analyze a flow payload (conversation_flow.create params, a flow definition's
+    `flow`, or a deployed flow in plain form).
+
+    Args:
+        flow: dict with `nodes` and `start_node_id`
+
+    Returns:
+        FlowAnalysis with issues, cycles and the longest path to an end node
+    """
+    graph = FlowGraph(flow.get("nodes") or [], flow.get("start_node_id"))
+    analysis = FlowAnalysis(
+        node_count=len(graph.nodes),
+        edge_count=sum(len(edges) for edges in graph.edges.values()),
+        start_node_id=graph.start_node_id,
+    )
+    issue = analysis.issues.append
+
+    for node_id in graph.duplicates:
+        issue(FlowIssue("error", "duplicate_node", node_id, "node id is used more than once"))
+    if graph.start_node_id not in graph.nodes:
+        issue(FlowIssue("error", "missing_start", None, f"start node '{graph.start_node_id}' does not exist"))
+
+    for node_id, node in graph.nodes.items():
+        is_end = node.get("type") == "end"
+        if is_end:
+            analysis.end_nodes.append(node_id)
+        for edge_id, dest in graph.edges[node_id]:
+            if not dest:
+                issue(FlowIssue("error", "edge_without_target", node_id, f"edge '{edge_id}' has no destination_node_id"))
+            elif dest not in graph.nodes:
+                issue(FlowIssue("error", "dangling_edge", node_id, f"edge '{edge_id}' points at missing node '{dest}'"))
+        if is_end and graph.edges[node_id]:
+            issue(FlowIssue("warning", "end_with_edges", node_id, "end node has outgoing edges that never run"))
+        elif not is_end and not graph.successors(node_id):
+            issue(FlowIssue("error", "no_exit", node_id, f"{node.get('type')} node has no exit"))
+
+    reachable = graph.reachable(graph.entry_points())
+    analysis.unreachable = [node_id for node_id in graph.nodes if node_id not in reachable]
+    for node_id in analysis.unreachable:
+        issue(FlowIssue("error", "unreachable", node_id, "node cannot be reached from the start node"))
+
+    # Condense cycles; components come out with successors first, so one
+    # pass computes "reaches an end" and the longest path to an end for each
+    components = graph.components()
+    component_of = {node_id: i for i, component in enumerate(components) for node_id in component}
+    best: list = [None] * len(components)  # (length, next component, entry node, exit node)
+    for i, component in enumerate(components):
+        members = set(component)
+        if len(component) > 1 or component[0] in graph.successors(component[0]):
+            analysis.cycles.append(list(reversed(component)))
+
+        if any(graph.nodes[node_id].get("type") == "end" for node_id in component):
+            best[i] = (1, None, component[0], component[0])
+        for node_id in component:
+            for dest in graph.successors(node_id):
+                j = component_of[dest]
+                if dest in members or best[j] is None:
+                    continue
+                if best[i] is None or best[j][0] + 1 > best[i][0]:
+                    best[i] = (best[j][0] + 1, j, node_id, dest)
+
+        # A closed loop: nothing inside ends the call and no edge leaves it
+        if best[i] is None and len(component) > 1 and members & reachable and \
+                all(dest in members for node_id in component for dest in graph.successors(node_id)):
+            issue(FlowIssue("warning", "closed_loop", component[-1],
+                            f"cycle {', '.join(reversed(component))} has no way out to an end node"))
+
+    start = graph.start_node_id
+    if start in component_of and best[component_of[start]] is not None:
+        path, node_id, i = [], start, component_of[start]
+        while i is not None:
+            _, next_component, exit_node, next_node = best[i]
+            path.append(node_id)
+            if exit_node != node_id and next_component is not None:
+                path.append(exit_node)  # Walk through a cycle to the node that leaves it
+            node_id, i = next_node, next_component
+        analysis.longest_path = path
+
+    return analysis
+
+
+def validate_flow(flow: dict) -> FlowAnalysis:
+    """
+    Analyze a flow payload and raise if it has structural errors.
+
+    Raises:
+        FlowValidationError: If any error-level issue is found
+
+    Returns:
+        FlowAnalysis (warnings only)
+    """
+    analysis = analyze_flow(flow)
+    if analysis.errors:
+        raise FlowValidationError(analysis)
+    return analysis
@@ -0,0 +1,421 @@
+"""
+Offline conversation flow simulator.
+
+Walks a flow's node graph without Retell, an LLM or the webhook server, so
+flow changes can be regression-tested on every commit. A scripted caller
+supplies one utterance per conversation turn; a pluggable, deterministic
+classifier stands in for the LLM that picks which edge to take:
+
+- KeywordClassifier: explicit keyword rules per edge, falling back to word
+  overlap between the utterance and each edge's transition condition
+- RecordedClassifier: replays a recorded list of destination nodes
+- RandomClassifier: seeded random walks, for coverage exploration
+
+Function (tool), SMS and transfer nodes are stubbed: each scenario says
+whether a tool call, SMS or transfer succeeds, and the matching edge is
+taken. Conversation nodes with no matching edge stay put for the turn, as
+the real agent would keep talking.
+
+Usage:
+    sim = FlowSimulator(builder._build_flow_params(config))
+    report = sim.run_many(load_scenarios("scenarios.json"))
+    print(report.summary())
+
+    python cli.py simulate --scenarios scenarios.json --random 5000
+"""
+
+import json
+import random
+import re
+import statistics
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional
+
+from flow_graph import FlowGraph
+
+_WORD_PATTERN = re.compile(r"[a-z0-9']+")
+_STOPWORDS = frozenset(
+    "the and for are but not you all any can had her was one our out has his how its may new now "
+    "see who did get let say she too use that this with have from they will would there their what "
+    "about which when make like than then them these some been into just also only over such were "
+    "caller callers wants want is it or to of a an in on be by as at has does".split()
+)
+
+# Stub outcome texts matched against function node edge conditions
+TOOL_SUCCESS = "success successfully retrieved created"
+TOOL_FAILURE = "failed error not configured"
+
+# Why a simulated call stopped
+OUTCOME_END = "end"
+OUTCOME_TRANSFERRED = "transferred"
+OUTCOME_HANGUP = "hangup"  # Script ran out of utterances
+OUTCOME_MAX_STEPS = "max_steps"
+OUTCOME_STUCK = "stuck"  # Non-conversation node with no edge to take
+
+
+def _tokens(text: str) -> frozenset:
+    """Lowercased content words, truncated to 6 chars as a cheap stemmer."""
+    return frozenset(
+        word[:6] for word in _WORD_PATTERN.findall(text.lower())
+        if len(word) > 2 and word not in _STOPWORDS
+    )
+
+
+@dataclass(frozen=True)
+class Edge:
+    """One outgoing edge, with its condition text pre-tokenized."""
+    edge_id: str
+    destination: str
+    key: str  # "edges", "success_edge", "failed_edge", ...
+    tokens: frozenset
+
+
+class KeywordClassifier:
+    """
+    Deterministic edge classifier based on words in the caller's utterance.
+
+    Args:
+        rules: Optional {edge id or destination node id: [keywords]}; an
+            edge whose keyword appears in the utterance wins outright
+        min_overlap: Words an utterance must share with an edge's
+            transition condition for the fallback to take that edge
+    """
+
+    def __init__(self, rules: Optional[dict] = None, min_overlap: int = 1):
+        self.rules = {key: [keyword.lower() for keyword in keywords] for key, keywords in (rules or {}).items()}
+        self.min_overlap = min_overlap
+
+    def choose(self, node_id: str, edges: list, utterance: Optional[str]) -> Optional[Edge]:
+        if not edges:
+            return None
+        if utterance is None:
+            return edges[0]
+
+        text = utterance.lower()
+        for edge in edges:
+            for keyword in self.rules.get(edge.edge_id, ()) or self.rules.get(edge.destination, ()):
+                if keyword in text:
+                    return edge
+
+        words = _tokens(utterance)
+        best, best_score = None, self.min_overlap - 1
+        for edge in edges:
+            score = len(words & edge.tokens)
+            if score > best_score:
+                best, best_score = edge, score
+        return best
+
+
+class RecordedClassifier:
+    """
+    Replays recorded decisions: each step takes the edge to the next
+    recorded destination. Recorded paths cover every node type, so tool,
+    SMS and transfer stubs are bypassed.
+
+    Args:
+        destinations: Node ids in the order they were visited (after the start node)
+    """
+
+    def __init__(self, destinations: list):
+        self.destinations = list(destinations)
+        self.position = 0
+
+    @property
+    def done(self) -> bool:
+        return self.position >= len(self.destinations)
+
+    def choose(self, node_id: str, edges: list, utterance: Optional[str]) -> Optional[Edge]:
+        if self.done:
+            return None
+        wanted = self.destinations[self.position]
+        for edge in edges:
+            if edge.destination == wanted:
+                self.position += 1
+                return edge
+        return None
+
+
+class RandomClassifier:
+    """Seeded random edge choice, for coverage exploration."""
+
+    def __init__(self, seed: int = 0):
+        self.random = random.Random(seed)
+
+    def choose(self, node_id: str, edges: list, utterance: Optional[str]) -> Optional[Edge]:
+        return self.random.choice(edges) if edges else None
+
+
+@dataclass
+class Scenario:
+    """
+    A scripted caller.
+
+    Attributes:
+        name: Scenario name for reports
+        utterances: Caller turns, consumed one per conversation node visit
+        decisions: Recorded destination node ids; replayed with a
+            RecordedClassifier instead of matching utterances
+        tool_results: {tool_id: True/False} stubbed function node results (default success)
+        sms_ok: Whether SMS nodes succeed
+        transfer_ok: Whether transfers connect (ending the simulated call)
+        expect_end: Node id (or outcome) the call must finish on
+        expect_visits: Node ids the call must pass through
+    """
+    name: str = "scenario"
+    utterances: list = field(default_factory=list)
+    decisions: Optional[list] = None
+    tool_results: dict = field(default_factory=dict)
+    sms_ok: bool = True
+    transfer_ok: bool = True
+    expect_end: Optional[str] = None
+    expect_visits: list = field(default_factory=list)
+
+
+@dataclass
+class SimulationResult:
+    """One simulated call."""
+    scenario: str
+    path: list
+    outcome: str
+    edges: list = field(default_factory=list)  # (node_id, edge_id) taken
+    failures: list = field(default_factory=list)  # Unmet expectations
+
+    @property
+    def end_node(self) -> str:
+        return self.path[-1] if self.path else None
+
+    @property
+    def passed(self) -> bool:
+        return not self.failures
+
+
+@dataclass
+class SimulationReport:
+    """Aggregate statistics over many simulated calls."""
+    runs: int
+    elapsed_s: float
+    outcomes: Counter
+    end_nodes: Counter
+    visited_nodes: set
+    all_nodes: list
+    taken_edges: set
+    all_edges: set
+    path_lengths: list
+    failures: list  # (scenario name, message)
+
+    @property
+    def unvisited_nodes(self) -> list:
+        return [node_id for node_id in self.all_nodes if node_id not in self.visited_nodes]
+
+    @property
+    def node_coverage(self) -> float:
+        return len(self.visited_nodes) / len(self.all_nodes) if self.all_nodes else 0.0
+
+    @property
+    def edge_coverage(self) -> float:
+        return len(self.taken_edges) / len(self.all_edges) if self.all_edges else 0.0
+
+    def path_stats(self) -> dict:
+        """Path length (nodes visited) statistics."""
+        if not self.path_lengths:
+            return {"count": 0}
+        ordered = sorted(self.path_lengths)
+        return {
+            "count": len(ordered),
+            "min": ordered[0],
+            "mean": round(statistics.fmean(ordered), 2),
+            "p50": ordered[len(ordered) // 2],
+            "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            "max": ordered[-1],
+        }
+
+    def summary(self) -> str:
+        """Multi-line report for CLI output."""
+        rate = self.runs / self.elapsed_s if self.elapsed_s else 0
+        stats = self.path_stats()
+        lines = [
+            f"Runs:           {self.runs} in {self.elapsed_s:.2f}s ({rate:,.0f} runs/s)",
+            f"Outcomes:       {', '.join(f'{k} {v}' for k, v in self.outcomes.most_common())}",
+            f"End nodes:      {', '.join(f'{k} {v}' for k, v in self.end_nodes.most_common())}",
+            f"Node coverage:  {len(self.visited_nodes)}/{len(self.all_nodes)} ({self.node_coverage:.0%})",
+            f"Edge coverage:  {len(self.taken_edges)}/{len(self.all_edges)} ({self.edge_coverage:.0%})",
+        ]
+        if stats["count"]:
+            lines.append(f"Path length:    min {stats['min']}, mean {stats['mean']}, p50 {stats['p50']}, "
+                         f"p95 {stats['p95']}, max {stats['max']}")
+        if self.unvisited_nodes:
+            lines.append(f"Unvisited:      {', '.join(self.unvisited_nodes)}")
+        for name, message in self.failures:
+            lines.append(f"FAILED {name}: {message}")
+        return "\n".join(lines)
+
+
+class FlowSimulator:
+    """
+    Walks a conversation flow with scripted callers.
+
+    Args:
+        flow: Flow payload with `nodes` and `start_node_id`
+        classifier: Default classifier for scenarios without recorded decisions
+        max_steps: Node visits after which a call is cut off (catches loops)
+    """
+
+    def __init__(self, flow: dict, classifier=None, max_steps: int = 60):
+        graph = FlowGraph(flow.get("nodes") or [], flow.get("start_node_id"))
+        self.start_node_id = graph.start_node_id
+        self.classifier = classifier or KeywordClassifier()
+        self._stub = KeywordClassifier()  # Matches stubbed tool results to function node edges
+        self.max_steps = max_steps
+        self.node_ids = list(graph.nodes)
+        self.types = {node_id: node.get("type") for node_id, node in graph.nodes.items()}
+
+        # Index edges once: node id -> edge key -> [Edge]
+        self.edges: dict = {}
+        for node_id, node in graph.nodes.items():
+            by_key: dict = {}
+            for key in ("edges", "edge", "success_edge", "failed_edge", "else_edge", "skip_response_edge"):
+                raw = node.get(key)
+                for edge in (raw if isinstance(raw, list) else [raw] if raw else []):
+                    dest = edge.get("destination_node_id")
+                    if dest not in graph.nodes:
+                        continue
+                    condition = edge.get("transition_condition") or {}
+                    text = f"{edge.get('description', '')} {condition.get('prompt', '')}"
+                    by_key.setdefault(key, []).append(
+                        Edge(edge.get("id") or key, dest, key, _tokens(text))
+                    )
+            self.edges[node_id] = by_key
+        self.tool_ids = {node_id: node.get("tool_id") for node_id, node in graph.nodes.items()}
+        self.all_edges = {(node_id, edge.edge_id) for node_id, by_key in self.edges.items()
+                          for edges in by_key.values() for edge in edges}
+
+    def _step(self, node_id: str, scenario: Scenario, classifier, script: list) -> tuple:
+        """Pick the edge out of a node: (edge or None to stay put, outcome if the call is over)."""
+        node_type = self.types[node_id]
+        edges = self.edges[node_id]
+        if node_type == "end":
+            return None, OUTCOME_END
+
+        candidates = [edge for group in edges.values() for edge in group]
+        if isinstance(classifier, RecordedClassifier):
+            chosen = classifier.choose(node_id, candidates, None)
+            if chosen:
+                return chosen, None
+            if node_type == "transfer_call" and scenario.transfer_ok:
+                return None, OUTCOME_TRANSFERRED
+            return None, OUTCOME_HANGUP if classifier.done else OUTCOME_STUCK
+
+        if node_type == "sms":
+            key = "success_edge" if scenario.sms_ok else "failed_edge"
+            chosen = (edges.get(key) or edges.get("edges") or [None])[0]
+        elif node_type == "transfer_call":
+            if scenario.transfer_ok:
+                return None, OUTCOME_TRANSFERRED
+            chosen = (edges.get("edge") or edges.get("edges") or [None])[0]
+        elif node_type == "function":
+            ok = scenario.tool_results.get(self.tool_ids[node_id], True)
+            chosen = self._stub.choose(node_id, candidates, TOOL_SUCCESS if ok else TOOL_FAILURE)
+            chosen = chosen or (candidates[0] if candidates else None)
+        elif node_type != "conversation":
+            # Extraction and other automatic nodes move on without a caller turn
+            chosen = classifier.choose(node_id, candidates, None)
+        elif not script:
+            return None, OUTCOME_HANGUP
+        else:
+            # No matching edge means the agent keeps talking in this node
+            return classifier.choose(node_id, candidates, script.pop()), None
+
+        return chosen, None if chosen else OUTCOME_STUCK
+
+    def run(self, scenario: Scenario, classifier=None) -> SimulationResult:
+        """Simulate one call."""
+        if scenario.decisions is not None:
+            classifier = RecordedClassifier(scenario.decisions)
+        classifier = classifier or self.classifier
+        script = list(reversed(scenario.utterances))
+
+        node_id = self.start_node_id
+        path, taken = [node_id], []
+        outcome = OUTCOME_MAX_STEPS
+        for _ in range(self.max_steps):
+            edge, finished = self._step(node_id, scenario, classifier, script)
+            if finished:
+                outcome = finished
+                break
+            if edge is None:
+                continue
+            taken.append((node_id, edge.edge_id))
+            node_id = edge.destination
+            path.append(node_id)
+
+        result = SimulationResult(scenario.name, path, outcome, taken)
+        if scenario.expect_end and scenario.expect_end not in (result.end_node, outcome):
+            result.failures.append(f"ended at {result.end_node} ({outcome}), expected {scenario.expect_end}")
+        visited = set(path)
+        for node_id in scenario.expect_visits:
+            if node_id not in visited:
+                result.failures.append(f"never reached {node_id}")
+        if isinstance(classifier, RecordedClassifier) and not classifier.done:
+            result.failures.append(
+                f"recorded path diverged at {path[-1]} -> {classifier.destinations[classifier.position]}"
+            )
+        return result
+
+    def run_many(self, scenarios: list, random_walks: int = 0, seed: int = 0) -> SimulationReport:
+        """
+        Simulate scripted scenarios plus optional seeded random walks.
+
+        Args:
+            scenarios: Scenarios to run
+            random_walks: Additional calls driven by a RandomClassifier
+            seed: Seed for the random walks
+
+        Returns:
+            SimulationReport with coverage and path statistics
+        """
+        started = time.perf_counter()
+        results = [self.run(scenario) for scenario in scenarios]
+        if random_walks:
+            walker = RandomClassifier(seed)
+            walk = Scenario(name="random", utterances=[""] * self.max_steps)
+            for _ in range(random_walks):
+                walk.tool_results = {}
+                walk.sms_ok = walker.random.random() > 0.1
+                walk.transfer_ok = walker.random.random() > 0.3
+                for tool_id in self.tool_ids.values():
+                    if tool_id:
+                        walk.tool_results[tool_id] = walker.random.random() > 0.2
+                results.append(self.run(walk, walker))
+        elapsed = time.perf_counter() - started
+
+        report = SimulationReport(
+            runs=len(results),
+            elapsed_s=elapsed,
+            outcomes=Counter(),
+            end_nodes=Counter(),
+            visited_nodes=set(),
+            all_nodes=self.node_ids,
+            taken_edges=set(),
+            all_edges=self.all_edges,
+            path_lengths=[],
+            failures=[],
+        )
+        for result in results:
+            report.outcomes[result.outcome] += 1
+            report.end_nodes[result.end_node] += 1
+            report.visited_nodes.update(result.path)
+            report.taken_edges.update(result.edges)
+            report.path_lengths.append(len(result.path))
+            report.failures.extend((result.scenario, message) for message in result.failures)
+        return report
+
+
+def load_scenarios(path: str) -> list:
+    """Load scenarios from a JSON file holding a list of Scenario fields."""
+    with open(path, 'r') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("scenarios", [])
+    return [Scenario(**item) for item in data]
@@ -0,0 +1,274 @@
+"""
+Precompiled templates for conversation flow rendering.
+
+The builders' _build_nodes methods rebuild a large nested literal with
+f-strings for every tenant, even though only a handful of values (company
+name, services list, owner name, ...) differ between tenants. This module
+renders the builder once with marker values in those slots, compiles the
+result into a template, and renders each tenant by filling in the slots:
+
+- strings containing slots are split once into literal text and slots
+- dicts/lists containing slots are rebuilt by one generated function,
+  which references their static children instead of rebuilding them
+- subtrees without slots are shared between every rendered tenant
+
+Rendered payloads therefore share most of their memory and must be treated
+as read-only (which is how they are used: serialized and sent to Retell).
+
+The first render for each template is checked against a direct build, so a
+builder change that can't be templated (e.g. a slot value that is
+transformed instead of interpolated) falls back to direct building instead
+of sending a wrong flow.
+
+Templates are keyed by the config fields that change the tree's structure
+(each builder lists them explicitly), not by every non-slot field, so
+tenants that only differ in fields the section never reads (URLs, voice,
+...) share one template. At most `max_templates` are kept (LRU).
+
+The global prompts are single f-strings, which Python already renders as
+fast as a template could, so they are still built directly.
+
+Run `python flow_templates.py` for a 1k tenant micro-benchmark.
+"""
+
+import dataclasses
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+# Slot markers can't appear in real config values or prompt text
+_MARKER = "\x00"
+_SLOT_PATTERN = re.compile("\x00([A-Za-z_][A-Za-z0-9_]*)\x00")
+
+DEFAULT_MAX_TEMPLATES = 64
+
+
+def slot(name: str) -> str:
+    """Marker string for a named slot."""
+    return f"{_MARKER}{name}{_MARKER}"
+
+
+def marker_config(config, slot_fields: tuple):
+    """Copy of a config dataclass with every slot field replaced by its marker."""
+    overrides = {}
+    for name in slot_fields:
+        value = getattr(config, name)
+        overrides[name] = [slot(name)] if isinstance(value, list) else slot(name)
+    return dataclasses.replace(config, **overrides)
+
+
+def _compile(node, slots: set, consts: list) -> str:
+    """
+    Compile a tree into a Python expression over the slot values dict `v`.
+
+    Static subtrees become references into `consts` (shared, never copied);
+    dynamic dicts/lists become literals so rendering runs as fast as the
+    original f-string code, without rebuilding the static parts.
+    """
+    if isinstance(node, str) and _MARKER in node:
+        # Alternating literal text / slot names, joined like an f-string would
+        parts = _SLOT_PATTERN.split(node)
+        exprs = []
+        for i, part in enumerate(parts):
+            if i % 2:
+                slots.add(part)
+                exprs.append(f"v[{part!r}]")
+            elif part:
+                exprs.append(_const(part, consts))
+        return f"''.join(({', '.join(exprs)},))"
+
+    if isinstance(node, dict):
+        items = [(key, _compile(value, slots, consts)) for key, value in node.items()]
+        if any(expr is not None for _, expr in items):
+            return "{" + ", ".join(
+                f"{_const(key, consts)}: {expr if expr is not None else _const(node[key], consts)}"
+                for key, expr in items
+            ) + "}"
+        return None
+
+    if isinstance(node, list):
+        items = [_compile(value, slots, consts) for value in node]
+        if any(expr is not None for expr in items):
+            return "[" + ", ".join(
+                expr if expr is not None else _const(value, consts)
+                for value, expr in zip(node, items)
+            ) + "]"
+        return None
+
+    return None
+
+
+def _const(value, consts: list) -> str:
+    consts.append(value)
+    return f"_c[{len(consts) - 1}]"
+
+
+class FlowTemplate:
+    """A compiled flow tree (nodes list, prompt string, ...) with named slots."""
+
+    def __init__(self, tree):
+        self.slots: set = set()
+        consts: list = []
+        expr = _compile(tree, self.slots, consts)
+        if expr is None:
+            self._render = lambda values: tree
+        else:
+            self._render = eval(f"lambda v: {expr}", {"_c": consts})
+
+    def render(self, values: dict):
+        """Render with slot values; missing slots raise KeyError."""
+        return self._render(values)
+
+
+class CompiledSection:
+    """
+    Template-backed version of one builder function.
+
+    Args:
+        build: config -> tree (the builder's original literal-building function)
+        slot_values: config -> dict of slot values, using the same derivations
+            (joins, fallbacks) that `build` applies to those fields
+        slot_fields: Config fields that are substituted rather than baked in
+        shape_fields: Other config fields `build` reads (business type, ...);
+            one template is compiled per combination of their values
+        max_templates: Templates kept before the least recently used is dropped
+
+    Every config field `build` reads must be a slot or shape field: two
+    configs with the same shape render from the same template.
+    """
+
+    def __init__(
+        self,
+        build: Callable,
+        slot_values: Callable,
+        slot_fields: tuple,
+        shape_fields: tuple = (),
+        max_templates: int = DEFAULT_MAX_TEMPLATES,
+    ):
+        self.build = build
+        self.slot_values = slot_values
+        self.slot_fields = tuple(slot_fields)
+        self.shape_fields = tuple(shape_fields)
+        self.max_templates = max_templates
+        self._templates: OrderedDict = OrderedDict()  # shape -> FlowTemplate, or None if not templatable
+        self._lock = threading.Lock()
+
+    def _shape(self, config) -> tuple:
+        shape = tuple(getattr(config, name) for name in self.shape_fields)
+        try:
+            hash(shape)
+        except TypeError:
+            shape = repr(shape)  # Unhashable (list) shape field
+        return shape
+
+    def render(self, config):
+        shape = self._shape(config)
+        with self._lock:
+            compiled = shape in self._templates
+            if compiled:
+                self._templates.move_to_end(shape)
+                template = self._templates[shape]
+        if not compiled:
+            return self._compile_and_render(shape, config)
+
+        if template is None:
+            return self.build(config)
+        return template.render(self.slot_values(config))
+
+    def _compile_and_render(self, shape: tuple, config):
+        expected = self.build(config)
+        template = FlowTemplate(self.build(marker_config(config, self.slot_fields)))
+
+        try:
+            ok = template.render(self.slot_values(config)) == expected
+        except KeyError:
+            ok = False
+        if not ok:
+            name = getattr(self.build, "__qualname__", repr(self.build))
+            print(f"Warning: {name} can't be templated, falling back to direct rendering")
+            template = None
+
+        with self._lock:
+            self._templates[shape] = template
+            while len(self._templates) > self.max_templates:
+                self._templates.popitem(last=False)
+        return expected
+
+
+def _benchmark(tenants: int = 1000):
+    """
+    Compare direct vs templated rendering of the inbound and outbound nodes.
+
+    Tenants also differ in fields the nodes don't read (URLs, voice), which
+    must not cost a template each.
+    """
+    import time
+    import tracemalloc
+
+    from greenline_agent import GreenLineAgentBuilder, GreenLineConfig
+    from outbound_agent import GreenLineOutboundAgentBuilder, GreenLineOutboundConfig
+
+    inbound = GreenLineAgentBuilder.__new__(GreenLineAgentBuilder)
+    outbound = GreenLineOutboundAgentBuilder.__new__(GreenLineOutboundAgentBuilder)
+
+    inbound_configs = [
+        GreenLineConfig(
+            company_name=f"Tenant {i} Landscaping",
+            business_type="landscaping",
+            phone_number=f"+1619555{i:04d}",
+            services=["Lawn Care", "Tree Trimming", f"Service {i}"],
+            service_areas=["San Diego", f"Area {i}"],
+            owner_name=f"Owner {i}",
+            webhook_url=f"https://tenant-{i}.example.com/webhook",
+            calendly_url=f"https://calendly.com/tenant-{i}/estimate",
+            transfer_number=f"+1858555{i:04d}",
+            voice_id=("11labs-Adrian", "11labs-Myra")[i % 2],
+        )
+        for i in range(tenants)
+    ]
+    outbound_configs = [
+        GreenLineOutboundConfig(
+            agent_name=f"Agent {i}",
+            base_price=f"${100 + i}",
+            cal_event_type_id=str(i),
+            webhook_url=f"https://tenant-{i}.example.com/webhook",
+        )
+        for i in range(tenants)
+    ]
+
+    cases = [
+        ("inbound nodes", inbound._build_nodes, inbound._render_nodes, inbound_configs),
+        ("outbound nodes", outbound._build_nodes, outbound._render_nodes, outbound_configs),
+    ]
+
+    print(f"Rendering {tenants} tenants\n")
+    print(f"{'Section':<16} {'Direct':>10} {'Template':>10} {'Speedup':>8} {'Direct KB/t':>12} {'Tmpl KB/t':>10} "
+          f"{'Templates':>10}")
+    for name, direct, templated, configs in cases:
+        templated(configs[0])  # Compile outside the timed loop
+
+        results = {}
+        for label, func in (("direct", direct), ("template", templated)):
+            started = time.perf_counter()
+            for config in configs:
+                func(config)
+            elapsed = time.perf_counter() - started
+
+            # Memory retained when keeping every tenant's render around
+            tracemalloc.start()
+            rendered = [func(config) for config in configs]
+            retained, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del rendered
+
+            results[label] = (elapsed, retained / len(configs) / 1024)
+
+        (direct_s, direct_kb), (tmpl_s, tmpl_kb) = results["direct"], results["template"]
+        compiled = len(templated.__self__._node_template()._templates)
+        print(f"{name:<16} {direct_s * 1000:>8.1f}ms {tmpl_s * 1000:>8.1f}ms "
+              f"{direct_s / tmpl_s:>7.1f}x {direct_kb:>12.1f} {tmpl_kb:>10.1f} {compiled:>10}")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -1,10 +1,18 @@
 import os
 import re
+import asyncio
 from pathlib import Path
 from typing import Optional
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from retell import Retell
 
+from async_clients import AsyncClientPool
+from flow_cache import FlowCache, api_key_namespace, payload_hash
+from flow_diff import diff_flow, matches, to_plain
+from flow_definitions import load_definition, write_definition
+from flow_graph import validate_flow
+from flow_templates import CompiledSection, marker_config, slot
+
 # Load environment variables from .env file
 try:
     from dotenv import load_dotenv
@@ -146,6 +154,36 @@ except ImportError:
 # Default webhook URL for GreenLine AI CRM integration
 DEFAULT_WEBHOOK_URL = "https://www.greenline-ai.com/api/inbound/webhook"
 
+# Services described in the global prompt when a config lists none
+BUSINESS_CONTEXT = {
+    "landscaping": "lawn care, landscaping design, tree trimming, irrigation systems, and seasonal maintenance",
+    "hvac": "heating, ventilation, air conditioning installation, repair, and maintenance"
+}
+
+# GreenLineConfig fields substituted into the precompiled node/prompt templates
+TEMPLATE_SLOT_FIELDS = (
+    "company_name",
+    "phone_number",
+    "business_hours",
+    "services",
+    "service_areas",
+    "transfer_number",
+    "owner_name",
+    "emergency_availability",
+)
+
+# Other GreenLineConfig fields _build_nodes reads; each combination gets its own
+# node template. None today: business type, URLs, voice and model only affect
+# the prompt, tools and agent settings
+NODE_SHAPE_FIELDS = ()
+
+
+def _supabase_settings(supabase_url: str = None, supabase_key: str = None) -> tuple:
+    """Supabase URL and key from the arguments, falling back to the environment."""
+    url = supabase_url or os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
+    key = supabase_key or os.environ.get("SUPABASE_SERVICE_ROLE_KEY") or os.environ.get("NEXT_PUBLIC_SUPABASE_ANON_KEY")
+    return url, key
+
 
 @dataclass
 class GreenLineConfig:
@@ -171,14 +209,29 @@ class GreenLineAgentBuilder:
     programmatically for GreenLine AI clients.
     """
 
-    def __init__(self, api_key: str, supabase_url: str = None, supabase_key: str = None):
-        self.client = Retell(api_key=api_key)
+    def __init__(
+        self,
+        api_key: str,
+        supabase_url: str = None,
+        supabase_key: str = None,
+        flow_cache: FlowCache = None,
+        flow_definition: str = None,
+        max_retries: int = None
+    ):
+        # max_retries overrides the SDK's own retries (e.g. 0 when the caller retries)
+        self.client = Retell(api_key=api_key) if max_retries is None else Retell(api_key=api_key, max_retries=max_retries)
+
+        # Optional content-addressed cache to reuse identical flows
+        self.flow_cache = flow_cache
+        self._cache_namespace = api_key_namespace(api_key)
+
+        # Optional flow definition file (name or path) replacing the built-in nodes and prompt
+        self.flow_definition = flow_definition
 
         # Initialize Supabase client for CRM integration
         self.supabase: Optional[Client] = None
         if SUPABASE_AVAILABLE:
-            sb_url = supabase_url or os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
-            sb_key = supabase_key or os.environ.get("SUPABASE_SERVICE_ROLE_KEY") or os.environ.get("NEXT_PUBLIC_SUPABASE_ANON_KEY")
+            sb_url, sb_key = _supabase_settings(supabase_url, supabase_key)
             if sb_url and sb_key:
                 self.supabase = create_client(sb_url, sb_key)
                 print("Supabase client initialized for CRM integration")
@@ -194,6 +247,135 @@ class GreenLineAgentBuilder:
         Returns:
             dict with conversation_flow_id, agent_id, and onboarding_updated status
         """
+        self.prepare_config(config)
+
+        # Step 1: Create the conversation flow
+        conversation_flow = self.create_conversation_flow(config)
+        flow_id = conversation_flow.conversation_flow_id
+        print(f"Created conversation flow: {flow_id}")
+
+        # Step 2: Create the agent and attach the flow
+        agent = self.create_voice_agent(config, flow_id)
+        agent_id = agent.agent_id
+        print(f"Created voice agent: {agent_id}")
+
+        # Step 3: Link agent to business_onboarding for CRM integration
+        onboarding_updated = False
+        if onboarding_id:
+            onboarding_updated = self.link_agent_to_onboarding(
+                onboarding_id=onboarding_id,
+                agent_id=agent_id,
+                flow_id=flow_id
+            )
+
+        return self._agent_result(config, flow_id, agent_id, onboarding_updated)
+
+    def _agent_result(self, config: GreenLineConfig, flow_id: str, agent_id: str, onboarding_updated: bool) -> dict:
+        """The create_agent return value (shared by the sync and async builders)."""
+        return {
+            "conversation_flow_id": flow_id,
+            "agent_id": agent_id,
+            "config": config,
+            "onboarding_updated": onboarding_updated
+        }
+
+    def update_agent(self, agent_id: str, config: GreenLineConfig, dry_run: bool = False) -> dict:
+        """
+        Bring an existing agent's conversation flow up to date with a config.
+
+        Fetches the agent's current flow, diffs nodes, edges, tools, the
+        global prompt and flow settings against a freshly rendered payload,
+        and sends only the changed fields through conversation_flow.update.
+        Agent settings (name, voice, webhook) are patched the same way.
+
+        If another agent uses the same flow (tenants reusing a flow through
+        the flow cache), a separate flow is created for this agent instead of
+        patching it in place, so other tenants are not changed by accident.
+
+        Args:
+            agent_id: Retell agent ID to update
+            config: GreenLineConfig with the desired business details
+            dry_run: Only compute the diff, don't send any updates
+
+        Returns:
+            dict with agent_id, conversation_flow_id, the FlowDiff, the agent
+            fields that changed, and whether anything was updated
+        """
+        self.prepare_config(config)
+
+        agent = self.client.agent.retrieve(agent_id)
+        engine = to_plain(agent.response_engine) or {}
+        flow_id = engine.get("conversation_flow_id")
+        if engine.get("type") != "conversation-flow" or not flow_id:
+            raise ValueError(f"Agent {agent_id} is not backed by a conversation flow")
+
+        current = to_plain(self.client.conversation_flow.retrieve(flow_id))
+        desired = self._build_flow_params(config)
+        diff = diff_flow(current, desired)
+
+        agent_changes = {
+            key: value
+            for key, value in self._build_agent_params(config, flow_id).items()
+            if key != "response_engine" and not matches(getattr(agent, key, None), value)
+        }
+
+        updated = False
+        if not dry_run and diff.has_changes:
+            if self._flow_is_shared(flow_id, agent_id):
+                flow_id = self.create_conversation_flow(config).conversation_flow_id
+                agent_changes["response_engine"] = {
+                    "type": "conversation-flow",
+                    "conversation_flow_id": flow_id
+                }
+                print(f"Flow was shared with other agents - moved {agent_id} to flow {flow_id}")
+            else:
+                self.client.conversation_flow.update(flow_id, **diff.update_params(desired))
+                if self.flow_cache is not None:
+                    # The old payload hash no longer describes this flow
+                    self.flow_cache.discard_flow(flow_id)
+                    self.flow_cache.store(self._cache_namespace, payload_hash(desired), flow_id)
+                print(f"Updated conversation flow: {flow_id}")
+            updated = True
+
+        if not dry_run and agent_changes:
+            self.client.agent.update(agent_id, **agent_changes)
+            print(f"Updated voice agent: {agent_id} ({', '.join(agent_changes)})")
+            updated = True
+
+        return {
+            "agent_id": agent_id,
+            "conversation_flow_id": flow_id,
+            "diff": diff,
+            "agent_changes": sorted(agent_changes),
+            "updated": updated
+        }
+
+    def _flow_is_shared(self, flow_id: str, agent_id: str) -> bool:
+        """
+        Whether another agent uses the same flow.
+
+        Always asks Retell: flows are shared through the flow cache, but the
+        cache may be off for this run (or another machine's cache shared it).
+        """
+        for other in self.client.agent.list():
+            engine = to_plain(other.response_engine) or {}
+            if other.agent_id != agent_id and engine.get("conversation_flow_id") == flow_id:
+                return True
+        return False
+
+    def prepare_config(self, config: GreenLineConfig) -> GreenLineConfig:
+        """
+        Sanitize the company name and normalize phone numbers in place.
+
+        Called by create_agent before anything is sent to Retell, and by the
+        batch provisioner which runs the create steps individually.
+
+        Args:
+            config: GreenLineConfig with business details
+
+        Returns:
+            The same config, cleaned up
+        """
         # Sanitize company name (removes accidental greeting phrases)
         config.company_name = sanitize_company_name(config.company_name)
 
@@ -223,31 +405,7 @@ class GreenLineAgentBuilder:
         if config.transfer_number and transfer_valid:
             print(f"✓ Transfer number formatted: {config.transfer_number}")
 
-        # Step 1: Create the conversation flow
-        conversation_flow = self._create_conversation_flow(config)
-        flow_id = conversation_flow.conversation_flow_id
-        print(f"Created conversation flow: {flow_id}")
-
-        # Step 2: Create the agent and attach the flow
-        agent = self._create_voice_agent(config, flow_id)
-        agent_id = agent.agent_id
-        print(f"Created voice agent: {agent_id}")
-
-        # Step 3: Link agent to business_onboarding for CRM integration
-        onboarding_updated = False
-        if onboarding_id:
-            onboarding_updated = self.link_agent_to_onboarding(
-                onboarding_id=onboarding_id,
-                agent_id=agent_id,
-                flow_id=flow_id
-            )
-
-        return {
-            "conversation_flow_id": flow_id,
-            "agent_id": agent_id,
-            "config": config,
-            "onboarding_updated": onboarding_updated
-        }
+        return config
 
     def link_agent_to_onboarding(
         self,
@@ -279,29 +437,63 @@ class GreenLineAgentBuilder:
             return False
 
         try:
-            update_data = {
-                "retell_agent_id": agent_id,
-                "status": "agent_created",
-            }
+            result = self._link_query(self.supabase, onboarding_id, agent_id, phone_number).execute()
+            return self._link_result(result, onboarding_id, agent_id)
+        except Exception as e:
+            print(f"Error linking agent to onboarding: {e}")
+            return False
 
-            if phone_number:
-                update_data["retell_phone_number"] = phone_number
+    def _link_query(self, supabase, onboarding_id: str, agent_id: str, phone_number: str = None):
+        """The business_onboarding update behind link_agent_to_onboarding, not yet executed."""
+        update_data = {
+            "retell_agent_id": agent_id,
+            "status": "agent_created",
+        }
 
-            result = self.supabase.table("business_onboarding").update(
-                update_data
-            ).eq("id", onboarding_id).execute()
+        if phone_number:
+            update_data["retell_phone_number"] = phone_number
 
-            if result.data:
-                print(f"Linked agent {agent_id} to onboarding {onboarding_id}")
-                print("CRM integration active: leads will be created from inbound calls")
-                return True
-            else:
-                print(f"Warning: No onboarding record found with id {onboarding_id}")
-                return False
+        return supabase.table("business_onboarding").update(update_data).eq("id", onboarding_id)
 
-        except Exception as e:
-            print(f"Error linking agent to onboarding: {e}")
-            return False
+    def _link_result(self, result, onboarding_id: str, agent_id: str) -> bool:
+        """Whether the link update matched the onboarding record."""
+        if result.data:
+            print(f"Linked agent {agent_id} to onboarding {onboarding_id}")
+            print("CRM integration active: leads will be created from inbound calls")
+            return True
+
+        print(f"Warning: No onboarding record found with id {onboarding_id}")
+        return False
+
+    def fetch_onboarding(self, onboarding_id: str) -> dict:
+        """
+        Fetch a business_onboarding record from Supabase.
+
+        Args:
+            onboarding_id: UUID of the business_onboarding record
+
+        Returns:
+            The onboarding row as a dict
+
+        Raises:
+            ValueError: If Supabase is not configured or the record does not exist
+        """
+        if not self.supabase:
+            raise ValueError("Supabase not configured. Set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY")
+
+        result = self._fetch_query(self.supabase, onboarding_id).execute()
+        return self._fetch_result(result, onboarding_id)
+
+    def _fetch_query(self, supabase, onboarding_id: str):
+        """The business_onboarding select behind fetch_onboarding, not yet executed."""
+        return supabase.table("business_onboarding").select("*").eq("id", onboarding_id).single()
+
+    def _fetch_result(self, result, onboarding_id: str) -> dict:
+        """The fetched onboarding row; raises ValueError if there is none."""
+        if not result.data:
+            raise ValueError(f"No onboarding record found with id {onboarding_id}")
+
+        return result.data
 
     def activate_onboarding(self, onboarding_id: str) -> bool:
         """
@@ -318,42 +510,111 @@ class GreenLineAgentBuilder:
             return False
 
         try:
-            result = self.supabase.table("business_onboarding").update({
-                "status": "active"
-            }).eq("id", onboarding_id).execute()
-
-            if result.data:
-                print(f"Onboarding {onboarding_id} is now active")
-                return True
-            return False
-
+            result = self._activate_query(self.supabase, onboarding_id).execute()
+            return self._activate_result(result, onboarding_id)
         except Exception as e:
             print(f"Error activating onboarding: {e}")
             return False
 
-    def _create_conversation_flow(self, config: GreenLineConfig):
-        """Create the conversation flow with all nodes and transitions."""
+    def _activate_query(self, supabase, onboarding_id: str):
+        """The business_onboarding update behind activate_onboarding, not yet executed."""
+        return supabase.table("business_onboarding").update({"status": "active"}).eq("id", onboarding_id)
+
+    def _activate_result(self, result, onboarding_id: str) -> bool:
+        """Whether the activate update matched the onboarding record."""
+        if result.data:
+            print(f"Onboarding {onboarding_id} is now active")
+            return True
+        return False
+
+    def create_conversation_flow(self, config: GreenLineConfig):
+        """
+        Create the conversation flow with all nodes and transitions.
+
+        Step 1 of create_agent; callers that run and retry the steps
+        themselves (batch_provisioner.py) call it directly after prepare_config.
+
+        If a flow cache is configured and an identical payload was already
+        created in this workspace, the existing flow is returned instead.
+        """
+        params = self._build_flow_params(config)
+        if self.flow_cache is None:
+            return self.client.conversation_flow.create(**params)
+        return self.flow_cache.get_or_create(self.client, self._cache_namespace, params)
 
-        # Build the nodes
-        nodes = self._build_nodes(config)
+    def _build_flow_params(self, config: GreenLineConfig) -> dict:
+        """
+        Build the conversation_flow.create payload (shared by the sync and async builders).
+
+        Raises:
+            FlowValidationError: If the flow graph has structural errors (see flow_graph.py)
+        """
 
         # Build custom tools for Cal.com calendar integration
         tools = self._build_calendar_tools(config)
 
-        # Create the flow with tools
-        return self.client.conversation_flow.create(
-            model_choice={
+        params = {
+            "model_choice": {
                 "type": "cascading",
                 "model": config.model
             },
-            nodes=nodes,
-            tools=tools,
-            start_speaker="agent",
-            global_prompt=self._build_global_prompt(config),
-            start_node_id="greeting",
-            model_temperature=0.3
+            "tools": tools,
+            "start_speaker": "agent",
+            "start_node_id": "greeting",
+            "model_temperature": 0.3
+        }
+
+        if self.flow_definition:
+            # Nodes and prompt come from a flow definition file (see flow_definitions.py)
+            params.update(load_definition(self.flow_definition).render(self._definition_slots(config)))
+        else:
+            # Render the nodes from the precompiled template
+            params["nodes"] = self._render_nodes(config)
+            params["global_prompt"] = self._build_global_prompt(config)
+
+        # Refuse to deploy flows with dangling edges, unreachable nodes or dead ends
+        validate_flow(params)
+        return params
+
+    def _definition_slots(self, config: GreenLineConfig) -> dict:
+        """Slot values for flow definition files ('prompt_services' has the prompt's own fallback)."""
+        slots = self._node_slots(config)
+        slots["prompt_services"] = self._prompt_slots(config)["services"]
+        return slots
+
+    def export_flow_definition(self, path: str, version: int = 1) -> dict:
+        """
+        Write the built-in nodes and global prompt as a flow definition file.
+
+        Args:
+            path: Output .json (or .yaml) path
+            version: Definition version to record
+
+        Returns:
+            The exported flow fields (with slot markers)
+        """
+        sample = GreenLineConfig(company_name="Sample Co", business_type="other", phone_number="+15550000000")
+        markers = marker_config(sample, TEMPLATE_SLOT_FIELDS)
+        flow = {
+            "global_prompt": self._build_global_prompt(
+                replace(markers, services=[slot("prompt_services")])
+            ),
+            "nodes": self._build_nodes(markers),
+            "start_node_id": "greeting",
+            "start_speaker": "agent",
+            "model_temperature": 0.3,
+        }
+        write_definition(
+            path, "inbound_receptionist", flow, TEMPLATE_SLOT_FIELDS + ("prompt_services",),
+            version=version, description="Inbound receptionist for home service businesses (GreenLineAgentBuilder)",
         )
 
+        # Make sure the file renders exactly what the builder would
+        rendered = load_definition(path).render(self._definition_slots(sample))
+        if rendered["nodes"] != self._build_nodes(sample) or rendered["global_prompt"] != self._build_global_prompt(sample):
+            raise ValueError(f"{path} does not reproduce the built-in flow")
+        return flow
+
     def _build_calendar_tools(self, config: GreenLineConfig) -> list:
         """
         Build custom tools for Cal.com calendar integration.
@@ -424,17 +685,52 @@ class GreenLineAgentBuilder:
             }
         ]
 
-    def _build_global_prompt(self, config: GreenLineConfig) -> str:
-        """Build the global system prompt for the agent."""
+    def _node_slots(self, config: GreenLineConfig) -> dict:
+        """
+        Per-tenant values interpolated into the nodes.
 
-        business_context = {
-            "landscaping": "lawn care, landscaping design, tree trimming, irrigation systems, and seasonal maintenance",
-            "hvac": "heating, ventilation, air conditioning installation, repair, and maintenance"
+        _build_nodes reads these instead of the raw config fields so the
+        precompiled node template (see flow_templates.py) fills its slots with
+        exactly the same joins and fallbacks.
+        """
+        return {
+            "company_name": config.company_name,
+            "phone_number": config.phone_number,
+            "business_hours": config.business_hours,
+            "services": ", ".join(config.services) if config.services else "various services",
+            "service_areas": ", ".join(config.service_areas) if config.service_areas else "the local area",
+            "transfer_number": config.transfer_number if config.transfer_number else "+15551234567",
+            "owner_name": config.owner_name or "the owner",
+            "emergency_availability": config.emergency_availability,
         }
 
-        services_list = ", ".join(config.services) if config.services else business_context.get(config.business_type, "various services")
-        areas_list = ", ".join(config.service_areas) if config.service_areas else "the local area"
-        owner_name = config.owner_name or "the owner"
+    def _prompt_slots(self, config: GreenLineConfig) -> dict:
+        """Per-tenant values interpolated into the global prompt."""
+        slots = self._node_slots(config)
+        if not config.services:
+            slots["services"] = BUSINESS_CONTEXT.get(config.business_type, "various services")
+        return slots
+
+    def _node_template(self) -> CompiledSection:
+        """Precompiled node template, shared by all instances of the class."""
+        cls = type(self)
+        if "_nodes_template" not in cls.__dict__:
+            cls._nodes_template = CompiledSection(
+                self._build_nodes, self._node_slots, TEMPLATE_SLOT_FIELDS, shape_fields=NODE_SHAPE_FIELDS
+            )
+        return cls._nodes_template
+
+    def _render_nodes(self, config: GreenLineConfig) -> list:
+        """Render the nodes from the precompiled template (read-only result)."""
+        return self._node_template().render(config)
+
+    def _build_global_prompt(self, config: GreenLineConfig) -> str:
+        """Build the global system prompt for the agent."""
+
+        slots = self._prompt_slots(config)
+        services_list = slots["services"]
+        areas_list = slots["service_areas"]
+        owner_name = slots["owner_name"]
 
         return f"""You are a professional and friendly AI assistant answering calls for {config.company_name}. Your job is to provide excellent customer service, answer questions, book appointments, and ensure callers feel taken care of.
 
@@ -514,9 +810,10 @@ Always read back the information to confirm accuracy.
     def _build_nodes(self, config: GreenLineConfig) -> list:
         """Build all conversation flow nodes matching RETELL-INCOMING-FLOW.md"""
 
-        services_list = ", ".join(config.services) if config.services else "various services"
-        areas_list = ", ".join(config.service_areas) if config.service_areas else "the local area"
-        owner_name = config.owner_name or "the owner"
+        slots = self._node_slots(config)
+        services_list = slots["services"]
+        areas_list = slots["service_areas"]
+        owner_name = slots["owner_name"]
 
         nodes = [
             # ============ NODE 1: GREETING ============
@@ -1314,7 +1611,7 @@ or would you prefer a callback when {owner_name} is available?"""
                 "name": "Node 8a: Transfer to Owner",
                 "transfer_destination": {
                     "type": "predefined",
-                    "number": config.transfer_number if config.transfer_number else "+15551234567",
+                    "number": slots["transfer_number"],
                     "ignore_e164_validation": False
                 },
                 "transfer_option": {
@@ -1558,8 +1855,12 @@ Thanks for calling {config.company_name}, and have a wonderful day!"""
 
         return nodes
 
-    def _create_voice_agent(self, config: GreenLineConfig, flow_id: str):
-        """Create the voice agent and attach the conversation flow."""
+    def create_voice_agent(self, config: GreenLineConfig, flow_id: str):
+        """Create the voice agent and attach the conversation flow (step 2 of create_agent)."""
+        return self.client.agent.create(**self._build_agent_params(config, flow_id))
+
+    def _build_agent_params(self, config: GreenLineConfig, flow_id: str) -> dict:
+        """Build the agent.create payload (shared by the sync and async builders)."""
 
         agent_params = {
             "agent_name": f"{config.company_name} AI Receptionist",
@@ -1577,7 +1878,177 @@ Thanks for calling {config.company_name}, and have a wonderful day!"""
             agent_params["webhook_url"] = config.webhook_url
             print(f"Webhook configured: {config.webhook_url}")
 
-        return self.client.agent.create(**agent_params)
+        return agent_params
+
+
+class AsyncGreenLineAgentBuilder(GreenLineAgentBuilder):
+    """
+    asyncio variant of GreenLineAgentBuilder.
+
+    Uses AsyncRetell and the async Supabase client from a shared
+    AsyncClientPool, so it can run inside an async worker and overlap the
+    network calls of many tenants (e.g. creating tenant B's flow while
+    tenant A's agent is being created). Node, prompt and tool building and
+    the Supabase queries and result handling are inherited from
+    GreenLineAgentBuilder; only the awaited calls differ.
+
+    Without a `pool` the builder creates its own; close it with
+    `await builder.aclose()` or `async with`.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        supabase_url: str = None,
+        supabase_key: str = None,
+        pool: AsyncClientPool = None,
+        flow_cache: FlowCache = None,
+        flow_definition: str = None
+    ):
+        self._owns_pool = pool is None
+        self.pool = pool or AsyncClientPool()
+        self.client = self.pool.retell(api_key)
+
+        self.flow_cache = flow_cache
+        self._cache_namespace = api_key_namespace(api_key)
+        self.flow_definition = flow_definition
+
+        # The async Supabase client can only be created inside the event loop
+        self.supabase = None
+        self._supabase_url, self._supabase_key = _supabase_settings(supabase_url, supabase_key)
+
+    async def _get_supabase(self):
+        """Lazily create the async Supabase client from the shared pool."""
+        if self.supabase is None and SUPABASE_AVAILABLE and self._supabase_url and self._supabase_key:
+            self.supabase = await self.pool.supabase(self._supabase_url, self._supabase_key)
+        return self.supabase
+
+    async def aclose(self):
+        """Close the client pool if this builder created it (a pool passed in is left open)."""
+        if self._owns_pool:
+            await self.pool.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def create_agent(self, config: GreenLineConfig, onboarding_id: str = None) -> dict:
+        """
+        Create a complete conversation flow agent for a GreenLine client.
+
+        Args:
+            config: GreenLineConfig with business details
+            onboarding_id: Optional business_onboarding UUID to link agent to CRM
+
+        Returns:
+            dict with conversation_flow_id, agent_id, and onboarding_updated status
+        """
+        self.prepare_config(config)
+
+        # Step 1: Create the conversation flow
+        conversation_flow = await self.create_conversation_flow(config)
+        flow_id = conversation_flow.conversation_flow_id
+        print(f"Created conversation flow: {flow_id}")
+
+        # Step 2: Create the agent and attach the flow
+        agent = await self.create_voice_agent(config, flow_id)
+        agent_id = agent.agent_id
+        print(f"Created voice agent: {agent_id}")
+
+        # Step 3: Link agent to business_onboarding for CRM integration
+        onboarding_updated = False
+        if onboarding_id:
+            onboarding_updated = await self.link_agent_to_onboarding(
+                onboarding_id=onboarding_id,
+                agent_id=agent_id,
+                flow_id=flow_id
+            )
+
+        return self._agent_result(config, flow_id, agent_id, onboarding_updated)
+
+    async def create_agents(self, configs: list, onboarding_ids: list = None, concurrency: int = 10) -> list:
+        """
+        Create agents for many configs concurrently.
+
+        Each tenant's flow -> agent -> link chain runs as its own task, so
+        independent requests for different tenants overlap on the shared pool.
+
+        Args:
+            configs: List of GreenLineConfig
+            onboarding_ids: Optional list of business_onboarding UUIDs, parallel to configs
+            concurrency: Maximum number of tenants in flight at once
+
+        Returns:
+            List of create_agent results (or the raised exception) in input order
+        """
+        onboarding_ids = onboarding_ids or [None] * len(configs)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def run(config, onboarding_id):
+            async with semaphore:
+                return await self.create_agent(config, onboarding_id=onboarding_id)
+
+        return await asyncio.gather(
+            *(run(config, onboarding_id) for config, onboarding_id in zip(configs, onboarding_ids)),
+            return_exceptions=True
+        )
+
+    async def link_agent_to_onboarding(
+        self,
+        onboarding_id: str,
+        agent_id: str,
+        flow_id: str = None,
+        phone_number: str = None
+    ) -> bool:
+        """Async version of GreenLineAgentBuilder.link_agent_to_onboarding."""
+        supabase = await self._get_supabase()
+        if not supabase:
+            print("Warning: Supabase not configured. Cannot link agent to onboarding.")
+            print("Set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY environment variables.")
+            return False
+
+        try:
+            result = await self._link_query(supabase, onboarding_id, agent_id, phone_number).execute()
+            return self._link_result(result, onboarding_id, agent_id)
+        except Exception as e:
+            print(f"Error linking agent to onboarding: {e}")
+            return False
+
+    async def fetch_onboarding(self, onboarding_id: str) -> dict:
+        """Async version of GreenLineAgentBuilder.fetch_onboarding."""
+        supabase = await self._get_supabase()
+        if not supabase:
+            raise ValueError("Supabase not configured. Set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY")
+
+        result = await self._fetch_query(supabase, onboarding_id).execute()
+        return self._fetch_result(result, onboarding_id)
+
+    async def activate_onboarding(self, onboarding_id: str) -> bool:
+        """Async version of GreenLineAgentBuilder.activate_onboarding."""
+        supabase = await self._get_supabase()
+        if not supabase:
+            print("Warning: Supabase not configured.")
+            return False
+
+        try:
+            result = await self._activate_query(supabase, onboarding_id).execute()
+            return self._activate_result(result, onboarding_id)
+        except Exception as e:
+            print(f"Error activating onboarding: {e}")
+            return False
+
+    async def create_conversation_flow(self, config: GreenLineConfig):
+        """Create the conversation flow, reusing an identical cached flow if possible."""
+        params = self._build_flow_params(config)
+        if self.flow_cache is None:
+            return await self.client.conversation_flow.create(**params)
+        return await self.flow_cache.aget_or_create(self.client, self._cache_namespace, params)
+
+    async def create_voice_agent(self, config: GreenLineConfig, flow_id: str):
+        """Create the voice agent and attach the conversation flow."""
+        return await self.client.agent.create(**self._build_agent_params(config, flow_id))
 
 
 def create_demo_agent(onboarding_id: str = None):
@@ -1663,16 +2134,55 @@ def create_agent_for_onboarding(onboarding_id: str) -> dict:
     if not builder.supabase:
         raise ValueError("Supabase not configured. Set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY")
 
-    # Fetch onboarding data
-    result = builder.supabase.table("business_onboarding").select("*").eq("id", onboarding_id).single().execute()
+    onboarding = builder.fetch_onboarding(onboarding_id)
+    config = build_config_from_onboarding(onboarding)
+
+    # Create the agent and link to onboarding
+    agent_result = builder.create_agent(config, onboarding_id=onboarding_id)
+
+    print(f"\nAgent created for {onboarding['business_name']}")
+    print(f"Leads from calls will appear in their CRM dashboard")
 
-    if not result.data:
-        raise ValueError(f"No onboarding record found with id {onboarding_id}")
+    return agent_result
 
-    onboarding = result.data
 
-    # Build config from onboarding data
-    config = GreenLineConfig(
+async def create_agent_for_onboarding_async(onboarding_id: str, pool: AsyncClientPool = None) -> dict:
+    """
+    Async version of create_agent_for_onboarding for use inside async workers.
+
+    Args:
+        onboarding_id: UUID of the business_onboarding record
+        pool: Optional AsyncClientPool to share connections with other builders
+
+    Returns:
+        dict with agent details and CRM link status
+    """
+    api_key = os.environ.get("RETELL_API_KEY")
+    if not api_key:
+        raise ValueError("RETELL_API_KEY environment variable not set")
+
+    async with AsyncGreenLineAgentBuilder(api_key, pool=pool) as builder:
+        onboarding = await builder.fetch_onboarding(onboarding_id)
+        config = build_config_from_onboarding(onboarding)
+
+        agent_result = await builder.create_agent(config, onboarding_id=onboarding_id)
+
+    print(f"\nAgent created for {onboarding['business_name']}")
+
+    return agent_result
+
+
+def build_config_from_onboarding(onboarding: dict) -> GreenLineConfig:
+    """
+    Build a GreenLineConfig from a business_onboarding row.
+
+    Args:
+        onboarding: business_onboarding record as returned by Supabase
+
+    Returns:
+        GreenLineConfig ready to pass to GreenLineAgentBuilder.create_agent
+    """
+    return GreenLineConfig(
         company_name=onboarding.get("greeting_name") or onboarding["business_name"],
         business_type=onboarding["business_type"],
         phone_number=onboarding["phone"],
@@ -1686,14 +2196,6 @@ def create_agent_for_onboarding(onboarding_id: str) -> dict:
         model="gpt-4.1"
     )
 
-    # Create the agent and link to onboarding
-    agent_result = builder.create_agent(config, onboarding_id=onboarding_id)
-
-    print(f"\nAgent created for {onboarding['business_name']}")
-    print(f"Leads from calls will appear in their CRM dashboard")
-
-    return agent_result
-
 
 def _build_business_hours(onboarding: dict) -> str:
     """Build business hours string from onboarding data."""
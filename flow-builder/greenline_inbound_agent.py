@@ -11,6 +11,11 @@ import os
 import json
 from retell import Retell
 
+from async_clients import AsyncClientPool
+from flow_cache import FlowCache, api_key_namespace
+from flow_definitions import load_definition, write_definition
+from flow_graph import validate_flow
+
 
 # GreenLine AI Sales Agent Configuration
 GREENLINE_CONFIG = {
@@ -1048,52 +1053,145 @@ Have a great day, and best of luck with your business!"""
     return nodes
 
 
-def create_greenline_inbound_agent(api_key: str) -> dict:
+AGENT_NAME = "Jordan - GreenLine AI Sales"
+
+
+def build_flow_params(flow_definition: str = None) -> dict:
+    """
+    Build the conversation_flow.create payload for Jordan.
+
+    Args:
+        flow_definition: Optional flow definition file (name or path) to load
+            instead of the built-in flow, see flow_definitions.py
+
+    Raises:
+        FlowValidationError: If the flow graph has structural errors (see flow_graph.py)
+    """
+    if flow_definition:
+        params = dict(load_definition(flow_definition).render())
+    else:
+        params = {
+            "model_choice": {
+                "type": "cascading",
+                "model": "gpt-4.1"
+            },
+            "nodes": build_nodes(),
+            "start_speaker": "agent",
+            "global_prompt": build_global_prompt(),
+            "start_node_id": "greeting",
+            "model_temperature": 0.4
+        }
+
+    # Refuse to deploy flows with dangling edges, unreachable nodes or dead ends
+    validate_flow(params)
+    return params
+
+
+def export_flow_definition(path: str, version: int = 1) -> dict:
+    """Write the built-in Jordan flow as a flow definition file."""
+    flow = build_flow_params()
+    write_definition(path, "greenline_inbound", flow, [], version=version,
+                     description="Jordan, GreenLine AI's own inbound sales agent")
+    return flow
+
+
+def build_agent_params(flow_id: str) -> dict:
+    """Build the agent.create payload for Jordan."""
+    return {
+        "agent_name": AGENT_NAME,
+        "response_engine": {
+            "type": "conversation-flow",
+            "conversation_flow_id": flow_id
+        },
+        "voice_id": "11labs-Adrian",
+        "language": "en-US",
+    }
+
+
+def create_greenline_inbound_agent(
+    api_key: str,
+    flow_cache: FlowCache = None,
+    flow_definition: str = None
+) -> dict:
     """
     Create the GreenLine AI inbound sales agent.
 
+    Args:
+        api_key: Retell API key
+        flow_cache: Optional FlowCache; an identical existing flow is reused
+        flow_definition: Optional flow definition file (name or path) to use
+            instead of the built-in flow
+
     Returns:
         dict with conversation_flow_id and agent_id
     """
     client = Retell(api_key=api_key)
+    params = build_flow_params(flow_definition)
 
-    # Build the nodes
-    nodes = build_nodes()
-
-    # Create the conversation flow
+    # Create the conversation flow, reusing an identical one already created in this workspace
     print("Creating conversation flow...")
-    conversation_flow = client.conversation_flow.create(
-        model_choice={
-            "type": "cascading",
-            "model": "gpt-4.1"
-        },
-        nodes=nodes,
-        start_speaker="agent",
-        global_prompt=build_global_prompt(),
-        start_node_id="greeting",
-        model_temperature=0.4
-    )
+    if flow_cache is not None:
+        conversation_flow = flow_cache.get_or_create(client, api_key_namespace(api_key), params)
+    else:
+        conversation_flow = client.conversation_flow.create(**params)
     flow_id = conversation_flow.conversation_flow_id
-    print(f"Created conversation flow: {flow_id}")
+    print(f"Conversation flow: {flow_id}")
 
     # Create the voice agent
     print("Creating voice agent...")
-    agent = client.agent.create(
-        agent_name="Jordan - GreenLine AI Sales",
-        response_engine={
-            "type": "conversation-flow",
-            "conversation_flow_id": flow_id
-        },
-        voice_id="11labs-Adrian",
-        language="en-US",
-    )
+    agent = client.agent.create(**build_agent_params(flow_id))
+    agent_id = agent.agent_id
+    print(f"Created voice agent: {agent_id}")
+
+    return {
+        "conversation_flow_id": flow_id,
+        "agent_id": agent_id,
+        "agent_name": AGENT_NAME
+    }
+
+
+async def create_greenline_inbound_agent_async(
+    api_key: str,
+    pool: AsyncClientPool = None,
+    flow_cache: FlowCache = None,
+    flow_definition: str = None
+) -> dict:
+    """
+    asyncio version of create_greenline_inbound_agent.
+
+    Args:
+        api_key: Retell API key
+        pool: Optional AsyncClientPool to share connections with other builders
+            (default: a pool for this call, closed before returning)
+        flow_cache: Optional FlowCache; an identical existing flow is reused
+        flow_definition: Optional flow definition file (name or path) to use
+            instead of the built-in flow
+
+    Returns:
+        dict with conversation_flow_id and agent_id
+    """
+    if pool is None:
+        async with AsyncClientPool() as pool:
+            return await create_greenline_inbound_agent_async(api_key, pool, flow_cache, flow_definition)
+
+    client = pool.retell(api_key)
+    params = build_flow_params(flow_definition)
+
+    if flow_cache is not None:
+        conversation_flow = await flow_cache.aget_or_create(client, api_key_namespace(api_key), params)
+    else:
+        conversation_flow = await client.conversation_flow.create(**params)
+    flow_id = conversation_flow.conversation_flow_id
+    print(f"Conversation flow: {flow_id}")
+
+    agent = await client.agent.create(**build_agent_params(flow_id))
     agent_id = agent.agent_id
     print(f"Created voice agent: {agent_id}")
 
     return {
         "conversation_flow_id": flow_id,
         "agent_id": agent_id,
-        "agent_name": "Jordan - GreenLine AI Sales"
+        "agent_name": AGENT_NAME
     }
 
 
@@ -0,0 +1,182 @@
+"""
+Application-lifetime outbound HTTP pool for the webhook server.
+
+forward_to_crm and the Calendly helpers used to open a new
+httpx.AsyncClient per call, paying a TCP + TLS handshake every time.
+HTTPClientPool keeps one pooled client for the life of the app:
+
+- keep-alive connection limits and tuned connect/read/pool timeouts
+- HTTP/2 when the `h2` package is installed (pip install 'httpx[http2]')
+- a per-host concurrency cap, so a slow CRM can't take every connection
+- request latency and error counters per host, for /api/metrics
+
+Usage:
+    pool = HTTPClientPool()
+    await pool.start()                      # FastAPI lifespan startup
+    response = await pool.request("POST", url, json=payload)
+    await pool.aclose()                     # lifespan shutdown
+"""
+
+import asyncio
+import importlib.util
+import os
+import time
+from collections import deque
+from typing import Callable, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+# Pool limits and timeouts (seconds), overridable from the environment
+DEFAULT_MAX_CONNECTIONS = int(os.environ.get("HTTP_POOL_MAX_CONNECTIONS", 100))
+DEFAULT_MAX_KEEPALIVE = int(os.environ.get("HTTP_POOL_MAX_KEEPALIVE", 20))
+DEFAULT_PER_HOST_LIMIT = int(os.environ.get("HTTP_POOL_PER_HOST", 20))
+DEFAULT_TIMEOUT = httpx.Timeout(
+    connect=float(os.environ.get("HTTP_POOL_CONNECT_TIMEOUT", 3.0)),
+    read=float(os.environ.get("HTTP_POOL_READ_TIMEOUT", 10.0)),
+    write=10.0,
+    pool=5.0,
+)
+KEEPALIVE_EXPIRY = 30.0
+
+# HTTP/2 needs the optional h2 package
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class LatencyTracker:
+    """Recent latency samples (seconds) with percentiles."""
+
+    def __init__(self, size: int = 2048):
+        self.samples: deque = deque(maxlen=size)
+        self.count = 0
+        self.errors = 0
+
+    def record(self, seconds: float, error: bool = False):
+        self.samples.append(seconds)
+        self.count += 1
+        if error:
+            self.errors += 1
+
+    def summary(self) -> dict:
+        """Counts plus p50/p95/p99/max in milliseconds over the recent samples."""
+        result = {"count": self.count, "errors": self.errors}
+        if self.samples:
+            ordered = sorted(self.samples)
+
+            def percentile(p: float) -> float:
+                return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 2)
+
+            result.update(p50_ms=percentile(0.50), p95_ms=percentile(0.95),
+                          p99_ms=percentile(0.99), max_ms=round(ordered[-1] * 1000, 2))
+        return result
+
+
+class HTTPClientPool:
+    """
+    Shared httpx.AsyncClient with per-host concurrency caps and latency metrics.
+
+    Args:
+        max_connections: Total open connections
+        max_keepalive_connections: Idle connections kept for reuse
+        per_host_limit: Concurrent requests per host
+        timeout: httpx.Timeout for every request
+        http2: Use HTTP/2 (default: when h2 is installed)
+        observer: Called with (host, method, status, seconds) after each
+            request; status is 0 when the request raised
+    """
+
+    def __init__(
+        self,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE,
+        per_host_limit: int = DEFAULT_PER_HOST_LIMIT,
+        timeout: httpx.Timeout = DEFAULT_TIMEOUT,
+        http2: Optional[bool] = None,
+        observer: Optional[Callable[[str, str, int, float], None]] = None,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        )
+        self.timeout = timeout
+        self.http2 = HTTP2_AVAILABLE if http2 is None else (http2 and HTTP2_AVAILABLE)
+        self.per_host_limit = per_host_limit
+        self.observer = observer
+
+        self.client: Optional[httpx.AsyncClient] = None
+        self._host_slots: dict = {}  # host -> asyncio.Semaphore
+        self._in_flight: dict = {}  # host -> requests in progress
+        self.latency: dict = {}  # host -> LatencyTracker
+
+    async def start(self):
+        """Create the pooled client (called from the app lifespan)."""
+        if self.client is None:
+            self.client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout, http2=self.http2)
+
+    async def aclose(self):
+        """Close pooled connections (called at shutdown)."""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Send a request through the pool, waiting for a per-host slot.
+
+        Raises:
+            httpx.HTTPError: Transport errors and timeouts, as httpx raises them
+        """
+        if self.client is None:
+            await self.start()  # Used outside the app lifespan (scripts, tests)
+
+        host = urlsplit(url).netloc
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.per_host_limit)
+            self._in_flight[host] = 0
+            self.latency[host] = LatencyTracker()
+
+        async with self._host_slots[host]:
+            self._in_flight[host] += 1
+            started = time.perf_counter()
+            status = 0
+            try:
+                response = await self.client.request(method, url, **kwargs)
+                status = response.status_code
+                return response
+            finally:
+                elapsed = time.perf_counter() - started
+                self._in_flight[host] -= 1
+                self.latency[host].record(elapsed, error=status == 0 or status >= 500)
+                if self.observer is not None:
+                    self.observer(host, method, status, elapsed)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    def _connection_counts(self) -> dict:
+        # httpx doesn't expose pool stats; read httpcore's pool when it's there
+        pool = getattr(getattr(self.client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is None:
+            return {}
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {"open": len(connections), "idle": idle, "active": len(connections) - idle}
+
+    def metrics(self) -> dict:
+        """Pool settings, connection counts and per-host latency."""
+        return {
+            "started": self.client is not None,
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "per_host_limit": self.per_host_limit,
+            "connections": self._connection_counts(),
+            "hosts": {
+                host: {"in_flight": self._in_flight[host], **tracker.summary()}
+                for host, tracker in self.latency.items()
+            },
+        }
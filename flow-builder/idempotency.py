@@ -0,0 +1,187 @@
+"""
+Idempotency for Retell tool calls that create records.
+
+Retell retries a tool call when it doesn't get an answer in time, and
+submit_lead / book_appointment minted a new LEAD-/APT- id on every
+delivery, so a retry storm turned into duplicate leads, duplicate
+Calendly bookings and duplicate CRM posts. IdempotencyIndex remembers
+the response to each call:
+
+- the key is call_id + tool name + a hash of the tool arguments, so the
+  same tool called twice in one call with different arguments still runs
+- requests without a call_id can send an `Idempotency-Key` header instead;
+  requests with neither are not deduplicated
+- a repeat delivery gets the original response without running the
+  handler again; one that arrives while the first is still running waits
+  for it
+- entries expire after `ttl` seconds and the index holds at most
+  `max_entries` (least recently used are evicted first); failures are not
+  remembered, so a retry after an error runs again
+- with a SharedState (see shared_state.py) responses are also stored
+  there, so a retry that lands on another worker process is replayed
+  too; a worker that finds the key claimed by another polls for its
+  response instead of running the handler
+
+Usage:
+    index = IdempotencyIndex()
+    key = tool_call_key(data, "book_appointment", request.headers.get("idempotency-key"))
+    content, replayed = await index.run(key, lambda: create_booking(appt))
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from shared_state import SharedState
+
+DEFAULT_TTL = float(os.environ.get("IDEMPOTENCY_TTL", 24 * 3600))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("IDEMPOTENCY_MAX_ENTRIES", 10000))
+
+# How long another worker may hold a key while its handler runs, and how
+# often a worker waiting on it checks for the response
+CLAIM_TTL = 30.0
+CLAIM_POLL = 0.05
+
+
+def tool_call_key(payload: dict, tool: str, header_key: Optional[str] = None) -> Optional[str]:
+    """
+    Idempotency key for a Retell tool call payload.
+
+    Args:
+        payload: Parsed request body ({"call": {...}, "name": ..., "args": {...}} or bare args)
+        tool: Tool name to use when the payload doesn't name one
+        header_key: Client-supplied Idempotency-Key header, used when there is no call_id
+
+    Returns:
+        The key, or None if the request can't be identified
+    """
+    call = payload.get("call")
+    call_id = call.get("call_id") if isinstance(call, dict) else None
+    if not call_id and not header_key:
+        return None
+    args = payload.get("args", payload)
+    digest = hashlib.sha256(
+        json.dumps(args, sort_keys=True, separators=(",", ":"), default=str).encode()
+    ).hexdigest()[:32]
+    return f"{call_id or 'key:' + header_key}:{payload.get('name') or tool}:{digest}"
+
+
+class IdempotencyIndex:
+    """
+    Bounded LRU + TTL map of idempotency key -> response content.
+
+    Args:
+        ttl: Seconds a response is replayed
+        max_entries: Responses kept before the least recently used is evicted
+        shared: Store shared with other workers (default: this process only)
+    """
+
+    def __init__(
+        self,
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        shared: Optional[SharedState] = None,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared = shared
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires_at, content)
+        self._pending: dict = {}  # key -> asyncio.Future for a handler still running
+        self.counters = {"stored": 0, "replayed": 0, "waited": 0, "evicted": 0, "expired": 0,
+                         "shared_replayed": 0, "shared_waited": 0}
+
+    def get(self, key: str):
+        """Stored content for `key`, or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            self.counters["expired"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: str, content):
+        self._entries[key] = (time.monotonic() + self.ttl, content)
+        self._entries.move_to_end(key)
+        self.counters["stored"] += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evicted"] += 1
+
+    async def run(self, key: Optional[str], handler: Callable[[], Awaitable]) -> tuple:
+        """
+        Run `handler` once per key.
+
+        Returns:
+            (content, replayed) - replayed is True if `content` came from an
+            earlier delivery
+        """
+        if key is None:
+            return await handler(), False
+
+        content = self.get(key)
+        if content is not None:
+            self.counters["replayed"] += 1
+            return content, True
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.counters["waited"] += 1
+            return await asyncio.shield(pending), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        replayed = claimed = False
+        try:
+            if self.shared is not None:
+                content, claimed = await self._claim(key)
+                replayed = not claimed
+            if not replayed:
+                content = await handler()
+        except BaseException as e:
+            if claimed:
+                await self.shared.delete(f"idempotency-claim:{key}")  # Let a retry run it
+            if isinstance(e, Exception):
+                future.set_exception(e)
+                future.exception()  # Retrieved here if no duplicate is waiting
+            else:
+                future.cancel()
+            raise
+        finally:
+            del self._pending[key]
+        if claimed:
+            await self.shared.set(f"idempotency:{key}", json.dumps(content, default=str), self.ttl)
+            await self.shared.delete(f"idempotency-claim:{key}")
+        self.put(key, content)
+        future.set_result(content)
+        return content, replayed
+
+    async def _claim(self, key: str) -> tuple:
+        """
+        (stored content, False) if another worker already answered `key`, or
+        (None, True) once this worker holds the claim to run the handler.
+        """
+        waited = False
+        while True:
+            stored = await self.shared.get(f"idempotency:{key}")
+            if stored is not None:
+                self.counters["shared_replayed"] += 1
+                return json.loads(stored), False
+            if await self.shared.add(f"idempotency-claim:{key}", str(os.getpid()), CLAIM_TTL):
+                return None, True
+            if not waited:
+                waited = True
+                self.counters["shared_waited"] += 1
+            # Another worker is running the handler; the claim expires if it dies
+            await asyncio.sleep(CLAIM_POLL)
+
+    def metrics(self) -> dict:
+        return {"entries": len(self._entries), "pending": len(self._pending),
+                "ttl": self.ttl, "max_entries": self.max_entries,
+                "shared": type(self.shared).__name__ if self.shared is not None else None, **self.counters}
@@ -0,0 +1,311 @@
+"""
+Prometheus-style metrics for the webhook server (GET /metrics).
+
+The server reported what it was doing only through print(). This module
+adds counters and fixed-bucket histograms that a Prometheus scraper (or
+curl) can read in the text exposition format:
+
+- PrometheusMiddleware (ASGI) counts every request by method, route
+  template and status, and observes its duration in a histogram
+- HTTPClientPool reports each upstream call (Calendly, CRM) through its
+  observer hook, see upstream_observer()
+- CallbackMetric exposes counters the components already keep (CRM
+  deliveries, queue depths, cache hits, ...) when /metrics is scraped
+- route_summary() turns the request metrics into the per-endpoint
+  numbers of /api/metrics, so both endpoints read one set of data
+
+Recording is a dict lookup and a few integer adds: no locks (values are
+only updated from the event loop thread), no allocation once a label set
+has been seen, and bucket lookup is a bisect over the bucket bounds.
+Labels use the route template ("/api/calls/{call_id}"), never the raw
+path, so cardinality stays bounded.
+
+Usage:
+    registry = Registry()
+    app.add_middleware(PrometheusMiddleware, registry=registry)
+    pool = HTTPClientPool(observer=upstream_observer(registry))
+    registry.render()       # -> text/plain; version=0.0.4
+"""
+
+import time
+from bisect import bisect_left
+from typing import Callable, Optional
+
+from structured_log import get_logger
+
+logger = get_logger("instrumentation")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers in-process handlers (sub-millisecond) up to slow upstream calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonic counter per label set.
+
+    Args:
+        name: Metric name (by convention ending in _total)
+        help: One-line description
+        labels: Label names; inc() takes the values in the same order
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: dict = {}  # label values -> count
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> list:
+        return [(self.name, _format_labels(self.labels, key), value) for key, value in self.values.items()]
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram per label set.
+
+    Args:
+        name: Metric name (by convention ending in _seconds)
+        help: One-line description
+        labels: Label names; observe() takes the values in the same order
+        buckets: Ascending upper bounds; +Inf is added
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self.values: dict = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, labels: tuple = ()):
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self) -> list:
+        result = []
+        for key, series in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                result.append((f"{self.name}_bucket",
+                               _format_labels(self.labels, key, f'le="{_format_value(bound)}"'), cumulative))
+            result.append((f"{self.name}_sum", _format_labels(self.labels, key), series[-1]))
+            result.append((f"{self.name}_count", _format_labels(self.labels, key), cumulative))
+        return result
+
+    def quantile(self, q: float, series: list) -> float:
+        """
+        Estimated q-quantile (0..1) of one series, interpolating linearly within its bucket.
+
+        Values in the +Inf bucket are reported as the largest finite bound.
+        """
+        total = sum(series[:-1])
+        if not total:
+            return 0.0
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(series[:-1]):
+            if count and cumulative + count >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+
+class CallbackMetric:
+    """
+    Counter or gauge read from a callback at scrape time.
+
+    Args:
+        name: Metric name
+        help: One-line description
+        kind: "counter" or "gauge"
+        labels: Label names
+        callback: Returns {label values tuple: value}
+    """
+
+    def __init__(self, name: str, help: str, kind: str, labels: tuple, callback: Callable[[], dict]):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labels = labels
+        self.callback = callback
+
+    def samples(self) -> list:
+        return [(self.name, _format_labels(self.labels, key), value) for key, value in self.callback().items()]
+
+
+class Registry:
+    """The metrics exposed at /metrics."""
+
+    def __init__(self):
+        self.metrics: dict = {}  # name -> metric
+
+    def register(self, metric):
+        """Add a metric; raises ValueError if the name is taken."""
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: tuple = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def callback(self, name: str, help: str, kind: str, labels: tuple, callback: Callable[[], dict]):
+        return self.register(CallbackMetric(name, help, kind, labels, callback))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics.values():
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                logger.warning("Metric callback failed",
+                               extra={"event": "metric_failed", "metric": metric.name, "error": str(e)})
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class PrometheusMiddleware:
+    """
+    Count requests and observe their duration by method, route and status.
+
+    Args:
+        app: ASGI app
+        registry: Where the request metrics are registered
+        prefix: Metric name prefix
+    """
+
+    def __init__(self, app, registry: Registry, prefix: str = "greenline_http"):
+        self.app = app
+        self.requests = registry.counter(
+            f"{prefix}_requests_total", "HTTP requests by method, route and status", ("method", "route", "status"))
+        self.duration = registry.histogram(
+            f"{prefix}_request_duration_seconds", "HTTP request duration by method and route", ("method", "route"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            # The router stores the matched route in the (shared) scope
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            self.requests.inc((method, route, status))
+            self.duration.observe(elapsed, (method, route))
+
+
+def route_summary(registry: Registry, prefix: str = "greenline_http") -> dict:
+    """
+    Per-route request count, 5xx count and latency from PrometheusMiddleware's metrics (for /api/metrics).
+
+    Percentiles are estimated from the histogram buckets, so they are as
+    precise as the bucket bounds.
+
+    Returns:
+        {route: {"count", "errors", "mean_ms", "p50_ms", "p95_ms", "p99_ms"}}
+    """
+    duration = registry.metrics.get(f"{prefix}_request_duration_seconds")
+    requests = registry.metrics.get(f"{prefix}_requests_total")
+    if duration is None or requests is None:
+        return {}  # No request served yet
+
+    merged: dict = {}  # route -> series summed over methods
+    for (_, route), series in list(duration.values.items()):
+        total = merged.get(route)
+        merged[route] = list(series) if total is None else [a + b for a, b in zip(total, series)]
+    errors: dict = {}
+    for (_, route, status), count in list(requests.values.items()):
+        if status >= 500:
+            errors[route] = errors.get(route, 0) + count
+
+    summary = {}
+    for route, series in merged.items():
+        count = sum(series[:-1])
+        summary[route] = {
+            "count": count,
+            "errors": errors.get(route, 0),
+            "mean_ms": round(series[-1] / count * 1000, 2) if count else 0.0,
+            **{f"p{int(q * 100)}_ms": round(duration.quantile(q, series) * 1000, 2) for q in (0.50, 0.95, 0.99)},
+        }
+    return summary
+
+
+def upstream_observer(registry: Registry, prefix: str = "greenline_upstream") -> Callable:
+    """
+    Observer for HTTPClientPool: counts and times each outbound request by host.
+
+    Returns:
+        observer(host, method, status, seconds); status is 0 when the request raised
+    """
+    requests = registry.counter(
+        f"{prefix}_requests_total", "Outbound requests by host, method and status (0: transport error)",
+        ("host", "method", "status"))
+    duration = registry.histogram(
+        f"{prefix}_request_duration_seconds", "Outbound request duration by host", ("host", "method"))
+
+    def observe(host: str, method: str, status: int, seconds: float):
+        requests.inc((host, method, status))
+        duration.observe(seconds, (host, method))
+
+    return observe
+
+
+def counters_callback(counters: Callable[[], Optional[dict]], keys: Optional[tuple] = None) -> Callable[[], dict]:
+    """Callback exposing a component's counters dict with the counter name as the only label."""
+    def callback() -> dict:
+        values = counters() or {}
+        return {(name,): value for name, value in values.items()
+                if (keys is None or name in keys) and isinstance(value, (int, float)) and not isinstance(value, bool)}
+    return callback
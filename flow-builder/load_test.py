@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+Load generator for the webhook server with synthetic Retell traffic.
+
+test_call_scenarios.py sends one request per scenario, which says nothing
+about behaviour under concurrency. This replays whole calls the way
+Retell delivers them, many at once:
+
+    call_started -> submit_lead -> check_availability -> book_appointment -> call_ended -> call_analyzed
+
+Calls cycle through the scenarios in call_scenarios.py (service request
+with a booking, message taking, the lead scoring calls), so every run
+sends the same mix. Calls arrive at --rate per second (open loop) with
+at most --concurrency in flight; an arrival that finds every slot busy
+waits, and the report counts it as late, so a run that couldn't hold its
+rate says so.
+
+The target is webhook_server.app in this process (httpx.ASGITransport,
+memory storage, lifespan started) or a running server with --url. With
+RETELL_API_KEY set, requests are signed like Retell's.
+
+The report has throughput, p50/p95/p99/max latency and error rates per
+operation and status codes (429 is the event queue pushing back).
+--save-baseline writes it as JSON; --compare checks a run against a
+saved baseline and exits 1 if p95 latency or error rate regressed by more
+than --tolerance. Throughput is fixed by --rate in an open-loop run, so it
+is only compared when the run fell behind its rate (late starts). A
+baseline recorded with different load settings (rate, concurrency,
+duration, think time, signing) is refused, as the numbers would not be
+comparable.
+
+Usage:
+    python load_test.py                                   # In-process, 20 calls/s for 30 s
+    python load_test.py --rate 100 --concurrency 200 --duration 60
+    python load_test.py --url http://localhost:8000       # A running server
+    python load_test.py --save-baseline load_baseline.json
+    python load_test.py --compare load_baseline.json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import os
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Optional
+
+import httpx
+
+import fast_json
+from call_scenarios import LEAD_SCORING_SCENARIOS, booking_request, call_started, lead_scoring_call, \
+    message_call, service_request_call
+from http_pool import LatencyTracker
+
+DEFAULT_RATE = 20.0
+DEFAULT_CONCURRENCY = 50
+DEFAULT_DURATION = 30.0
+DEFAULT_TOLERANCE = 0.2
+REQUEST_TIMEOUT = 30.0
+AGENT_ID = "agent_load_test"
+
+# Enough samples for exact percentiles over a long run
+MAX_SAMPLES = 1_000_000
+
+# p95 changes smaller than this are noise, however large relative to the baseline
+MIN_LATENCY_DELTA_MS = 2.0
+# Error rate may rise by this much (absolute) before it counts as a regression
+MAX_ERROR_RATE_DELTA = 0.01
+
+# Load settings that must match for a run to be compared with a baseline
+COMPARED_CONFIG = ("rate", "concurrency", "duration", "think_time", "signed")
+
+OPERATIONS = ("call_started", "submit_lead", "check_availability", "book_appointment", "call_ended", "call_analyzed")
+
+
+def call_plans() -> list:
+    """(name, call fields, lead args or None, books) for each scenario, in the order calls cycle through them."""
+    service = service_request_call()
+    caller = service["dynamic_variables"]
+    message = message_call()
+    plans = [
+        ("service_request", service, {
+            "customer_name": caller["caller_name"], "phone": caller["caller_phone"],
+            "address": caller["service_address"], "service_type": caller["service_type"],
+            "notes": service["call_analysis"]["call_summary"], "priority": "normal",
+        }, True),
+        ("message", message, {
+            "customer_name": message["dynamic_variables"]["message_name"],
+            "phone": message["dynamic_variables"]["message_phone"],
+            "notes": message["dynamic_variables"]["message_reason"], "callback_requested": True,
+        }, False),
+    ]
+    for index, scenario in enumerate(LEAD_SCORING_SCENARIOS):
+        variables = scenario["dynamic_variables"]
+        lead = {
+            "customer_name": variables["caller_name"], "phone": variables["caller_phone"],
+            "priority": "high" if variables.get("urgency") == "today" else "normal",
+        } if variables.get("caller_name") else None  # A caller who gave nothing leaves no lead
+        plans.append((f"lead_scoring_{index + 1}", lead_scoring_call(scenario), lead, False))
+    return plans
+
+
+class LoadGenerator:
+    """
+    Replays synthetic calls against the webhook server and records each request.
+
+    Args:
+        client: httpx.AsyncClient with the server as base_url
+        rate: Calls started per second
+        concurrency: Calls in flight at most
+        duration: Seconds to keep starting calls
+        think_time: Seconds between a call's requests
+        api_key: Retell API key to sign requests with (empty: unsigned)
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        rate: float = DEFAULT_RATE,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        duration: float = DEFAULT_DURATION,
+        think_time: float = 0.0,
+        api_key: str = "",
+    ):
+        if rate <= 0 or concurrency < 1 or duration <= 0:
+            raise ValueError("rate and duration must be positive and concurrency at least 1")
+        self.client = client
+        self.rate = rate
+        self.concurrency = concurrency
+        self.duration = duration
+        self.think_time = think_time
+        self._key = api_key.encode()
+        self.plans = call_plans()
+        self.latency = {op: LatencyTracker(size=MAX_SAMPLES) for op in OPERATIONS}
+        self.statuses: dict = {op: {} for op in OPERATIONS}  # operation -> {status: count}
+        self.counters = {"calls_started": 0, "calls_completed": 0, "calls_failed": 0,
+                         "late_starts": 0, "bookings_skipped": 0}
+        self.elapsed = 0.0
+
+    def _headers(self, body: bytes) -> dict:
+        headers = {"content-type": "application/json"}
+        if self._key:
+            timestamp = str(int(time.time() * 1000))
+            digest = hmac.new(self._key, body + timestamp.encode(), hashlib.sha256).hexdigest()
+            headers["x-retell-signature"] = f"v={timestamp},d={digest}"
+        return headers
+
+    async def _request(self, op: str, method: str, path: str, payload: Optional[dict] = None,
+                       params: Optional[dict] = None) -> Optional[httpx.Response]:
+        """Send one request and record it; None if it failed."""
+        body = fast_json.dumps(payload) if payload is not None else b""
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, content=body or None, params=params,
+                                                 headers=self._headers(body))
+        except httpx.HTTPError as e:
+            self.latency[op].record(time.perf_counter() - started, error=True)
+            status = type(e).__name__
+        else:
+            self.latency[op].record(time.perf_counter() - started, error=response.status_code >= 400)
+            status = response.status_code
+        self.statuses[op][status] = self.statuses[op].get(status, 0) + 1
+        if isinstance(status, int) and status < 400:
+            return response
+        return None
+
+    async def _event(self, event: str, call: dict) -> bool:
+        return await self._request(event, "POST", "/webhook/retell", {"event": event, "call": call}) is not None
+
+    async def _tool(self, name: str, path: str, call: dict, args: dict) -> Optional[httpx.Response]:
+        payload = {"call": {"call_id": call["call_id"], "agent_id": AGENT_ID}, "name": name, "args": args}
+        return await self._request(name, "POST", path, payload)
+
+    async def _pause(self):
+        if self.think_time:
+            await asyncio.sleep(self.think_time)
+
+    async def run_call(self, number: int) -> bool:
+        """One call's requests, in order; False if any failed."""
+        name, fields, lead, books = self.plans[number % len(self.plans)]
+        call_id = f"call_load_{os.getpid()}_{number:07d}"
+        base = {"call_id": call_id, "agent_id": AGENT_ID, "direction": "inbound"}
+        ok = await self._event("call_started", {**base, **call_started(), "from_number": fields["from_number"],
+                                                "call_status": "ongoing"})
+
+        if lead is not None:
+            await self._pause()
+            ok &= await self._tool("submit_lead", "/api/leads", base, lead) is not None
+        if books:
+            await self._pause()
+            response = await self._request("check_availability", "GET", "/api/availability",
+                                           params={"service_type": lead["service_type"]})
+            ok &= response is not None
+            slots = fast_json.loads(response.content).get("slots") if response is not None else None
+            if slots:
+                booking = booking_request()
+                await self._pause()
+                ok &= await self._tool("book_appointment", "/api/appointments", base, {
+                    "customer_name": lead["customer_name"], "phone": lead["phone"], "address": lead["address"],
+                    "service_type": booking["service_type"], "notes": booking["notes"],
+                    # Spread concurrent bookings over the offered slots
+                    "appointment_time": slots[number % len(slots)]["datetime"],
+                }) is not None
+            else:
+                self.counters["bookings_skipped"] += 1
+
+        await self._pause()
+        ended = {key: value for key, value in fields.items() if key != "call_analysis"}
+        ok &= await self._event("call_ended", {**base, **ended, "call_status": "ended"})
+        ok &= await self._event("call_analyzed", {**base, "call_status": "ended",
+                                                  "call_analysis": fields["call_analysis"]})
+        return ok
+
+    async def _tracked_call(self, number: int, slots: asyncio.Semaphore):
+        try:
+            ok = await self.run_call(number)
+        except Exception:
+            ok = False
+        finally:
+            slots.release()
+        self.counters["calls_completed" if ok else "calls_failed"] += 1
+
+    async def run(self) -> dict:
+        """Start calls at the configured rate until the duration is up, wait for them, and report."""
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+        started = time.perf_counter()
+        number = 0
+        while True:
+            due = started + number / self.rate
+            if due - started >= self.duration:
+                break
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if slots.locked():
+                self.counters["late_starts"] += 1
+            await slots.acquire()
+            task = asyncio.create_task(self._tracked_call(number, slots))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            self.counters["calls_started"] += 1
+            number += 1
+        if tasks:
+            await asyncio.gather(*tasks)
+        self.elapsed = time.perf_counter() - started
+        return self.report()
+
+    def report(self) -> dict:
+        """Throughput, latency percentiles and error rates, overall and per operation."""
+        operations = {}
+        total = errors = 0
+        for op in OPERATIONS:
+            summary = self.latency[op].summary()
+            if not summary["count"]:
+                continue
+            total += summary["count"]
+            errors += summary["errors"]
+            summary["error_rate"] = round(summary["errors"] / summary["count"], 4)
+            summary["throughput_rps"] = round(summary["count"] / self.elapsed, 1)
+            summary["statuses"] = {str(status): count for status, count in sorted(self.statuses[op].items(), key=str)}
+            operations[op] = summary
+        return {
+            "run_at": datetime.utcnow().isoformat(),
+            "config": run_config(self.rate, self.concurrency, self.duration, self.think_time, bool(self._key)),
+            "elapsed_s": round(self.elapsed, 2),
+            "calls_per_second": round(self.counters["calls_started"] / self.elapsed, 1) if self.elapsed else 0.0,
+            **self.counters,
+            "requests": total,
+            "throughput_rps": round(total / self.elapsed, 1) if self.elapsed else 0.0,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "operations": operations,
+        }
+
+
+def run_config(rate: float, concurrency: int, duration: float, think_time: float, signed: bool) -> dict:
+    """The load settings recorded in a report (and checked by compare())."""
+    return {"rate": rate, "concurrency": concurrency, "duration": duration,
+            "think_time": think_time, "signed": signed}
+
+
+def config_mismatches(config: dict, baseline: dict) -> list:
+    """Load settings that differ from the baseline's, e.g. "rate 50.0 (baseline 20.0)"."""
+    base = baseline.get("config", {})
+    return [f"{name} {config.get(name)} (baseline {base.get(name)})"
+            for name in COMPARED_CONFIG if config.get(name) != base.get(name)]
+
+
+def compare(result: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> list:
+    """
+    Regressions of a run against a baseline report.
+
+    p95 latency and error rates are compared per operation. Throughput is
+    set by the arrival rate, so it is only compared when this run fell
+    behind that rate (late_starts > 0).
+
+    Args:
+        result: This run's report()
+        baseline: A saved report()
+        tolerance: Allowed relative change, e.g. 0.2 for p95 up to 20% slower
+
+    Returns:
+        One message per regression (empty if none)
+
+    Raises:
+        ValueError: If the run and the baseline used different load settings
+    """
+    mismatches = config_mismatches(result["config"], baseline)
+    if mismatches:
+        raise ValueError(f"Baseline was recorded with different load settings: {', '.join(mismatches)}")
+
+    regressions = []
+    if result["late_starts"] and result["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        regressions.append(f"throughput {result['throughput_rps']} req/s < baseline {baseline['throughput_rps']} req/s "
+                           f"({result['late_starts']} calls started late)")
+    for op, base in baseline["operations"].items():
+        current = result["operations"].get(op)
+        if current is None:
+            regressions.append(f"{op}: not exercised in this run")
+            continue
+        if "p95_ms" in base and current["p95_ms"] > max(base["p95_ms"] * (1 + tolerance),
+                                                        base["p95_ms"] + MIN_LATENCY_DELTA_MS):
+            regressions.append(f"{op}: p95 {current['p95_ms']} ms > baseline {base['p95_ms']} ms")
+        if current["error_rate"] > base["error_rate"] + MAX_ERROR_RATE_DELTA:
+            regressions.append(f"{op}: error rate {current['error_rate']:.2%} > baseline {base['error_rate']:.2%}")
+    return regressions
+
+
+def print_report(result: dict, target: str):
+    print(f"\nTarget: {target}")
+    print(f"Calls: {result['calls_started']} started ({result['calls_per_second']}/s), "
+          f"{result['calls_completed']} completed, {result['calls_failed']} with errors, "
+          f"{result['late_starts']} started late (all {result['config']['concurrency']} slots busy)")
+    print(f"Requests: {result['requests']} in {result['elapsed_s']} s = {result['throughput_rps']} req/s, "
+          f"error rate {result['error_rate']:.2%}")
+    print(f"\n{'operation':<20}{'count':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+          f"{'errors':>9}  statuses")
+    for op, stats in result["operations"].items():
+        statuses = " ".join(f"{status}:{count}" for status, count in stats["statuses"].items())
+        print(f"{op:<20}{stats['count']:>8}{stats['throughput_rps']:>9}{stats['p50_ms']:>9}{stats['p95_ms']:>9}"
+              f"{stats['p99_ms']:>9}{stats['max_ms']:>9}{stats['error_rate']:>9.2%}  {statuses}")
+
+
+@asynccontextmanager
+async def in_process_client():
+    """Client for webhook_server.app in this process, with its lifespan running."""
+    # Memory storage and a scratch transcript directory, so a run leaves nothing
+    # behind; request logging off so the report isn't buried
+    os.environ.setdefault("WEBHOOK_STORAGE", "memory")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    with tempfile.TemporaryDirectory(prefix="greenline-load-") as scratch:
+        os.environ.setdefault("TRANSCRIPT_STORE_DIR", scratch)
+        import webhook_server
+
+        async with webhook_server.lifespan(webhook_server.app):
+            transport = httpx.ASGITransport(app=webhook_server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://load-test",
+                                         timeout=REQUEST_TIMEOUT) as client:
+                yield client
+
+
+@asynccontextmanager
+async def http_client(url: str, concurrency: int):
+    """Client for a running server, with a connection per in-flight call."""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=REQUEST_TIMEOUT) as client:
+        yield client
+
+
+async def main_async(args) -> dict:
+    target = http_client(args.url, args.concurrency) if args.url else in_process_client()
+    async with target as client:
+        generator = LoadGenerator(client, rate=args.rate, concurrency=args.concurrency, duration=args.duration,
+                                  think_time=args.think_time, api_key=os.environ.get("RETELL_API_KEY", ""))
+        return await generator.run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay synthetic Retell calls against the webhook server")
+    parser.add_argument("--url", help="Running server, e.g. http://localhost:8000 (default: webhook_server.app in-process)")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help=f"Calls started per second (default: {DEFAULT_RATE:g})")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Calls in flight at most (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION,
+                        help=f"Seconds to keep starting calls (default: {DEFAULT_DURATION:g})")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Seconds between a call's requests (default: 0)")
+    parser.add_argument("--save-baseline", help="Write the report as a baseline to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to check this run against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"Allowed relative regression for --compare (default: {DEFAULT_TOLERANCE:g})")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "rb") as f:
+            baseline = fast_json.loads(f.read())
+        # Refuse before spending --duration on a run that can't be compared
+        config = run_config(args.rate, args.concurrency, args.duration, args.think_time,
+                            bool(os.environ.get("RETELL_API_KEY")))
+        mismatches = config_mismatches(config, baseline)
+        if mismatches:
+            parser.error(f"{args.compare} was recorded with different load settings: {', '.join(mismatches)}")
+
+    try:
+        result = asyncio.run(main_async(args))
+    except ValueError as e:
+        parser.error(str(e))
+    print_report(result, args.url or "webhook_server.app (in-process)")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "wb") as f:
+            f.write(fast_json.dumps(result))
+        print(f"\nBaseline written to {args.save_baseline}")
+
+    if baseline is not None:
+        regressions = compare(result, baseline, args.tolerance)
+        print(f"\nCompared with {args.compare} (run {baseline.get('run_at', '?')}, tolerance {args.tolerance:.0%}):")
+        for message in regressions:
+            print(f"  REGRESSION {message}")
+        if regressions:
+            sys.exit(1)
+        print("  No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -42,6 +42,12 @@ from dataclasses import dataclass, field
 from typing import Optional
 from retell import Retell
 
+from async_clients import AsyncClientPool
+from flow_cache import FlowCache, api_key_namespace
+from flow_definitions import load_definition, write_definition
+from flow_graph import validate_flow
+from flow_templates import CompiledSection, marker_config
+
 # Import utilities from the inbound agent
 from greenline_agent import (
     normalize_phone_to_e164,
@@ -56,6 +62,20 @@ if SUPABASE_AVAILABLE:
 # Default webhook URL for GreenLine AI CRM integration
 DEFAULT_WEBHOOK_URL = "https://www.greenline-ai.com/api/outbound/webhook"
 
+# GreenLineOutboundConfig fields substituted into the precompiled node/prompt templates
+TEMPLATE_SLOT_FIELDS = (
+    "agent_name",
+    "company_name",
+    "base_price",
+    "price_description",
+    "cal_booking_url",
+)
+
+# Other GreenLineOutboundConfig fields _build_nodes reads; each combination gets
+# its own node template. None today: URLs, voice, model and timezone only
+# affect the tools and agent settings
+NODE_SHAPE_FIELDS = ()
+
 
 @dataclass
 class GreenLineOutboundConfig:
@@ -98,9 +118,23 @@ class GreenLineOutboundAgentBuilder:
     - Handle objections and send follow-up SMS
     """
 
-    def __init__(self, api_key: str, supabase_url: str = None, supabase_key: str = None):
+    def __init__(
+        self,
+        api_key: str,
+        supabase_url: str = None,
+        supabase_key: str = None,
+        flow_cache: FlowCache = None,
+        flow_definition: str = None
+    ):
         self.client = Retell(api_key=api_key)
 
+        # Optional content-addressed cache to reuse identical flows
+        self.flow_cache = flow_cache
+        self._cache_namespace = api_key_namespace(api_key)
+
+        # Optional flow definition file (name or path) replacing the built-in nodes and prompt
+        self.flow_definition = flow_definition
+
         # Initialize Supabase client for CRM integration
         self.supabase: Optional[Client] = None
         if SUPABASE_AVAILABLE:
@@ -141,24 +175,75 @@ class GreenLineOutboundAgentBuilder:
         }
 
     def _create_conversation_flow(self, config: GreenLineOutboundConfig):
-        """Create the conversation flow with all nodes and transitions."""
+        """Create the conversation flow, reusing an identical cached flow if possible."""
+        params = self._build_flow_params(config)
+        if self.flow_cache is None:
+            return self.client.conversation_flow.create(**params)
+        return self.flow_cache.get_or_create(self.client, self._cache_namespace, params)
+
+    def _build_flow_params(self, config: GreenLineOutboundConfig) -> dict:
+        """
+        Build the conversation_flow.create payload (shared by the sync and async builders).
+
+        Raises:
+            FlowValidationError: If the flow graph has structural errors (see flow_graph.py)
+        """
 
-        nodes = self._build_nodes(config)
         tools = self._build_custom_tools(config)
 
-        return self.client.conversation_flow.create(
-            model_choice={
+        params = {
+            "model_choice": {
                 "type": "cascading",
                 "model": config.model
             },
-            nodes=nodes,
-            tools=tools,
-            start_speaker="agent",
-            global_prompt=self._build_global_prompt(config),
-            start_node_id="welcome",
-            model_temperature=0.4  # Slightly higher for sales conversations
+            "tools": tools,
+            "start_speaker": "agent",
+            "start_node_id": "welcome",
+            "model_temperature": 0.4  # Slightly higher for sales conversations
+        }
+
+        if self.flow_definition:
+            # Nodes and prompt come from a flow definition file (see flow_definitions.py)
+            params.update(load_definition(self.flow_definition).render(self._template_slots(config)))
+        else:
+            params["nodes"] = self._render_nodes(config)
+            params["global_prompt"] = self._build_global_prompt(config)
+
+        # Refuse to deploy flows with dangling edges, unreachable nodes or dead ends
+        validate_flow(params)
+        return params
+
+    def export_flow_definition(self, path: str, version: int = 1) -> dict:
+        """
+        Write the built-in nodes and global prompt as a flow definition file.
+
+        Args:
+            path: Output .json (or .yaml) path
+            version: Definition version to record
+
+        Returns:
+            The exported flow fields (with slot markers)
+        """
+        sample = GreenLineOutboundConfig()
+        markers = marker_config(sample, TEMPLATE_SLOT_FIELDS)
+        flow = {
+            "global_prompt": self._build_global_prompt(markers),
+            "nodes": self._build_nodes(markers),
+            "start_node_id": "welcome",
+            "start_speaker": "agent",
+            "model_temperature": 0.4,
+        }
+        write_definition(
+            path, "outbound_sales", flow, TEMPLATE_SLOT_FIELDS,
+            version=version, description="Outbound sales agent (GreenLineOutboundAgentBuilder)",
         )
 
+        # Make sure the file renders exactly what the builder would
+        rendered = load_definition(path).render(self._template_slots(sample))
+        if rendered["nodes"] != self._build_nodes(sample) or rendered["global_prompt"] != self._build_global_prompt(sample):
+            raise ValueError(f"{path} does not reproduce the built-in flow")
+        return flow
+
     def _build_custom_tools(self, config: GreenLineOutboundConfig) -> list:
         """
         Build custom webhook tools for Cal.com integration.
@@ -261,6 +346,23 @@ class GreenLineOutboundAgentBuilder:
             }
         ]
 
+    def _template_slots(self, config: GreenLineOutboundConfig) -> dict:
+        """Per-tenant values interpolated into the nodes (and flow definition files)."""
+        return {name: getattr(config, name) for name in TEMPLATE_SLOT_FIELDS}
+
+    def _node_template(self) -> CompiledSection:
+        """Precompiled node template, shared by all instances of the class."""
+        cls = type(self)
+        if "_nodes_template" not in cls.__dict__:
+            cls._nodes_template = CompiledSection(
+                self._build_nodes, self._template_slots, TEMPLATE_SLOT_FIELDS, shape_fields=NODE_SHAPE_FIELDS
+            )
+        return cls._nodes_template
+
+    def _render_nodes(self, config: GreenLineOutboundConfig) -> list:
+        """Render the nodes from the precompiled template (read-only result)."""
+        return self._node_template().render(config)
+
     def _build_global_prompt(self, config: GreenLineOutboundConfig) -> str:
         """Build the global system prompt for the outbound sales agent."""
 
@@ -1836,6 +1938,10 @@ I'll give you a call then. Thanks so much for your time, and talk to you soon!""
 
     def _create_voice_agent(self, config: GreenLineOutboundConfig, flow_id: str):
         """Create the voice agent and attach the conversation flow."""
+        return self.client.agent.create(**self._build_agent_params(config, flow_id))
+
+    def _build_agent_params(self, config: GreenLineOutboundConfig, flow_id: str) -> dict:
+        """Build the agent.create payload (shared by the sync and async builders)."""
 
         agent_params = {
             "agent_name": f"{config.company_name} Sales Agent ({config.agent_name})",
@@ -1852,7 +1958,87 @@ I'll give you a call then. Thanks so much for your time, and talk to you soon!""
             agent_params["webhook_url"] = config.webhook_url
             print(f"Webhook configured: {config.webhook_url}")
 
-        return self.client.agent.create(**agent_params)
+        return agent_params
+
+
+class AsyncGreenLineOutboundAgentBuilder(GreenLineOutboundAgentBuilder):
+    """
+    asyncio variant of GreenLineOutboundAgentBuilder.
+
+    Uses AsyncRetell from a shared AsyncClientPool; nodes, prompt and tools
+    are inherited unchanged from GreenLineOutboundAgentBuilder.
+
+    Without a `pool` the builder creates its own; close it with
+    `await builder.aclose()` or `async with`.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        pool: AsyncClientPool = None,
+        flow_cache: FlowCache = None,
+        flow_definition: str = None
+    ):
+        self._owns_pool = pool is None
+        self.pool = pool or AsyncClientPool()
+        self.client = self.pool.retell(api_key)
+        self.supabase = None  # The outbound builder does not write to Supabase
+
+        self.flow_cache = flow_cache
+        self._cache_namespace = api_key_namespace(api_key)
+        self.flow_definition = flow_definition
+
+    async def aclose(self):
+        """Close the client pool if this builder created it (a pool passed in is left open)."""
+        if self._owns_pool:
+            await self.pool.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def create_agent(self, config: GreenLineOutboundConfig) -> dict:
+        """
+        Create a complete outbound sales agent.
+
+        Args:
+            config: GreenLineOutboundConfig with agent settings
+
+        Returns:
+            dict with conversation_flow_id and agent_id
+        """
+        # Normalize phone numbers
+        if config.transfer_number:
+            config.transfer_number = normalize_phone_to_e164(config.transfer_number)
+
+        # Step 1: Create the conversation flow
+        conversation_flow = await self._create_conversation_flow(config)
+        flow_id = conversation_flow.conversation_flow_id
+        print(f"Created conversation flow: {flow_id}")
+
+        # Step 2: Create the voice agent
+        agent = await self._create_voice_agent(config, flow_id)
+        agent_id = agent.agent_id
+        print(f"Created voice agent: {agent_id}")
+
+        return {
+            "conversation_flow_id": flow_id,
+            "agent_id": agent_id,
+            "config": config
+        }
+
+    async def _create_conversation_flow(self, config: GreenLineOutboundConfig):
+        """Create the conversation flow, reusing an identical cached flow if possible."""
+        params = self._build_flow_params(config)
+        if self.flow_cache is None:
+            return await self.client.conversation_flow.create(**params)
+        return await self.flow_cache.aget_or_create(self.client, self._cache_namespace, params)
+
+    async def _create_voice_agent(self, config: GreenLineOutboundConfig, flow_id: str):
+        """Create the voice agent and attach the conversation flow."""
+        return await self.client.agent.create(**self._build_agent_params(config, flow_id))
 
 
 def create_outbound_agent():
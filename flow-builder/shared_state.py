@@ -0,0 +1,292 @@
+"""
+State shared between webhook server workers.
+
+Running the server with several worker processes (`--workers N`) gives
+each process its own copy of the module globals, so without a shared
+store workers would replay different idempotent responses, keep serving
+a slot another worker just booked, and so on. SharedState is a small
+key-value interface those components use instead:
+
+- LocalState: a dict in this process (single worker, tests)
+- SQLiteState (default with SQLite storage): a table in the webhook
+  database; WAL mode lets every worker on the host read and write it
+- RedisState: a Redis (or Redis-compatible) server, for workers spread
+  over several hosts; needs the `redis` package and REDIS_URL
+
+Values are strings (callers store JSON), keys can expire, and add() /
+incr() are atomic across workers. Every method is a coroutine: Redis goes
+through the redis.asyncio client and SQLite statements run in a worker
+thread, so the event loop never waits on the store. Leads, appointments and calls are
+already shared through the SQLite repository (see webhook_storage.py).
+
+Select the backend with WEBHOOK_SHARED_STATE=local|sqlite|redis.
+
+Usage:
+    state = create_shared_state()
+    if await state.add("lock:call_123", "1", ttl=30):   # First worker to claim it
+        ...
+    await state.incr("availability:generation")
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from webhook_storage import DEFAULT_DB_PATH
+
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# Writes between sweeps of expired SQLite rows
+_PURGE_EVERY = 1000
+
+
+class SharedState:
+    """
+    Interface for the shared key-value store; backends implement every method.
+
+    Methods are coroutines, so a slow Redis round trip or a busy SQLite
+    lock holds up only the request waiting on it, not the event loop.
+    """
+
+    async def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None):
+        """Store a value, expiring after `ttl` seconds (never, if None)."""
+        raise NotImplementedError
+
+    async def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        """Store a value only if the key is absent; True if this call stored it."""
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    async def incr(self, key: str) -> int:
+        """Increment an integer counter (missing keys start at 0); returns the new value."""
+        raise NotImplementedError
+
+    async def keys(self, prefix: str) -> list:
+        """Live keys starting with `prefix`."""
+        raise NotImplementedError
+
+    async def close(self):
+        """Release resources."""
+
+
+class LocalState(SharedState):
+    """Process-local dict; only correct with a single worker."""
+
+    def __init__(self):
+        self._values: dict = {}  # key -> (expires_at or None, value)
+
+    def _live(self, key: str):
+        entry = self._values.get(key)
+        if entry is not None and entry[0] is not None and entry[0] <= time.time():
+            del self._values[key]
+            return None
+        return entry
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._live(key)
+        return entry[1] if entry else None
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None):
+        self._values[key] = (time.time() + ttl if ttl else None, value)
+
+    async def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        if self._live(key):
+            return False
+        await self.set(key, value, ttl)
+        return True
+
+    async def delete(self, key: str):
+        self._values.pop(key, None)
+
+    async def incr(self, key: str) -> int:
+        entry = self._live(key)
+        value = int(entry[1]) + 1 if entry else 1
+        self._values[key] = (entry[0] if entry else None, str(value))
+        return value
+
+    async def keys(self, prefix: str) -> list:
+        return [key for key in list(self._values) if key.startswith(prefix) and self._live(key)]
+
+
+class SQLiteState(SharedState):
+    """
+    Key-value table in a SQLite database shared by the workers on one host.
+
+    Statements run in a worker thread (asyncio.to_thread), so waiting on
+    another worker's write lock doesn't stall this worker's event loop.
+    The database is opened on first use.
+
+    Args:
+        path: Database file (the webhook database by default)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        # Called with self._lock held
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS shared_state (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL
+                )
+            """)
+            self._conn = conn
+        return self._conn
+
+    def _fetch(self, sql: str, params: tuple) -> list:
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def _write(self, sql: str, params: tuple) -> int:
+        """Run a write; returns its row count."""
+        with self._lock:
+            conn = self._connect()
+            rowcount = conn.execute(sql, params).rowcount
+            self._writes += 1
+            if self._writes % _PURGE_EVERY == 0:
+                conn.execute("DELETE FROM shared_state WHERE expires_at <= ?", (time.time(),))
+            return rowcount
+
+    async def get(self, key: str) -> Optional[str]:
+        rows = await asyncio.to_thread(
+            self._fetch,
+            "SELECT value FROM shared_state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time()),
+        )
+        return rows[0][0] if rows else None
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None):
+        await asyncio.to_thread(
+            self._write,
+            "INSERT OR REPLACE INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl if ttl else None),
+        )
+
+    async def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        now = time.time()
+        # Replaces an expired row; a live one is left alone and nothing changes
+        rowcount = await asyncio.to_thread(
+            self._write,
+            "INSERT INTO shared_state (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+            "WHERE shared_state.expires_at IS NOT NULL AND shared_state.expires_at <= ?",
+            (key, value, now + ttl if ttl else None, now),
+        )
+        return rowcount == 1
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._write, "DELETE FROM shared_state WHERE key = ?", (key,))
+
+    async def incr(self, key: str) -> int:
+        rows = await asyncio.to_thread(
+            self._fetch,
+            "INSERT INTO shared_state (key, value, expires_at) VALUES (?, '1', NULL) "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(shared_state.value AS INTEGER) + 1 "
+            "RETURNING value",
+            (key,),
+        )
+        return int(rows[0][0])
+
+    async def keys(self, prefix: str) -> list:
+        rows = await asyncio.to_thread(
+            self._fetch,
+            "SELECT key FROM shared_state WHERE key >= ? AND key < ? AND (expires_at IS NULL OR expires_at > ?)",
+            (prefix, prefix + "\uffff", time.time()),
+        )
+        return [row[0] for row in rows]
+
+    def _close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    async def close(self):
+        await asyncio.to_thread(self._close)
+
+
+class RedisState(SharedState):
+    """
+    Redis-backed state, for workers on more than one host (redis.asyncio client).
+
+    Args:
+        url: Redis URL, e.g. redis://localhost:6379/0
+        namespace: Prefix for every key
+    """
+
+    def __init__(self, url: str, namespace: str = "greenline:"):
+        if not REDIS_AVAILABLE:
+            raise ValueError("Redis shared state requires the redis package (pip install redis)")
+        self.url = url
+        self.namespace = namespace
+        # Connects lazily, on the first command
+        self._client = aioredis.Redis.from_url(url, decode_responses=True)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client.get(self.namespace + key)
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None):
+        await self._client.set(self.namespace + key, value, px=int(ttl * 1000) if ttl else None)
+
+    async def add(self, key: str, value: str, ttl: Optional[float] = None) -> bool:
+        return bool(await self._client.set(self.namespace + key, value, nx=True,
+                                           px=int(ttl * 1000) if ttl else None))
+
+    async def delete(self, key: str):
+        await self._client.delete(self.namespace + key)
+
+    async def incr(self, key: str) -> int:
+        return int(await self._client.incr(self.namespace + key))
+
+    async def keys(self, prefix: str) -> list:
+        start = len(self.namespace)
+        return [key[start:] async for key in self._client.scan_iter(match=f"{self.namespace}{prefix}*", count=500)]
+
+    async def close(self):
+        await self._client.aclose()
+
+
+def create_shared_state(backend: Optional[str] = None) -> SharedState:
+    """
+    Shared state selected by argument or the WEBHOOK_SHARED_STATE env var.
+
+    The default follows WEBHOOK_STORAGE: "sqlite" (in the WEBHOOK_DB_PATH
+    database) with SQLite storage, "local" with memory storage.
+
+    Args:
+        backend: "local", "sqlite" or "redis" (REDIS_URL, default redis://localhost:6379/0)
+
+    Raises:
+        ValueError: For an unknown backend, or redis without the redis package
+    """
+    storage = (os.environ.get("WEBHOOK_STORAGE") or "sqlite").lower()
+    backend = (backend or os.environ.get("WEBHOOK_SHARED_STATE")
+               or ("local" if storage == "memory" else "sqlite")).lower()
+    if backend == "local":
+        return LocalState()
+    if backend == "sqlite":
+        return SQLiteState(os.environ.get("WEBHOOK_DB_PATH") or DEFAULT_DB_PATH)
+    if backend == "redis":
+        return RedisState(os.environ.get("REDIS_URL") or "redis://localhost:6379/0")
+    raise ValueError(f"Unknown WEBHOOK_SHARED_STATE backend: {backend} (expected 'local', 'sqlite' or 'redis')")
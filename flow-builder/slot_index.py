@@ -0,0 +1,141 @@
+"""
+Precomputed index of open appointment slots for the mock calendar.
+
+get_mock_availability used to walk the calendar day by day and strftime
+every slot on each request, and the preferred-date filter then scanned
+the results. SlotIndex generates the slots once, formats their display
+strings once, and keeps them in a sorted list:
+
+- next_available() / on_date() / next_on_weekday() are bisect lookups
+- refresh() is incremental: past slots are trimmed from the front and only
+  the days that came into the horizon are generated
+- book() removes a slot, so it is not offered again
+
+When availability starts depending on service type, keep one SlotIndex
+per service type (each with its own hours).
+
+Usage:
+    index = SlotIndex()
+    index.next_available(limit=6)
+    index.on_date(date(2025, 6, 12))
+    index.next_on_weekday(3)            # Next Thursday with an open slot
+    index.book(datetime(2025, 6, 12, 9))
+"""
+
+from bisect import bisect_left
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+DEFAULT_HOURS = (9, 11, 14, 16)
+DEFAULT_WORKDAYS = (0, 1, 2, 3, 4, 5)  # Mon-Sat
+DEFAULT_HORIZON_DAYS = 28
+DISPLAY_FORMAT = "%A, %B %d at %I:%M %p"
+
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+
+class SlotIndex:
+    """
+    Sorted open slots from tomorrow to `horizon_days` ahead.
+
+    Args:
+        hours: Slot start hours each working day
+        workdays: Working weekdays (0 = Monday)
+        horizon_days: How far ahead slots are generated
+    """
+
+    def __init__(
+        self,
+        hours: tuple = DEFAULT_HOURS,
+        workdays: tuple = DEFAULT_WORKDAYS,
+        horizon_days: int = DEFAULT_HORIZON_DAYS,
+    ):
+        self.hours = tuple(sorted(hours))
+        self.workdays = frozenset(workdays)
+        self.horizon_days = horizon_days
+        self._times: list = []  # Sorted slot datetimes
+        self._slots: dict = {}  # datetime -> {"datetime", "display"}
+        self._first_day: Optional[date] = None
+        self._last_day: Optional[date] = None  # Last day generated
+
+    def refresh(self, now: Optional[datetime] = None):
+        """Trim slots before tomorrow and generate days newly inside the horizon."""
+        now = now or datetime.now()
+        first_day = now.date() + timedelta(days=1)
+        last_day = now.date() + timedelta(days=self.horizon_days)
+        if first_day == self._first_day:
+            return
+
+        cut = bisect_left(self._times, datetime.combine(first_day, time.min))
+        for slot_time in self._times[:cut]:
+            del self._slots[slot_time]
+        del self._times[:cut]
+
+        day = first_day if self._last_day is None or self._last_day < first_day \
+            else self._last_day + timedelta(days=1)
+        while day <= last_day:
+            if day.weekday() in self.workdays:
+                for hour in self.hours:
+                    slot_time = datetime.combine(day, time(hour))
+                    self._times.append(slot_time)
+                    self._slots[slot_time] = {
+                        "datetime": slot_time.isoformat(),
+                        "display": slot_time.strftime(DISPLAY_FORMAT),
+                    }
+            day += timedelta(days=1)
+        self._first_day, self._last_day = first_day, last_day
+
+    def _range(self, start: datetime, end: Optional[datetime], limit: Optional[int]) -> list:
+        self.refresh()
+        lo = bisect_left(self._times, start)
+        hi = bisect_left(self._times, end) if end else len(self._times)
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        return [self._slots[slot_time] for slot_time in self._times[lo:hi]]
+
+    def next_available(self, after: Optional[datetime] = None, limit: Optional[int] = 6) -> list:
+        """Open slots after `after` (default: now), earliest first."""
+        return self._range(after or datetime.now(), None, limit)
+
+    def on_date(self, day: date, limit: Optional[int] = None) -> list:
+        """Open slots on one day."""
+        start = datetime.combine(day, time.min)
+        return self._range(start, start + timedelta(days=1), limit)
+
+    def next_on_weekday(self, weekday: int, limit: Optional[int] = None) -> list:
+        """Open slots on the first upcoming `weekday` (0 = Monday) that has any."""
+        self.refresh()
+        day = self._first_day + timedelta(days=(weekday - self._first_day.weekday()) % 7)
+        while day <= self._last_day:
+            slots = self.on_date(day, limit)
+            if slots:
+                return slots
+            day += timedelta(days=7)
+        return []
+
+    def book(self, slot_time: datetime) -> bool:
+        """
+        Remove a slot from the index.
+
+        Returns:
+            True if the slot was open
+        """
+        if slot_time not in self._slots:
+            return False
+        del self._slots[slot_time]
+        del self._times[bisect_left(self._times, slot_time)]
+        return True
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+
+def parse_weekday(value: str) -> Optional[int]:
+    """0-6 for a weekday name ("thu", "Thursday"), else None."""
+    value = value.strip().lower()
+    if len(value) < 3:
+        return None
+    for number, name in enumerate(WEEKDAYS):
+        if name.startswith(value):
+            return number
+    return None
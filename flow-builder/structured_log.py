@@ -0,0 +1,266 @@
+"""
+Structured logging for the webhook server, formatted off the event loop.
+
+The endpoints and the call event pipeline used to print() on the event
+loop for every request and event (call_analyzed printed the whole
+analysis dict). configure_logging() routes the "greenline" loggers
+through a queue instead:
+
+    logger.info() -> sampling filter -> ContextQueueHandler -> queue -> listener thread -> JSON -> stdout
+
+- the calling side only checks the level, samples, attaches context and
+  enqueues the record; JSON formatting and the write happen on the
+  QueueListener's thread
+- the queue is bounded and enqueueing never blocks: when it is full the
+  record is dropped and counted (see stats()), so logging can't stall
+  request handling
+- call_id / agent_id (and anything else bound with bind() or
+  log_context()) are added to every record automatically, via
+  contextvars, so they follow each request and pipeline event
+- high-frequency events can be sampled per `event` name (LOG_SAMPLE);
+  warnings and errors are never sampled
+
+Records carry an `event` name and fields through `extra`:
+
+    logger = get_logger("webhook")
+    logger.info("Lead captured", extra={"event": "lead_captured", "lead_id": lead_id})
+
+    {"ts": "2025-06-12T14:03:07.120Z", "level": "INFO", "logger": "greenline.webhook",
+     "msg": "Lead captured", "event": "lead_captured", "lead_id": "LEAD-...", "call_id": "call_123"}
+
+Configure with LOG_LEVEL (default INFO), LOG_FORMAT=json|text and
+LOG_SAMPLE, e.g. "availability_checked=0.1,call_event=0.25" (keep 1 in 10
+availability checks and 1 in 4 call events).
+"""
+
+import atexit
+import contextlib
+import contextvars
+import logging
+import os
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+import fast_json
+
+ROOT_LOGGER = "greenline"
+DEFAULT_QUEUE_SIZE = 10000
+
+_context: contextvars.ContextVar = contextvars.ContextVar("log_context", default={})
+
+# LogRecord attributes; anything else on a record came from `extra`
+_RECORD_FIELDS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "context"}
+
+_listener: Optional[QueueListener] = None
+_handler: Optional["ContextQueueHandler"] = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger under the "greenline" hierarchy (configured by configure_logging())."""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def bind(**fields):
+    """Add fields to every record logged from the current context (e.g. one request)."""
+    _context.set({**_context.get(), **{name: value for name, value in fields.items() if value is not None}})
+
+
+@contextlib.contextmanager
+def log_context(**fields):
+    """Add fields to records logged inside the block."""
+    token = _context.set({**_context.get(), **{name: value for name, value in fields.items() if value is not None}})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def parse_sample_rates(value: str) -> dict:
+    """{"event": rate} from "event=0.1,other=0.5"; raises ValueError for bad entries."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, rate = item.partition("=")
+        rate = float(rate)
+        if not name or not 0 < rate <= 1:
+            raise ValueError(f"Invalid LOG_SAMPLE entry: {item} (expected event=rate, 0 < rate <= 1)")
+        rates[name.strip()] = rate
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep 1 in every 1/rate INFO/DEBUG records per `event` name.
+
+    Args:
+        rates: event name -> fraction kept (events not listed are all kept)
+    """
+
+    def __init__(self, rates: dict):
+        super().__init__()
+        self.every = {name: max(1, round(1 / rate)) for name, rate in rates.items()}
+        self.seen: dict = {}
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        every = self.every.get(getattr(record, "event", None))
+        if every is None or every == 1 or record.levelno >= logging.WARNING:
+            return True
+        seen = self.seen[record.event] = self.seen.get(record.event, 0) + 1
+        if seen % every == 1:
+            record.sample_rate = 1 / every
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class ContextQueueHandler(QueueHandler):
+    """
+    QueueHandler that attaches the context, never formats and never blocks.
+
+    Args:
+        log_queue: Unbounded SimpleQueue (its put() takes no lock in Python code)
+        max_size: Records waiting before new ones are dropped
+    """
+
+    def __init__(self, log_queue: queue.SimpleQueue, max_size: int = DEFAULT_QUEUE_SIZE):
+        super().__init__(log_queue)
+        self.max_size = max_size
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The queue stays in this process, so the record is passed as-is and
+        # formatted by the listener; only the context has to be captured here
+        record.context = _context.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if self.queue.qsize() >= self.max_size:
+            self.dropped += 1
+            return
+        self.queue.put_nowait(record)
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, context and extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "context", {}))
+        for name, value in vars(record).items():
+            if name not in _RECORD_FIELDS:
+                entry[name] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return fast_json.dumps(entry).decode("utf-8")
+
+
+class TextFormatter(logging.Formatter):
+    """Readable lines for local runs: time, level, message, then key=value fields."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(message)s", datefmt="%H:%M:%S")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = {**getattr(record, "context", {}),
+                  **{name: value for name, value in vars(record).items() if name not in _RECORD_FIELDS}}
+        if fields:
+            line += "  " + " ".join(f"{name}={value}" for name, value in fields.items())
+        return line
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    fmt: Optional[str] = None,
+    sample: Optional[str] = None,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    stream=None,
+) -> logging.Logger:
+    """
+    Route the "greenline" loggers through a queue to a formatting thread.
+
+    Calling it again replaces the previous configuration.
+
+    Args:
+        level: DEBUG, INFO, WARNING, ... (default: LOG_LEVEL or INFO)
+        fmt: "json" or "text" (default: LOG_FORMAT or json)
+        sample: Sample rates, "event=rate,..." (default: LOG_SAMPLE)
+        queue_size: Records buffered before new ones are dropped
+        stream: Where formatted records go (default: stdout)
+
+    Returns:
+        The "greenline" root logger
+
+    Raises:
+        ValueError: For an unknown level or format, or a bad sample rate
+    """
+    global _listener, _handler
+    stop_logging()
+
+    level = (level or os.environ.get("LOG_LEVEL") or "INFO").upper()
+    if not isinstance(logging.getLevelName(level), int):
+        raise ValueError(f"Unknown LOG_LEVEL: {level}")
+    fmt = (fmt or os.environ.get("LOG_FORMAT") or "json").lower()
+    if fmt not in ("json", "text"):
+        raise ValueError(f"Unknown LOG_FORMAT: {fmt} (expected 'json' or 'text')")
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JSONFormatter() if fmt == "json" else TextFormatter())
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _handler = ContextQueueHandler(log_queue, queue_size)
+    rates = parse_sample_rates(sample if sample is not None else os.environ.get("LOG_SAMPLE", ""))
+    if rates:
+        _handler.addFilter(SamplingFilter(rates))
+    _listener = QueueListener(log_queue, output)
+    _listener.start()
+
+    logger = logging.getLogger(ROOT_LOGGER)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(_handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    return logger
+
+
+def stop_logging():
+    """
+    Detach the queue handler, write out queued records and stop the listener thread.
+
+    Until configure_logging() runs again, "greenline" records propagate to
+    the standard logging root instead of piling up in an unread queue.
+    """
+    global _listener, _handler
+    handler, _handler = _handler, None
+    if handler is not None:
+        logger = logging.getLogger(ROOT_LOGGER)
+        logger.removeHandler(handler)
+        logger.propagate = True
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+
+def stats() -> dict:
+    """Queue depth plus dropped and sampled-out record counts."""
+    if _handler is None:
+        return {"configured": False}
+    sampler = next((f for f in _handler.filters if isinstance(f, SamplingFilter)), None)
+    return {
+        "configured": True,
+        "depth": _handler.queue.qsize(),
+        "dropped": _handler.dropped,
+        "sampled_out": sampler.sampled_out if sampler else 0,
+    }
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Tests for batch_provisioner.py.
+
+Runs BatchProvisioner against a fake builder (no Retell or Supabase
+calls) to check retries, the journal and resuming an interrupted batch.
+
+Usage:
+    cd flow-builder
+    python -m pytest test_batch_provisioner.py
+    python test_batch_provisioner.py
+"""
+
+import os
+import tempfile
+from types import SimpleNamespace
+
+import httpx
+from retell import APIConnectionError, APIStatusError, APITimeoutError
+
+from batch_provisioner import (
+    BatchProvisioner,
+    ProvisioningJournal,
+    is_retryable,
+    jobs_from_configs,
+    jobs_from_onboarding_ids,
+)
+from greenline_agent import GreenLineConfig
+
+_REQUEST = httpx.Request("POST", "https://api.retellai.com/create-agent")
+
+ONBOARDING = {
+    "business_name": "Acme Lawn", "business_type": "landscaping", "phone": "(408) 555-1234",
+    "owner_name": "Ann", "city": "San Jose", "state": "CA",
+}
+
+
+class FakeBuilder:
+    """Records calls; each step fails with the errors queued for it first."""
+
+    def __init__(self, **failures):
+        self.failures = {step: list(errors) for step, errors in failures.items()}
+        self.calls = []
+
+    def _step(self, step: str):
+        self.calls.append(step)
+        errors = self.failures.get(step)
+        if errors:
+            error = errors.pop(0)
+            if isinstance(error, Exception):
+                raise error
+            return error
+        return None
+
+    def fetch_onboarding(self, onboarding_id):
+        self._step("fetch_onboarding")
+        return dict(ONBOARDING, id=onboarding_id, user_id=f"owner-of-{onboarding_id}")
+
+    def prepare_config(self, config):
+        return config
+
+    def create_conversation_flow(self, config):
+        self._step("create_flow")
+        return SimpleNamespace(conversation_flow_id=f"flow-{self.calls.count('create_flow')}")
+
+    def create_voice_agent(self, config, flow_id):
+        self._step("create_agent")
+        return SimpleNamespace(agent_id=f"agent-{self.calls.count('create_agent')}")
+
+    def link_agent_to_onboarding(self, onboarding_id, agent_id, flow_id=None):
+        outcome = self._step("link")
+        return outcome if outcome is not None else True
+
+
+def _status_error(status: int) -> APIStatusError:
+    return APIStatusError("error", response=httpx.Response(status, request=_REQUEST), body=None)
+
+
+def _connection_error(cause: Exception) -> APIConnectionError:
+    try:
+        raise APIConnectionError(request=_REQUEST) from cause
+    except APIConnectionError as e:
+        return e
+
+
+def _provisioner(builder, journal_path, **kwargs):
+    return BatchProvisioner(builder, max_workers=2, rate_per_second=0, backoff_base=0,
+                            journal_path=journal_path, **kwargs)
+
+
+def test_link_failure_is_retried_and_not_journaled_done():
+    with tempfile.TemporaryDirectory() as directory:
+        journal_path = os.path.join(directory, "journal.jsonl")
+        builder = FakeBuilder(link=[False, False])
+        results, stats = _provisioner(builder, journal_path, max_retries=1).provision(
+            jobs_from_onboarding_ids(["ob-1"]))
+
+        assert results[0].status == "failed"
+        assert builder.calls.count("link") == 2
+        assert not ProvisioningJournal(journal_path).is_done("ob-1")
+
+        # Resuming reuses the flow and agent and only retries the link
+        builder = FakeBuilder()
+        results, stats = _provisioner(builder, journal_path).provision(jobs_from_onboarding_ids(["ob-1"]))
+        assert results[0].status == "created" and results[0].onboarding_updated
+        assert results[0].agent_id == "agent-1"
+        assert builder.calls == ["fetch_onboarding", "link"]
+        assert ProvisioningJournal(journal_path).is_done("ob-1")
+
+
+def test_creates_only_retried_when_nothing_was_created():
+    refused = _connection_error(httpx.ConnectError("refused"))
+    lost = _connection_error(httpx.ReadError("reset"))
+    for error, retry_create in [(refused, True), (_status_error(429), True), (lost, False),
+                                (APITimeoutError(request=_REQUEST), False), (_status_error(503), False),
+                                (_status_error(409), False)]:
+        assert is_retryable(error, idempotent=False) == retry_create, error
+    assert is_retryable(lost) and is_retryable(_status_error(503))
+    assert not is_retryable(_status_error(409))
+
+
+def test_ambiguous_create_failure_is_not_retried():
+    with tempfile.TemporaryDirectory() as directory:
+        journal_path = os.path.join(directory, "journal.jsonl")
+        builder = FakeBuilder(create_agent=[APITimeoutError(request=_REQUEST)],
+                              fetch_onboarding=[_status_error(503)], create_flow=[_status_error(429)])
+        results, _ = _provisioner(builder, journal_path).provision(jobs_from_onboarding_ids(["ob-1"]))
+
+        assert results[0].status == "failed"
+        assert builder.calls == ["fetch_onboarding", "fetch_onboarding", "create_flow", "create_flow",
+                                 "create_agent"]
+        assert ProvisioningJournal(journal_path).get("ob-1")["conversation_flow_id"] == "flow-2"
+
+
+def test_jobs_are_rate_limited_per_tenant():
+    builder = FakeBuilder()
+    provisioner = _provisioner(builder, None)
+    tenants = []
+    provisioner.rate_limiter.acquire = tenants.append
+    configs = [GreenLineConfig(company_name="Bob's HVAC", business_type="hvac", phone_number="4085550001")]
+    provisioner.provision(jobs_from_onboarding_ids(["ob-1"]) + jobs_from_configs(configs))
+
+    assert tenants.count("onboarding:ob-1") == 1  # The fetch, before the owner is known
+    assert tenants.count("user:owner-of-ob-1") == 3
+    assert tenants.count("company:bob-s-hvac") == 2
+
+    tenants.clear()
+    provisioner = _provisioner(FakeBuilder(), None)
+    provisioner.rate_limiter.acquire = tenants.append
+    provisioner.provision(jobs_from_configs(configs, tenant="campaign"))
+    assert tenants == ["campaign", "campaign"]
+
+
+def test_done_jobs_are_skipped_on_resume():
+    with tempfile.TemporaryDirectory() as directory:
+        journal_path = os.path.join(directory, "journal.jsonl")
+        _provisioner(FakeBuilder(), journal_path).provision(jobs_from_onboarding_ids(["ob-1", "ob-2"]))
+
+        builder = FakeBuilder()
+        results, stats = _provisioner(builder, journal_path).provision(
+            jobs_from_onboarding_ids(["ob-1", "ob-2", "ob-3"]))
+        assert stats.skipped == 2 and stats.created == 1
+        assert builder.calls == ["fetch_onboarding", "create_flow", "create_agent", "link"]
+        skipped = {result.job_id: result for result in results if result.status == "skipped"}
+        assert skipped["ob-1"].onboarding_updated
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Tests for call_events.py (the /webhook/retell ingestion pipeline).
+
+Checks that events are merged into call records, that malformed
+payloads, failing handlers and persistence errors are counted without
+stopping the worker, and that a batch that can't be saved is retried and
+then dead-lettered instead of dropped.
+
+Usage:
+    cd flow-builder
+    python -m pytest test_call_events.py
+    python test_call_events.py
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+
+import call_events
+from call_events import EventPipeline
+from transcript_store import TranscriptStore
+from webhook_storage import MemoryRepository, SQLiteRepository
+
+
+def _event(event, call_id, **call):
+    return {"event": event, "call": {"call_id": call_id, **call}}
+
+
+async def _run(pipeline: EventPipeline, *payloads):
+    await pipeline.start()
+    for payload in payloads:
+        assert pipeline.submit(payload)
+    await pipeline.stop()
+
+
+def test_events_merge_into_call_record():
+    repository = MemoryRepository()
+    pipeline = EventPipeline(repository)
+    asyncio.run(_run(
+        pipeline,
+        _event("call_ended", "c1", from_number="+14085551234", duration_ms=60000, transcript="Agent: hi"),
+        _event("call_started", "c1", from_number="+14085551234", direction="inbound"),
+    ))
+
+    call = repository.get_call("c1")
+    assert call["status"] == "ended"  # Never moves back to "started"
+    assert call["phone"] == "+14085551234"
+    assert call["transcript"] == "Agent: hi"
+    assert pipeline.counters["processed"] == 2
+
+
+def test_transcripts_persisted_off_the_event_loop():
+    repository = SQLiteRepository(":memory:")
+    with tempfile.TemporaryDirectory() as directory:
+        transcripts = TranscriptStore(directory)
+        pipeline = EventPipeline(repository, transcripts=transcripts)
+        asyncio.run(_run(pipeline, _event("call_ended", "c6", transcript="Agent: hello " * 500)))
+
+        call = repository.get_call("c6")
+        assert call["has_transcript"] and "transcript" not in call
+        assert transcripts.get("c6") == "Agent: hello " * 500
+        transcripts.close()
+    repository.close()
+
+
+def test_malformed_payload_does_not_stop_worker():
+    repository = MemoryRepository()
+    pipeline = EventPipeline(repository)
+
+    async def scenario():
+        await pipeline.start()
+        pipeline.submit({"event": ["x"], "call": {"call_id": "bad"}})
+        pipeline.submit(["not", "an", "object"])
+        await asyncio.wait_for(pipeline.queue.join(), 5)
+        # A later batch is still processed by the same worker
+        pipeline.submit(_event("call_started", "c2", direction="outbound", to_number="+14085559999"))
+        await asyncio.wait_for(pipeline.queue.join(), 5)
+        assert not pipeline._task.done()
+        await pipeline.stop()
+
+    asyncio.run(scenario())
+    assert pipeline.counters["invalid"] == 2
+    assert pipeline.counters["processed"] == 3
+    assert repository.get_call("c2")["phone"] == "+14085559999"
+
+
+class FlakyRepository(MemoryRepository):
+    """update_calls() fails `failures` times, then works."""
+
+    def __init__(self, failures: int):
+        super().__init__()
+        self.failures = failures
+
+    def update_calls(self, call_ids, update):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("disk full")
+        super().update_calls(call_ids, update)
+
+
+def _dead_letters(path: str) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def _without_backoff(test):
+    def run():
+        backoff, call_events.PERSIST_BACKOFF = call_events.PERSIST_BACKOFF, 0.001
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                test(directory)
+        finally:
+            call_events.PERSIST_BACKOFF = backoff
+    run.__name__ = test.__name__
+    return run
+
+
+@_without_backoff
+def test_handler_and_persist_errors_are_counted(directory):
+    pipeline = EventPipeline(FlakyRepository(failures=1), dead_letter_path=os.path.join(directory, "dead.jsonl"))
+
+    def broken(event):
+        raise KeyError("missing")
+
+    pipeline.on("call_started", broken)
+
+    asyncio.run(_run(pipeline, _event("call_started", "c3"), _event("call_ended", "c3")))
+    assert pipeline.counters["handler_errors"] == 1
+    assert pipeline.counters["persist_errors"] == 1 and pipeline.counters["persist_retries"] == 1
+    assert pipeline.counters["processed"] == 2
+    assert pipeline.repository.get_call("c3")["status"] == "ended"  # Saved on the retry
+    assert _dead_letters(pipeline.dead_letter_path) == []
+
+
+@_without_backoff
+def test_unsaved_batch_is_dead_lettered(directory):
+    path = os.path.join(directory, "dead.jsonl")
+    pipeline = EventPipeline(FlakyRepository(failures=call_events.PERSIST_ATTEMPTS), dead_letter_path=path)
+    ended = _event("call_ended", "c8", transcript="Agent: hi")
+    asyncio.run(_run(pipeline, _event("call_started", "c8"), ended, ["not", "an", "object"]))
+
+    assert pipeline.counters["persist_errors"] == call_events.PERSIST_ATTEMPTS
+    assert pipeline.counters["dead_lettered"] == 2
+    entries = _dead_letters(path)
+    assert [entry["payload"] for entry in entries] == [_event("call_started", "c8"), ended]
+    assert entries[0]["reason"].startswith("persist failed (RuntimeError: disk full")
+    assert pipeline.repository.get_call("c8") is None
+
+
+@_without_backoff
+def test_transcripts_kept_when_their_write_is_retried(directory):
+    transcripts = TranscriptStore(os.path.join(directory, "transcripts"))
+    append_many = transcripts.append_many
+    calls = []
+
+    def flaky_append(records):
+        calls.append(len(records))
+        if len(calls) == 1:
+            raise OSError("disk full")
+        append_many(records)
+
+    transcripts.append_many = flaky_append
+    repository = MemoryRepository()
+    pipeline = EventPipeline(repository, transcripts=transcripts, dead_letter_path=os.path.join(directory, "dead.jsonl"))
+    asyncio.run(_run(pipeline, _event("call_ended", "c9", transcript="Agent: hi")))
+
+    assert calls == [1, 1]
+    assert transcripts.get("c9") == "Agent: hi"
+    assert repository.get_call("c9")["has_transcript"]
+    transcripts.close()
+
+
+def test_worker_survives_unexpected_errors():
+    pipeline = EventPipeline(MemoryRepository())
+    calls = []
+
+    async def process(batch):
+        calls.append(len(batch))
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+
+    pipeline.process = process
+
+    async def scenario():
+        await pipeline.start()
+        pipeline.submit(_event("call_started", "c4"))
+        await asyncio.wait_for(pipeline.queue.join(), 5)
+        pipeline.submit(_event("call_started", "c5"))
+        await asyncio.wait_for(pipeline.queue.join(), 5)
+        await pipeline.stop()
+
+    asyncio.run(scenario())
+    assert calls == [1, 1]
+    assert pipeline.counters["worker_errors"] == 1
+
+
+
+def test_pipeline_restarts_in_a_new_event_loop():
+    repository = MemoryRepository()
+    pipeline = EventPipeline(repository)
+    # Two lifespans in one process, each with its own event loop
+    asyncio.run(_run(pipeline, _event("call_started", "c7")))
+    assert pipeline.queue is None
+    asyncio.run(_run(pipeline, _event("call_ended", "c7", duration_ms=1000)))
+
+    assert repository.get_call("c7")["status"] == "ended"
+    assert pipeline.counters["processed"] == 2
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -6,15 +6,34 @@ This script helps test and validate the conversation flow by:
 2. Testing the CRM integration endpoints
 3. Validating calendar integration
 
+Requests go through one pooled requests.Session, and the scenarios run
+in parallel on a thread pool (each test's output is printed as a block
+when it finishes), so a full pass takes about as long as the slowest
+test. --repeat N runs every test N times at once as a soak test of the
+webhook under concurrency.
+
 Run with: python test_call_scenarios.py
+          python test_call_scenarios.py --workers 1      # One test at a time
+          python test_call_scenarios.py --repeat 20      # Soak: 20 runs of each test
 """
 
+import argparse
 import os
 import json
+import sys
+import threading
+import time
+import uuid
 import requests
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from requests.adapters import HTTPAdapter
 from typing import Optional
 
+from call_scenarios import (
+    LEAD_SCORING_SCENARIOS, booking_request, call_started, lead_scoring_call, message_call, service_request_call
+)
+
 # Configuration - update these for your environment
 BASE_URL = os.environ.get("TEST_BASE_URL", "http://localhost:3000")
 WEBHOOK_URL = f"{BASE_URL}/api/inbound/webhook"
@@ -24,6 +43,16 @@ CALENDAR_BOOK_URL = f"{BASE_URL}/api/calendar/create-booking"
 # Test agent ID - replace with your actual agent ID
 TEST_AGENT_ID = os.environ.get("TEST_AGENT_ID", "agent_a031c45cf671b81a985d7ae082")
 
+# Tests running at once (and pooled connections to the server)
+DEFAULT_WORKERS = 8
+
+# One session for every test: connections are pooled (run_all_tests sizes
+# the pool to the worker count) and reused across threads
+session = requests.Session()
+
+# Output of the test running on this thread, printed as one block when it ends
+_output = threading.local()
+
 
 class Colors:
     """ANSI color codes for terminal output"""
@@ -35,27 +64,36 @@ class Colors:
     END = '\033[0m'
 
 
+def _emit(line: str):
+    lines = getattr(_output, "lines", None)
+    if lines is None:
+        print(line)
+    else:
+        lines.append(line)
+
+
 def print_test(name: str):
-    print(f"\n{Colors.BLUE}{Colors.BOLD}━━━ TEST: {name} ━━━{Colors.END}")
+    _emit(f"\n{Colors.BLUE}{Colors.BOLD}━━━ TEST: {name} ━━━{Colors.END}")
 
 
 def print_pass(msg: str):
-    print(f"{Colors.GREEN}✓ PASS:{Colors.END} {msg}")
+    _emit(f"{Colors.GREEN}✓ PASS:{Colors.END} {msg}")
 
 
 def print_fail(msg: str):
-    print(f"{Colors.RED}✗ FAIL:{Colors.END} {msg}")
+    _emit(f"{Colors.RED}✗ FAIL:{Colors.END} {msg}")
 
 
 def print_info(msg: str):
-    print(f"{Colors.YELLOW}ℹ INFO:{Colors.END} {msg}")
+    _emit(f"{Colors.YELLOW}ℹ INFO:{Colors.END} {msg}")
 
 
 def send_webhook(event_type: str, data: dict) -> Optional[dict]:
     """Send a webhook event to the inbound webhook endpoint"""
     payload = {
         "event": event_type,
-        "call_id": f"call_test_{datetime.now().strftime('%Y%m%d%H%M%S')}",
+        # Unique per request: tests running in the same second must not share a call
+        "call_id": f"call_test_{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}",
         "agent_id": TEST_AGENT_ID,
         "call_status": "ended",
         "direction": "inbound",
@@ -63,7 +101,7 @@ def send_webhook(event_type: str, data: dict) -> Optional[dict]:
     }
 
     try:
-        response = requests.post(WEBHOOK_URL, json=payload, timeout=10)
+        response = session.post(WEBHOOK_URL, json=payload, timeout=10)
         return {
             "status_code": response.status_code,
             "response": response.json() if response.headers.get('content-type', '').startswith('application/json') else response.text
@@ -79,7 +117,7 @@ def test_webhook_endpoint():
     print_test("Webhook Endpoint Accessibility")
 
     try:
-        response = requests.get(WEBHOOK_URL, timeout=5)
+        response = session.get(WEBHOOK_URL, timeout=5)
         if response.status_code == 200:
             print_pass(f"Webhook endpoint accessible at {WEBHOOK_URL}")
             print_info(f"Response: {response.json()}")
@@ -97,11 +135,7 @@ def test_call_started_event():
     """Test 2: Simulate call_started event"""
     print_test("Call Started Event")
 
-    result = send_webhook("call_started", {
-        "from_number": "+14085551234",
-        "to_number": "+16195551234",
-        "start_timestamp": int(datetime.now().timestamp() * 1000)
-    })
+    result = send_webhook("call_started", call_started())
 
     if result.get("error"):
         print_fail(result["error"])
@@ -120,26 +154,7 @@ def test_call_ended_with_service_request():
     """Test 3: Simulate call_ended with service appointment request"""
     print_test("Call Ended - Service Appointment Request")
 
-    result = send_webhook("call_ended", {
-        "from_number": "+14085551234",
-        "to_number": "+16195551234",
-        "start_timestamp": int((datetime.now() - timedelta(minutes=5)).timestamp() * 1000),
-        "end_timestamp": int(datetime.now().timestamp() * 1000),
-        "duration_ms": 300000,  # 5 minutes
-        "dynamic_variables": {
-            "caller_name": "John Test",
-            "caller_phone": "+14085551234",
-            "service_address": "123 Test Street, San Diego, CA 92101",
-            "service_type": "Lawn Mowing",
-            "urgency": "this week"
-        },
-        "call_analysis": {
-            "call_summary": "Customer requested lawn mowing service for next week.",
-            "user_sentiment": "positive",
-            "call_successful": True
-        },
-        "transcript": "Agent: Thank you for calling... User: I need lawn mowing service..."
-    })
+    result = send_webhook("call_ended", service_request_call())
 
     if result.get("error"):
         print_fail(result["error"])
@@ -158,22 +173,7 @@ def test_call_ended_with_message():
     """Test 4: Simulate call_ended with message taking"""
     print_test("Call Ended - Message Taking")
 
-    result = send_webhook("call_ended", {
-        "from_number": "+14087779999",
-        "to_number": "+16195551234",
-        "duration_ms": 120000,  # 2 minutes
-        "dynamic_variables": {
-            "message_name": "Jane Callback",
-            "message_phone": "+14087779999",
-            "message_reason": "Wants to discuss a large landscaping project",
-            "callback_time": "afternoon"
-        },
-        "call_analysis": {
-            "call_summary": "Caller left a message requesting callback about landscaping project.",
-            "user_sentiment": "neutral",
-            "call_successful": True
-        }
-    })
+    result = send_webhook("call_ended", message_call())
 
     if result.get("error"):
         print_fail(result["error"])
@@ -226,20 +226,9 @@ def test_function_call_create_booking():
     """Test 6: Simulate function call for creating a booking"""
     print_test("Function Call - Create Calendar Booking")
 
-    # Get a future datetime for booking
-    booking_time = datetime.now() + timedelta(days=2)
-    booking_time = booking_time.replace(hour=10, minute=0, second=0, microsecond=0)
-
     result = send_webhook("function_call", {
         "function_name": "create_calendar_booking",
-        "function_args": {
-            "attendee_name": "Test Customer",
-            "attendee_phone": "+14085559999",
-            "attendee_email": "test@example.com",
-            "start_time": booking_time.isoformat(),
-            "service_type": "Tree Trimming",
-            "notes": "Large oak tree in backyard needs trimming"
-        }
+        "function_args": booking_request()
     })
 
     if result.get("error"):
@@ -268,7 +257,7 @@ def test_calendar_endpoints_direct():
 
     # Test check-availability endpoint
     try:
-        response = requests.post(
+        response = session.post(
             CALENDAR_CHECK_URL,
             json={"agent_id": TEST_AGENT_ID, "date_range": "next_7_days"},
             timeout=10
@@ -290,36 +279,8 @@ def test_lead_scoring():
     """Test 8: Verify lead scoring logic with different scenarios"""
     print_test("Lead Scoring Logic")
 
-    scenarios = [
-        {
-            "name": "Urgent customer (should be HOT)",
-            "dynamic_variables": {"urgency": "today", "caller_name": "Urgent User", "caller_phone": "+14085551111"},
-            "call_analysis": {"user_sentiment": "positive", "call_successful": True}
-        },
-        {
-            "name": "Positive sentiment (should be HOT)",
-            "dynamic_variables": {"caller_name": "Happy User", "caller_phone": "+14085552222"},
-            "call_analysis": {"user_sentiment": "positive", "call_successful": True}
-        },
-        {
-            "name": "Basic info only (should be WARM)",
-            "dynamic_variables": {"caller_name": "Basic User", "caller_phone": "+14085553333"},
-            "call_analysis": {"user_sentiment": "neutral", "call_successful": True}
-        },
-        {
-            "name": "Minimal info (should be COLD)",
-            "dynamic_variables": {},
-            "call_analysis": {"user_sentiment": "negative", "call_successful": False}
-        }
-    ]
-
-    for scenario in scenarios:
-        result = send_webhook("call_ended", {
-            "from_number": scenario["dynamic_variables"].get("caller_phone", "+14085550000"),
-            "duration_ms": 60000,
-            "dynamic_variables": scenario["dynamic_variables"],
-            "call_analysis": scenario["call_analysis"]
-        })
+    for scenario in LEAD_SCORING_SCENARIOS:
+        result = send_webhook("call_ended", lead_scoring_call(scenario))
 
         if result.get("status_code") == 200:
             print_pass(f"{scenario['name']} - processed")
@@ -387,55 +348,109 @@ def test_company_name_sanitization():
     return all_passed
 
 
-def run_all_tests():
-    """Run all tests and print summary"""
+TESTS = [
+    ("Webhook Endpoint", test_webhook_endpoint),
+    ("Call Started Event", test_call_started_event),
+    ("Service Request Call", test_call_ended_with_service_request),
+    ("Message Taking Call", test_call_ended_with_message),
+    ("Check Availability Function", test_function_call_check_availability),
+    ("Create Booking Function", test_function_call_create_booking),
+    ("Direct Calendar Endpoints", test_calendar_endpoints_direct),
+    ("Lead Scoring", test_lead_scoring),
+    ("Phone Normalization", test_phone_normalization),
+    ("Company Name Sanitization", test_company_name_sanitization),
+]
+
+
+def run_test(name: str, test_func) -> dict:
+    """Run one test on this thread, capturing its output"""
+    _output.lines = []
+    started = time.perf_counter()
+    try:
+        passed = bool(test_func())
+    except Exception as e:
+        print_fail(f"Exception in {name}: {e}")
+        passed = False
+    seconds = time.perf_counter() - started
+    lines, _output.lines = _output.lines, None
+    return {"name": name, "passed": passed, "seconds": seconds, "output": lines}
+
+
+def print_result(result: dict):
+    print("\n".join(result["output"]))
+    print(f"  ({result['seconds']:.2f}s)")
+
+
+def run_all_tests(workers: int = DEFAULT_WORKERS, repeat: int = 1) -> bool:
+    """Run all tests (each `repeat` times) on `workers` threads and print a summary"""
     print(f"\n{Colors.BOLD}{'='*60}")
     print("GreenLine AI Call Flow Test Suite")
     print(f"{'='*60}{Colors.END}")
     print(f"Target: {BASE_URL}")
     print(f"Agent ID: {TEST_AGENT_ID}")
+    print(f"Workers: {workers}" + (f", {repeat} runs of each test" if repeat > 1 else ""))
 
-    tests = [
-        ("Webhook Endpoint", test_webhook_endpoint),
-        ("Call Started Event", test_call_started_event),
-        ("Service Request Call", test_call_ended_with_service_request),
-        ("Message Taking Call", test_call_ended_with_message),
-        ("Check Availability Function", test_function_call_check_availability),
-        ("Create Booking Function", test_function_call_create_booking),
-        ("Direct Calendar Endpoints", test_calendar_endpoints_direct),
-        ("Lead Scoring", test_lead_scoring),
-        ("Phone Normalization", test_phone_normalization),
-        ("Company Name Sanitization", test_company_name_sanitization),
-    ]
+    # A connection per worker thread, reused across its tests
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    started = time.perf_counter()
+
+    # The accessibility check runs alone first, so its output leads the report
+    first = run_test(*TESTS[0])
+    print_result(first)
+    results = [first]
+
+    # The scenarios are independent: each call_id is unique
+    jobs = TESTS[1:] + TESTS * (repeat - 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_test, name, test_func) for name, test_func in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            # A soak run only shows the runs that failed
+            if repeat == 1 or not result["passed"]:
+                print_result(result)
 
-    results = []
-    for name, test_func in tests:
-        try:
-            passed = test_func()
-            results.append((name, passed))
-        except Exception as e:
-            print_fail(f"Exception in {name}: {e}")
-            results.append((name, False))
+    elapsed = time.perf_counter() - started
 
     # Summary
     print(f"\n{Colors.BOLD}{'='*60}")
     print("TEST SUMMARY")
     print(f"{'='*60}{Colors.END}")
 
-    passed = sum(1 for _, p in results if p)
-    total = len(results)
+    for name, _ in TESTS:
+        runs = [r for r in results if r["name"] == name]
+        passed_runs = sum(1 for r in runs if r["passed"])
+        status = f"{Colors.GREEN}PASS{Colors.END}" if passed_runs == len(runs) else f"{Colors.RED}FAIL{Colors.END}"
+        if repeat == 1:
+            print(f"  {status} - {name} ({runs[0]['seconds']:.2f}s)")
+        else:
+            times = [r["seconds"] for r in runs]
+            print(f"  {status} - {name}: {passed_runs}/{len(runs)} passed, "
+                  f"avg {sum(times) / len(times):.2f}s, max {max(times):.2f}s")
 
-    for name, result in results:
-        status = f"{Colors.GREEN}PASS{Colors.END}" if result else f"{Colors.RED}FAIL{Colors.END}"
-        print(f"  {status} - {name}")
+    passed = sum(1 for r in results if r["passed"])
+    total = len(results)
 
-    print(f"\n{Colors.BOLD}Results: {passed}/{total} tests passed{Colors.END}")
+    print(f"\n{Colors.BOLD}Results: {passed}/{total} {'tests' if repeat == 1 else 'runs'} passed "
+          f"in {elapsed:.2f}s{Colors.END}")
 
     if passed == total:
         print(f"{Colors.GREEN}All tests passed!{Colors.END}")
     else:
         print(f"{Colors.YELLOW}Some tests failed - review output above{Colors.END}")
+    return passed == total
 
 
 if __name__ == "__main__":
-    run_all_tests()
+    parser = argparse.ArgumentParser(description="GreenLine AI call flow scenario tests")
+    parser.add_argument("--workers", "-w", type=int, default=DEFAULT_WORKERS,
+                        help=f"Tests running at once (default: {DEFAULT_WORKERS}; 1 runs them in order)")
+    parser.add_argument("--repeat", "-n", type=int, default=1,
+                        help="Run every test N times at once, as a soak test (default: 1)")
+    args = parser.parse_args()
+    if args.workers < 1 or args.repeat < 1:
+        parser.error("--workers and --repeat must be at least 1")
+    sys.exit(0 if run_all_tests(args.workers, args.repeat) else 1)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Tests for crm_queue.py.
+
+Runs CRMForwarder against a fake HTTP pool to check delivery, retries,
+dead-lettering, and that an unexpected error in one batch doesn't stop
+the worker.
+
+Usage:
+    cd flow-builder
+    python -m pytest test_crm_queue.py
+    python test_crm_queue.py
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import threading
+
+import httpx
+
+import crm_queue
+from crm_queue import CRMForwarder
+
+URL = "https://crm.example/webhook"
+
+
+class FakePool:
+    """Answers each post with the next queued outcome (status code or exception), then 200."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.posted = []
+
+    async def post(self, url, json=None):
+        self.posted.append(json)
+        outcome = self.outcomes.pop(0) if self.outcomes else 200
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome, request=httpx.Request("POST", url))
+
+
+def _dead_letters(path: str) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+async def _deliver(forwarder: CRMForwarder, *leads):
+    await forwarder.start()
+    for lead in leads:
+        forwarder.submit(lead)
+    await asyncio.wait_for(forwarder.queue.join(), 5)
+    await forwarder.stop(timeout=5)
+
+
+def _forwarder(pool, directory, **kwargs) -> CRMForwarder:
+    return CRMForwarder(pool, URL, workers=1, dead_letter_path=os.path.join(directory, "dead.jsonl"), **kwargs)
+
+
+def test_transient_errors_are_retried():
+    base_delay, crm_queue.BASE_DELAY = crm_queue.BASE_DELAY, 0.001
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            pool = FakePool(503, httpx.ConnectError("refused"))
+            forwarder = _forwarder(pool, directory)
+            asyncio.run(_deliver(forwarder, {"lead_id": "LEAD-1"}))
+            dead_letters = _dead_letters(forwarder.dead_letter_path)
+    finally:
+        crm_queue.BASE_DELAY = base_delay
+
+    assert pool.posted == [{"lead_id": "LEAD-1"}] * 3
+    assert forwarder.counters["forwarded"] == 1 and forwarder.counters["retried"] == 2
+    assert dead_letters == []
+
+
+def test_rejected_lead_is_dead_lettered_off_the_loop():
+    with tempfile.TemporaryDirectory() as directory:
+        forwarder = _forwarder(FakePool(400), directory)
+        writers = []
+        append = forwarder._append_dead_letters
+        forwarder._append_dead_letters = lambda lines: (writers.append(threading.get_ident()), append(lines))
+
+        async def scenario():
+            await _deliver(forwarder, {"lead_id": "LEAD-1"})
+            return threading.get_ident()
+
+        loop_thread = asyncio.run(scenario())
+        [entry] = _dead_letters(forwarder.dead_letter_path)
+        assert entry["lead"] == {"lead_id": "LEAD-1"} and entry["reason"] == "HTTP 400"
+        assert writers and loop_thread not in writers
+
+
+def test_unexpected_error_does_not_stop_worker():
+    with tempfile.TemporaryDirectory() as directory:
+        pool = FakePool(TypeError("Object of type set is not JSON serializable"))
+        forwarder = _forwarder(pool, directory)
+
+        async def scenario():
+            await forwarder.start()
+            forwarder.submit({"lead_id": "LEAD-1"})
+            await asyncio.wait_for(forwarder.queue.join(), 5)
+            forwarder.submit({"lead_id": "LEAD-2"})
+            await asyncio.wait_for(forwarder.queue.join(), 5)
+            assert not forwarder._tasks[0].done()
+            await forwarder.stop(timeout=5)
+
+        asyncio.run(scenario())
+        assert forwarder.counters["worker_errors"] == 1
+        assert forwarder.counters["forwarded"] == 1
+        [entry] = _dead_letters(forwarder.dead_letter_path)
+        assert entry["lead"] == {"lead_id": "LEAD-1"} and entry["reason"].startswith("worker error (TypeError")
+
+
+def test_forwarder_restarts_in_a_new_event_loop():
+    with tempfile.TemporaryDirectory() as directory:
+        pool = FakePool()
+        forwarder = _forwarder(pool, directory)
+        # Two lifespans in one process, each with its own event loop
+        asyncio.run(_deliver(forwarder, {"lead_id": "LEAD-1"}))
+        assert forwarder.queue is None
+        asyncio.run(_deliver(forwarder, {"lead_id": "LEAD-2"}))
+
+        assert pool.posted == [{"lead_id": "LEAD-1"}, {"lead_id": "LEAD-2"}]
+        assert forwarder.counters["forwarded"] == 2
+        assert _dead_letters(forwarder.dead_letter_path) == []
+
+
+def test_full_queue_and_write_errors_are_counted():
+    with tempfile.TemporaryDirectory() as directory:
+        forwarder = _forwarder(FakePool(), directory, queue_size=1)
+
+        async def scenario():
+            # Workers not started, so the second lead finds the queue full
+            assert forwarder.submit({"lead_id": "LEAD-1"})
+            assert not forwarder.submit({"lead_id": "LEAD-2"})
+            await asyncio.gather(*forwarder._writes)
+
+        asyncio.run(scenario())
+        assert [entry["reason"] for entry in _dead_letters(forwarder.dead_letter_path)] == ["queue full"]
+
+        forwarder.dead_letter_path = os.path.join(directory, "missing", "dead.jsonl")
+        asyncio.run(forwarder._dead_letter([crm_queue._Job({"lead_id": "LEAD-3"})], "HTTP 400"))
+        assert forwarder.counters["dead_letter_errors"] == 1
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
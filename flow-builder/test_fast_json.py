@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for fast_json.py.
+
+Checks that dumps()/loads() round-trip webhook payloads with both the
+orjson and the standard library backend, that datetimes and other
+non-JSON values are rendered the same way by both, and that use() falls
+back to the standard library when orjson is unavailable.
+
+Usage:
+    cd flow-builder
+    python -m pytest test_fast_json.py
+    python test_fast_json.py
+"""
+
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import fast_json
+from fast_json import FastJSONResponse
+
+PAYLOAD = {
+    "event": "call_ended",
+    "call": {"call_id": "call-1", "duration_ms": 61250, "transcript": "Agent: Hi 👋\nUser: Olá", "score": 0.25,
+             "tags": ["lead", None, True], "analysis": {}},
+}
+
+
+def _backends() -> list:
+    return ["orjson", "json"] if fast_json.ORJSON_AVAILABLE else ["json"]
+
+
+def _with_backend(backend: str, test):
+    previous = fast_json.BACKEND
+    fast_json.use(backend)
+    try:
+        assert fast_json.BACKEND == backend
+        return test()
+    finally:
+        fast_json.use(previous)
+
+
+def test_round_trip():
+    for backend in _backends():
+        def run():
+            rendered = fast_json.dumps(PAYLOAD)
+            assert isinstance(rendered, bytes)
+            assert fast_json.loads(rendered) == PAYLOAD
+            # Compact UTF-8, byte for byte what the standard library renders
+            assert rendered == json.dumps(PAYLOAD, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+        _with_backend(backend, run)
+
+
+def test_datetimes_and_other_values_render_alike():
+    content = {"created_at": datetime(2025, 6, 12, 9, 30), "sent_at": datetime(2025, 6, 12, 16, 30, tzinfo=timezone.utc),
+               "ids": ("a", "b"), "price": Decimal("297.50")}
+    decoded = {backend: _with_backend(backend, lambda: fast_json.loads(fast_json.dumps(content)))
+               for backend in _backends()}
+    for value in decoded.values():
+        assert datetime.fromisoformat(value["created_at"]) == content["created_at"]
+        assert datetime.fromisoformat(value["sent_at"]) == content["sent_at"]
+        assert value["ids"] == ["a", "b"] and value["price"] == "297.50"
+
+
+def test_stdlib_fallback_without_orjson():
+    available = fast_json.ORJSON_AVAILABLE
+    fast_json.ORJSON_AVAILABLE = False
+    try:
+        previous = fast_json.BACKEND
+        fast_json.use("orjson")
+        assert fast_json.BACKEND == "json" and fast_json.loads is json.loads
+        assert fast_json.loads(fast_json.dumps(PAYLOAD)) == PAYLOAD
+    finally:
+        fast_json.ORJSON_AVAILABLE = available
+        fast_json.use(previous)
+
+
+def test_response_uses_active_backend():
+    for backend in _backends():
+        body = _with_backend(backend, lambda: FastJSONResponse(PAYLOAD).body)
+        assert json.loads(body) == PAYLOAD
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Tests for flow_cache.py.
+
+Checks that get_or_create() / aget_or_create() reuse a flow for an
+identical payload, create one for a new payload, replace a cached flow
+that was deleted in Retell, and create only one flow when identical
+payloads arrive concurrently.
+
+Usage:
+    cd flow-builder
+    python -m pytest test_flow_cache.py
+    python test_flow_cache.py
+"""
+
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import httpx
+from retell import NotFoundError
+
+from flow_cache import FlowCache, payload_hash
+
+PARAMS = {"start_node_id": "greeting", "nodes": [{"id": "greeting"}]}
+
+
+class FakeFlows:
+    """conversation_flow resource keeping flows in a dict."""
+
+    def __init__(self):
+        self.flows: dict = {}
+        self.created = 0
+
+    def create(self, **params):
+        self.created += 1
+        flow = SimpleNamespace(conversation_flow_id=f"flow-{self.created}", **params)
+        self.flows[flow.conversation_flow_id] = flow
+        return flow
+
+    def retrieve(self, flow_id):
+        if flow_id not in self.flows:
+            request = httpx.Request("GET", f"https://api.retellai.com/get-conversation-flow/{flow_id}")
+            raise NotFoundError("Not found", response=httpx.Response(404, request=request), body=None)
+        return self.flows[flow_id]
+
+
+class SlowFakeFlows(FakeFlows):
+    def create(self, **params):
+        time.sleep(0.05)  # Long enough for concurrent callers to overlap
+        return super().create(**params)
+
+
+class AsyncFakeFlows(FakeFlows):
+    async def create(self, **params):
+        await asyncio.sleep(0.01)
+        return FakeFlows.create(self, **params)
+
+    async def retrieve(self, flow_id):
+        return FakeFlows.retrieve(self, flow_id)
+
+
+def _cache(directory: str) -> FlowCache:
+    return FlowCache(os.path.join(directory, "flow_cache.json"))
+
+
+def test_identical_payload_reuses_flow():
+    with tempfile.TemporaryDirectory() as directory:
+        client = SimpleNamespace(conversation_flow=FakeFlows())
+        cache = _cache(directory)
+        first = cache.get_or_create(client, "ns", PARAMS)
+        second = cache.get_or_create(client, "ns", dict(PARAMS))
+        other = cache.get_or_create(client, "ns", {**PARAMS, "start_node_id": "other"})
+
+        assert first.conversation_flow_id == second.conversation_flow_id == "flow-1"
+        assert other.conversation_flow_id == "flow-2"
+        assert cache.get_or_create(client, "other-workspace", PARAMS).conversation_flow_id == "flow-3"
+        # The index is on disk, so another process reuses the flow too
+        assert _cache(directory).lookup("ns", payload_hash(PARAMS)) == "flow-1"
+
+
+def test_deleted_flow_is_recreated():
+    with tempfile.TemporaryDirectory() as directory:
+        flows = FakeFlows()
+        client = SimpleNamespace(conversation_flow=flows)
+        cache = _cache(directory)
+        cache.get_or_create(client, "ns", PARAMS)
+        del flows.flows["flow-1"]
+
+        assert cache.get_or_create(client, "ns", PARAMS).conversation_flow_id == "flow-2"
+        assert cache.lookup("ns", payload_hash(PARAMS)) == "flow-2"
+
+
+def test_async_entry_point_shares_the_index():
+    with tempfile.TemporaryDirectory() as directory:
+        flows = AsyncFakeFlows()
+        client = SimpleNamespace(conversation_flow=flows)
+        cache = _cache(directory)
+
+        async def run():
+            first = await cache.aget_or_create(client, "ns", PARAMS)
+            second = await cache.aget_or_create(client, "ns", PARAMS)
+            del flows.flows["flow-1"]
+            third = await cache.aget_or_create(client, "ns", PARAMS)
+            return first, second, third
+
+        first, second, third = asyncio.run(run())
+        assert (first.conversation_flow_id, second.conversation_flow_id) == ("flow-1", "flow-1")
+        assert third.conversation_flow_id == "flow-2"
+
+
+def test_concurrent_identical_payloads_create_one_flow():
+    with tempfile.TemporaryDirectory() as directory:
+        flows = SlowFakeFlows()
+        client = SimpleNamespace(conversation_flow=flows)
+        cache = _cache(directory)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            created = list(pool.map(lambda _: cache.get_or_create(client, "ns", PARAMS), range(4)))
+
+        assert flows.created == 1
+        assert {flow.conversation_flow_id for flow in created} == {"flow-1"}
+        assert cache._flights == {}
+
+
+def test_async_concurrent_payloads_create_one_flow_off_the_loop():
+    with tempfile.TemporaryDirectory() as directory:
+        flows = AsyncFakeFlows()
+        client = SimpleNamespace(conversation_flow=flows)
+        cache = _cache(directory)
+        writers = []
+        save = cache._save
+        cache._save = lambda: (writers.append(threading.get_ident()), save())
+
+        async def run():
+            created = await asyncio.gather(
+                *(cache.aget_or_create(client, "ns", PARAMS) for _ in range(4)),
+                cache.aget_or_create(client, "ns", {**PARAMS, "start_node_id": "other"}),
+            )
+            return created, threading.get_ident()
+
+        created, loop_thread = asyncio.run(run())
+        assert flows.created == 2
+        assert [flow.conversation_flow_id for flow in created[:4]] == ["flow-1"] * 4
+        assert len(writers) == 2 and loop_thread not in writers
+        assert cache._async_flights == {}
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
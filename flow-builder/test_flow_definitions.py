@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for the flow definition files in flows/.
+
+The builders' node and prompt literals and flows/*.json describe the same
+flows. These tests regenerate the files the way
+`python cli.py write-flow-definitions` does and fail if the committed
+copies differ, so a builder change can't ship without its definition file
+(or the other way round).
+
+Usage:
+    cd flow-builder
+    python -m pytest test_flow_definitions.py
+    python test_flow_definitions.py
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+
+import cli
+from flow_definitions import FLOWS_DIR, load_definition
+
+DEFINITIONS = ("inbound_receptionist", "outbound_sales", "greenline_inbound")
+
+
+def _committed(name: str) -> str:
+    with open(os.path.join(FLOWS_DIR, f"{name}.json"), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_flows_match_builders():
+    versions = {json.loads(_committed(name))["version"] for name in DEFINITIONS}
+    assert len(versions) == 1, f"flows/ mixes definition versions {sorted(versions)}"
+
+    with tempfile.TemporaryDirectory() as directory:
+        with contextlib.redirect_stdout(io.StringIO()):
+            cli.write_flow_definitions(argparse.Namespace(dir=directory, format="json", version=versions.pop()))
+
+        assert sorted(os.listdir(directory)) == sorted(f"{name}.json" for name in DEFINITIONS)
+        for name in DEFINITIONS:
+            with open(os.path.join(directory, f"{name}.json"), encoding="utf-8") as f:
+                generated = f.read()
+            assert generated == _committed(name), (
+                f"flows/{name}.json is out of date with the builders; "
+                "run `python cli.py write-flow-definitions` and commit the result"
+            )
+
+
+def test_committed_definitions_load():
+    for name in DEFINITIONS:
+        definition = load_definition(name)
+        assert definition.flow["nodes"], name
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
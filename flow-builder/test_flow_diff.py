@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for flow_diff.py.
+
+Checks that a deployed flow carrying Retell's server-side defaults diffs
+as unchanged, that fields removed from the rendered payload are detected,
+and that node, edge, tool, prompt and setting changes are reported and
+turned into a minimal conversation_flow.update payload.
+
+Usage:
+    cd flow-builder
+    python -m pytest test_flow_diff.py
+    python test_flow_diff.py
+"""
+
+import copy
+
+from flow_diff import diff_flow, matches
+
+FLOW = {
+    "global_prompt": "You are a receptionist.",
+    "start_node_id": "greeting",
+    "start_speaker": "agent",
+    "model_temperature": 0.2,
+    "nodes": [
+        {
+            "id": "greeting",
+            "type": "conversation",
+            "instruction": {"type": "prompt", "text": "Greet the caller."},
+            "edges": [{
+                "id": "to_end",
+                "destination_node_id": "end",
+                "transition_condition": {"type": "prompt", "prompt": "Caller is done"},
+            }],
+        },
+        {"id": "end", "type": "end", "instruction": {"type": "prompt", "text": "Say goodbye."}},
+    ],
+    "tools": [{"tool_id": "book", "type": "custom", "url": "https://example.com/book"}],
+}
+
+
+def _deployed(flow: dict) -> dict:
+    """The flow as Retell returns it: ids, positions and unset fields filled in."""
+    deployed = copy.deepcopy(flow)
+    deployed["conversation_flow_id"] = "flow-1"
+    for number, node in enumerate(deployed["nodes"]):
+        node["display_position"] = {"x": number * 200.0, "y": 0.0}
+        node["finetune_conversation_examples"] = []
+        node["skip_response_edge"] = None
+    deployed["tools"][0]["parameters"] = {}
+    return deployed
+
+
+def test_matches_allows_server_defaults_only():
+    desired = {"type": "custom", "url": "https://example.com"}
+    assert matches({**desired, "display_position": {"x": 1}, "headers": {}, "async": False}, desired)
+    assert not matches({**desired, "timeout_ms": 5000}, desired)  # Set before, no longer rendered
+    assert not matches({**desired, "speak_during_execution": True}, desired)
+    assert not matches({"type": "custom"}, desired)
+    assert matches([{"a": 1.0}], [{"a": 1}]) and not matches([{"a": 1}], [{"a": 1}, {"b": 2}])
+
+
+def test_unchanged_flow_has_no_changes():
+    diff = diff_flow(_deployed(FLOW), FLOW)
+    assert not diff.has_changes, diff.summary()
+    assert diff.update_params(FLOW) == {}
+
+
+def test_removed_node_field_is_detected():
+    desired = copy.deepcopy(FLOW)
+    deployed = _deployed(FLOW)
+    deployed["nodes"][0]["skip_response"] = True  # Dropped from the builder since the last deploy
+    deployed["nodes"][0]["edges"][0]["transition_condition"]["equations"] = [{"left": "x", "operator": "exists"}]
+    deployed["tools"][0]["timeout_ms"] = 5000
+
+    diff = diff_flow(deployed, desired)
+    assert diff.changed_nodes == ["greeting"]
+    assert diff.changed_edges == [("greeting", "to_end")]
+    assert diff.tools_changed == ["book"]
+    assert set(diff.update_params(desired)) == {"nodes", "tools"}
+
+
+def test_node_edge_prompt_and_setting_changes():
+    desired = copy.deepcopy(FLOW)
+    desired["nodes"][0]["instruction"]["text"] = "Greet the caller warmly."
+    desired["nodes"][0]["edges"].append({
+        "id": "to_help",
+        "destination_node_id": "help",
+        "transition_condition": {"type": "prompt", "prompt": "Caller needs help"},
+    })
+    desired["nodes"].insert(1, {"id": "help", "type": "conversation",
+                                "instruction": {"type": "prompt", "text": "Help."}})
+    desired["global_prompt"] = "You are a friendly receptionist."
+    desired["model_temperature"] = 0.4
+    desired["tools"] = []
+
+    deployed = _deployed(FLOW)
+    deployed["nodes"].append({"id": "old", "type": "end", "instruction": {"type": "prompt", "text": "Bye."}})
+    diff = diff_flow(deployed, desired)
+
+    assert diff.added_nodes == ["help"] and diff.removed_nodes == ["old"]
+    assert diff.changed_nodes == ["greeting"]
+    assert diff.changed_edges == [("greeting", "to_help")]
+    assert diff.tools_changed == ["book"]
+    assert diff.global_prompt_changed and diff.settings_changed == ["model_temperature"]
+    assert diff.update_params(desired) == {
+        "nodes": desired["nodes"], "tools": [], "global_prompt": desired["global_prompt"], "model_temperature": 0.4,
+    }
+
+
+def test_node_order_change_is_detected():
+    desired = copy.deepcopy(FLOW)
+    desired["nodes"].reverse()
+    diff = diff_flow(_deployed(FLOW), desired)
+    assert diff.node_order_changed and diff.nodes_changed
+    assert not diff.changed_nodes and not diff.changed_edges
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
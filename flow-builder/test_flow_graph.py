@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests for flow_graph.py.
+
+Checks that the validator reports dangling edges, unreachable nodes, dead
+ends and closed loops (found through the strongly connected components),
+that the longest path walks through cycles to an end node, and that the
+three built-in flows pass.
+
+Usage:
+    cd flow-builder
+    python -m pytest test_flow_graph.py
+    python test_flow_graph.py
+"""
+
+import cli
+import greenline_inbound_agent
+from flow_graph import FlowValidationError, analyze_flow, validate_flow
+from outbound_agent import GreenLineOutboundAgentBuilder, GreenLineOutboundConfig
+
+
+def _node(node_id: str, *destinations: str, node_type: str = "conversation", **fields) -> dict:
+    edges = [{"id": f"{node_id}_to_{dest}", "destination_node_id": dest} for dest in destinations]
+    return {"id": node_id, "type": node_type, "edges": edges, **fields}
+
+
+def _flow(*nodes: dict, start: str = "start") -> dict:
+    return {"start_node_id": start, "nodes": list(nodes)}
+
+
+def _codes(analysis) -> list:
+    return sorted((issue.code, issue.node_id) for issue in analysis.issues)
+
+
+def test_builtin_flows_pass():
+    outbound = GreenLineOutboundAgentBuilder.__new__(GreenLineOutboundAgentBuilder)
+    outbound.flow_definition = None
+    flows = {
+        "inbound receptionist": cli._inbound_flow(),
+        "outbound sales": outbound._build_flow_params(GreenLineOutboundConfig()),
+        "greenline inbound": greenline_inbound_agent.build_flow_params(),
+    }
+    for name, flow in flows.items():
+        analysis = validate_flow(flow)
+        assert analysis.ok and not analysis.unreachable, (name, analysis.summary())
+        assert analysis.longest_path[0] == flow["start_node_id"], name
+        assert analysis.longest_path[-1] in analysis.end_nodes, name
+
+
+def test_dangling_and_missing_targets_are_errors():
+    flow = _flow(
+        _node("start", "end", "ghost"),
+        {"id": "ask", "type": "conversation", "edge": {"id": "next"}},
+        _node("end", node_type="end"),
+    )
+    analysis = analyze_flow(flow)
+    assert ("dangling_edge", "start") in _codes(analysis)
+    assert ("edge_without_target", "ask") in _codes(analysis)
+    try:
+        validate_flow(flow)
+    except FlowValidationError as e:
+        assert "points at missing node 'ghost'" in str(e)
+        assert isinstance(e, ValueError) and e.analysis.errors
+    else:
+        raise AssertionError("validate_flow() accepted a dangling edge")
+
+
+def test_unreachable_nodes_and_global_entry_points():
+    flow = _flow(
+        _node("start", "end"),
+        _node("orphan", "end"),
+        _node("faq", "end", global_node_setting={"condition": "Caller asks a question"}),
+        _node("end", node_type="end"),
+    )
+    analysis = analyze_flow(flow)
+    assert analysis.unreachable == ["orphan"]  # Global nodes can be entered from anywhere
+    assert _codes(analysis) == [("unreachable", "orphan")]
+
+
+def test_dead_ends_and_closed_loops():
+    flow = _flow(
+        _node("start", "a", "stuck", "end"),
+        _node("a", "b"),
+        _node("b", "c"),
+        _node("c", "a"),  # a -> b -> c -> a never reaches an end node
+        _node("stuck"),
+        _node("end", node_type="end"),
+    )
+    analysis = analyze_flow(flow)
+    assert _codes(analysis) == [("closed_loop", "a"), ("no_exit", "stuck")]
+    assert [sorted(cycle) for cycle in analysis.cycles] == [["a", "b", "c"]]
+    assert analysis.longest_path == ["start", "end"]
+
+
+def test_longest_path_walks_through_cycles():
+    flow = _flow(
+        _node("start", "ask"),
+        _node("ask", "confirm"),
+        _node("confirm", "ask", "book"),  # Retry loop with a way out
+        _node("book", "end"),
+        _node("end", node_type="end"),
+    )
+    analysis = validate_flow(flow)
+    assert not analysis.issues
+    assert [sorted(cycle) for cycle in analysis.cycles] == [["ask", "confirm"]]
+    assert analysis.longest_path == ["start", "ask", "confirm", "book", "end"]
+
+
+def test_duplicate_and_missing_start_nodes():
+    analysis = analyze_flow(_flow(_node("a", "end"), _node("a", "end"), _node("end", node_type="end"), start="begin"))
+    assert ("duplicate_node", "a") in _codes(analysis)
+    assert ("missing_start", None) in _codes(analysis)
+    assert not analysis.longest_path
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
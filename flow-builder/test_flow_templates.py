@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Tests for flow_templates.py.
+
+Checks that templated node rendering matches the builders' direct output,
+that tenants which only differ in fields the nodes don't read share one
+template, that the template cache is bounded, and that each builder's
+NODE_SHAPE_FIELDS lists every other config field its nodes depend on.
+
+Usage:
+    cd flow-builder
+    python -m pytest test_flow_templates.py
+    python test_flow_templates.py
+"""
+
+import dataclasses
+
+import greenline_agent
+import outbound_agent
+from flow_templates import CompiledSection
+from greenline_agent import GreenLineAgentBuilder, GreenLineConfig
+from outbound_agent import GreenLineOutboundAgentBuilder, GreenLineOutboundConfig
+
+INBOUND = GreenLineConfig(
+    company_name="Acme Landscaping",
+    business_type="landscaping",
+    phone_number="+16195550100",
+    services=["Lawn Care", "Tree Trimming"],
+    service_areas=["San Diego"],
+    owner_name="Dana",
+)
+OUTBOUND = GreenLineOutboundConfig(agent_name="Sam", base_price="$199")
+
+# (builder module, builder, base config, other values for the fields the nodes must not depend on)
+BUILDERS = [
+    (greenline_agent, GreenLineAgentBuilder, INBOUND, {"business_type": "hvac"}),
+    (outbound_agent, GreenLineOutboundAgentBuilder, OUTBOUND, {}),
+]
+
+
+def _changed(config, name: str, overrides: dict):
+    if name in overrides:
+        return dataclasses.replace(config, **{name: overrides[name]})
+    value = getattr(config, name)
+    return dataclasses.replace(config, **{name: value + ["Other"] if isinstance(value, list) else f"{value}-other"})
+
+
+def test_templated_nodes_match_direct_build():
+    for _, cls, config, _ in BUILDERS:
+        builder = cls.__new__(cls)
+        for tenant in (config, dataclasses.replace(config, company_name="Bob's", webhook_url="https://bob.example")):
+            assert builder._render_nodes(tenant) == builder._build_nodes(tenant)
+
+
+def test_shape_fields_cover_what_the_nodes_read():
+    for module, cls, config, overrides in BUILDERS:
+        builder = cls.__new__(cls)
+        expected = builder._build_nodes(config)
+        for field in dataclasses.fields(config):
+            if field.name in module.TEMPLATE_SLOT_FIELDS or field.name in module.NODE_SHAPE_FIELDS:
+                continue
+            changed = _changed(config, field.name, overrides)
+            assert builder._build_nodes(changed) == expected, (
+                f"{cls.__name__}._build_nodes reads {field.name}; add it to NODE_SHAPE_FIELDS"
+            )
+
+
+def test_templates_keyed_by_shape_fields_only():
+    builds = []
+
+    def build(config):
+        builds.append(config.business_type)
+        return [{"id": config.business_type, "text": f"Call {config.company_name}"}]
+
+    section = CompiledSection(
+        build, lambda config: {"company_name": config.company_name}, ("company_name",),
+        shape_fields=("business_type",), max_templates=2,
+    )
+    for number in range(10):
+        config = dataclasses.replace(INBOUND, company_name=f"Tenant {number}",
+                                     calendly_url=f"https://calendly.com/tenant-{number}")
+        assert section.render(config) == [{"id": "landscaping", "text": f"Call Tenant {number}"}]
+    assert list(section._templates) == [("landscaping",)]
+    assert len(builds) == 2  # One direct build to check the template, one with the markers
+
+    for business_type in ("hvac", "plumbing", "landscaping"):
+        section.render(dataclasses.replace(INBOUND, business_type=business_type))
+    assert list(section._templates) == [("plumbing",), ("landscaping",)]  # Least recently used dropped
+
+
+def test_untemplatable_section_falls_back_to_direct_build():
+    section = CompiledSection(
+        lambda config: [config.company_name.upper()], lambda config: {"company_name": config.company_name},
+        ("company_name",),
+    )
+    assert section.render(INBOUND) == ["ACME LANDSCAPING"]
+    assert section.render(dataclasses.replace(INBOUND, company_name="Bob's")) == ["BOB'S"]
+    assert section._templates == {(): None}
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Tests for the Supabase steps of the GreenLine agent builders.
+
+Runs GreenLineAgentBuilder and AsyncGreenLineAgentBuilder against a fake
+Supabase client (no network) to check that both send the same
+business_onboarding queries and read the results the same way, that
+AsyncClientPool creates one Supabase client for concurrent callers, that
+async builders close only the pools they created, and that update_agent()
+never patches a flow another agent uses.
+
+Usage:
+    cd flow-builder
+    python -m pytest test_greenline_agent.py
+    python test_greenline_agent.py
+"""
+
+import asyncio
+import sys
+from types import ModuleType, SimpleNamespace
+
+from async_clients import AsyncClientPool
+from greenline_agent import AsyncGreenLineAgentBuilder, GreenLineAgentBuilder, GreenLineConfig
+from outbound_agent import AsyncGreenLineOutboundAgentBuilder
+
+
+class FakeQuery:
+    """Records the chained query; execute() returns the rows of the fake table."""
+
+    def __init__(self, table, rows, executed):
+        self.calls = [("table", table)]
+        self.rows = rows
+        self.executed = executed
+
+    def __getattr__(self, name):
+        def step(*args):
+            self.calls.append((name, *args))
+            return self
+        return step
+
+    def _result(self):
+        self.executed.append(self.calls)
+        ids = [args[1] for name, *args in self.calls if name == "eq"]
+        data = [row for row in self.rows if row["id"] in ids]
+        if ("single",) in self.calls:
+            data = data[0] if data else None
+        return SimpleNamespace(data=data)
+
+    def execute(self):
+        return self._result()
+
+
+class AsyncFakeQuery(FakeQuery):
+    async def execute(self):
+        return self._result()
+
+
+class FakeSupabase:
+    def __init__(self, query_class, rows):
+        self.query_class = query_class
+        self.rows = rows
+        self.executed = []
+
+    def table(self, name):
+        return self.query_class(name, self.rows, self.executed)
+
+
+ROWS = [{"id": "ob-1", "business_name": "Acme Lawn"}]
+
+
+def _sync_builder() -> GreenLineAgentBuilder:
+    builder = GreenLineAgentBuilder(api_key="key_test")
+    builder.supabase = FakeSupabase(FakeQuery, ROWS)
+    return builder
+
+
+def _async_builder() -> AsyncGreenLineAgentBuilder:
+    builder = AsyncGreenLineAgentBuilder(api_key="key_test", pool=SimpleNamespace(retell=lambda key: None))
+    builder.supabase = FakeSupabase(AsyncFakeQuery, ROWS)
+    return builder
+
+
+def test_sync_and_async_builders_send_the_same_queries():
+    sync_builder = _sync_builder()
+    async_builder = _async_builder()
+
+    async def run_async():
+        return (
+            await async_builder.link_agent_to_onboarding("ob-1", "agent-1", phone_number="+14085551234"),
+            await async_builder.link_agent_to_onboarding("ob-missing", "agent-1"),
+            await async_builder.fetch_onboarding("ob-1"),
+            await async_builder.activate_onboarding("ob-1"),
+        )
+
+    sync_results = (
+        sync_builder.link_agent_to_onboarding("ob-1", "agent-1", phone_number="+14085551234"),
+        sync_builder.link_agent_to_onboarding("ob-missing", "agent-1"),
+        sync_builder.fetch_onboarding("ob-1"),
+        sync_builder.activate_onboarding("ob-1"),
+    )
+    assert sync_results == asyncio.run(run_async()) == (True, False, ROWS[0], True)
+    assert sync_builder.supabase.executed == async_builder.supabase.executed
+    assert sync_builder.supabase.executed[0] == [
+        ("table", "business_onboarding"),
+        ("update", {"retell_agent_id": "agent-1", "status": "agent_created",
+                    "retell_phone_number": "+14085551234"}),
+        ("eq", "id", "ob-1"),
+    ]
+
+
+def test_missing_onboarding_raises_in_both_builders():
+    for fetch in (_sync_builder().fetch_onboarding,
+                  lambda onboarding_id: asyncio.run(_async_builder().fetch_onboarding(onboarding_id))):
+        try:
+            fetch("ob-missing")
+        except ValueError as e:
+            assert "ob-missing" in str(e)
+        else:
+            raise AssertionError("fetch_onboarding returned for a missing record")
+
+
+def test_pool_creates_one_supabase_client_for_concurrent_callers():
+    created = []
+
+    async def acreate_client(url, key):
+        await asyncio.sleep(0.01)  # Give the other callers a chance to interleave
+        created.append((url, key))
+        return object()
+
+    fake_supabase = ModuleType("supabase")
+    fake_supabase.acreate_client = acreate_client
+
+    async def scenario():
+        async with AsyncClientPool() as pool:
+            return await asyncio.gather(*(pool.supabase("https://db.example", "key") for _ in range(5)))
+
+    original = sys.modules.get("supabase")
+    sys.modules["supabase"] = fake_supabase
+    try:
+        clients = asyncio.run(scenario())
+    finally:
+        if original is None:
+            del sys.modules["supabase"]
+        else:
+            sys.modules["supabase"] = original
+
+    assert created == [("https://db.example", "key")]
+    assert all(client is clients[0] for client in clients)
+
+
+def test_async_builders_close_only_their_own_pool():
+    async def scenario():
+        async with AsyncClientPool() as shared:
+            for builder_class in (AsyncGreenLineAgentBuilder, AsyncGreenLineOutboundAgentBuilder):
+                async with builder_class(api_key="key_test") as builder:
+                    owned = builder.pool
+                assert owned is not shared and owned.http.is_closed
+
+                async with builder_class(api_key="key_test", pool=shared) as builder:
+                    assert builder.pool is shared
+                assert not shared.http.is_closed
+
+    asyncio.run(scenario())
+
+
+class FakeRetell:
+    """agent / conversation_flow resources where agents "a1" and "a2" share "flow-1"."""
+
+    def __init__(self):
+        self.calls = []
+        agents = [SimpleNamespace(agent_id=agent_id, response_engine={
+            "type": "conversation-flow", "conversation_flow_id": "flow-1"}) for agent_id in ("a1", "a2")]
+        self.agent = SimpleNamespace(
+            retrieve=lambda agent_id: agents[0],
+            list=lambda: agents,
+            update=lambda agent_id, **params: self.calls.append(("agent.update", agent_id, params)),
+        )
+        self.conversation_flow = SimpleNamespace(
+            retrieve=lambda flow_id: {"start_node_id": "greeting", "nodes": []},
+            create=lambda **params: self.calls.append(("flow.create",)) or SimpleNamespace(conversation_flow_id="flow-2"),
+            update=lambda flow_id, **params: self.calls.append(("flow.update", flow_id)),
+        )
+
+
+def test_shared_flow_is_not_patched_without_a_flow_cache():
+    builder = GreenLineAgentBuilder(api_key="key_test")
+    assert builder.flow_cache is None
+    builder.client = FakeRetell()
+    config = GreenLineConfig(company_name="Acme Lawn", business_type="landscaping", phone_number="+16195550100")
+
+    result = builder.update_agent("a1", config)
+    assert result["conversation_flow_id"] == "flow-2"
+    assert ("flow.create",) in builder.client.calls
+    assert not [call for call in builder.client.calls if call[0] == "flow.update"]
+    [(_, agent_id, params)] = [call for call in builder.client.calls if call[0] == "agent.update"]
+    assert agent_id == "a1" and params["response_engine"]["conversation_flow_id"] == "flow-2"
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
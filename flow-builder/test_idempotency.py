@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Tests for idempotency.py.
+
+Checks that a repeated tool call is replayed instead of run again (in one
+worker, while the first delivery is still running, and across workers
+through a shared SQLite state), and that failures are not remembered.
+
+Usage:
+    cd flow-builder
+    python -m pytest test_idempotency.py
+    python test_idempotency.py
+"""
+
+import asyncio
+import os
+import tempfile
+
+from idempotency import IdempotencyIndex, tool_call_key
+from shared_state import SQLiteState
+
+PAYLOAD = {"call": {"call_id": "call_1"}, "name": "capture_lead",
+           "args": {"customer_name": "Jane Doe", "phone": "555-0100"}}
+
+
+def _handler(runs: list, delay: float = 0):
+    async def handler():
+        runs.append(1)
+        await asyncio.sleep(delay)
+        return {"lead_id": f"LEAD-{len(runs)}"}
+    return handler
+
+
+def test_key_covers_call_tool_and_arguments():
+    key = tool_call_key(PAYLOAD, "submit_lead")
+    assert key == tool_call_key({**PAYLOAD, "args": {"phone": "555-0100", "customer_name": "Jane Doe"}}, "x")
+    assert key != tool_call_key({**PAYLOAD, "args": {"customer_name": "John Doe"}}, "submit_lead")
+    assert key != tool_call_key({**PAYLOAD, "call": {"call_id": "call_2"}}, "submit_lead")
+    assert tool_call_key(PAYLOAD["args"], "submit_lead") is None
+    assert tool_call_key(PAYLOAD["args"], "submit_lead", header_key="abc").startswith("key:abc:submit_lead:")
+
+
+def test_repeat_delivery_is_replayed():
+    index = IdempotencyIndex()
+    runs = []
+
+    async def scenario():
+        key = tool_call_key(PAYLOAD, "submit_lead")
+        first = await index.run(key, _handler(runs))
+        second = await index.run(key, _handler(runs))
+        unkeyed = await index.run(None, _handler(runs))
+        return first, second, unkeyed
+
+    first, second, unkeyed = asyncio.run(scenario())
+    assert first == ({"lead_id": "LEAD-1"}, False)
+    assert second == ({"lead_id": "LEAD-1"}, True)
+    assert unkeyed == ({"lead_id": "LEAD-2"}, False)
+    assert index.counters["replayed"] == 1
+
+
+def test_concurrent_delivery_waits_for_the_first():
+    index = IdempotencyIndex()
+    runs = []
+
+    async def scenario():
+        key = tool_call_key(PAYLOAD, "submit_lead")
+        return await asyncio.gather(index.run(key, _handler(runs, 0.05)), index.run(key, _handler(runs, 0.05)))
+
+    first, second = asyncio.run(scenario())
+    assert len(runs) == 1
+    assert first == ({"lead_id": "LEAD-1"}, False) and second == ({"lead_id": "LEAD-1"}, True)
+    assert index.counters["waited"] == 1
+
+
+def test_failure_is_not_remembered():
+    index = IdempotencyIndex()
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("calendar down")
+        return {"confirmation_number": "APT-1"}
+
+    async def scenario():
+        key = tool_call_key(PAYLOAD, "book_appointment")
+        try:
+            await index.run(key, flaky)
+        except RuntimeError:
+            pass
+        return await index.run(key, flaky)
+
+    assert asyncio.run(scenario()) == ({"confirmation_number": "APT-1"}, False)
+    assert len(attempts) == 2
+
+
+def test_replayed_across_workers_through_shared_state():
+    runs = []
+
+    async def scenario(path):
+        shared_a, shared_b = SQLiteState(path), SQLiteState(path)
+        worker_a = IdempotencyIndex(shared=shared_a)
+        worker_b = IdempotencyIndex(shared=shared_b)
+        key = tool_call_key(PAYLOAD, "submit_lead")
+        # Both workers get the same delivery at once; only one runs the handler
+        results = await asyncio.gather(worker_a.run(key, _handler(runs, 0.1)), worker_b.run(key, _handler(runs, 0.1)))
+        late = await IdempotencyIndex(shared=shared_b).run(key, _handler(runs))
+        await shared_a.close()
+        await shared_b.close()
+        return results, late, worker_a.counters["shared_waited"] + worker_b.counters["shared_waited"]
+
+    with tempfile.TemporaryDirectory() as directory:
+        results, late, waited = asyncio.run(scenario(os.path.join(directory, "state.db")))
+
+    assert len(runs) == 1
+    assert sorted(replayed for _, replayed in results) == [False, True]
+    assert all(content == {"lead_id": "LEAD-1"} for content, _ in results)
+    assert late == ({"lead_id": "LEAD-1"}, True)
+    assert waited == 1
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Tests for instrumentation.py (Prometheus-style /metrics).
+
+Checks the exposition format, route-template labels, upstream timing
+through HTTPClientPool, and that recording adds only microseconds per
+request.
+
+Usage:
+    cd flow-builder
+    python -m pytest test_instrumentation.py
+    python test_instrumentation.py
+"""
+
+import asyncio
+import time
+
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from http_pool import HTTPClientPool
+from instrumentation import Histogram, PrometheusMiddleware, Registry, route_summary, upstream_observer
+
+# Budget for the middleware's own bookkeeping, per request
+MAX_OVERHEAD_US = 25.0
+
+
+def _app(registry: Registry):
+    async def call(request):
+        return PlainTextResponse(request.path_params["call_id"])
+
+    async def fail(request):
+        return PlainTextResponse("no", status_code=503)
+
+    app = Starlette(routes=[Route("/api/calls/{call_id}", call), Route("/fail", fail)])
+    return PrometheusMiddleware(app, registry=registry)
+
+
+async def _get(app, path: str) -> httpx.Response:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        return await client.get(path)
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency", ("route",), buckets=(0.01, 0.1))
+    for value in (0.005, 0.01, 0.05, 3.0):
+        histogram.observe(value, ("/a",))
+
+    samples = {(name, labels): value for name, labels, value in histogram.samples()}
+    assert samples[("latency_seconds_bucket", '{route="/a",le="0.01"}')] == 2  # Bounds are inclusive
+    assert samples[("latency_seconds_bucket", '{route="/a",le="0.1"}')] == 3
+    assert samples[("latency_seconds_bucket", '{route="/a",le="+Inf"}')] == 4
+    assert samples[("latency_seconds_count", '{route="/a"}')] == 4
+    assert abs(samples[("latency_seconds_sum", '{route="/a"}')] - 3.065) < 1e-9
+
+
+def test_render_exposition_format():
+    registry = Registry()
+    registry.counter("events_total", "Events", ("event",)).inc(('call "ended"',), 2)
+    registry.callback("queue_depth", "Depth", "gauge", ("queue",), lambda: {("crm",): 3})
+    text = registry.render()
+
+    assert "# TYPE events_total counter\n" in text
+    assert 'events_total{event="call \\"ended\\""} 2\n' in text
+    assert "# TYPE queue_depth gauge\n" in text
+    assert 'queue_depth{queue="crm"} 3\n' in text
+
+
+def test_registry_rejects_duplicate_names():
+    registry = Registry()
+    registry.counter("events_total", "Events")
+    try:
+        registry.counter("events_total", "Events")
+    except ValueError:
+        return
+    raise AssertionError("duplicate metric name was accepted")
+
+
+def test_middleware_labels_route_template_and_status():
+    registry = Registry()
+    app = _app(registry)
+
+    async def run():
+        await _get(app, "/api/calls/call_1")
+        await _get(app, "/api/calls/call_2")
+        await _get(app, "/fail")
+        await _get(app, "/nowhere")
+
+    asyncio.run(run())
+    text = registry.render()
+    assert 'greenline_http_requests_total{method="GET",route="/api/calls/{call_id}",status="200"} 2' in text
+    assert 'greenline_http_requests_total{method="GET",route="/fail",status="503"} 1' in text
+    assert 'greenline_http_requests_total{method="GET",route="unmatched",status="404"} 1' in text
+    assert 'greenline_http_request_duration_seconds_count{method="GET",route="/api/calls/{call_id}"} 2' in text
+    assert "call_1" not in text  # Raw paths never become labels
+
+
+def test_histogram_quantile_interpolates_within_bucket():
+    histogram = Histogram("latency_seconds", "Latency", buckets=(0.01, 0.1, 1.0))
+    for value in [0.005] * 50 + [0.05] * 40 + [0.5] * 9 + [5.0]:
+        histogram.observe(value)
+    series = histogram.values[()]
+
+    assert abs(histogram.quantile(0.25, series) - 0.005) < 1e-9  # Halfway through the first bucket
+    assert 0.01 < histogram.quantile(0.9, series) <= 0.1
+    assert histogram.quantile(1.0, series) == 1.0  # +Inf is reported as the largest bound
+
+
+def test_route_summary_reads_middleware_metrics():
+    registry = Registry()
+    assert route_summary(registry) == {}
+    app = _app(registry)
+
+    async def run():
+        for path in ("/api/calls/call_1", "/api/calls/call_2", "/fail"):
+            await _get(app, path)
+
+    asyncio.run(run())
+    summary = route_summary(registry)
+    assert summary["/api/calls/{call_id}"]["count"] == 2
+    assert summary["/api/calls/{call_id}"]["errors"] == 0
+    assert summary["/fail"]["errors"] == 1
+    assert set(summary["/fail"]) == {"count", "errors", "mean_ms", "p50_ms", "p95_ms", "p99_ms"}
+
+
+def test_upstream_observer_times_pool_requests():
+    registry = Registry()
+    pool = HTTPClientPool(observer=upstream_observer(registry))
+
+    def handler(request):
+        return httpx.Response(201 if request.url.host == "crm.example.com" else 502)
+
+    async def run():
+        pool.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        await pool.post("https://crm.example.com/webhook", json={})
+        await pool.get("https://api.calendly.com/event_type_available_times")
+        await pool.aclose()
+
+    asyncio.run(run())
+    text = registry.render()
+    assert 'greenline_upstream_requests_total{host="crm.example.com",method="POST",status="201"} 1' in text
+    assert 'greenline_upstream_requests_total{host="api.calendly.com",method="GET",status="502"} 1' in text
+    assert 'greenline_upstream_request_duration_seconds_count{host="api.calendly.com",method="GET"} 1' in text
+
+
+def test_recording_overhead_is_microseconds():
+    async def bare(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    registry = Registry()
+    instrumented = PrometheusMiddleware(bare, registry=registry)
+    scope = {"type": "http", "method": "POST", "path": "/webhook/retell", "headers": []}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    async def per_request(app, count: int) -> float:
+        started = time.perf_counter()
+        for _ in range(count):
+            await app(dict(scope), receive, send)
+        return (time.perf_counter() - started) / count
+
+    async def run() -> float:
+        await per_request(instrumented, 1000)  # Warm up: create the label series
+        # Best of several rounds, so a scheduler hiccup doesn't fail the test
+        rounds = []
+        for _ in range(5):
+            rounds.append(await per_request(instrumented, 5000) - await per_request(bare, 5000))
+        return min(rounds)
+
+    overhead_us = asyncio.run(run()) * 1e6
+    print(f"Middleware overhead: {overhead_us:.2f} us/request")
+    assert overhead_us < MAX_OVERHEAD_US, f"{overhead_us:.1f} us per request"
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for load_test.compare().
+
+Checks that p95 latency and error rate regressions are flagged, that
+throughput only counts when the run fell behind its arrival rate, and
+that a baseline recorded with different load settings is refused.
+
+Usage:
+    cd flow-builder
+    python -m pytest test_load_test.py
+    python test_load_test.py
+"""
+
+from load_test import compare, run_config
+
+
+def _report(throughput: float = 100.0, p95: float = 10.0, error_rate: float = 0.0, late_starts: int = 0,
+            **config) -> dict:
+    settings = {"rate": 20.0, "concurrency": 50, "duration": 30.0, "think_time": 0.0, "signed": False, **config}
+    return {
+        "config": run_config(**settings),
+        "late_starts": late_starts,
+        "throughput_rps": throughput,
+        "operations": {"submit_lead": {"p95_ms": p95, "error_rate": error_rate}},
+    }
+
+
+def test_latency_and_errors_are_compared():
+    baseline = _report()
+    assert compare(_report(p95=11.0), baseline) == []
+    assert compare(_report(p95=13.0), baseline) == ["submit_lead: p95 13.0 ms > baseline 10.0 ms"]
+    assert compare(_report(error_rate=0.05), baseline) == ["submit_lead: error rate 5.00% > baseline 0.00%"]
+
+
+def test_throughput_only_compared_when_saturated():
+    baseline = _report(throughput=100.0)
+    # The rate held, so lower throughput is just a shorter tail, not a regression
+    assert compare(_report(throughput=60.0), baseline) == []
+    [message] = compare(_report(throughput=60.0, late_starts=12), baseline)
+    assert message.startswith("throughput 60.0 req/s < baseline 100.0 req/s")
+
+
+def test_different_load_settings_are_refused():
+    baseline = _report()
+    for changed in ({"rate": 50.0}, {"concurrency": 10}, {"duration": 60.0}, {"think_time": 0.5}, {"signed": True}):
+        try:
+            compare(_report(**changed), baseline)
+        except ValueError as e:
+            assert next(iter(changed)) in str(e)
+        else:
+            raise AssertionError(f"compare() accepted a run with {changed}")
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Tests for retell_signature.py.
+
+Checks RetellSignatureVerifier against signatures made the way Retell
+makes them (valid, tampered body, wrong key, malformed header, expired
+timestamp), and that RetellSignatureMiddleware answers bad requests with
+401/413 before the endpoint runs.
+
+Usage:
+    cd flow-builder
+    python -m pytest test_retell_signature.py
+    python test_retell_signature.py
+"""
+
+import hashlib
+import hmac
+import json
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from retell.lib.webhook_auth import verify as retell_verify
+
+from retell_signature import TOLERANCE_MS, RetellSignatureMiddleware, RetellSignatureVerifier
+
+API_KEY = "key_test_123"
+BODY = json.dumps({"args": {"customer_name": "Jane Doe", "phone": "+14085551234"}}).encode()
+
+
+def _sign(body: bytes, api_key: str = API_KEY, timestamp: int = None) -> str:
+    """x-retell-signature value: v=<ms>,d=HMAC-SHA256(key, body + ms)."""
+    timestamp = int(time.time() * 1000) if timestamp is None else timestamp
+    digest = hmac.new(api_key.encode(), body + str(timestamp).encode(), hashlib.sha256).hexdigest()
+    return f"v={timestamp},d={digest}"
+
+
+def test_valid_signature_verifies():
+    verifier = RetellSignatureVerifier(API_KEY)
+    signature = _sign(BODY)
+    assert verifier.verify(BODY, signature)
+    assert retell_verify(BODY.decode(), API_KEY, signature)  # Same scheme as the Retell SDK
+
+
+def test_tampered_body_and_wrong_key_are_rejected():
+    verifier = RetellSignatureVerifier(API_KEY)
+    assert not verifier.verify(BODY.replace(b"Jane", b"John"), _sign(BODY))
+    assert not verifier.verify(BODY, _sign(BODY, api_key="key_other"))
+
+
+def test_malformed_signatures_are_rejected():
+    verifier = RetellSignatureVerifier(API_KEY)
+    valid = _sign(BODY)
+    for signature in ("", "garbage", valid.replace("v=", "t="), valid[:-1], valid.upper(), valid + ",x=1"):
+        assert verifier.parse(signature) is None, signature
+        assert not verifier.verify(BODY, signature)
+
+
+def test_expired_timestamp_is_rejected():
+    verifier = RetellSignatureVerifier(API_KEY)
+    now = int(time.time() * 1000)
+    assert verifier.verify(BODY, _sign(BODY, timestamp=now - TOLERANCE_MS + 1000))
+    assert not verifier.verify(BODY, _sign(BODY, timestamp=now - TOLERANCE_MS - 1000))
+    assert not verifier.verify(BODY, _sign(BODY, timestamp=now + TOLERANCE_MS + 1000))
+
+
+def _client(verifier: RetellSignatureVerifier, **kwargs) -> tuple:
+    app = FastAPI()
+    handled = []
+
+    @app.post("/api/leads")
+    async def submit_lead(request: Request):
+        handled.append(await request.body())
+        return {"success": True}
+
+    app.add_middleware(RetellSignatureMiddleware, verifier=verifier, paths=("/api/leads",), **kwargs)
+    return TestClient(app), handled
+
+
+def test_endpoint_rejects_bad_signatures():
+    verifier = RetellSignatureVerifier(API_KEY)
+    client, handled = _client(verifier, required=True, max_body_bytes=len(BODY))
+
+    def post(body=BODY, signature=None):
+        headers = {"content-type": "application/json"}
+        if signature is not None:
+            headers["x-retell-signature"] = signature
+        return client.post("/api/leads", content=body, headers=headers)
+
+    response = post(signature=_sign(BODY))
+    assert response.status_code == 200 and handled == [BODY]  # The endpoint sees the verified body
+
+    expired = _sign(BODY, timestamp=int(time.time() * 1000) - TOLERANCE_MS - 1000)
+    for signature in (_sign(BODY, api_key="key_other"), "v=1,d=abc", expired, None):
+        response = post(signature=signature)
+        assert response.status_code == 401, signature
+    assert post(BODY.replace(b"Jane", b"John"), _sign(BODY)).status_code == 401
+    assert post(BODY + b" ", _sign(BODY + b" ")).status_code == 413
+
+    assert handled == [BODY]
+    assert verifier.counters["verified"] == 1 and verifier.counters["rejected"] == 6
+
+
+def test_unsigned_requests_pass_unless_required():
+    client, handled = _client(RetellSignatureVerifier(API_KEY))
+    assert client.post("/api/leads", content=BODY).status_code == 200
+
+    disabled, _ = _client(RetellSignatureVerifier(""), required=True)
+    assert disabled.post("/api/leads", content=BODY, headers={"x-retell-signature": "garbage"}).status_code == 200
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Tests for shared_state.py and the availability cache invalidations it carries.
+
+Runs the same contract against LocalState and SQLiteState (Redis needs a
+server and is not covered here), and checks that two caches sharing one
+SQLite store see each other's invalidations.
+
+Usage:
+    cd flow-builder
+    python -m pytest test_shared_state.py
+    python test_shared_state.py
+"""
+
+import asyncio
+import os
+import tempfile
+
+from availability_cache import TTLCache
+from shared_state import LocalState, SQLiteState
+
+
+async def _check_contract(state):
+    assert await state.get("a") is None
+    await state.set("a", "1")
+    assert await state.get("a") == "1"
+
+    assert await state.add("claim", "x", ttl=30)
+    assert not await state.add("claim", "y", ttl=30)
+    assert await state.get("claim") == "x"
+
+    await state.set("short", "1", ttl=0.01)
+    await asyncio.sleep(0.02)
+    assert await state.get("short") is None
+    assert await state.add("short", "2")  # An expired key can be claimed again
+
+    assert await state.incr("n") == 1
+    assert await state.incr("n") == 2
+    assert sorted(await state.keys("cl")) == ["claim"]
+
+    await state.delete("a")
+    assert await state.get("a") is None
+    await state.close()
+
+
+def test_local_state():
+    asyncio.run(_check_contract(LocalState()))
+
+
+def test_sqlite_state():
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(_check_contract(SQLiteState(os.path.join(directory, "state.db"))))
+
+
+def test_sqlite_state_shared_between_instances():
+    async def scenario(path):
+        first, second = SQLiteState(path), SQLiteState(path)
+        assert await first.add("claim", "1", ttl=30)
+        assert not await second.add("claim", "2", ttl=30)
+        await second.set("k", "v")
+        assert await first.get("k") == "v"
+        await first.close()
+        await second.close()
+
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(scenario(os.path.join(directory, "state.db")))
+
+
+def test_invalidation_reaches_other_worker():
+    loads = []
+
+    async def loader(key):
+        loads.append(key)
+        return len(loads)
+
+    async def scenario(path):
+        shared_a, shared_b = SQLiteState(path), SQLiteState(path)
+        worker_a = TTLCache(loader, shared=shared_a)
+        worker_b = TTLCache(loader, shared=shared_b)
+        assert await worker_a.get("slots") == 1
+        assert await worker_b.get("slots") == 2
+        assert await worker_b.get("slots") == 2  # Cached
+
+        await worker_a.invalidate()
+        assert await worker_b.get("slots") == 3  # Dropped after a's booking
+        assert worker_b.counters["shared_invalidations"] == 1
+        assert worker_a.counters["shared_invalidations"] == 0
+        await shared_a.close()
+        await shared_b.close()
+
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(scenario(os.path.join(directory, "state.db")))
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
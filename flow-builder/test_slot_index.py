@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for slot_index.py.
+
+Checks slot lookups (next available, by date, by weekday), that a booked
+slot is no longer offered, that refresh() trims past days and adds new
+ones without bringing booked slots back, and weekday name parsing.
+
+Usage:
+    cd flow-builder
+    python -m pytest test_slot_index.py
+    python test_slot_index.py
+"""
+
+from datetime import date, datetime, timedelta
+
+from slot_index import DEFAULT_HOURS, SlotIndex, parse_weekday
+
+
+def _next(weekday: int) -> date:
+    """First day from tomorrow on that falls on a weekday."""
+    tomorrow = date.today() + timedelta(days=1)
+    return tomorrow + timedelta(days=(weekday - tomorrow.weekday()) % 7)
+
+
+def test_lookups():
+    index = SlotIndex()
+    slots = index.next_available(limit=6)
+    assert len(slots) == 6
+    times = [datetime.fromisoformat(slot["datetime"]) for slot in slots]
+    assert times == sorted(times) and times[0].date() > date.today()
+    assert all(slot_time.hour in DEFAULT_HOURS and slot_time.weekday() != 6 for slot_time in times)
+    assert slots[0]["display"] == times[0].strftime("%A, %B %d at %I:%M %p")
+
+    wednesday = _next(2)
+    assert [slot["datetime"] for slot in index.on_date(wednesday)] == [
+        datetime(wednesday.year, wednesday.month, wednesday.day, hour).isoformat() for hour in DEFAULT_HOURS
+    ]
+    assert index.on_date(_next(6)) == []  # Closed on Sundays
+    assert index.on_date(date.today()) == []  # Slots start tomorrow
+
+    assert index.next_on_weekday(2) == index.on_date(wednesday)
+    assert index.next_on_weekday(2, limit=1) == index.on_date(wednesday)[:1]
+    assert index.next_on_weekday(6) == []
+
+
+def test_booked_slot_is_not_offered_again():
+    index = SlotIndex()
+    friday = _next(4)
+    first, second = (datetime.fromisoformat(slot["datetime"]) for slot in index.on_date(friday)[:2])
+    count = len(index)
+
+    assert index.book(first)
+    assert not index.book(first)
+    assert not index.book(datetime.combine(friday, datetime.min.time()))  # Not a slot
+    assert len(index) == count - 1
+    assert index.next_on_weekday(4)[0]["datetime"] == second.isoformat()
+
+    # Every Friday slot booked: the following Friday is offered
+    for slot in index.on_date(friday):
+        index.book(datetime.fromisoformat(slot["datetime"]))
+    assert datetime.fromisoformat(index.next_on_weekday(4)[0]["datetime"]).date() == friday + timedelta(days=7)
+
+
+def test_refresh_trims_and_extends_incrementally():
+    start = datetime(2025, 6, 10, 15)  # A Tuesday
+    index = SlotIndex(horizon_days=14)
+    index.refresh(start)
+    booked = datetime(2025, 6, 20, 11)
+    assert index.book(booked)
+
+    later = start + timedelta(days=3)
+    index.refresh(later)
+    fresh = SlotIndex(horizon_days=14)
+    fresh.refresh(later)
+    fresh.book(booked)
+
+    assert index._times == fresh._times
+    assert index._times[0].date() == later.date() + timedelta(days=1)
+    assert index._times[-1].date() <= later.date() + timedelta(days=14)
+    assert booked not in index._times  # Still booked after the refresh
+    assert index._slots.keys() == set(index._times)
+
+
+def test_parse_weekday():
+    assert parse_weekday("thu") == 3
+    assert parse_weekday(" Thursday ") == 3
+    assert parse_weekday("SUN") == 6
+    assert parse_weekday("th") is None
+    assert parse_weekday("2025-06-12") is None
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for structured_log.py.
+
+Checks that records are written as JSON with bound context, that
+sampled-out records are counted in stats(), and that
+stop_logging() leaves nothing attached to an unread queue.
+
+Usage:
+    cd flow-builder
+    python -m pytest test_structured_log.py
+    python test_structured_log.py
+"""
+
+import io
+import json
+import logging
+
+import structured_log
+from structured_log import configure_logging, get_logger, log_context, stop_logging
+
+
+def _lines(stream: io.StringIO) -> list:
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_records_written_with_context():
+    stream = io.StringIO()
+    configure_logging(level="INFO", fmt="json", sample="", stream=stream)
+    logger = get_logger("test")
+    with log_context(call_id="call_1"):
+        logger.info("Lead captured", extra={"event": "lead_captured", "lead_id": "LEAD-1"})
+    logger.debug("Not at INFO")
+    stop_logging()
+
+    [entry] = _lines(stream)
+    assert entry["logger"] == "greenline.test" and entry["msg"] == "Lead captured"
+    assert entry["call_id"] == "call_1" and entry["lead_id"] == "LEAD-1"
+
+
+def test_sampled_records_are_counted():
+    stream = io.StringIO()
+    configure_logging(level="INFO", fmt="json", sample="noisy=0.5", stream=stream)
+    logger = get_logger("test")
+    for _ in range(5):
+        logger.info("Noisy", extra={"event": "noisy"})
+    logger.warning("Never sampled", extra={"event": "noisy"})
+    stats = structured_log.stats()
+    stop_logging()
+
+    assert stats["configured"] and stats["sampled_out"] == 2
+    assert [entry["msg"] for entry in _lines(stream)] == ["Noisy"] * 3 + ["Never sampled"]
+
+
+def test_stop_logging_detaches_queue_handler():
+    configure_logging(level="INFO", fmt="json", sample="", stream=io.StringIO())
+    stop_logging()
+
+    root = logging.getLogger(structured_log.ROOT_LOGGER)
+    assert not any(isinstance(handler, structured_log.ContextQueueHandler) for handler in root.handlers)
+    assert root.propagate
+    assert structured_log.stats() == {"configured": False}
+
+    # A second startup (e.g. another lifespan cycle) logs again
+    stream = io.StringIO()
+    configure_logging(level="INFO", fmt="json", sample="", stream=stream)
+    get_logger("test").info("Back", extra={"event": "back"})
+    stop_logging()
+    assert [entry["msg"] for entry in _lines(stream)] == ["Back"]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
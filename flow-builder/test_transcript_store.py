@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Tests for transcript_store.py.
+
+Checks segment indexing: reopening a directory rebuilds the index from
+frame headers, frames from another writer are found after a refresh
+(rate limited on misses), a torn frame ends a segment's scan, segments
+roll over, and the newest frame for a call wins.
+
+Usage:
+    cd flow-builder
+    python -m pytest test_transcript_store.py
+    python test_transcript_store.py
+"""
+
+import io
+import json
+import os
+import tempfile
+
+from transcript_store import CODEC_ZLIB, TranscriptStore
+
+ANALYSIS = {"summary": "Booked a mowing visit", "sentiment": "positive"}
+
+
+def test_index_rebuilt_on_open():
+    with tempfile.TemporaryDirectory() as directory:
+        store = TranscriptStore(directory, codec=CODEC_ZLIB, writer="a")
+        store.append_many([("c1", "transcript", "Agent: Hi"), ("c1", "analysis", ANALYSIS)])
+        store.append("c2", "transcript", "Agent: Hello")
+        store.close()
+
+        reopened = TranscriptStore(directory, writer="a")
+        assert reopened.get_call("c1") == {"transcript": "Agent: Hi", "analysis": ANALYSIS}
+        assert reopened.get("c2") == "Agent: Hello"
+        assert reopened.get("missing") is None
+
+        # Appends go to a new segment; old ones are never appended to
+        reopened.append("c3", "transcript", "Agent: Hey")
+        reopened.close()
+        assert sorted(os.listdir(directory)) == ["segment-a-000001.seg", "segment-a-000002.seg"]
+
+
+def test_store_touches_no_files_until_used():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "transcripts")
+        store = TranscriptStore(path)
+        assert not os.path.exists(path)
+        store.open()
+        assert os.listdir(path) == []  # Reading leaves no empty segment behind
+        store.close()
+
+
+def test_other_writers_frames_found_after_refresh():
+    with tempfile.TemporaryDirectory() as directory:
+        reader = TranscriptStore(directory, writer="a", refresh_interval=3600)
+        other = TranscriptStore(directory, writer="b")
+        reader.open()
+
+        other.append("c1", "transcript", "Agent: From worker b")
+        assert reader.get("c1") is None  # Indexed too recently to refresh again
+        assert reader.counters["refreshes_skipped"] == 1
+
+        reader.refresh()
+        assert reader.get("c1") == "Agent: From worker b"
+
+        eager = TranscriptStore(directory, writer="c", refresh_interval=0)
+        eager.open()
+        other.append("c2", "transcript", "Agent: Later")
+        assert eager.get("c2") == "Agent: Later"
+        for store in (reader, other, eager):
+            store.close()
+
+
+def test_torn_frame_ends_segment_scan():
+    with tempfile.TemporaryDirectory() as directory:
+        store = TranscriptStore(directory, codec=CODEC_ZLIB, writer="a")
+        store.append("c1", "transcript", "Agent: Complete")
+        store.append("c2", "transcript", "Agent: Torn " * 100)
+        store.close()
+
+        [name] = os.listdir(directory)
+        path = os.path.join(directory, name)
+        with open(path, "r+b") as f:
+            f.truncate(os.path.getsize(path) - 10)
+
+        reopened = TranscriptStore(directory, writer="b")
+        assert reopened.get("c1") == "Agent: Complete"
+        assert reopened.get("c2") is None
+        assert [call_id for call_id, _, _ in reopened.iter_records()] == ["c1"]
+
+
+def test_segments_roll_over_and_newest_frame_wins():
+    with tempfile.TemporaryDirectory() as directory:
+        store = TranscriptStore(directory, segment_bytes=200, codec=CODEC_ZLIB, writer="a")
+        for number in range(5):
+            store.append(f"c{number}", "transcript", f"Agent: Call {number} " + "x" * number)
+        store.append("c1", "transcript", "Agent: Retried delivery")
+        assert len(os.listdir(directory)) > 1
+        assert store.get("c1") == "Agent: Retried delivery"
+
+        out = io.StringIO()
+        assert store.export_jsonl(out) == 5
+        exported = {line["call_id"]: line["data"] for line in map(json.loads, out.getvalue().splitlines())}
+        assert exported["c1"] == "Agent: Retried delivery"
+        store.close()
+
+        reopened = TranscriptStore(directory, writer="b")
+        assert reopened.get("c1") == "Agent: Retried delivery"
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
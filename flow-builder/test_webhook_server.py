@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for webhook_server.py.
+
+Runs the app through FastAPI's TestClient with its storage in a temporary
+directory, and checks that the app keeps working when its lifespan runs
+more than once in a process (each TestClient starts and stops it), that
+tool calls are parsed from Retell's envelope or bare args, and that its
+Retell endpoints refuse requests with a bad signature.
+
+Usage:
+    cd flow-builder
+    python -m pytest test_webhook_server.py
+    python test_webhook_server.py
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import tempfile
+import time
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+DIRECTORY = tempfile.TemporaryDirectory()
+
+# The server builds its repository, shared state and transcript store at import
+with mock.patch.dict(os.environ, {
+    "WEBHOOK_STORAGE": "sqlite",
+    "WEBHOOK_DB_PATH": os.path.join(DIRECTORY.name, "webhook.db"),
+    "TRANSCRIPT_STORE_DIR": os.path.join(DIRECTORY.name, "transcripts"),
+    "RETELL_API_KEY": "key_test_123",
+    "RETELL_REQUIRE_SIGNATURE": "",
+}):
+    import webhook_server
+
+LEAD = {"customer_name": "Jane Doe", "phone": "+14085551234", "service_type": "lawn mowing"}
+
+
+def test_lifespan_runs_twice():
+    leads = webhook_server.repository.count_leads()
+    lead_ids = []
+    for _ in range(2):
+        with TestClient(webhook_server.app) as client:
+            response = client.post("/api/leads", json=LEAD)
+            assert response.status_code == 200, response.text
+            lead_ids.append(response.json()["lead_id"])
+            listed = client.get("/api/leads").json()["leads"]
+            assert [lead["lead_id"] for lead in listed][:1] == lead_ids[-1:]
+
+    # Both lifespans' writes were committed to the same database
+    assert webhook_server.repository.count_leads() == leads + 2
+    webhook_server.repository.close()
+
+
+def test_tool_call_bodies_are_validated():
+    tool_call = {"name": "submit_lead", "call": {"call_id": "call-1", "agent_id": "agent-1"}, "args": LEAD}
+    with TestClient(webhook_server.app) as client:
+        first = client.post("/api/leads", json=tool_call)
+        retried = client.post("/api/leads", json=tool_call)
+        assert first.status_code == retried.status_code == 200
+        assert first.json()["lead_id"] == retried.json()["lead_id"]  # Same call, replayed
+
+        for body in (b"{not json", b"[1, 2]", b'{"args": {"phone": "+14085551234"}}'):
+            response = client.post("/api/leads", content=body, headers={"content-type": "application/json"})
+            assert response.status_code == 422, body
+        response = client.post("/api/appointments", json={"args": {**LEAD, "address": "1 Main St"}})
+        assert response.status_code == 422 and "appointment_time" in response.text
+    webhook_server.repository.close()
+
+
+def _sign(body: bytes, api_key: str = "key_test_123") -> str:
+    timestamp = str(int(time.time() * 1000))
+    return f"v={timestamp},d={hmac.new(api_key.encode(), body + timestamp.encode(), hashlib.sha256).hexdigest()}"
+
+
+def test_endpoints_reject_bad_signatures():
+    body = json.dumps({"args": LEAD}).encode()
+    leads = webhook_server.repository.count_leads()
+    with TestClient(webhook_server.app) as client:
+        for path in ("/api/leads", "/api/appointments", "/webhook/retell"):
+            for signature in (_sign(body, api_key="key_other"), "v=1,d=garbage"):
+                response = client.post(path, content=body, headers={"x-retell-signature": signature})
+                assert response.status_code == 401, (path, signature)
+
+        response = client.post("/api/leads", content=body, headers={"x-retell-signature": _sign(body)})
+        assert response.status_code == 200, response.text
+    assert webhook_server.repository.count_leads() == leads + 1  # Only the signed lead was stored
+    webhook_server.repository.close()
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Tests for webhook_storage.py.
+
+Checks that SQLiteRepository opens its database on first use (not when it
+is created), that saves never commit on the caller's thread, that run()
+moves SQLite calls off the event loop, that saved records are visible
+to the next read and survive close() (after which the repository reopens),
+and that both backends page through filtered records with keyset cursors
+the same way, including records that share a created_at.
+
+Usage:
+    cd flow-builder
+    python -m pytest test_webhook_storage.py
+    python test_webhook_storage.py
+"""
+
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+from webhook_storage import (
+    InvalidCursor,
+    MemoryRepository,
+    SQLiteRepository,
+    decode_cursor,
+    encode_cursor,
+)
+
+
+def _lead(number: int, phone: str = "+14085551234") -> dict:
+    return {"lead_id": f"LEAD-{number}", "phone": phone, "status": "new",
+            "created_at": f"2025-01-01T00:00:{number:02d}"}
+
+
+def test_database_opened_on_first_use():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "webhook.db")
+        repository = SQLiteRepository(path)
+        assert not os.path.exists(path)
+        repository.close()
+        assert not os.path.exists(path)  # Nothing was written, so nothing was created
+
+        repository = SQLiteRepository(path)
+        repository.save_lead(_lead(1))
+        assert repository.get_lead("LEAD-1")["phone"] == "+14085551234"
+        repository.close()
+
+        reopened = SQLiteRepository(path)
+        assert reopened.count_leads() == 1
+        reopened.close()
+
+
+def test_full_batch_committed_by_writer_thread():
+    with tempfile.TemporaryDirectory() as directory:
+        repository = SQLiteRepository(os.path.join(directory, "webhook.db"), batch_size=2, flush_interval=60)
+        committers = []
+        flush = repository.flush
+        repository.flush = lambda: (committers.append(threading.get_ident()), flush())
+
+        for number in range(1, 4):
+            repository.save_lead(_lead(number))
+        assert committers == []  # Saving never commits inline, even once the batch is full
+        for _ in range(100):
+            if committers:
+                break
+            time.sleep(0.01)
+        assert committers and threading.get_ident() not in committers  # Didn't wait out flush_interval
+
+        repository.close()
+        repository.save_lead(_lead(4))  # Reopens after close()
+        assert repository.count_leads() == 4
+        repository.close()
+
+
+def test_run_calls_sqlite_off_the_event_loop():
+    with tempfile.TemporaryDirectory() as directory:
+        repository = SQLiteRepository(os.path.join(directory, "webhook.db"))
+        threads = []
+
+        def find(phone):
+            threads.append(threading.get_ident())
+            return repository.find_leads_by_phone(phone)
+
+        async def scenario():
+            repository.save_lead(_lead(1))
+            repository.save_lead(_lead(2))
+            repository.save_lead(_lead(3, phone="+14085559999"))
+            leads = await repository.run(find, "+14085551234")
+            page = await repository.run(repository.query, "lead", limit=2)
+            return leads, page, threading.get_ident()
+
+        leads, page, loop_thread = asyncio.run(scenario())
+        repository.close()
+
+    assert [lead["lead_id"] for lead in leads] == ["LEAD-2", "LEAD-1"]
+    assert [lead["lead_id"] for lead in page.records] == ["LEAD-3", "LEAD-2"] and page.next_cursor
+    assert threads and threads[0] != loop_thread
+
+
+def test_memory_repository_runs_inline():
+    repository = MemoryRepository()
+    threads = []
+
+    def count():
+        threads.append(threading.get_ident())
+        return repository.count_leads()
+
+    async def scenario():
+        repository.save_lead(_lead(1))
+        return await repository.run(count), threading.get_ident()
+
+    leads, loop_thread = asyncio.run(scenario())
+    assert leads == 1 and threads == [loop_thread]
+
+
+def _paging_leads() -> list:
+    # Three leads per second, so pages split runs of equal created_at
+    return [
+        {"lead_id": f"LEAD-{number}", "phone": ("+14085551234", "+14085559999")[number % 2],
+         "status": ("new", "contacted", "booked")[number % 3], "priority": "normal",
+         "created_at": f"2025-01-0{1 + number // 12}T09:00:{number // 3:02d}"}
+        for number in range(23)
+    ]
+
+
+def _newest_first(leads: list) -> list:
+    return [lead["lead_id"] for lead in sorted(leads, key=lambda lead: (lead["created_at"], lead["lead_id"]),
+                                               reverse=True)]
+
+
+def _selected(lead: dict, filters: dict) -> bool:
+    """Whether a lead passes query filters (created_to is an inclusive prefix)."""
+    for name, value in filters.items():
+        if name == "created_from" and lead["created_at"] < value:
+            return False
+        if name == "created_to" and lead["created_at"][:len(value)] > value:
+            return False
+        if name in ("phone", "status") and lead[name] != value:
+            return False
+    return True
+
+
+def _page_through(repository, limit: int, **filters) -> list:
+    ids, after, pages = [], None, 0
+    while True:
+        page = repository.query_leads(after=after, limit=limit, **filters)
+        assert len(page.records) <= limit
+        ids.extend(lead["lead_id"] for lead in page.records)
+        pages += 1
+        if page.next_cursor is None:
+            return ids
+        assert len(page.records) == limit
+        after = page.next_cursor
+        assert pages < 100
+
+
+def _check_paging(repository):
+    leads = _paging_leads()
+    for lead in leads:
+        repository.save_lead(lead)
+    moved = dict(leads[4], status="booked")  # Re-saving moves it between status indexes
+    repository.save_lead(moved)
+    leads[4] = moved
+
+    assert _page_through(repository, 4) == _newest_first(leads)
+    assert _page_through(repository, 1) == _newest_first(leads)
+    assert _page_through(repository, 50) == _newest_first(leads)
+
+    for filters in ({"phone": "+14085551234"}, {"status": "booked"}, {"status": "new", "phone": "+14085559999"},
+                    {"created_from": "2025-01-02"}, {"created_to": "2025-01-01"},
+                    {"created_from": "2025-01-01T09:00:02", "created_to": "2025-01-02T09:00:05", "status": "booked"}):
+        expected = _newest_first([lead for lead in leads if _selected(lead, filters)])
+        assert expected and _page_through(repository, 3, **filters) == expected, filters
+
+    assert repository.query_leads(phone="+10000000000").records == []
+    for bad in ({"after": "not a cursor"}, {"after": encode_cursor("x", "y")[:-2]}):
+        try:
+            repository.query_leads(**bad)
+        except InvalidCursor:
+            pass
+        else:
+            raise AssertionError(f"query_leads accepted {bad}")
+    try:
+        repository.query_leads(city="San Diego")
+    except ValueError as e:
+        assert "city" in str(e)
+    else:
+        raise AssertionError("query_leads accepted an unknown filter")
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("2025-01-01T09:00:00", "LEAD-1")
+    assert "=" not in cursor and decode_cursor(cursor) == ("2025-01-01T09:00:00", "LEAD-1")
+
+
+def test_memory_repository_pages_with_filters():
+    _check_paging(MemoryRepository())
+
+
+def test_sqlite_repository_pages_with_filters():
+    with tempfile.TemporaryDirectory() as directory:
+        repository = SQLiteRepository(os.path.join(directory, "webhook.db"))
+        _check_paging(repository)
+        repository.close()
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,356 @@
+"""
+Compressed, append-only segment store for call transcripts and analyses.
+
+Multi-minute transcripts arrive by the thousand each day, so the call
+event pipeline doesn't keep them in the call records. TranscriptStore
+appends each transcript / analysis as a compressed frame to the current
+segment file and keeps an in-memory call_id index:
+
+    frame = header (codec, kind, call_id length, payload length) + call_id + payload
+
+- payloads are compressed with zstd when the `zstandard` package is
+  installed, zlib otherwise; the codec is recorded per frame, so segments
+  written with either stay readable
+- segments roll over at `segment_bytes`; nothing is rewritten in place
+- get() seeks straight to one frame; iter_records() / export_jsonl()
+  stream frames in file order, one at a time, so exporting every call
+  never holds more than one transcript in memory
+- each process writes its own segment series (segment-<writer>-<n>.seg,
+  the writer being the process id), so several webhook server workers can
+  share one directory without interleaving their frames; a process starts
+  a new segment on its first append and never appends to old ones
+- the index is built by open() (or the first read or write) from frame
+  headers only (payloads are skipped with a seek); creating a store
+  touches no files; segments written by other workers are indexed
+  incrementally by refresh(), which get() runs on a miss at most once per
+  `refresh_interval` seconds (so a burst of lookups for unknown calls
+  doesn't list the directory each time). A torn frame at the end of a
+  segment (a crash mid-write) ends that segment's scan
+- all methods do blocking file I/O; async callers run them in a thread
+- a call appended twice (e.g. a retried webhook) resolves to the newest frame
+
+Usage:
+    store = TranscriptStore("transcripts")
+    store.append_many([("call_123", "transcript", "Agent: Hi..."), ("call_123", "analysis", {...})])
+    store.get("call_123")               # -> "Agent: Hi..."
+    store.export_jsonl(open("calls.jsonl", "w"))
+"""
+
+import json
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from typing import Iterator, Optional
+
+from structured_log import get_logger
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+logger = get_logger("transcript_store")
+
+DEFAULT_STORE_DIR = "transcripts"
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+# Minimum seconds between the refreshes a get() miss triggers
+DEFAULT_REFRESH_INTERVAL = 1.0
+
+# Frame header: codec, kind, call_id length, payload length
+_HEADER = struct.Struct("<BBHI")
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+KINDS = {"transcript": 1, "analysis": 2}
+_KIND_NAMES = {number: name for name, number in KINDS.items()}
+# segment-<writer>-<n>.seg; segment-<n>.seg from before segments were per writer
+_SEGMENT_PATTERN = re.compile(r"segment-(?:(\w+)-)?(\d{6})\.seg$")
+
+
+class TranscriptStore:
+    """
+    Append-only compressed frames in rolling segment files, indexed by call_id.
+
+    Args:
+        directory: Where segment files live (created if missing)
+        segment_bytes: Size at which a new segment is started
+        codec: CODEC_ZSTD or CODEC_ZLIB (default: zstd when installed)
+        writer: Name for this process's segments (default: the process id)
+        refresh_interval: Minimum seconds between refreshes triggered by get() misses
+    """
+
+    def __init__(
+        self,
+        directory: str = DEFAULT_STORE_DIR,
+        segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+        codec: Optional[int] = None,
+        writer: Optional[str] = None,
+        refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+    ):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.refresh_interval = refresh_interval
+        self.codec = codec or (CODEC_ZSTD if ZSTD_AVAILABLE else CODEC_ZLIB)
+        if self.codec == CODEC_ZSTD and not ZSTD_AVAILABLE:
+            raise ValueError("zstd codec requires the zstandard package (pip install zstandard)")
+        self._compressor = zstandard.ZstdCompressor(level=3) if self.codec == CODEC_ZSTD else None
+        self._decompressor = zstandard.ZstdDecompressor() if ZSTD_AVAILABLE else None
+
+        self._lock = threading.Lock()
+        self.index: dict = {}  # (call_id, kind) -> (segment file name, offset of frame)
+        self.counters = {"frames": 0, "stored_bytes": 0, "raw_bytes": 0, "written_bytes": 0,
+                         "refreshes": 0, "refreshes_skipped": 0}
+
+        self.writer = writer or str(os.getpid())
+        self._own: set = set()  # Segments this process writes (indexed as they are written)
+        self._scanned: dict = {}  # segment file name -> offset indexed up to
+        self._refresh_lock = threading.Lock()
+        self._opened = False
+        self._refreshed_at = float("-inf")  # time.monotonic() of the last refresh
+        self._number = 1
+        self._file = None  # Opened on the first append, so readers don't leave empty segments
+
+    def open(self):
+        """Create the directory and index the existing segments (once; later calls do nothing)."""
+        if self._opened:
+            return
+        with self._refresh_lock:
+            if self._opened:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self._refresh(report_torn=True)
+            own = [int(match.group(2)) for match in map(_SEGMENT_PATTERN.match, self._scanned)
+                   if match and match.group(1) == self.writer]
+            self._number = max(own, default=0) + 1
+            self._opened = True
+
+    def _name(self, number: int) -> str:
+        return f"segment-{self.writer}-{number:06d}.seg"
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _open_segment(self):
+        name = self._name(self._number)
+        self._file = open(self._path(name), "ab")
+        self._file_name = name
+        self._own.add(name)
+        self._scanned[name] = 0
+
+    def refresh(self):
+        """Index frames appended to other writers' segments since the last scan."""
+        if not self._opened:
+            self.open()
+            return
+        with self._refresh_lock:
+            self._refresh(report_torn=False)
+
+    def _refresh(self, report_torn: bool):
+        # Called with self._refresh_lock held
+        self._refreshed_at = time.monotonic()
+        self.counters["refreshes"] += 1
+        names = sorted(
+            (int(match.group(2)), match.string) for match in map(_SEGMENT_PATTERN.match, os.listdir(self.directory))
+            if match
+        )
+        for _, name in names:
+            if name not in self._own:
+                self._scan(name, report_torn)
+
+    def _scan(self, name: str, report_torn: bool):
+        """Index a segment from its frame headers, starting where the last scan stopped."""
+        path = self._path(name)
+        size = os.path.getsize(path)
+        offset = self._scanned.get(name, 0)
+        if offset >= size:
+            self._scanned.setdefault(name, offset)
+            return
+        found = {}
+        with open(path, "rb") as f:
+            f.seek(offset)
+            while offset < size:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    break
+                codec, kind, id_length, length = _HEADER.unpack(header)
+                end = offset + _HEADER.size + id_length + length
+                if end > size or kind not in _KIND_NAMES:
+                    break
+                call_id = f.read(id_length).decode("utf-8")
+                f.seek(length, os.SEEK_CUR)
+                found[(call_id, _KIND_NAMES[kind])] = (name, offset)
+                self.counters["frames"] += 1
+                self.counters["stored_bytes"] += end - offset
+                offset = end
+        if offset < size and report_torn:
+            # Still being written by another worker, or torn by a crash
+            logger.warning("Incomplete transcript frame skipped",
+                           extra={"event": "transcript_frame_torn", "path": path, "offset": offset})
+        with self._lock:
+            self.index.update(found)
+            self._scanned[name] = offset
+
+    # ---- writes ----
+
+    def _encode(self, data) -> bytes:
+        raw = data.encode("utf-8") if isinstance(data, str) else json.dumps(data, separators=(",", ":")).encode("utf-8")
+        self.counters["raw_bytes"] += len(raw)
+        if self.codec == CODEC_ZSTD:
+            return self._compressor.compress(raw)
+        return zlib.compress(raw, 6)
+
+    def append_many(self, records: list):
+        """
+        Append (call_id, kind, data) records with one write.
+
+        Args:
+            records: kind is "transcript" (data: str) or "analysis" (data: dict)
+        """
+        frames = []
+        for call_id, kind, data in records:
+            call_id_bytes = call_id.encode("utf-8")
+            payload = self._encode(data)
+            frames.append((call_id, kind, _HEADER.pack(self.codec, KINDS[kind], len(call_id_bytes), len(payload))
+                           + call_id_bytes + payload))
+
+        self.open()
+        with self._lock:
+            if self._file is None:
+                self._open_segment()
+            offset = self._file.tell()
+            if offset and offset + sum(len(frame) for _, _, frame in frames) > self.segment_bytes:
+                self._file.close()
+                self._number += 1
+                self._open_segment()
+                offset = 0
+            name = self._file_name
+            for call_id, kind, frame in frames:
+                self.index[(call_id, kind)] = (name, offset)
+                offset += len(frame)
+                self.counters["frames"] += 1
+                self.counters["stored_bytes"] += len(frame)
+                self.counters["written_bytes"] += len(frame)
+            self._file.write(b"".join(frame for _, _, frame in frames))
+            self._file.flush()
+            self._scanned[name] = offset
+
+    def append(self, call_id: str, kind: str, data):
+        self.append_many([(call_id, kind, data)])
+
+    # ---- reads ----
+
+    def _read_frame(self, f) -> Optional[tuple]:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return None
+        codec, kind, id_length, length = _HEADER.unpack(header)
+        call_id = f.read(id_length).decode("utf-8")
+        payload = f.read(length)
+        if len(payload) < length:
+            return None
+        if codec == CODEC_ZSTD:
+            if self._decompressor is None:
+                raise ValueError("Segment has zstd frames; install zstandard to read them")
+            raw = self._decompressor.decompress(payload)
+        else:
+            raw = zlib.decompress(payload)
+        kind_name = _KIND_NAMES[kind]
+        text = raw.decode("utf-8")
+        return call_id, kind_name, text if kind_name == "transcript" else json.loads(text)
+
+    def _flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def _locate(self, call_id: str, kind: str) -> Optional[tuple]:
+        self.open()
+        location = self.index.get((call_id, kind))
+        if location is None:
+            # Maybe stored by another worker since the last refresh
+            if time.monotonic() - self._refreshed_at < self.refresh_interval:
+                self.counters["refreshes_skipped"] += 1
+                return None
+            self.refresh()
+            location = self.index.get((call_id, kind))
+        return location
+
+    def get(self, call_id: str, kind: str = "transcript"):
+        """Newest transcript (str) or analysis (dict) for a call, or None."""
+        location = self._locate(call_id, kind)
+        if location is None:
+            return None
+        name, offset = location
+        self._flush()
+        with open(self._path(name), "rb") as f:
+            f.seek(offset)
+            frame = self._read_frame(f)
+        return frame[2] if frame else None
+
+    def get_call(self, call_id: str) -> dict:
+        """{"transcript": ..., "analysis": ...} for the kinds stored for a call."""
+        stored = {}
+        for kind in KINDS:
+            data = self.get(call_id, kind)
+            if data is not None:
+                stored[kind] = data
+        return stored
+
+    def iter_records(self, call_ids: Optional[set] = None, kinds: Optional[set] = None) -> Iterator[tuple]:
+        """
+        Stream the newest (call_id, kind, data) records in file order.
+
+        Args:
+            call_ids: Only these calls (default: all)
+            kinds: Only these kinds (default: all)
+        """
+        self.refresh()
+        self._flush()
+        with self._lock:
+            segments = list(self._scanned)
+            index = dict(self.index)
+        for name in segments:
+            path = self._path(name)
+            if not os.path.exists(path):
+                continue
+            with open(path, "rb") as f:
+                while True:
+                    offset = f.tell()
+                    frame = self._read_frame(f)
+                    if frame is None:
+                        break
+                    call_id, kind, data = frame
+                    if index.get((call_id, kind)) != (name, offset):
+                        continue  # Superseded by a newer frame
+                    if (call_ids is None or call_id in call_ids) and (kinds is None or kind in kinds):
+                        yield call_id, kind, data
+
+    def export_jsonl(self, out, call_ids: Optional[set] = None) -> int:
+        """Write one JSON line per record to a text stream; returns the record count."""
+        count = 0
+        for call_id, kind, data in self.iter_records(call_ids):
+            out.write(json.dumps({"call_id": call_id, "kind": kind, "data": data}, ensure_ascii=False) + "\n")
+            count += 1
+        return count
+
+    def stats(self) -> dict:
+        """Frame count, segment count and compression ratio."""
+        raw, written = self.counters["raw_bytes"], self.counters["written_bytes"]
+        return {
+            "codec": "zstd" if self.codec == CODEC_ZSTD else "zlib",
+            "writer": self.writer,
+            "segments": len(self._scanned),
+            "calls": len({call_id for call_id, _ in self.index}),
+            **self.counters,
+            # Over this process's writes
+            "compression_ratio": round(raw / written, 2) if raw and written else None,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
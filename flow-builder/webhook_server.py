@@ -21,23 +21,98 @@ This file is kept for local testing/reference only.
 """
 
 import os
-import json
+import asyncio
 import hmac
 import hashlib
 from datetime import datetime, timedelta
 from typing import Optional, List
-from fastapi import FastAPI, Request, HTTPException, Header
+from fastapi import FastAPI, Request, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import httpx
-from retell import Retell
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, model_validator
+from contextlib import asynccontextmanager
+
+import fast_json
+from availability_cache import TTLCache
+from call_events import EventPipeline
+from crm_queue import CRMForwarder
+from fast_json import FastJSONResponse
+from http_pool import HTTPClientPool
+from idempotency import IdempotencyIndex, tool_call_key
+from instrumentation import (
+    CONTENT_TYPE,
+    PrometheusMiddleware,
+    Registry,
+    counters_callback,
+    route_summary,
+    upstream_observer,
+)
+from retell_signature import RetellSignatureMiddleware, RetellSignatureVerifier
+from shared_state import LocalState, create_shared_state
+from structured_log import bind, configure_logging, get_logger, stop_logging
+from structured_log import stats as logging_stats
+from slot_index import SlotIndex, parse_weekday
+from transcript_store import DEFAULT_STORE_DIR, TranscriptStore
+from webhook_storage import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursor, create_repository, project
+
+# Structured JSON logs, formatted on a background thread (see structured_log.py);
+# configured in the lifespan, so every startup after a shutdown gets a listener again
+logger = get_logger("webhook")
+
+# ============ Storage ============
+
+# Leads and appointments (SQLite by default, see webhook_storage.py). The
+# database is opened on first use, and reads go through repository.run()
+repository = create_repository()
+
+# State worker processes must agree on - replayed tool responses, availability
+# invalidations, mock bookings (SQLite by default, see shared_state.py)
+shared_state = create_shared_state()
+
+# Transcripts and analyses go to compressed segment files, see transcript_store.py;
+# the directory is created and indexed at startup
+transcripts = TranscriptStore(os.environ.get("TRANSCRIPT_STORE_DIR") or DEFAULT_STORE_DIR)
+
+# Retell call events are stored by a background pipeline, see call_events.py
+event_pipeline = EventPipeline(repository, transcripts=transcripts)
+
+# Counters and histograms served at GET /metrics, see instrumentation.py
+metrics_registry = Registry()
+
+# Outbound HTTP (CRM, Calendly) shares one pooled client, see http_pool.py
+http_pool = HTTPClientPool(observer=upstream_observer(metrics_registry))
+
+# Responses to Retell tool calls, replayed when Retell retries (see idempotency.py)
+idempotency = IdempotencyIndex(shared=shared_state)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+    await asyncio.to_thread(transcripts.open)
+    await http_pool.start()
+    await crm_forwarder.start()
+    await event_pipeline.start()
+    yield
+    await event_pipeline.stop()
+    transcripts.close()
+    # Deliver (or dead-letter) queued CRM leads before closing the pool
+    await crm_forwarder.stop()
+    await http_pool.aclose()
+    # Commit queued writes before the process exits
+    repository.close()
+    await shared_state.close()
+    stop_logging()
+
 
 # Initialize FastAPI app
 
 app = FastAPI(
     title="GreenLine AI Webhook Server [DEPRECATED]",
     description="⚠️ DEPRECATED - Use /api/inbound/webhook instead. Backend API for Retell AI voice agents",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # CORS middleware
@@ -50,6 +125,7 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
 # Configuration from environment variables
 
 RETELL_API_KEY = os.environ.get("RETELL_API_KEY", "")
@@ -57,9 +133,21 @@ CALENDLY_API_KEY = os.environ.get("CALENDLY_API_KEY", "")
 CALENDLY_EVENT_TYPE_URI = os.environ.get("CALENDLY_EVENT_TYPE_URI", "")
 CRM_WEBHOOK_URL = os.environ.get("CRM_WEBHOOK_URL", "")  # Optional: forward to your CRM
 
-# Initialize Retell client for signature verification
+# Leads are forwarded to the CRM in the background, see crm_queue.py
+crm_forwarder = CRMForwarder(http_pool, CRM_WEBHOOK_URL)
+
+# Verify Retell signatures before requests reach the endpoints (see retell_signature.py)
 
-retell = Retell(api_key=RETELL_API_KEY) if RETELL_API_KEY else None
+signature_verifier = RetellSignatureVerifier(RETELL_API_KEY)
+app.add_middleware(
+    RetellSignatureMiddleware,
+    verifier=signature_verifier,
+    paths=("/api/leads", "/api/availability", "/api/appointments", "/webhook/retell"),
+    required=os.environ.get("RETELL_REQUIRE_SIGNATURE", "").lower() in ("1", "true", "yes"),
+)
+
+# Outermost, so requests the signature middleware rejects are counted too
+app.add_middleware(PrometheusMiddleware, registry=metrics_registry)
 
 
 # ============ Data Models ============
@@ -106,22 +194,51 @@ class AppointmentResponse(BaseModel):
     message: str
 
 
+class ToolCall(BaseModel):
+    """
+    Retell custom function body, {"name", "call", "args"}, or bare args.
+
+    Subclasses type `args`, so model_validate_json() parses and validates
+    the raw body in one pass.
+    """
+    name: Optional[str] = None
+    call: Optional[dict] = None
+
+    @model_validator(mode="before")
+    @classmethod
+    def _bare_args(cls, data):
+        if isinstance(data, dict) and "args" not in data:
+            return {"name": data.get("name"), "call": data.get("call"), "args": data}
+        return data
+
+    def payload(self) -> dict:
+        """Plain form for bind_call() and tool_call_key()."""
+        return {"name": self.name, "call": self.call, "args": self.args.model_dump()}
+
+
+class LeadToolCall(ToolCall):
+    args: LeadRequest
+
+
+class AppointmentToolCall(ToolCall):
+    args: AppointmentRequest
+
+
 # ============ Helper Functions ============
 
 def verify_retell_signature(body: bytes, signature: str) -> bool:
-    """Verify the request is actually from Retell AI."""
-    if not retell or not signature:
+    """Verify the request is actually from Retell AI (the middleware does this for the endpoints)."""
+    if not signature_verifier.enabled or not signature:
         return True  # Skip verification if not configured
 
-    try:
-        return retell.verify(
-            body.decode('utf-8'),
-            api_key=RETELL_API_KEY,
-            signature=signature
-        )
-    except Exception as e:
-        print(f"Signature verification error: {e}")
-        return False
+    return signature_verifier.verify(body, signature)
+
+
+def bind_call(data: dict):
+    """Tag this request's log records with the Retell call and agent it belongs to."""
+    call = data.get("call") if isinstance(data, dict) else None
+    if isinstance(call, dict):
+        bind(call_id=call.get("call_id"), agent_id=call.get("agent_id"))
 
 
 def generate_lead_id() -> str:
@@ -136,65 +253,59 @@ def generate_confirmation_number() -> str:
     return f"APT-{str(uuid.uuid4())[:8].upper()}"
 
 
-async def forward_to_crm(lead_data: dict):
-    """Forward lead data to external CRM if configured."""
-    if not CRM_WEBHOOK_URL:
-        return
-
-    try:
-        async with httpx.AsyncClient() as client:
-            await client.post(
-                CRM_WEBHOOK_URL,
-                json=lead_data,
-                timeout=10.0
-            )
-    except Exception as e:
-        print(f"CRM forward error: {e}")
+def forward_to_crm(lead_data: dict):
+    """Queue lead data for the external CRM, if configured (returns immediately)."""
+    crm_forwarder.submit(lead_data)
 
 
 async def get_calendly_availability(days_ahead: int = 7) -> List[dict]:
-    """Fetch available time slots from Calendly."""
-    if not CALENDLY_API_KEY or not CALENDLY_EVENT_TYPE_URI:
+    """Fetch available time slots from Calendly (cached, see availability_cache.py)."""
+    if not calendly_configured():
         # Return mock data if Calendly not configured
-        return get_mock_availability()
+        return await get_mock_availability()
 
     try:
-        async with httpx.AsyncClient() as client:
-            # Get available times from Calendly
-            start_time = datetime.utcnow().isoformat() + "Z"
-            end_time = (datetime.utcnow() + timedelta(days=days_ahead)).isoformat() + "Z"
-
-            response = await client.get(
-                "https://api.calendly.com/event_type_available_times",
-                params={
-                    "event_type": CALENDLY_EVENT_TYPE_URI,
-                    "start_time": start_time,
-                    "end_time": end_time
-                },
-                headers={
-                    "Authorization": f"Bearer {CALENDLY_API_KEY}",
-                    "Content-Type": "application/json"
-                },
-                timeout=10.0
-            )
-
-            if response.status_code == 200:
-                data = response.json()
-                slots = []
-                for slot in data.get("collection", [])[:10]:  # Limit to 10 slots
-                    start = datetime.fromisoformat(slot["start_time"].replace("Z", "+00:00"))
-                    slots.append({
-                        "datetime": slot["start_time"],
-                        "display": start.strftime("%A, %B %d at %I:%M %p")
-                    })
-                return slots
-            else:
-                print(f"Calendly API error: {response.status_code}")
-                return get_mock_availability()
-
+        return await availability_cache.get((CALENDLY_EVENT_TYPE_URI, days_ahead))
     except Exception as e:
-        print(f"Calendly error: {e}")
-        return get_mock_availability()
+        logger.warning("Calendly availability failed, using mock slots",
+                       extra={"event": "calendly_error", "error": str(e)})
+        return await get_mock_availability()
+
+
+async def fetch_calendly_availability(key: tuple) -> List[dict]:
+    """Load slots for (event type, days ahead) from Calendly; raises on failure."""
+    event_type, days_ahead = key
+    start_time = datetime.utcnow().isoformat() + "Z"
+    end_time = (datetime.utcnow() + timedelta(days=days_ahead)).isoformat() + "Z"
+
+    response = await http_pool.get(
+        "https://api.calendly.com/event_type_available_times",
+        params={
+            "event_type": event_type,
+            "start_time": start_time,
+            "end_time": end_time
+        },
+        headers={
+            "Authorization": f"Bearer {CALENDLY_API_KEY}",
+            "Content-Type": "application/json"
+        }
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"Calendly API error: {response.status_code}")
+
+    data = response.json()
+    slots = []
+    for slot in data.get("collection", [])[:10]:  # Limit to 10 slots
+        start = datetime.fromisoformat(slot["start_time"].replace("Z", "+00:00"))
+        slots.append({
+            "datetime": slot["start_time"],
+            "display": start.strftime("%A, %B %d at %I:%M %p")
+        })
+    return slots
+
+
+# Calendly availability, shared by concurrent callers and refreshed in the background
+availability_cache = TTLCache(fetch_calendly_availability, shared=shared_state)
 
 
 async def book_calendly_appointment(
@@ -213,75 +324,94 @@ async def book_calendly_appointment(
         }
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.calendly.com/scheduled_events",
-                json={
-                    "event_type": CALENDLY_EVENT_TYPE_URI,
-                    "start_time": start_time,
-                    "invitee": {
-                        "email": invitee_email,
-                        "name": invitee_name
-                    },
-                    "text_reminder_number": "",  # Could add phone here
-                    "questions_and_answers": [
-                        {"question": "Notes", "answer": notes}
-                    ]
-                },
-                headers={
-                    "Authorization": f"Bearer {CALENDLY_API_KEY}",
-                    "Content-Type": "application/json"
+        response = await http_pool.post(
+            "https://api.calendly.com/scheduled_events",
+            json={
+                "event_type": CALENDLY_EVENT_TYPE_URI,
+                "start_time": start_time,
+                "invitee": {
+                    "email": invitee_email,
+                    "name": invitee_name
                 },
-                timeout=10.0
-            )
-
-            if response.status_code in [200, 201]:
-                data = response.json()
-                return {
-                    "success": True,
-                    "uri": data.get("resource", {}).get("uri", ""),
-                    "start_time": start_time
-                }
-            else:
-                return {"success": False, "error": response.text}
+                "text_reminder_number": "",  # Could add phone here
+                "questions_and_answers": [
+                    {"question": "Notes", "answer": notes}
+                ]
+            },
+            headers={
+                "Authorization": f"Bearer {CALENDLY_API_KEY}",
+                "Content-Type": "application/json"
+            }
+        )
+
+        if response.status_code in [200, 201]:
+            data = response.json()
+            return {
+                "success": True,
+                "uri": data.get("resource", {}).get("uri", ""),
+                "start_time": start_time
+            }
+        else:
+            return {"success": False, "error": response.text}
 
     except Exception as e:
-        print(f"Calendly booking error: {e}")
+        logger.error("Calendly booking error", extra={"event": "calendly_booking_error", "error": str(e)})
         return {"success": False, "error": str(e)}
 
 
-def get_mock_availability() -> List[dict]:
-    """Generate mock availability for testing."""
-    slots = []
-    now = datetime.now()
-
-    # Generate slots for next 5 business days
-    current_date = now + timedelta(days=1)
-    slots_added = 0
-
-    while slots_added < 6:
-        # Skip weekends
-        if current_date.weekday() < 6:  # Mon-Sat
-            # Add morning and afternoon slots
-            for hour in [9, 11, 14, 16]:
-                slot_time = current_date.replace(hour=hour, minute=0, second=0, microsecond=0)
-                if slot_time > now:
-                    slots.append({
-                        "datetime": slot_time.isoformat(),
-                        "display": slot_time.strftime("%A, %B %d at %I:%M %p")
-                    })
-                    slots_added += 1
-                    if slots_added >= 6:
-                        break
-        current_date += timedelta(days=1)
+# Mock calendar, generated once and kept current (see slot_index.py)
+slot_index = SlotIndex()
+
+# Mock bookings are recorded in shared state so every worker removes the slot
+BOOKED_SLOT_PREFIX = "slots:booked:"
+_booked_generation = None  # availability_cache generation the mock calendar last synced at
 
-    return slots
 
+def calendly_configured() -> bool:
+    return bool(CALENDLY_API_KEY and CALENDLY_EVENT_TYPE_URI)
 
-# ============ In-Memory Storage (Replace with DB in production) ============
 
-leads_db: dict = {}
-appointments_db: dict = {}
+async def mock_calendar() -> SlotIndex:
+    """The mock calendar, with slots booked on other workers removed."""
+    global _booked_generation
+    generation = await shared_state.get(availability_cache.generation_key)
+    if generation != _booked_generation:
+        _booked_generation = generation
+        for key in await shared_state.keys(BOOKED_SLOT_PREFIX):
+            slot_index.book(datetime.fromisoformat(key[len(BOOKED_SLOT_PREFIX):]))
+    return slot_index
+
+
+async def book_mock_slot(slot_time: datetime):
+    """Remove a booked slot from the mock calendar on every worker."""
+    slot_index.book(slot_time)
+    await shared_state.set(BOOKED_SLOT_PREFIX + slot_time.isoformat(), "1", ttl=(slot_index.horizon_days + 1) * 86400)
+
+
+async def get_mock_availability() -> List[dict]:
+    """Next open mock slots for testing."""
+    return (await mock_calendar()).next_available(limit=6)
+
+
+# Component counters, read when /metrics is scraped
+metrics_registry.callback(
+    "greenline_queue_depth", "Items waiting in background queues", "gauge", ("queue",),
+    lambda: {("crm",): crm_forwarder.metrics()["depth"], ("call_events",): event_pipeline.metrics()["depth"],
+             ("logging",): logging_stats().get("depth", 0)})
+metrics_registry.callback(
+    "greenline_call_events_total", "Retell webhook events processed by type", "counter", ("event",),
+    lambda: {(event,): count for event, count in event_pipeline.event_counts.items()})
+for component, description, counters in (
+    ("crm_queue", "CRM forwarding counters", lambda: crm_forwarder.counters),
+    ("call_pipeline", "Call event pipeline counters", lambda: event_pipeline.counters),
+    ("availability_cache", "Calendly availability cache counters", lambda: availability_cache.counters),
+    ("idempotency", "Tool call idempotency counters", lambda: idempotency.counters),
+    ("signatures", "Retell signature verification counters", lambda: signature_verifier.counters),
+):
+    metrics_registry.callback(f"greenline_{component}_total", description, "counter", ("counter",),
+                              counters_callback(counters))
+metrics_registry.callback("greenline_logging_total", "Log records dropped (queue full) or sampled out", "counter",
+                          ("counter",), counters_callback(logging_stats, ("dropped", "sampled_out")))
 
 
 # ============ API Endpoints ============
@@ -297,27 +427,35 @@ async def root():
 
 
 @app.post("/api/leads", response_model=LeadResponse)
-async def submit_lead(
-    request: Request,
-    x_retell_signature: Optional[str] = Header(None)
-):
+async def submit_lead(request: Request):
     """
     Receive lead data from Retell AI agent.
     Called when customer info is collected during a call.
     """
+    # Signature already verified by RetellSignatureMiddleware
     body = await request.body()
 
-    # Verify signature
-    if x_retell_signature and not verify_retell_signature(body, x_retell_signature):
-        raise HTTPException(status_code=401, detail="Invalid signature")
-
-    # Parse request
+    # Parse and validate in one pass
     try:
-        data = json.loads(body)
-        lead = LeadRequest(**data.get("args", data))
-    except Exception as e:
+        tool_call = LeadToolCall.model_validate_json(body)
+    except ValueError as e:
         raise HTTPException(status_code=422, detail=f"Invalid request: {e}")
+    data, lead = tool_call.payload(), tool_call.args
+    bind_call(data)
+
+    # A retried tool call gets the first delivery's response
+    key = tool_call_key(data, "submit_lead", request.headers.get("idempotency-key"))
+    content, replayed = await idempotency.run(key, lambda: _create_lead(lead))
+    if replayed:
+        logger.info("Duplicate delivery, replaying lead",
+                    extra={"event": "tool_call_replayed", "lead_id": content["lead_id"]})
+
+    # Rendered directly; response_model only documents the shape
+    return FastJSONResponse(content)
+
 
+async def _create_lead(lead: LeadRequest) -> dict:
+    """Store a lead, queue it for the CRM and build the tool response."""
     # Generate lead ID
     lead_id = generate_lead_id()
 
@@ -334,81 +472,93 @@ async def submit_lead(
         "created_at": datetime.utcnow().isoformat(),
         "status": "new"
     }
-    leads_db[lead_id] = lead_data
+    repository.save_lead(lead_data)
 
-    # Forward to CRM asynchronously
-    await forward_to_crm(lead_data)
+    # Forward to CRM in the background
+    forward_to_crm(lead_data)
 
-    print(f"Lead captured: {lead_id} - {lead.customer_name} ({lead.phone})")
+    logger.info("Lead captured", extra={"event": "lead_captured", "lead_id": lead_id,
+                                        "service_type": lead.service_type, "priority": lead.priority})
 
-    return LeadResponse(
-        success=True,
-        lead_id=lead_id,
-        message=f"Lead {lead_id} created successfully"
-    )
+    return {
+        "success": True,
+        "lead_id": lead_id,
+        "message": f"Lead {lead_id} created successfully"
+    }
 
 
 @app.get("/api/availability")
 async def check_availability(
     request: Request,
     service_type: Optional[str] = None,
-    preferred_date: Optional[str] = None,
-    x_retell_signature: Optional[str] = Header(None)
+    preferred_date: Optional[str] = None
 ):
     """
     Check available appointment slots.
     Returns available time slots from Calendly or mock data.
     """
-    # Note: GET requests have empty body for signature verification
-    if x_retell_signature:
-        # For GET requests, verify with empty string
-        if not retell.verify("", api_key=RETELL_API_KEY, signature=x_retell_signature):
-            # Log but don't fail - signature verification for GET can be tricky
-            print("Warning: Signature verification failed for GET request")
-
-    # Get availability
-    slots = await get_calendly_availability()
-
-    # Filter by preferred date if provided
-    if preferred_date:
-        try:
-            pref_date = datetime.fromisoformat(preferred_date.replace("Z", "+00:00"))
-            slots = [s for s in slots if pref_date.date().isoformat() in s["datetime"]]
-        except:
-            pass  # Ignore invalid date format
+    # GET signatures (over an empty body) are checked by RetellSignatureMiddleware,
+    # which logs a mismatch but doesn't fail the request
+    weekday = parse_weekday(preferred_date) if preferred_date else None
+    try:
+        pref_date = datetime.fromisoformat(preferred_date.replace("Z", "+00:00")).date() \
+            if preferred_date and weekday is None else None
+    except ValueError:
+        pref_date = None  # Ignore invalid date format
+
+    if not calendly_configured() and (weekday is not None or pref_date):
+        # Look the day up in the mock calendar index
+        calendar = await mock_calendar()
+        slots = calendar.next_on_weekday(weekday) if weekday is not None else calendar.on_date(pref_date)
+    else:
+        # Get availability
+        slots = await get_calendly_availability()
+
+        # Filter by preferred date ("2025-06-12" or a weekday name) if provided
+        if pref_date:
+            slots = [s for s in slots if s["datetime"].startswith(pref_date.isoformat())]
+        elif weekday is not None:
+            slots = [s for s in slots if datetime.fromisoformat(s["datetime"].replace("Z", "+00:00")).weekday() == weekday]
 
     next_available = slots[0]["display"] if slots else "No availability found"
 
-    print(f"Availability checked: {len(slots)} slots available")
+    logger.info("Availability checked", extra={"event": "availability_checked", "slots": len(slots)})
 
-    return {
+    return FastJSONResponse({
         "slots": slots,
         "next_available": next_available
-    }
+    })
 
 
 @app.post("/api/appointments", response_model=AppointmentResponse)
-async def book_appointment(
-    request: Request,
-    x_retell_signature: Optional[str] = Header(None)
-):
+async def book_appointment(request: Request):
     """
     Book an appointment for a customer.
     Creates appointment in Calendly and stores locally.
     """
+    # Signature already verified by RetellSignatureMiddleware
     body = await request.body()
 
-    # Verify signature
-    if x_retell_signature and not verify_retell_signature(body, x_retell_signature):
-        raise HTTPException(status_code=401, detail="Invalid signature")
-
-    # Parse request
+    # Parse and validate in one pass
     try:
-        data = json.loads(body)
-        appt = AppointmentRequest(**data.get("args", data))
-    except Exception as e:
+        tool_call = AppointmentToolCall.model_validate_json(body)
+    except ValueError as e:
         raise HTTPException(status_code=422, detail=f"Invalid request: {e}")
+    data, appt = tool_call.payload(), tool_call.args
+    bind_call(data)
+
+    # A retried tool call gets the first booking's response, without booking again
+    key = tool_call_key(data, "book_appointment", request.headers.get("idempotency-key"))
+    content, replayed = await idempotency.run(key, lambda: _create_appointment(appt))
+    if replayed:
+        logger.info("Duplicate delivery, replaying appointment",
+                    extra={"event": "tool_call_replayed", "confirmation_number": content["confirmation_number"]})
+
+    return FastJSONResponse(content)
 
+
+async def _create_appointment(appt: AppointmentRequest) -> dict:
+    """Book with Calendly (or mock), store the appointment and lead, and build the tool response."""
     # Generate confirmation number
     confirmation = generate_confirmation_number()
 
@@ -426,7 +576,16 @@ async def book_appointment(
     if not booking_result.get("success", True):
         # Even if Calendly fails, we store locally and return success
         # The appointment can be manually added later
-        print(f"Warning: Calendly booking failed: {booking_result.get('error')}")
+        logger.warning("Calendly booking failed, stored locally",
+                       extra={"event": "calendly_booking_failed", "error": booking_result.get("error")})
+    else:
+        # The booked slot is gone; don't offer it from the mock calendar or the
+        # cache (the invalidation also tells other workers to resync)
+        try:
+            await book_mock_slot(datetime.fromisoformat(appt.appointment_time.replace("Z", "+00:00")).replace(tzinfo=None))
+        except ValueError:
+            pass
+        await availability_cache.invalidate()
 
     # Parse and format appointment time
     try:
@@ -449,52 +608,159 @@ async def book_appointment(
         "created_at": datetime.utcnow().isoformat(),
         "status": "confirmed"
     }
-    appointments_db[confirmation] = appointment_data
+    repository.save_appointment(appointment_data)
+
+    # Attach the booking to the caller's latest lead, or create one
+    existing = await repository.run(repository.find_leads_by_phone, appt.phone)
+    if existing:
+        lead_data = dict(existing[0])
+        lead_data.update(appointment_confirmation=confirmation, status="appointment_booked")
+        for field_name in ("address", "service_type"):
+            lead_data[field_name] = lead_data.get(field_name) or getattr(appt, field_name)
+    else:
+        lead_data = {
+            "lead_id": generate_lead_id(),
+            "customer_name": appt.customer_name,
+            "phone": appt.phone,
+            "address": appt.address,
+            "service_type": appt.service_type,
+            "notes": appt.notes,
+            "priority": "normal",
+            "callback_requested": False,
+            "appointment_confirmation": confirmation,
+            "created_at": datetime.utcnow().isoformat(),
+            "status": "appointment_booked"
+        }
+    repository.save_lead(lead_data)
 
-    # Also create a lead record if not exists
-    lead_id = generate_lead_id()
-    leads_db[lead_id] = {
-        "lead_id": lead_id,
-        "customer_name": appt.customer_name,
-        "phone": appt.phone,
-        "address": appt.address,
-        "service_type": appt.service_type,
-        "notes": appt.notes,
-        "priority": "normal",
-        "callback_requested": False,
-        "appointment_confirmation": confirmation,
-        "created_at": datetime.utcnow().isoformat(),
-        "status": "appointment_booked"
+    logger.info("Appointment booked", extra={"event": "appointment_booked", "confirmation_number": confirmation,
+                                             "appointment_time": appt.appointment_time})
+
+    return {
+        "success": True,
+        "confirmation_number": confirmation,
+        "datetime": formatted_datetime,
+        "message": f"Appointment confirmed for {formatted_datetime}"
     }
 
-    print(f"Appointment booked: {confirmation} - {appt.customer_name} on {formatted_datetime}")
 
-    return AppointmentResponse(
-        success=True,
-        confirmation_number=confirmation,
-        datetime=formatted_datetime,
-        message=f"Appointment confirmed for {formatted_datetime}"
-    )
+async def _page_response(kind: str, key: str, after, limit, fields, **filters) -> FastJSONResponse:
+    """Serialize one page of leads/appointments for the list endpoints (skips jsonable_encoder)."""
+    try:
+        page = await repository.run(repository.query, kind, after=after, limit=limit, **filters)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    selected = [name.strip() for name in fields.split(",") if name.strip()] if fields else None
+    return FastJSONResponse({
+        "count": len(page.records),
+        key: [project(record, selected) for record in page.records],
+        "next_cursor": page.next_cursor
+    })
 
 
 @app.get("/api/leads")
-async def list_leads():
-    """List all captured leads (for admin/testing)."""
-    return {
-        "count": len(leads_db),
-        "leads": list(leads_db.values())
-    }
+async def list_leads(
+    after: Optional[str] = Query(None, description="Cursor from the previous page's next_cursor"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    phone: Optional[str] = None,
+    created_from: Optional[str] = Query(None, description="ISO date/datetime, inclusive"),
+    created_to: Optional[str] = Query(None, description="ISO date/datetime, inclusive"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return")
+):
+    """List captured leads, newest first, one page at a time (for admin/testing)."""
+    return await _page_response(
+        "lead", "leads", after, limit, fields,
+        status=status, priority=priority, phone=phone,
+        created_from=created_from, created_to=created_to
+    )
 
 
 @app.get("/api/appointments")
-async def list_appointments():
-    """List all appointments (for admin/testing)."""
+async def list_appointments(
+    after: Optional[str] = Query(None, description="Cursor from the previous page's next_cursor"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    status: Optional[str] = None,
+    phone: Optional[str] = None,
+    created_from: Optional[str] = Query(None, description="ISO date/datetime, inclusive"),
+    created_to: Optional[str] = Query(None, description="ISO date/datetime, inclusive"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return")
+):
+    """List appointments, newest first, one page at a time (for admin/testing)."""
+    return await _page_response(
+        "appointment", "appointments", after, limit, fields,
+        status=status, phone=phone,
+        created_from=created_from, created_to=created_to
+    )
+
+
+@app.get("/api/metrics")
+async def metrics():
+    """Outbound pool stats and request latency per endpoint."""
     return {
-        "count": len(appointments_db),
-        "appointments": list(appointments_db.values())
+        "http_pool": http_pool.metrics(),
+        "crm_queue": crm_forwarder.metrics(),
+        "availability_cache": availability_cache.metrics(),
+        "signatures": signature_verifier.metrics(),
+        "idempotency": idempotency.metrics(),
+        "call_events": event_pipeline.metrics(),
+        # From the same request metrics as /metrics
+        "endpoints": route_summary(metrics_registry),
+        # Counters above are per worker process
+        "worker": {"pid": os.getpid(), "shared_state": type(shared_state).__name__},
     }
 
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Request, upstream and component metrics in the Prometheus text format (this worker's)."""
+    return Response(metrics_registry.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/api/calls")
+async def list_calls(
+    after: Optional[str] = Query(None, description="Cursor from the previous page's next_cursor"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    status: Optional[str] = Query(None, description="started, ended or analyzed"),
+    phone: Optional[str] = None,
+    created_from: Optional[str] = Query(None, description="ISO date/datetime, inclusive"),
+    created_to: Optional[str] = Query(None, description="ISO date/datetime, inclusive"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return")
+):
+    """List calls recorded from Retell webhooks, newest first (for admin/testing)."""
+    return await _page_response(
+        "call", "calls", after, limit, fields,
+        status=status, phone=phone,
+        created_from=created_from, created_to=created_to
+    )
+
+
+@app.get("/api/calls/export")
+async def export_calls(call_id: Optional[List[str]] = Query(None, description="Only these calls (repeatable)")):
+    """Stream stored transcripts and analyses as JSON lines (all calls by default)."""
+    selected = set(call_id) if call_id else None
+
+    # A plain generator: StreamingResponse iterates it in a thread, so the
+    # segment reads stay off the event loop
+    def lines():
+        for record_call_id, kind, data in transcripts.iter_records(selected):
+            yield fast_json.dumps({"call_id": record_call_id, "kind": kind, "data": data}) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.get("/api/calls/{call_id}")
+async def get_call(call_id: str):
+    """One call record with its transcript and analysis."""
+    call = await repository.run(repository.get_call, call_id)
+    stored = await asyncio.to_thread(transcripts.get_call, call_id)
+    if call is None and not stored:
+        raise HTTPException(status_code=404, detail=f"Call {call_id} not found")
+    return FastJSONResponse({**(call or {"call_id": call_id}), **stored})
+
+
 @app.post("/webhook/retell")
 async def retell_webhook(request: Request):
     """
@@ -502,28 +768,20 @@ async def retell_webhook(request: Request):
     Receives call status updates, transcripts, etc.
     """
     body = await request.body()
-    data = json.loads(body)
+    try:
+        data = fast_json.loads(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=400, detail="Expected a JSON object")
 
+    # Acknowledge right away; decoding, handlers and storage run in the pipeline
     event_type = data.get("event", "unknown")
-    call_id = data.get("call_id", "unknown")
-
-    print(f"Retell webhook: {event_type} for call {call_id}")
-
-    # Handle different event types
-    if event_type == "call_started":
-        print(f"   Call started: {data.get('from_number')} -> {data.get('to_number')}")
-
-    elif event_type == "call_ended":
-        print(f"   Call ended. Duration: {data.get('duration_ms', 0)/1000:.1f}s")
-        # Could save transcript here
-        transcript = data.get("transcript", "")
-        if transcript:
-            print(f"   Transcript length: {len(transcript)} chars")
-
-    elif event_type == "call_analyzed":
-        # Post-call analysis available
-        analysis = data.get("analysis", {})
-        print(f"   Analysis: {analysis}")
+    bind_call(data)
+    if not event_pipeline.submit(data):
+        logger.warning("Event queue full, asking Retell to retry",
+                       extra={"event": "webhook_rejected", "webhook_event": event_type})
+        raise HTTPException(status_code=429, detail="Event queue full, retry later", headers={"Retry-After": "1"})
 
     return {"status": "received", "event": event_type}
 
@@ -531,17 +789,35 @@ async def retell_webhook(request: Request):
 # ============ Run Server ============
 
 if __name__ == "__main__":
+    import argparse
     import uvicorn
 
-    port = int(os.environ.get("PORT", 8000))
+    parser = argparse.ArgumentParser(description="GreenLine AI webhook server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", 1)),
+                        help="Worker processes (default: WEB_CONCURRENCY or 1)")
+    args = parser.parse_args()
+    if args.workers > 1 and (isinstance(shared_state, LocalState) or not hasattr(repository, "path")):
+        parser.error("--workers > 1 needs shared storage: WEBHOOK_STORAGE=sqlite and "
+                     "WEBHOOK_SHARED_STATE=sqlite or redis")
 
     print("\n" + "=" * 50)
     print("GreenLine AI Webhook Server")
     print("=" * 50)
-    print(f"Port: {port}")
+    print(f"Port: {args.port}")
+    print(f"Workers: {args.workers}")
     print(f"Retell API: {'Configured' if RETELL_API_KEY else 'Not configured'}")
     print(f"Calendly API: {'Configured' if CALENDLY_API_KEY else 'Not configured (using mock)'}")
     print(f"CRM Webhook: {'Configured' if CRM_WEBHOOK_URL else 'Not configured'}")
+    print(f"Storage: {type(repository).__name__} ({getattr(repository, 'path', 'in-memory')})")
+    print(f"Shared state: {type(shared_state).__name__}")
+    print(f"HTTP pool: {http_pool.limits.max_connections} connections, "
+          f"{http_pool.per_host_limit}/host, HTTP/2 {'on' if http_pool.http2 else 'off (pip install h2)'}")
     print("=" * 50 + "\n")
 
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    if args.workers > 1:
+        # Each worker process imports the app itself
+        uvicorn.run("webhook_server:app", host=args.host, port=args.port, workers=args.workers)
+    else:
+        uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,622 @@
+"""
+Storage backends for the webhook server's leads, appointments and calls.
+
+The endpoints talk to a WebhookRepository instead of module-level dicts:
+
+- SQLiteRepository (default): an embedded SQLite database in WAL mode, so
+  data survives restarts. Records are stored as JSON with indexed phone,
+  status and created_at columns, and writes are batched: save_*() queues
+  the record and a background thread commits queued records in a single
+  transaction every few milliseconds (reads flush first, so a record is
+  always visible right after it is saved). The database is opened on first
+  use, not when the repository is created.
+- MemoryRepository: in-process dicts, for tests and throwaway runs.
+
+Several webhook server workers can share one SQLite database; call
+records, which different workers may update for the same call, are
+merged with update_calls() inside one write transaction.
+
+SQLite reads and commits block, so async callers go through
+`await repository.run(method, ...)`, which runs them in a worker thread for
+blocking backends (and inline for the memory backend).
+
+List endpoints page through records with query_leads()/query_appointments():
+newest first, keyset cursors (created_at, id) so a page costs about its own
+size no matter how deep it is, and optional status / priority / phone /
+created_at range filters. SQLite serves these from composite indexes; the
+memory backend keeps sorted secondary indexes per filter value.
+
+Select the backend with WEBHOOK_STORAGE=sqlite|memory and the database file
+with WEBHOOK_DB_PATH (default: webhook_data.db).
+"""
+
+import asyncio
+import base64
+import json
+import os
+import sqlite3
+import threading
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from structured_log import get_logger
+
+logger = get_logger("storage")
+
+# Default database file for the SQLite backend
+DEFAULT_DB_PATH = "webhook_data.db"
+
+# Writes are committed when this many are queued, or every FLUSH_INTERVAL seconds
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_FLUSH_INTERVAL = 0.05
+
+# Record kind -> (table, id field)
+TABLES = {
+    "lead": ("leads", "lead_id"),
+    "appointment": ("appointments", "confirmation_number"),
+    "call": ("calls", "call_id"),
+}
+
+# Equality filters backed by an index
+INDEXED_FIELDS = ("status", "priority", "phone")
+
+# Page size limits for query_*()
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Upper bound for an inclusive created_to date/time prefix
+_MAX_SUFFIX = "\uffff"
+
+
+class InvalidCursor(ValueError):
+    """A pagination cursor could not be decoded."""
+
+
+@dataclass
+class Page:
+    """One page of records, newest first."""
+    records: list
+    next_cursor: Optional[str] = None  # Pass as `after` to get the next page
+
+
+def encode_cursor(created_at: str, record_id: str) -> str:
+    """Opaque cursor pointing just after a record."""
+    raw = json.dumps([created_at, record_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """(created_at, id) from encode_cursor(); raises InvalidCursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, record_id = json.loads(raw)
+        return str(created_at), str(record_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def project(record: dict, fields: Optional[list]) -> dict:
+    """Only the requested fields of a record (all fields if none are requested)."""
+    if not fields:
+        return record
+    return {name: record[name] for name in fields if name in record}
+
+
+def _check_filters(filters: dict) -> dict:
+    unknown = set(filters) - set(INDEXED_FIELDS) - {"created_from", "created_to"}
+    if unknown:
+        raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+    return {name: value for name, value in filters.items() if value is not None}
+
+
+class WebhookRepository:
+    """Interface used by webhook_server.py; backends implement every method."""
+
+    # True if methods do blocking I/O; run() then calls them in a worker thread
+    blocking = False
+
+    async def run(self, method: Callable, *args, **kwargs):
+        """
+        Call one of this repository's methods from async code without
+        blocking the event loop.
+
+        Usage:
+            leads = await repository.run(repository.find_leads_by_phone, phone)
+        """
+        if self.blocking:
+            return await asyncio.to_thread(method, *args, **kwargs)
+        return method(*args, **kwargs)
+
+    def save_lead(self, lead: dict):
+        """Insert or replace a lead (keyed by lead_id)."""
+        raise NotImplementedError
+
+    def get_lead(self, lead_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def find_leads_by_phone(self, phone: str) -> list:
+        """Leads with an exact phone match, newest first."""
+        raise NotImplementedError
+
+    def list_leads(self) -> list:
+        """All leads, newest first."""
+        raise NotImplementedError
+
+    def count_leads(self) -> int:
+        raise NotImplementedError
+
+    def save_appointment(self, appointment: dict):
+        """Insert or replace an appointment (keyed by confirmation_number)."""
+        raise NotImplementedError
+
+    def get_appointment(self, confirmation_number: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def list_appointments(self) -> list:
+        """All appointments, newest first."""
+        raise NotImplementedError
+
+    def count_appointments(self) -> int:
+        raise NotImplementedError
+
+    def save_calls(self, calls: list):
+        """Insert or replace call records (keyed by call_id) in one batch."""
+        raise NotImplementedError
+
+    def get_calls(self, call_ids: list) -> dict:
+        """call_id -> call record, for the ids that exist."""
+        raise NotImplementedError
+
+    def get_call(self, call_id: str) -> Optional[dict]:
+        return self.get_calls([call_id]).get(call_id)
+
+    def update_calls(self, call_ids: list, update: Callable[[dict], list]):
+        """
+        Read-modify-write call records as one atomic step.
+
+        Args:
+            call_ids: Calls to read
+            update: Called with {call_id: existing record}; returns the records to save
+        """
+        raise NotImplementedError
+
+    def query(self, kind: str, after: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, **filters) -> Page:
+        """
+        One page of records of a kind ("lead", "appointment" or "call"), newest first.
+
+        Args:
+            after: Cursor from the previous page's next_cursor
+            limit: Page size (1..MAX_PAGE_SIZE)
+            **filters: status, priority, phone (exact match), created_from and
+                created_to (inclusive ISO date or datetime prefixes)
+
+        Raises:
+            InvalidCursor: If `after` is not a cursor from this API
+            ValueError: For an unknown filter
+        """
+        raise NotImplementedError
+
+    def query_leads(self, after: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, **filters) -> Page:
+        return self.query("lead", after, limit, **filters)
+
+    def query_appointments(self, after: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, **filters) -> Page:
+        return self.query("appointment", after, limit, **filters)
+
+    def flush(self):
+        """Persist any queued writes."""
+
+    def close(self):
+        """Flush and release resources."""
+        self.flush()
+
+
+class _MemoryTable:
+    """Records of one kind plus sorted (created_at, id) indexes."""
+
+    def __init__(self, id_field: str):
+        self.id_field = id_field
+        self.records: dict = {}
+        self.order: list = []  # All keys, ascending
+        self.indexes: dict = {name: {} for name in INDEXED_FIELDS}  # field -> value -> keys, ascending
+
+    def _key(self, record: dict) -> tuple:
+        return (record.get("created_at") or "", record[self.id_field])
+
+    @staticmethod
+    def _remove(keys: list, key: tuple):
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            del keys[i]
+
+    def save(self, record: dict):
+        old = self.records.get(record[self.id_field])
+        if old is not None:
+            key = self._key(old)
+            self._remove(self.order, key)
+            for name, index in self.indexes.items():
+                if old.get(name) is not None:
+                    self._remove(index[old[name]], key)
+
+        self.records[record[self.id_field]] = record
+        key = self._key(record)
+        insort(self.order, key)
+        for name, index in self.indexes.items():
+            if record.get(name) is not None:
+                insort(index.setdefault(record[name], []), key)
+
+    def page(self, after: Optional[str], limit: int, filters: dict) -> Page:
+        # Walk the smallest index that satisfies one of the equality filters
+        keys = self.order
+        for name in INDEXED_FIELDS:
+            if name in filters:
+                candidate = self.indexes[name].get(filters[name], [])
+                if len(candidate) < len(keys):
+                    keys = candidate
+
+        hi = len(keys)
+        if after:
+            hi = bisect_left(keys, decode_cursor(after))
+        if "created_to" in filters:
+            hi = min(hi, bisect_right(keys, (filters["created_to"] + _MAX_SUFFIX,)))
+        lo = bisect_left(keys, (filters["created_from"],)) if "created_from" in filters else 0
+
+        equality = [(name, filters[name]) for name in INDEXED_FIELDS if name in filters]
+        records = []
+        for i in range(hi - 1, lo - 1, -1):
+            record = self.records[keys[i][1]]
+            if all(record.get(name) == value for name, value in equality):
+                records.append(record)
+                if len(records) > limit:
+                    break
+
+        next_cursor = None
+        if len(records) > limit:
+            records.pop()
+            next_cursor = encode_cursor(*self._key(records[-1]))
+        return Page(records, next_cursor)
+
+
+class MemoryRepository(WebhookRepository):
+    """Process-local dicts with sorted secondary indexes; data is lost on restart."""
+
+    def __init__(self):
+        self.tables = {kind: _MemoryTable(id_field) for kind, (_, id_field) in TABLES.items()}
+
+    def save_lead(self, lead: dict):
+        self.tables["lead"].save(lead)
+
+    def get_lead(self, lead_id: str) -> Optional[dict]:
+        return self.tables["lead"].records.get(lead_id)
+
+    def find_leads_by_phone(self, phone: str) -> list:
+        return self.query("lead", limit=MAX_PAGE_SIZE, phone=phone).records
+
+    def list_leads(self) -> list:
+        table = self.tables["lead"]
+        return [table.records[key[1]] for key in reversed(table.order)]
+
+    def count_leads(self) -> int:
+        return len(self.tables["lead"].records)
+
+    def save_appointment(self, appointment: dict):
+        self.tables["appointment"].save(appointment)
+
+    def get_appointment(self, confirmation_number: str) -> Optional[dict]:
+        return self.tables["appointment"].records.get(confirmation_number)
+
+    def list_appointments(self) -> list:
+        table = self.tables["appointment"]
+        return [table.records[key[1]] for key in reversed(table.order)]
+
+    def count_appointments(self) -> int:
+        return len(self.tables["appointment"].records)
+
+    def save_calls(self, calls: list):
+        for call in calls:
+            self.tables["call"].save(call)
+
+    def get_calls(self, call_ids: list) -> dict:
+        records = self.tables["call"].records
+        return {call_id: records[call_id] for call_id in call_ids if call_id in records}
+
+    def update_calls(self, call_ids: list, update: Callable[[dict], list]):
+        self.save_calls(update(self.get_calls(call_ids)))
+
+    def query(self, kind: str, after: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, **filters) -> Page:
+        return self.tables[kind].page(after, max(1, min(limit, MAX_PAGE_SIZE)), _check_filters(filters))
+
+
+def _row(id_field: str, record: dict) -> tuple:
+    """(id, phone, status, priority, created_at, data) for an INSERT."""
+    return (
+        record[id_field],
+        record.get("phone"),
+        record.get("status"),
+        record.get("priority"),
+        record.get("created_at"),
+        json.dumps(record),
+    )
+
+
+class SQLiteRepository(WebhookRepository):
+    """
+    SQLite (WAL) backed repository with batched writes.
+
+    Args:
+        path: Database file (":memory:" for a throwaway database)
+        batch_size: Queued writes that wake the writer thread without waiting for flush_interval
+        flush_interval: Seconds the writer thread waits for more writes before committing
+
+    Saves only queue the record; a background writer thread commits it, so
+    a request never waits on the commit. Reads commit what is queued first.
+    close() commits and closes the connection, and the next call opens it
+    again (e.g. when the app's lifespan starts a second time).
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        path: str = DEFAULT_DB_PATH,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        # Opened on first use, so creating the repository (e.g. at import) touches no files
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()  # Guards the connection
+        self._pending: list = []  # (kind, record) waiting to be committed
+        self._pending_lock = threading.Lock()
+        self._wake = threading.Event()  # Records are queued
+        self._full = threading.Event()  # A full batch is queued, commit without waiting
+        self._writer: Optional[threading.Thread] = None  # Started with the first queued write
+        self._stop: Optional[threading.Event] = None  # Stops self._writer
+
+    def _connect(self) -> sqlite3.Connection:
+        # Called with self._lock held
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._init_schema(conn)
+            self._conn = conn
+        return self._conn
+
+    def _init_schema(self, conn: sqlite3.Connection):
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for table, _ in TABLES.values():
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    id TEXT PRIMARY KEY,
+                    phone TEXT,
+                    status TEXT,
+                    priority TEXT,
+                    created_at TEXT,
+                    data TEXT NOT NULL
+                )
+            """)
+            # Every index ends in (created_at, id) so filtered pages are keyset range scans
+            for name in ("phone", "status"):
+                conn.execute(f"DROP INDEX IF EXISTS idx_{table}_{name}")  # Pre-pagination indexes
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_created_at ON {table} (created_at, id)")
+            for name in INDEXED_FIELDS:
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{table}_{name}_created ON {table} ({name}, created_at, id)"
+                )
+
+    # ---- writes ----
+
+    def _queue(self, kind: str, *records: dict):
+        # Never commits on the caller's thread: saves are called from request handlers
+        with self._pending_lock:
+            self._pending.extend((kind, dict(record)) for record in records)
+            if len(self._pending) >= self.batch_size:
+                self._full.set()
+            if self._writer is None:
+                self._stop = threading.Event()
+                self._writer = threading.Thread(
+                    target=self._write_loop, args=(self._stop,), name="webhook-storage-writer", daemon=True
+                )
+                self._writer.start()
+        self._wake.set()
+
+    def _write_loop(self, stop: threading.Event):
+        while not stop.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            if self.flush_interval:
+                # Give concurrent requests a moment to join the batch, unless it is already full
+                self._full.wait(self.flush_interval)
+            self._full.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logger.error("Storage write error", extra={"event": "storage_write_error", "error": str(e)})
+
+    def flush(self):
+        # Hold the connection lock while swapping the queue, so a reader that
+        # flushes after a concurrent flush started waits for its commit
+        with self._lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+
+            conn = self._connect()
+            rows: dict = {}
+            for kind, record in batch:
+                table, id_field = TABLES[kind]
+                rows.setdefault(table, []).append(_row(id_field, record))
+
+            try:
+                conn.execute("BEGIN")
+                for table, values in rows.items():
+                    conn.executemany(
+                        f"INSERT OR REPLACE INTO {table} (id, phone, status, priority, created_at, data) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        values,
+                    )
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                with self._pending_lock:
+                    self._pending[:0] = batch  # Keep the records for the next attempt
+                raise
+
+    def save_lead(self, lead: dict):
+        self._queue("lead", lead)
+
+    def save_appointment(self, appointment: dict):
+        self._queue("appointment", appointment)
+
+    def save_calls(self, calls: list):
+        if calls:
+            self._queue("call", *calls)
+
+    # ---- reads ----
+
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        self.flush()
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def _records(self, sql: str, params: tuple = ()) -> list:
+        return [json.loads(row["data"]) for row in self._query(sql, params)]
+
+    def _get(self, table: str, record_id: str) -> Optional[dict]:
+        records = self._records(f"SELECT data FROM {table} WHERE id = ?", (record_id,))
+        return records[0] if records else None
+
+    def _count(self, table: str) -> int:
+        return self._query(f"SELECT COUNT(*) FROM {table}")[0][0]
+
+    def get_lead(self, lead_id: str) -> Optional[dict]:
+        return self._get("leads", lead_id)
+
+    def find_leads_by_phone(self, phone: str) -> list:
+        return self._records(
+            "SELECT data FROM leads WHERE phone = ? ORDER BY created_at DESC, id DESC", (phone,)
+        )
+
+    def list_leads(self) -> list:
+        return self._records("SELECT data FROM leads ORDER BY created_at DESC, id DESC")
+
+    def count_leads(self) -> int:
+        return self._count("leads")
+
+    def get_appointment(self, confirmation_number: str) -> Optional[dict]:
+        return self._get("appointments", confirmation_number)
+
+    def list_appointments(self) -> list:
+        return self._records("SELECT data FROM appointments ORDER BY created_at DESC, id DESC")
+
+    def count_appointments(self) -> int:
+        return self._count("appointments")
+
+    def get_calls(self, call_ids: list) -> dict:
+        calls = {}
+        for start in range(0, len(call_ids), 500):  # Stay under SQLite's variable limit
+            chunk = call_ids[start:start + 500]
+            for record in self._records(
+                f"SELECT data FROM calls WHERE id IN ({', '.join('?' * len(chunk))})", tuple(chunk)
+            ):
+                calls[record["call_id"]] = record
+        return calls
+
+    def update_calls(self, call_ids: list, update: Callable[[dict], list]):
+        # BEGIN IMMEDIATE takes SQLite's write lock before reading, so another
+        # worker process merging events for the same call waits for this commit
+        self.flush()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = {}
+                for start in range(0, len(call_ids), 500):  # Stay under SQLite's variable limit
+                    chunk = call_ids[start:start + 500]
+                    for row in conn.execute(
+                        f"SELECT data FROM calls WHERE id IN ({', '.join('?' * len(chunk))})", tuple(chunk)
+                    ):
+                        record = json.loads(row["data"])
+                        existing[record["call_id"]] = record
+                records = update(existing)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO calls (id, phone, status, priority, created_at, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [_row("call_id", record) for record in records],
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def query(self, kind: str, after: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, **filters) -> Page:
+        table, _ = TABLES[kind]
+        filters = _check_filters(filters)
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        where, params = [], []
+        for name in INDEXED_FIELDS:
+            if name in filters:
+                where.append(f"{name} = ?")
+                params.append(filters[name])
+        if "created_from" in filters:
+            where.append("created_at >= ?")
+            params.append(filters["created_from"])
+        if "created_to" in filters:
+            where.append("created_at <= ?")
+            params.append(filters["created_to"] + _MAX_SUFFIX)
+        if after:
+            created_at, record_id = decode_cursor(after)
+            where.append("(created_at < ? OR (created_at = ? AND id < ?))")
+            params.extend([created_at, created_at, record_id])
+
+        rows = self._query(
+            f"SELECT id, created_at, data FROM {table} "
+            f"{'WHERE ' + ' AND '.join(where) if where else ''} "
+            "ORDER BY created_at DESC, id DESC LIMIT ?",
+            tuple(params) + (limit + 1,),
+        )
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["created_at"] or "", rows[-1]["id"])
+        return Page([json.loads(row["data"]) for row in rows], next_cursor)
+
+    def close(self):
+        with self._pending_lock:
+            writer, stop = self._writer, self._stop
+            self._writer = self._stop = None  # The next queued write starts a new writer
+        if writer is not None:
+            stop.set()
+            self._full.set()
+            self._wake.set()
+            writer.join(timeout=5)
+        self.flush()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def create_repository(backend: Optional[str] = None, path: Optional[str] = None) -> WebhookRepository:
+    """
+    Repository selected by arguments or the WEBHOOK_STORAGE / WEBHOOK_DB_PATH env vars.
+
+    Args:
+        backend: "sqlite" (default) or "memory"
+        path: SQLite database file
+
+    Raises:
+        ValueError: For an unknown backend
+    """
+    backend = (backend or os.environ.get("WEBHOOK_STORAGE") or "sqlite").lower()
+    if backend == "memory":
+        return MemoryRepository()
+    if backend == "sqlite":
+        return SQLiteRepository(path or os.environ.get("WEBHOOK_DB_PATH") or DEFAULT_DB_PATH)
+    raise ValueError(f"Unknown WEBHOOK_STORAGE backend: {backend} (expected 'sqlite' or 'memory')")
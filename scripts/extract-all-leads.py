@@ -1,62 +1,230 @@
 #!/usr/bin/env python3
 """
 Extract all leads from import-leads.sql and create a Supabase-compatible SQL file
+
+The input is read line by line and scanned with a small SQL tokenizer
+(quoted strings, comments, parentheses), so leads are yielded one at a
+time as their VALUES tuples close and the output is written in chunks of
+--chunk-size rows, one INSERT per chunk. Memory stays flat however many
+leads the file holds.
+
+Both statement forms in import-leads.sql are read:
+  INSERT INTO leads (user_id, ...) VALUES (<user>, ...);          -- user_id is dropped
+  ... INSERT INTO leads (...) SELECT ... FROM (VALUES (...), (...)) AS t(...);
+
+Usage:
+  python scripts/extract-all-leads.py
+  python scripts/extract-all-leads.py -i leads-dump.sql -o import-leads-supabase.sql --email owner@example.com
+  python scripts/extract-all-leads.py -o - | head        # Write to stdout
 """
 
+import argparse
+import os
 import re
+import sys
+from itertools import islice
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INPUT = os.path.join(SCRIPTS_DIR, 'import-leads.sql')
+DEFAULT_OUTPUT = os.path.join(SCRIPTS_DIR, 'import-leads-supabase.sql')
+DEFAULT_EMAIL = 'Gugo2942@gmail.com'
+DEFAULT_CHUNK_SIZE = 1000
+
+# Columns of each extracted lead, in order (user_id comes from the email lookup)
+LEAD_COLUMNS = ('business_name', 'contact_name', 'email', 'phone', 'address', 'city', 'state', 'zip',
+                'industry', 'google_rating', 'review_count', 'website', 'status', 'score', 'notes')
+
+# Outside quoted strings: a comment, a quote, punctuation, or a run of anything else
+_TOKEN = re.compile(r"--[^\n]*|'|[(),;]|[^'(),;\-]+|-")
+# Fast paths: statement text up to the next quote, paren or semicolon, and a
+# whole value in a tuple (a literal or bare word followed by its comma or
+# closing paren); anything else goes through _TOKEN
+_HEADER_TEXT = re.compile(r"(?:[^'();\-]|-(?!-))+")
+_SIMPLE_VALUE = re.compile(r"\s*('(?:[^'\n]|'')*'(?:::\w+)?|(?:[^'(),;\n\-]|-(?!-))*?)\s*([,)])")
+_INSERT_LEADS = re.compile(r"\bINSERT\s+INTO\s+leads\b", re.IGNORECASE)
+_ENDS_WITH_VALUES = re.compile(r"\bVALUES\s*$", re.IGNORECASE)
+# A literal with a type cast, e.g. 'new'::lead_status (the output casts the columns itself)
+_CAST = re.compile(r"^('(?:[^']|'')*')::\w+$")
+
+# Statement text kept for keyword detection (tuples are never part of it)
+_MAX_HEADER = 4096
+
+
+class LeadScanner:
+    """
+    Incremental parser for the VALUES tuples of INSERT INTO leads statements.
+
+    Feed it lines with feed(); each call returns the tuples completed by
+    that line as lists of SQL literals, exactly as written.
+    """
+
+    def __init__(self):
+        self.in_quote = False
+        self.depth = 0
+        self._reset_statement()
+
+    def _reset_statement(self):
+        self.header = ''           # Statement text outside tuples, to spot INSERT INTO leads ... VALUES
+        self.is_leads = False
+        self.values_depth = None   # Paren depth of the VALUES list being read
+        self.expect_tuple = False  # After VALUES or a comma between tuples
+        self.row = None            # Values of the tuple being read
+        self.value = []            # Text of the value being read
+
+    def _text(self, text: str):
+        if self.row is not None:
+            self.value.append(text)
+        else:
+            self.header += text
+            if not self.is_leads and _INSERT_LEADS.search(self.header):
+                self.is_leads = True
+            if len(self.header) > _MAX_HEADER:
+                self.header = self.header[-64:]
+
+    def _end_value(self):
+        self.row.append(''.join(self.value).strip())
+        self.value = []
+
+    def feed(self, line: str) -> list:
+        rows = []
+        pos = 0
+        while pos < len(line):
+            if self.in_quote:
+                end = line.find("'", pos)
+                if end == -1:
+                    self._text(line[pos:])
+                    break
+                if line.startswith("''", end):  # Escaped quote
+                    self._text(line[pos:end + 2])
+                    pos = end + 2
+                    continue
+                self._text(line[pos:end + 1])
+                self.in_quote = False
+                pos = end + 1
+                continue
+
+            if self.row is not None:
+                if not self.value and self.depth == self.values_depth + 1:
+                    match = _SIMPLE_VALUE.match(line, pos)
+                    if match:
+                        self.row.append(match.group(1))
+                        pos = match.end()
+                        if match.group(2) == ')':
+                            self.depth -= 1
+                            rows.append(self.row)
+                            self.row = None
+                        continue
+            elif self.values_depth is None:
+                match = _HEADER_TEXT.match(line, pos)
+                if match:
+                    self._text(match.group())
+                    pos = match.end()
+                    continue
+
+            token = _TOKEN.match(line, pos).group()
+            pos += len(token)
+            if token.startswith('--'):
+                continue
+            if token == "'":
+                self.in_quote = True
+                self._text(token)
+            elif token == '(':
+                if self.row is None and self.is_leads and (
+                        self.expect_tuple and self.depth == self.values_depth
+                        or self.values_depth is None and _ENDS_WITH_VALUES.search(self.header)):
+                    self.values_depth = self.depth
+                    self.expect_tuple = False
+                    self.row = []
+                else:
+                    self._text(token)
+                self.depth += 1
+            elif token == ')':
+                self.depth -= 1
+                if self.row is not None and self.depth == self.values_depth:
+                    self._end_value()
+                    rows.append(self.row)
+                    self.row = None
+                else:
+                    self._text(token)
+                    if self.values_depth is not None and self.depth < self.values_depth:
+                        self.values_depth = None  # The VALUES subquery closed
+            elif token == ',':
+                if self.row is not None and self.depth == self.values_depth + 1:
+                    self._end_value()
+                elif self.row is None and self.values_depth is not None and self.depth == self.values_depth:
+                    self.expect_tuple = True
+                else:
+                    self._text(token)
+            elif token == ';' and self.depth == 0:
+                self._reset_statement()
+            else:
+                if self.row is None and self.values_depth is not None and token.strip():
+                    self.expect_tuple = False  # e.g. ON CONFLICT (...) after the tuples
+                self._text(token)
+        return rows
 
-print("Reading import-leads.sql...")
-with open('/workspaces/greenlineai-frontend/scripts/import-leads.sql', 'r') as f:
-    content = f.read()
-
-# Extract all VALUES clauses from INSERT statements
-pattern = r"INSERT INTO leads \(user_id, business_name, contact_name, email, phone, address, city, state, zip, industry, google_rating, review_count, website, status, score, notes\)\s*VALUES \(admin_id,\s*([^;]+)\);"
-
-matches = re.findall(pattern, content, re.DOTALL)
-print(f"Found {len(matches)} lead records")
-
-# Convert to VALUES format
-values_list = []
-for match in matches:
-    # Clean up the values and remove admin_id reference
-    cleaned = match.strip()
-    # Replace enum casts
-    cleaned = cleaned.replace("'new'::lead_status", "'new'")
-    cleaned = cleaned.replace("'qualified'::lead_status", "'qualified'")
-    cleaned = cleaned.replace("'contacted'::lead_status", "'contacted'")
-    cleaned = cleaned.replace("'hot'::lead_score", "'hot'")
-    cleaned = cleaned.replace("'warm'::lead_score", "'warm'")
-    cleaned = cleaned.replace("'cold'::lead_score", "'cold'")
-    values_list.append(f"    ({cleaned})")
-
-# Build the complete SQL file
-sql_content = f"""-- GreenLine AI Leads Import for Supabase UI
+
+def iter_leads(lines, skipped: list = None):
+    """
+    Yield each lead as a tuple of SQL literals, in LEAD_COLUMNS order.
+
+    Args:
+        lines: Iterable of SQL text lines (an open file)
+        skipped: Optional list that tuples with an unexpected column count are appended to
+    """
+    scanner = LeadScanner()
+    for line in lines:
+        for row in scanner.feed(line):
+            if len(row) == len(LEAD_COLUMNS) + 1:
+                row = row[1:]  # Drop the dump's user_id
+            if len(row) != len(LEAD_COLUMNS):
+                if skipped is not None:
+                    skipped.append(row)
+                continue
+            yield tuple(_CAST.sub(r'\1', value) for value in row)
+
+
+def chunks(iterable, size: int):
+    """Lists of up to `size` items, read lazily."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+HEADER = """-- GreenLine AI Leads Import for Supabase UI
 -- Run this in Supabase SQL Editor
--- 
+--
 -- INSTRUCTIONS:
--- This script will automatically find the user with email 'Gugo2942@gmail.com'
--- and import all {len(matches)} leads for that user.
+-- This script will automatically find the user with email '{email}'
+-- and import all leads for that user.
 
 BEGIN;
 
 DO $$
 DECLARE
   v_user_id UUID;
-  v_inserted_count INTEGER;
+  v_rows INTEGER;
+  v_inserted_count INTEGER := 0;
 BEGIN
   -- Get the admin user ID
-  SELECT id INTO v_user_id 
-  FROM auth.users 
-  WHERE email = 'Gugo2942@gmail.com' 
+  SELECT id INTO v_user_id
+  FROM auth.users
+  WHERE email = '{email}'
   LIMIT 1;
-  
+
   IF v_user_id IS NULL THEN
-    RAISE EXCEPTION 'User with email Gugo2942@gmail.com not found. Please create the user first.';
+    RAISE EXCEPTION 'User with email {email} not found. Please create the user first.';
   END IF;
+"""
 
-  -- Insert all leads using the found user_id
+# One per chunk of leads, so no single statement grows with the input
+CHUNK = """
+  -- Leads {first} to {last}
   INSERT INTO leads (user_id, business_name, contact_name, email, phone, address, city, state, zip, industry, google_rating, review_count, website, status, score, notes)
-  SELECT 
+  SELECT
     v_user_id,
     business_name,
     contact_name,
@@ -74,28 +242,78 @@ BEGIN
     score::lead_score,
     notes
   FROM (VALUES
-{',\n'.join(values_list)}
+{values}
   ) AS t(business_name, contact_name, email, phone, address, city, state, zip, industry, google_rating, review_count, website, status, score, notes);
+  GET DIAGNOSTICS v_rows = ROW_COUNT;
+  v_inserted_count := v_inserted_count + v_rows;
+"""
 
-  GET DIAGNOSTICS v_inserted_count = ROW_COUNT;
+FOOTER = """
   RAISE NOTICE 'Successfully imported % leads for user %', v_inserted_count, v_user_id;
 END $$;
 
 COMMIT;
 
 -- Verify the import
-SELECT 
+SELECT
   COUNT(*) as total_leads_imported,
   user_id,
   (SELECT email FROM auth.users WHERE id = user_id) as user_email
-FROM leads 
+FROM leads
 GROUP BY user_id;
 """
 
-# Write the new SQL file
-output_file = '/workspaces/greenlineai-frontend/scripts/import-leads-supabase.sql'
-with open(output_file, 'w') as f:
-    f.write(sql_content)
 
-print(f"Created {output_file} with {len(matches)} leads")
-print("File is ready to be run in Supabase SQL Editor!")
+def write_import_sql(leads, out, email: str = DEFAULT_EMAIL, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Write the Supabase import script for `leads` to `out`, one chunk at a time.
+
+    Returns:
+        Number of leads written
+    """
+    email = email.replace("'", "''")
+    out.write(HEADER.format(email=email))
+    count = 0
+    for chunk in chunks(leads, chunk_size):
+        values = ',\n'.join(f"    ({', '.join(lead)})" for lead in chunk)
+        out.write(CHUNK.format(first=count + 1, last=count + len(chunk), values=values))
+        count += len(chunk)
+    out.write(FOOTER)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Extract leads from import-leads.sql into a Supabase import script')
+    parser.add_argument('--input', '-i', default=DEFAULT_INPUT, help=f'SQL file with INSERT INTO leads statements (default: {DEFAULT_INPUT})')
+    parser.add_argument('--output', '-o', default=DEFAULT_OUTPUT, help=f"Import script to write, or - for stdout (default: {DEFAULT_OUTPUT})")
+    parser.add_argument('--email', default=DEFAULT_EMAIL, help=f'Email of the user the leads are imported for (default: {DEFAULT_EMAIL})')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help=f'Leads per INSERT statement (default: {DEFAULT_CHUNK_SIZE})')
+    args = parser.parse_args()
+    if args.chunk_size < 1:
+        parser.error('--chunk-size must be at least 1')
+
+    # Progress goes to stderr so the output can be piped
+    log = sys.stderr
+    print(f"Reading {args.input}...", file=log)
+    skipped = []
+    with open(args.input, 'r', encoding='utf-8') as source:
+        leads = iter_leads(source, skipped)
+        if args.output == '-':
+            count = write_import_sql(leads, sys.stdout, args.email, args.chunk_size)
+        else:
+            # Write next to the destination and move into place, so a failed run keeps the old file
+            partial = args.output + '.partial'
+            with open(partial, 'w', encoding='utf-8') as out:
+                count = write_import_sql(leads, out, args.email, args.chunk_size)
+            os.replace(partial, args.output)
+
+    print(f"Found {count} lead records", file=log)
+    if skipped:
+        print(f"Skipped {len(skipped)} tuples with {len(LEAD_COLUMNS)} or {len(LEAD_COLUMNS) + 1} values expected", file=log)
+    if args.output != '-':
+        print(f"Created {args.output} with {count} leads", file=log)
+        print("File is ready to be run in Supabase SQL Editor!", file=log)
+
+
+if __name__ == '__main__':
+    main()